@@ -65,5 +65,26 @@ DEFAULT_GUI_CONFIG = {
     },
     "callback_delays": {
         "voice_command": 5000,
-    }
+    },
+    "governor": {
+        "enable": True,
+        "interval_ms": 1000,
+        "latency_target_ms": 150,
+        "cpu_budget": 0.85,  # of one core, shared by the gaze, drone and GUI threads
+        "recovery_margin": 0.7,
+        "restore_after": 5,  # calm evaluations before a step is restored
+        "degraded": {
+            "telemetry_scale": 3,
+            "webcam_fps": 15,
+            "preview_scale": 0.5,
+            "gaze_tick_rate": 15,
+        },
+    },
+    "session_recording": {
+        "enable": False,
+        "jpeg_quality": 80,
+        "chunk_records": 64,  # frames or records per stream in each chunk
+        "chunk_seconds": 2.0,
+        "queue_size": 64,  # frames waiting to be written before frames are dropped
+    },
 }
@@ -4,7 +4,7 @@ Handles GUI for the application using PyQt6
 
 from typing import Dict, List, Tuple, Optional, Any
 from threading import Event, Lock
-from multiprocessing import Queue as MPQueue
+import time
 
 import cv2
 import numpy as np
@@ -15,30 +15,39 @@ from PyQt6.QtGui import QImage, QPixmap, QKeyEvent
 
 from common.logger_helper import init_logger
 from common.common_gui import CommonGUI
-from common import image
+from common.gaze_overlay import GazeOverlayRenderer
+from common import session_recorder
 from common import constants as cc
 from common.PeekableQueue import PeekableQueue
+from common.keyboard import KeyRouter
+from common.SharedRingQueue import SharedRingQueue
 from common import omegaconf_helper as oh
 
 from drone.src.flight_statistics import FlightStatistics
 
 from options import PreferencesDialog
+from resource_governor import ResourceGovernor
 from about import AboutDialog
 import constants as c
 
 import utils.file_handler as file_handler
+from utils.startup import StartupProfiler
 
 
 logger = init_logger("DEBUG")
 
 
 class MainApp(QMainWindow, CommonGUI):
-    def __init__(self, stop_event: Event, thread_data: Dict, data_lock: Lock, interprocess_data: Dict):
+    def __init__(self, stop_event: Event, thread_data: Dict, data_lock: Lock, interprocess_data: Dict,
+                 startup_profiler: Optional[StartupProfiler] = None):
         logger.info(">>> Initialising MainApp...")
         self.stop_event = stop_event
         self.thread_data = thread_data
         self.data_lock = data_lock
         self.interprocess_data = interprocess_data
+        self.startup_profiler = startup_profiler
+        # Drone frames are displayed without colour conversion, so are already RGB
+        self.gaze_overlay_renderer = GazeOverlayRenderer(rgb=True)
 
         super().__init__()
 
@@ -49,6 +58,8 @@ class MainApp(QMainWindow, CommonGUI):
         self._init_qpixmaps()
         self._init_timers()
         self._init_queues()
+        self._init_governor()
+        self._init_session_recording()
 
         logger.info("<<< MainApp initialised")
 
@@ -219,15 +230,41 @@ class MainApp(QMainWindow, CommonGUI):
 
     def _init_queues(self) -> None:
         """
-        Initialise the keyboard queue. Not assigned to any
-        particular module since any thread can "subscribe" to this queue.
+        Initialise the key router. Not assigned to any particular module since
+        any thread can subscribe to the keys it binds. The voice control process
+        routes keys itself, so it receives every key through its IPC queue.
         """
         logger.debug("Initialising queues")
+        self.key_router = KeyRouter()
+        self.key_router.subscribe(
+            cc.VOICE_CONTROL, queue=self.interprocess_data[cc.KEYBOARD_QUEUE])
         with self.data_lock:
-            self.thread_data[cc.KEYBOARD_QUEUE] = PeekableQueue()
+            self.thread_data[cc.KEY_ROUTER] = self.key_router
             self.thread_data[cc.DRONE][cc.COMMAND_QUEUE] = PeekableQueue()
             self.thread_data[cc.DRONE][cc.CONNECT_TO_DRONE] = False
 
+    def _init_governor(self) -> None:
+        """
+        Initialise the resource governor, which trades feed rates and quality for
+        latency when the app is short of CPU.
+        """
+        self.last_webcam_frame_time: Optional[float] = None
+        self.governor = ResourceGovernor(self.config.governor, self.timers_fps, self.timers,
+                                         self.thread_data, self.data_lock, self)
+
+    def _init_session_recording(self) -> None:
+        """
+        Starts recording the session's video, gaze, telemetry and voice commands, if enabled.
+        """
+        recording_config = self.config.session_recording
+        if not recording_config.enable:
+            return
+
+        session_recorder.start_session(
+            file_handler.get_sessions_folder(), jpeg_quality=recording_config.jpeg_quality,
+            chunk_records=recording_config.chunk_records, chunk_seconds=recording_config.chunk_seconds,
+            queue_size=recording_config.queue_size)
+
     def _resize_and_position_webcam_label(self):
         """
         Resize and position the webcam label at the bottom center of the window,
@@ -339,16 +376,11 @@ class MainApp(QMainWindow, CommonGUI):
         if key == Qt.Key.Key_Escape:
             self.close_app()
 
-        # Any other key goes into the keyboard queue
-        with self.data_lock:
-            logger.debug("Adding key to queue: %s", key)
-            keyboard_queue: PeekableQueue = self.thread_data[cc.KEYBOARD_QUEUE]
-            keyboard_queue.put(key)
-
-        keyboard_mp_queue: MPQueue = self.interprocess_data[cc.KEYBOARD_QUEUE]
-        keyboard_mp_queue.put(key)
+        # Any other key is routed to the modules which bind it. Delivery never
+        # blocks the GUI thread, even if the voice control process stops consuming.
+        subscribers = self.key_router.dispatch(key)
 
-        logger.info("Key %s added to keyboard queue", key)
+        logger.info("Key %s routed to %d subscribers", key, subscribers)
 
     def _open_options(self) -> None:
         """
@@ -446,6 +478,15 @@ class MainApp(QMainWindow, CommonGUI):
         if webcam_frame is None:
             return None
 
+        if self.startup_profiler is not None:
+            self.startup_profiler.mark("First gaze frame")
+            self.startup_profiler = None
+
+        frame_time = self.thread_data[cc.EYE_TRACKING].get(cc.FRAME_TIME)
+        if frame_time is not None and frame_time != self.last_webcam_frame_time:
+            self.last_webcam_frame_time = frame_time
+            self.governor.record_frame_latency(time.perf_counter() - frame_time)
+
         self._set_pixmap(self.webcam_video_label, webcam_frame)
 
     def get_drone_feed(self) -> None:
@@ -456,14 +497,13 @@ class MainApp(QMainWindow, CommonGUI):
         if drone_frame is None:
             return None
 
-        gaze_overlay_frame = self.get_video_feed(
-            cc.EYE_TRACKING, cc.GAZE_OVERLAY)
-        if gaze_overlay_frame is None:
+        gaze_overlay = self.thread_data[cc.EYE_TRACKING].get(cc.GAZE_OVERLAY)
+        if gaze_overlay is None:
             out_frame = drone_frame
         else:
-            gaze_overlay_frame = image.rescale_frame(
-                gaze_overlay_frame, drone_frame.shape)
-            out_frame = image.blend_frame(drone_frame, gaze_overlay_frame, 0.5)
+            # The drone frame is shared with the drone thread, so draw on a copy
+            out_frame = drone_frame.copy()
+            self.gaze_overlay_renderer.render(out_frame, gaze_overlay)
 
         self._set_pixmap(self.drone_video_label, out_frame)
 
@@ -521,7 +561,7 @@ class MainApp(QMainWindow, CommonGUI):
         if not voice_data:
             return None
 
-        command_queue: MPQueue = voice_data.get(cc.COMMAND_QUEUE, None)
+        command_queue: SharedRingQueue = voice_data.get(cc.COMMAND_QUEUE, None)
         if command_queue is None:
             logger.error("Voice command queue not found")
             return None
@@ -536,6 +576,11 @@ class MainApp(QMainWindow, CommonGUI):
             logger.info("Next voice command %s with parsed command %s",
                         command_text, parsed_command)
 
+            recorder = session_recorder.get_session_recorder()
+            if recorder is not None:
+                recorder.record(session_recorder.VOICE_COMMANDS,
+                                {cc.COMMAND_TEXT: command_text, cc.PARSED_COMMAND: parsed_command})
+
             self._send_voice_command_to_drone(parsed_command)
             self._display_voice_command(command_text)
 
@@ -677,6 +722,8 @@ class MainApp(QMainWindow, CommonGUI):
             None
         """
         self._stop_all_timers()
+        self.governor.stop()
+        session_recorder.stop_session()
 
         if not self.stop_event.is_set():
             logger.info("Signalling all threads to stop")
@@ -7,13 +7,18 @@ Hugo Burton
 import sys
 from typing import List, Dict, Any
 from threading import Thread, Event, Lock
-from multiprocessing import Manager, Process
-
-from PyQt6.QtWidgets import QApplication
+from multiprocessing import Process
 
 # Must go before any other user imports to ensure project directory is added to sys.path
 from utils.import_helper import dynamic_import
+# Installs the import profiler, if enabled, so the remaining imports are profiled
+from common import import_profiler  # noqa: F401
+
+from PyQt6.QtWidgets import QApplication
+
 from utils.progress_controller import ProgressController
+from utils.startup import StartupProfiler, LazyEntryPoint
+import utils.file_handler as file_handler
 
 from gui import MainApp
 from loading_gui import LoadingGUI
@@ -21,6 +26,7 @@ import constants as c
 
 from common.logger_helper import init_logger
 from common.thread_helper import get_function_module
+from common.SharedRingQueue import SharedRingQueue
 from common import constants as cc
 
 logger = init_logger()
@@ -33,26 +39,30 @@ def is_any_thread_alive(threads: List[Thread]):
     return any(t.is_alive() for t in threads)
 
 
-def initialise_modules(loading_shared_data: Dict, progress: ProgressController, stop_event: Event, data_lock: Lock) -> None:
+def initialise_modules(loading_shared_data: Dict, progress: ProgressController, stop_event: Event, data_lock: Lock,
+                       profiler: StartupProfiler) -> None:
     """
     Initialise the modules, and emit a signal when complete.
 
+    Only the voice control module is imported here, since it must be imported before its
+    process is started. The eye tracking and drone modules are imported by their own
+    threads, so their dependencies load in parallel with each other and with the voice
+    control process.
+
     Args:
         loading_shared_data: Shared data
-        loading_helper: Loading helper
+        progress: Progress controller
         stop_event: Stop event
         data_lock: Lock for shared data
+        profiler: Startup profiler
     """
-    progress.set_stage("Initialising Modules", 3)
+    progress.set_stage("Initialising Modules", 1)
 
-    progress.set_loading_task("Initialising eye tracking module", 10)
-    eye_tracking = dynamic_import("eye_tracking.src.main", "main")
+    with profiler.phase("Initialising voice control module"):
+        voice_control = dynamic_import("voice_control.src.main", "main")
 
-    progress.set_loading_task("Initialising voice control module", 10)
-    voice_control = dynamic_import("voice_control.src.main", "main")
-
-    progress.set_loading_task("Initialising drone module", 10)
-    drone = dynamic_import("drone.src.main", "main")
+    eye_tracking = LazyEntryPoint("eye_tracking.src.main", "main", profiler)
+    drone = LazyEntryPoint("drone.src.main", "main", profiler)
 
     logger.info("Modules initialised.")
 
@@ -61,30 +71,32 @@ def initialise_modules(loading_shared_data: Dict, progress: ProgressController,
 
         # Due to blocking operation, the voice control module is run in a Process
         # (instead of a Thread) to allow for parallel execution and termination on
-        # parent process exit. As a result, the shared data is managed by a Manager
-        # object to allow for inter-process communication.
+        # parent process exit. The queues shared with the process live in shared
+        # memory, so no manager server process is needed to host them.
+        # The process is started before the threads begin importing so it is never
+        # forked while another thread holds an import lock.
         progress.set_stage("Initialising processes", 3)
-        progress.set_loading_task("Initialising IPC data manager", 15)
-        manager = Manager()
-        interprocess_data = manager.dict()
-        progress.set_loading_task("Configuring IPC data", 0.5)
-        loading_shared_data[c.IPC_DATA] = interprocess_data
-        progress.set_loading_task("Initialising process functions", 0.1)
-        process_functions = {voice_control: {
-            cc.COMMAND_QUEUE: manager.Queue()}}
-        process_shared_dict = {get_function_module(
-            func): init_val for func, init_val in process_functions.items()}
-        process_shared_dict[cc.KEYBOARD_QUEUE] = manager.Queue()
-        interprocess_data.update(process_shared_dict)
-        processes = [
-            Process(target=func, args=(interprocess_data,), name=f"process_{get_function_module(func)}") for func in process_functions
-        ]
-        loading_shared_data[c.PROCESSES] = processes
+        with profiler.phase("Initialising IPC queues"):
+            interprocess_data = dict()
+        with profiler.phase("Configuring IPC data"):
+            loading_shared_data[c.IPC_DATA] = interprocess_data
+        with profiler.phase("Initialising process functions"):
+            process_functions = {voice_control: {
+                cc.COMMAND_QUEUE: SharedRingQueue(cc.COMMAND_QUEUE_CAPACITY, cc.COMMAND_QUEUE_SLOT_SIZE)}}
+            process_shared_dict = {get_function_module(
+                func): init_val for func, init_val in process_functions.items()}
+            process_shared_dict[cc.KEYBOARD_QUEUE] = SharedRingQueue(
+                cc.KEYBOARD_QUEUE_CAPACITY, cc.KEYBOARD_QUEUE_SLOT_SIZE)
+            interprocess_data.update(process_shared_dict)
+            processes = [
+                Process(target=func, args=(interprocess_data,), name=f"process_{get_function_module(func)}") for func in process_functions
+            ]
+            loading_shared_data[c.PROCESSES] = processes
 
         progress.set_stage("Starting processes", len(processes))
         for process in processes:
-            progress.set_loading_task(f"Starting process {process.name}", 0.2)
-            process.start()
+            with profiler.phase(f"Starting process {process.name}"):
+                process.start()
 
         # =========== Threads ===========
 
@@ -93,22 +105,22 @@ def initialise_modules(loading_shared_data: Dict, progress: ProgressController,
         # but also require a lock to prevent race conditions when accessing shared data.
         progress.set_stage("Initialising threads", 2)
         thread_functions = [eye_tracking, drone]
-        progress.set_loading_task("Initialising shared data dictionary", 0.5)
-        thread_data = {get_function_module(func): {}
-                       for func in thread_functions}
-        loading_shared_data[c.THREAD_DATA] = thread_data
-        progress.set_loading_task("Initialising thread functions", 0.2)
-        threads = [
-            Thread(target=func, args=(stop_event, thread_data, data_lock),
-                   name=f"thread_{get_function_module(func)}")
-            for func in thread_functions
-        ]
-        loading_shared_data[c.THREADS] = threads
+        with profiler.phase("Initialising shared data dictionary"):
+            thread_data = {get_function_module(func): {}
+                           for func in thread_functions}
+            loading_shared_data[c.THREAD_DATA] = thread_data
+        with profiler.phase("Initialising thread functions"):
+            threads = [
+                Thread(target=func, args=(stop_event, thread_data, data_lock),
+                       name=f"thread_{get_function_module(func)}")
+                for func in thread_functions
+            ]
+            loading_shared_data[c.THREADS] = threads
 
         progress.set_stage("Starting threads", len(threads))
         for thread in threads:
-            progress.set_loading_task(f"Starting thread {thread.name}", 0.1)
-            thread.start()
+            with profiler.phase(f"Starting thread {thread.name}"):
+                thread.start()
     except KeyboardInterrupt:
         logger.info(
             "Keyboard interrupt detected, stopping threads and processes.")
@@ -116,8 +128,25 @@ def initialise_modules(loading_shared_data: Dict, progress: ProgressController,
     logger.info("Modules initialised.")
 
 
+def release_ipc_queues(interprocess_data: Dict[str, Any]) -> None:
+    """
+    Frees the shared memory of the IPC queues. Must only be called once all
+    processes have been joined.
+
+    Args:
+        interprocess_data: IPC data dictionary holding the queues
+    """
+    for value in interprocess_data.values():
+        queues = value.values() if isinstance(value, dict) else [value]
+        for queue in queues:
+            if isinstance(queue, SharedRingQueue):
+                logger.debug("Releasing IPC queue %s", queue.name)
+                queue.unlink()
+
+
 def main():
     logger.info(">>> Main Begin")
+    profiler = StartupProfiler(profile_path=file_handler.get_startup_profile_file())
 
     loading_gui = QApplication(sys.argv)
     loading_data_lock = Lock()
@@ -126,6 +155,7 @@ def main():
     loading_window = LoadingGUI(
         loading_shared_data, loading_data_lock, loading_stop_event)
     progress = ProgressController(5, loading_window.progress_update_signal)
+    profiler.progress = progress
 
     try:
         # Define lock and stop event early to ensure KeyboardInterrupt
@@ -133,7 +163,7 @@ def main():
         stop_event = Event()
         data_lock = Lock()
         init_thread = Thread(target=initialise_modules, args=(
-            loading_shared_data, progress, stop_event, data_lock), name="init_thread")
+            loading_shared_data, progress, stop_event, data_lock, profiler), name="init_thread")
         init_thread.start()
 
         loading_window.wrap_show()
@@ -157,7 +187,7 @@ def main():
         logger.info("Launching Main GUI")
         main_gui = QApplication(sys.argv)
         main_window = MainApp(stop_event, thread_data,
-                              data_lock, interprocess_data)
+                              data_lock, interprocess_data, profiler)
         main_window.wrap_show()
         main_gui.exec()
 
@@ -175,6 +205,8 @@ def main():
                     process.kill()
                 process.join()
 
+        release_ipc_queues(interprocess_data)
+
         logger.info("Waiting for threads to join")
         for thread in threads:
             thread_name = thread.name
@@ -183,6 +215,9 @@ def main():
 
         logger.info("Closing GUI")
         main_gui.quit()
+
+        profiler.log_summary()
+        profiler.save()
     except KeyboardInterrupt:
         logger.critical("Interrupted! Stopping all threads...")
 
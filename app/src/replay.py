@@ -0,0 +1,442 @@
+"""
+Replays a recorded session through the eye tracking, drone and voice control modules,
+without a camera, drone, microphone, network or GUI.
+
+Recorded webcam frames are fed to the gaze detector, recorded drone frames and telemetry
+to the drone controller through a simulated drone, and recorded transcripts to the voice
+controller. Every module is ticked from a single thread in timestamp order, so a replay
+is deterministic: the gaze sides and drone commands it produces can be diffed between
+code versions. Replays run as fast as possible unless --realtime is given.
+
+    python app/src/replay.py app/sessions/session_20241010_120000.session --output replay.jsonl
+    python app/src/replay.py app/sessions/session_20241010_120000.session --compare replay.jsonl
+"""
+
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from threading import Event, Lock
+import sys
+import json
+import time
+import heapq
+import queue
+import pathlib
+import argparse
+import tempfile
+
+# Must go before any other user imports to ensure project directory is added to sys.path
+import utils.import_helper  # noqa: F401
+
+import numpy as np
+from omegaconf import OmegaConf
+
+from common import constants as cc
+from common.logger_helper import init_logger
+from common.PeekableQueue import PeekableQueue
+from common.session_recorder import SessionReader, WEBCAM, DRONE_VIDEO, FLIGHT_STATISTICS, VOICE_COMMANDS
+
+from eye_tracking.src import init as eye_tracking_init
+from eye_tracking.src.gaze_detector import GazeDetector
+from drone.src import init as drone_init
+from drone.src.controller import Controller
+from drone.src.models import SimulatedDrone
+from voice_control.src import init as voice_control_init
+from voice_control.src.audio import AudioRecogniser
+from voice_control.src.command_cache import CommandCache, is_valid_command_list
+from voice_control.src.LLM.context import ContextStore
+from voice_control.src.LLM.defaults import init_context
+from voice_control.src.voice_controller import VoiceController
+
+logger = init_logger()
+
+# Sources of the replay's output events
+GAZE = "gaze"
+DRONE = "drone"
+VOICE = "voice"
+
+CONTROLLER_TICK = "controller_tick"
+
+# Timestamps are rounded so outputs diff cleanly between runs
+TIME_DECIMALS = 6
+
+
+class ReplayCapture:
+    """
+    Stands in for the gaze detector's `cv2.VideoCapture`, returning the frame last pushed.
+    """
+
+    def __init__(self):
+        self.frame: Optional[np.ndarray] = None
+
+    def push(self, frame: np.ndarray) -> None:
+        self.frame = frame
+
+    def read(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if self.frame is None:
+            return False, None
+        if image is None or image.shape != self.frame.shape:
+            return True, self.frame.copy()
+
+        np.copyto(image, self.frame)
+        return True, image
+
+    def set(self, prop_id: int, value: float) -> bool:
+        return True
+
+    def isOpened(self) -> bool:
+        return True
+
+    def release(self) -> None:
+        self.frame = None
+
+
+class ReplayGazeDetector(GazeDetector):
+    """
+    Gaze detector reading frames from a replay capture instead of the camera.
+    """
+
+    def __init__(self, config: OmegaConf, stop_event: Event, thread_data: Dict, data_lock: Lock):
+        self.replay_capture = ReplayCapture()
+        super().__init__(config, stop_event, thread_data, data_lock)
+
+    def _create_capture(self) -> ReplayCapture:
+        return self.replay_capture
+
+
+class TranscriptAudioRecogniser(AudioRecogniser):
+    """
+    Audio recogniser answering with recorded transcripts instead of listening to the microphone.
+    """
+
+    def __init__(self):
+        # Nothing is listened to, so the microphone, network and sound effects are not initialised
+        self.microphone_available = True
+        self.network_available = True
+        self.enable_sound_effects = False
+        self.sound_effects = {}
+        self.transcripts: List[str] = []
+
+    def add_transcript(self, transcript: str) -> None:
+        self.transcripts.append(transcript)
+
+    def check_network_connection(self) -> bool:
+        return True
+
+    def capture_voice_input(self) -> Optional[str]:
+        if not self.transcripts:
+            return None
+        return self.transcripts.pop(0)
+
+    def convert_voice_to_text(self, audio: str) -> Optional[str]:
+        return audio
+
+
+def stream_events(reader: SessionReader, stream: str) -> Iterator[Tuple[float, str, Any]]:
+    """
+    Reads a recorded stream as replay events.
+
+    Args:
+        reader (SessionReader): The recorded session
+        stream (str): Name of the stream
+
+    Yields:
+        Time, stream name and the decoded frame or record
+    """
+    for timestamp, item in reader.read(stream):
+        yield timestamp, stream, item
+
+
+def ticks(period: float, end: float) -> Iterator[Tuple[float, str, None]]:
+    """
+    Generates the times of a loop ticking at a fixed period.
+
+    Args:
+        period (float): Seconds between ticks
+        end (float): Time of the last tick
+
+    Yields:
+        Time of each tick, as a controller tick event
+    """
+    tick = 0
+    while tick * period <= end:
+        yield tick * period, CONTROLLER_TICK, None
+        tick += 1
+
+
+class SessionReplay:
+    """
+    Drives the application's modules from a recorded session.
+    """
+
+    def __init__(self, reader: SessionReader, realtime: bool = False, live_llm: bool = False,
+                 calibrate_at: float = 0.0):
+        """
+        Args:
+            reader: The recorded session
+            realtime: Whether to wait between events to match the session's timing
+            live_llm: Whether to translate transcripts with the LLM. Otherwise the recorded
+                      translations are answered from the command cache, so no network is needed.
+            calibrate_at: Session time of the frame to calibrate the gaze detector on
+        """
+        self.reader = reader
+        self.realtime = realtime
+        self.live_llm = live_llm
+        self.calibrate_at = calibrate_at
+
+        # Session time of the event being replayed
+        self.now = 0.0
+        self.elapsed = 0.0
+        self.events: List[Dict[str, Any]] = []
+        self.last_gaze_side: Optional[str] = None
+        self.frames = {WEBCAM: 0, DRONE_VIDEO: 0}
+        self.module_seconds = {GAZE: 0.0, DRONE: 0.0, VOICE: 0.0}
+
+        self.stop_event = Event()
+        self.data_lock = Lock()
+        self.thread_data = {cc.EYE_TRACKING: {}, cc.DRONE: {cc.COMMAND_QUEUE: PeekableQueue()}}
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+        self._init_gaze_detector()
+        self._init_controller()
+        self._init_voice_controller()
+
+    def _init_gaze_detector(self) -> None:
+        config = eye_tracking_init.init_ptgaze()
+        # Gaze sides are only published while the gaze overlay is shown. Replays are not re-recorded.
+        overrides = OmegaConf.create({"demo": {"show_gaze_vector": True, "output_dir": None}})
+        config = OmegaConf.merge(config, overrides)
+        OmegaConf.set_readonly(config, True)
+
+        self.gaze_detector = ReplayGazeDetector(config, self.stop_event, self.thread_data, self.data_lock)
+        self.gaze_tick_rate = config.demo.max_tick_rate
+
+    def _init_controller(self) -> None:
+        drone_config = drone_init.init()
+        controller_config = OmegaConf.merge(drone_config.controller, {"connect_to_drone": True})
+
+        self.drone = SimulatedDrone(clock=lambda: self.now)
+        self.controller = Controller(self.drone, controller_config, self.stop_event, self.thread_data,
+                                     self.data_lock)
+        # Gaze dwell and command timing follow the recording rather than the wall clock
+        self.controller.clock = lambda: self.now
+        self.controller_tick_rate = controller_config.max_tick_rate
+
+    def _init_voice_controller(self) -> None:
+        config = voice_control_init.init_config()
+        overrides = OmegaConf.create({
+            "voice_control": {"use_existing_recording": False, "detect_voice": True, "send_to_llm": True},
+            "audio": {"save_recordings": False, "sound_effects": {"enable": False}},
+            "llm": {"pipeline": False},
+            "command_cache": {"enable": True},
+        })
+        config = OmegaConf.merge(config, overrides)
+        OmegaConf.set_readonly(config, True)
+
+        if self.live_llm:
+            voice_control_init.load_environment_variables()
+
+        self.voice_queue = queue.Queue()
+        interprocess_data = {cc.VOICE_CONTROL: {cc.COMMAND_QUEUE: self.voice_queue}}
+        self.audio_recogniser = TranscriptAudioRecogniser()
+        self.voice_controller = VoiceController(config, interprocess_data, self.audio_recogniser)
+        # Keep the replay's translations out of the user's command cache
+        cache_path = pathlib.Path(self.temp_dir.name) / "command_cache.json"
+        self.voice_controller.command_cache = CommandCache(config.command_cache, cache_path)
+        # and its turns out of the user's LLM context
+        self.voice_controller.llm.session.context_factory = lambda: ContextStore(init_context())
+
+    def close(self) -> None:
+        # Before the temporary command cache is deleted
+        self.voice_controller.close()
+        self.temp_dir.cleanup()
+
+    # =========== Replay ===========
+
+    def _session_events(self) -> Iterator[Tuple[float, str, Any]]:
+        """
+        Merges the recorded streams and the controller's ticks in time order. Events at the
+        same time are replayed in the order the streams are listed.
+        """
+        streams = (FLIGHT_STATISTICS, DRONE_VIDEO, VOICE_COMMANDS, WEBCAM)
+        sources = [stream_events(self.reader, stream) for stream in streams]
+        sources.append(ticks(1 / self.controller_tick_rate, self.reader.duration))
+        return heapq.merge(*sources, key=lambda event: event[0])
+
+    def run(self) -> List[Dict[str, Any]]:
+        """
+        Replays the session.
+
+        Returns:
+            The gaze side changes, voice commands and drone commands, in order
+        """
+        logger.info("Replaying %.1f s session %s", self.reader.duration, self.reader.path)
+        start_time = time.perf_counter()
+
+        for timestamp, stream, item in self._session_events():
+            if self.realtime:
+                time.sleep(max(0.0, start_time + timestamp - time.perf_counter()))
+            self.now = timestamp
+
+            if stream == FLIGHT_STATISTICS:
+                self.drone.set_statistics(item)
+            elif stream == DRONE_VIDEO:
+                self.drone.set_frame(item)
+                self.frames[DRONE_VIDEO] += 1
+            elif stream == VOICE_COMMANDS:
+                self._replay_voice_command(item)
+            elif stream == WEBCAM:
+                self._replay_webcam_frame(item)
+            elif stream == CONTROLLER_TICK:
+                self._tick_controller()
+
+        self.elapsed = time.perf_counter() - start_time
+        return self.events
+
+    def _add_event(self, source: str, **data) -> None:
+        self.events.append({"t": round(self.now, TIME_DECIMALS), "source": source, **data})
+
+    def _replay_webcam_frame(self, frame: np.ndarray) -> None:
+        tick_start = time.perf_counter()
+        detector = self.gaze_detector
+        detector.replay_capture.push(frame)
+        self.frames[WEBCAM] += 1
+
+        if not detector.calibrated and self.now >= self.calibrate_at:
+            detector._calibrate_landmarks()
+
+        detector._gaze_loop(self.gaze_tick_rate)
+        self.module_seconds[GAZE] += time.perf_counter() - tick_start
+
+        gaze_side = self.thread_data[cc.EYE_TRACKING].get(cc.GAZE_SIDE)
+        if gaze_side != self.last_gaze_side:
+            self.last_gaze_side = gaze_side
+            self._add_event(GAZE, side=gaze_side)
+
+    def _tick_controller(self) -> None:
+        tick_start = time.perf_counter()
+        commands = len(self.drone.commands)
+        self.controller._controller_loop(self.controller_tick_rate)
+        self.module_seconds[DRONE] += time.perf_counter() - tick_start
+
+        for _, command in self.drone.commands[commands:]:
+            self._add_event(DRONE, command=command)
+
+    def _replay_voice_command(self, data: Dict[str, Any]) -> None:
+        text = data[cc.COMMAND_TEXT]
+        recorded_command = data[cc.PARSED_COMMAND]
+
+        tick_start = time.perf_counter()
+        if not self.live_llm:
+            if not is_valid_command_list(recorded_command):
+                # Could not be translated when recorded and would need the LLM to retry
+                self._add_event(VOICE, text=text, command=None)
+                return
+            if not self.voice_controller.command_cache.store(text, recorded_command):
+                # Context dependent commands are never answered from the cache, so are replayed as recorded
+                self._add_event(VOICE, text=text, command=recorded_command)
+                self.thread_data[cc.DRONE][cc.COMMAND_QUEUE].put(recorded_command)
+                return
+
+        self.audio_recogniser.add_transcript(text)
+        self.voice_controller.audio_loop()
+        self.module_seconds[VOICE] += time.perf_counter() - tick_start
+
+        while not self.voice_queue.empty():
+            command_data = self.voice_queue.get()
+            parsed_command = command_data[cc.PARSED_COMMAND]
+            self._add_event(VOICE, text=command_data[cc.COMMAND_TEXT], command=parsed_command)
+            if parsed_command is not None:
+                self.thread_data[cc.DRONE][cc.COMMAND_QUEUE].put(parsed_command)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns the replay's timing, for profiling.
+        """
+        return {
+            "session_seconds": self.reader.duration,
+            "elapsed_seconds": self.elapsed,
+            "speed": self.reader.duration / self.elapsed if self.elapsed else 0.0,
+            "webcam_frames": self.frames[WEBCAM],
+            "drone_frames": self.frames[DRONE_VIDEO],
+            "module_seconds": self.module_seconds,
+            "events": len(self.events),
+        }
+
+
+def compare_events(events: List[Dict[str, Any]], previous_path: pathlib.Path) -> bool:
+    """
+    Compares a replay's events against the output of a previous replay.
+
+    Args:
+        events: The events
+        previous_path: JSON lines output of the previous replay
+
+    Returns:
+        True if the events are identical
+    """
+    with open(previous_path, "r") as f:
+        previous = [json.loads(line) for line in f if line.strip()]
+
+    # Round trip so tuples compare equal to the lists they were written as
+    events = json.loads(json.dumps(events))
+    differences = [(i, old, new) for i, (old, new) in enumerate(zip(previous, events)) if old != new]
+    for i, old, new in differences[:10]:
+        logger.error("Event %d differs:\n    was %s\n    now %s", i, old, new)
+
+    if len(previous) != len(events):
+        logger.error("%d events, %d previously", len(events), len(previous))
+        return False
+
+    return not differences
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Replays a recorded session.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments.
+
+    Returns:
+        int: Exit code. Non zero if the events differ from --compare.
+    """
+    parser = argparse.ArgumentParser(description="Replay a recorded session through the application's modules")
+    parser.add_argument("session", type=pathlib.Path, help="The session recording")
+    parser.add_argument("--realtime", action="store_true", help="Replay at the session's original timing")
+    parser.add_argument("--live-llm", action="store_true", help="Translate transcripts with the LLM")
+    parser.add_argument("--calibrate-at", type=float, default=0.0,
+                        help="Session time to calibrate the gaze detector at, in seconds")
+    parser.add_argument("--output", type=pathlib.Path, help="Write the events as JSON lines")
+    parser.add_argument("--summary", type=pathlib.Path, help="Write the replay's timing as JSON")
+    parser.add_argument("--compare", type=pathlib.Path, help="Fail if the events differ from this output")
+    args = parser.parse_args(argv)
+
+    with SessionReader(args.session) as reader:
+        replay = SessionReplay(reader, args.realtime, args.live_llm, args.calibrate_at)
+        try:
+            events = replay.run()
+        finally:
+            replay.close()
+
+    summary = replay.summary()
+    print(f"Replayed {summary['session_seconds']:.1f} s in {summary['elapsed_seconds']:.1f} s "
+          f"({summary['speed']:.1f}x), {summary['events']} events")
+    for module, seconds in summary["module_seconds"].items():
+        print(f"    {module:<24}{seconds:>10.2f} s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=4)
+
+    if args.compare:
+        return 0 if compare_events(events, args.compare) else 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
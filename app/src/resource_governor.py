@@ -0,0 +1,327 @@
+"""
+Governs the CPU used by the gaze, drone and GUI workloads, which share one interpreter
+and so one core's worth of Python execution. Measures per-subsystem CPU time and webcam
+frame latency, and walks a ladder of degradations when over budget, restoring them
+once there is headroom again. The drone command path (the drone loop and voice commands)
+is never degraded, and the drone loop missing its deadlines counts as pressure.
+
+CPU pressure only applies steps which reduce CPU usage, and latency pressure only steps
+which can lower the frame latency. Latency which the latency steps do not bring back
+under target, such as from a slow gaze model, is ignored until it recovers by itself so
+the steps can be restored.
+"""
+
+from typing import Dict, List, Optional, Callable, Tuple
+from threading import Lock
+import time
+
+from omegaconf import DictConfig
+from PyQt6.QtCore import QTimer, QObject
+
+from common.logger_helper import init_logger
+from common.gui_helper import fps_to_ms
+from common.loop import get_scheduler, EMA_ALPHA
+from common import constants as cc
+
+logger = init_logger()
+
+# Proportion of the frame latency kept at each evaluation without a new frame
+LATENCY_DECAY = 0.5
+
+
+class GovernorStep:
+    """
+    A reversible degradation.
+    """
+
+    def __init__(self, name: str, degrade: Callable[[], None], restore: Callable[[], None],
+                 reduces_cpu: bool = True, reduces_latency: bool = False):
+        """
+        Args:
+            name: Name of the step
+            degrade: Applies the degradation
+            restore: Reverts the degradation
+            reduces_cpu: Whether the step reduces CPU usage
+            reduces_latency: Whether the step can lower the webcam frame latency
+        """
+        self.name = name
+        self.degrade = degrade
+        self.restore = restore
+        self.reduces_cpu = reduces_cpu
+        self.reduces_latency = reduces_latency
+
+
+class ResourceGovernor(QObject):
+    """
+    Periodically evaluates resource usage on the GUI thread and degrades or restores
+    one step of the ladder at a time. Steps are restored in the reverse of the order
+    they were degraded.
+    """
+
+    def __init__(self, config: DictConfig, timers_fps: DictConfig, timers: Dict[str, QTimer],
+                 thread_data: Dict, data_lock: Lock, parent: Optional[QObject] = None):
+        """
+        Initialise the governor.
+
+        Args:
+            config: Governor configuration
+            timers_fps: Configured fps of the GUI timers
+            timers: The GUI timers by name
+            thread_data: Shared data between threads
+            data_lock: Lock for shared data
+            parent: Qt parent, to tie the governor's timer to the window
+        """
+        super().__init__(parent)
+        self.config = config
+        self.timers_fps = timers_fps
+        self.timers = timers
+        self.thread_data = thread_data
+        self.data_lock = data_lock
+
+        # Ordered from least to most noticeable. Showing fewer webcam frames or ticking
+        # the gaze loop less often saves CPU but makes each frame no fresher.
+        self.steps: List[GovernorStep] = [
+            GovernorStep("telemetry", self._reduce_telemetry, self._restore_telemetry),
+            GovernorStep("webcam fps", self._reduce_webcam_fps, self._restore_webcam_fps),
+            GovernorStep("overlay quality", self._reduce_overlay_quality, self._restore_overlay_quality,
+                         reduces_latency=True),
+            GovernorStep("preview resolution", self._reduce_preview_resolution, self._restore_preview_resolution,
+                         reduces_latency=True),
+            GovernorStep("gaze tick rate", self._reduce_gaze_tick_rate, self._restore_gaze_tick_rate),
+        ]
+        self.degraded: List[GovernorStep] = []
+        self.calm_evaluations = 0
+        # Evaluations over the latency target with every latency step degraded
+        self.latency_evaluations = 0
+        self.ignore_latency = False
+        self.gaze_target_rate: Optional[float] = None
+
+        self.frame_latency: Optional[float] = None
+        self._new_frames = 0
+        self.cpu_usage: Dict[str, float] = {}
+        self._last_drone_misses = 0
+        self._last_drone_ticks = 0
+        self._last_evaluation = time.perf_counter()
+        self._last_gui_cpu = time.thread_time()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.evaluate)
+        if self.config.enable:
+            self.timer.start(self.config.interval_ms)
+            logger.info("Resource governor started with %d steps", len(self.steps))
+
+    @property
+    def level(self) -> int:
+        """
+        Number of steps degraded.
+        """
+        return len(self.degraded)
+
+    def record_frame_latency(self, latency: float) -> None:
+        """
+        Records the time between a webcam frame being captured and displayed.
+
+        Args:
+            latency: Latency in seconds
+        """
+        self._new_frames += 1
+        if self.frame_latency is None:
+            self.frame_latency = latency
+        else:
+            self.frame_latency += EMA_ALPHA * (latency - self.frame_latency)
+
+    def measure(self) -> Tuple[float, float, float]:
+        """
+        Measures CPU usage per subsystem, as a fraction of one core, and the frame
+        latency since the last evaluation. The latency decays when there were no new
+        frames, so a stale measurement does not keep degrading.
+
+        Returns:
+            Tuple of total CPU usage, frame latency in seconds and the proportion of
+            drone loop ticks which missed their deadline
+        """
+        if self._new_frames == 0 and self.frame_latency is not None:
+            self.frame_latency *= LATENCY_DECAY
+        self._new_frames = 0
+
+        cpu_usage, drone_miss_ratio = self._measure_cpu()
+        return cpu_usage, self.frame_latency or 0.0, drone_miss_ratio
+
+    def _measure_cpu(self) -> Tuple[float, float]:
+        """
+        Measures CPU usage per subsystem, as a fraction of one core, since the last
+        evaluation.
+
+        Returns:
+            Tuple of total CPU usage and the proportion of drone loop ticks which
+            missed their deadline
+        """
+        now = time.perf_counter()
+        gui_cpu = time.thread_time()
+        elapsed = max(now - self._last_evaluation, 1e-6)
+        self.cpu_usage[cc.GUI] = (gui_cpu - self._last_gui_cpu) / elapsed
+        self._last_evaluation = now
+        self._last_gui_cpu = gui_cpu
+
+        drone_miss_ratio = 0.0
+        for name in (cc.EYE_TRACKING, cc.DRONE):
+            scheduler = get_scheduler(name)
+            if scheduler is None:
+                self.cpu_usage.pop(name, None)
+                continue
+
+            stats = scheduler.stats()
+            self.cpu_usage[name] = stats.cpu_ms / cc.MILLISECONDS_PER_SECOND * stats.tick_rate
+            if name == cc.DRONE:
+                ticks = stats.ticks - self._last_drone_ticks
+                misses = stats.deadline_misses - self._last_drone_misses
+                drone_miss_ratio = misses / ticks if ticks > 0 else 0.0
+                self._last_drone_ticks = stats.ticks
+                self._last_drone_misses = stats.deadline_misses
+
+        return sum(self.cpu_usage.values()), drone_miss_ratio
+
+    def evaluate(self) -> None:
+        """
+        Degrades one step when over the latency target or CPU budget, or when the drone
+        loop misses deadlines. Restores one step after enough calm evaluations.
+        """
+        cpu_usage, frame_latency, drone_miss_ratio = self.measure()
+        latency_target = self.config.latency_target_ms / cc.MILLISECONDS_PER_SECOND
+        margin = self.config.recovery_margin
+
+        if frame_latency <= latency_target:
+            self.ignore_latency = False
+        cpu_pressure = cpu_usage > self.config.cpu_budget or drone_miss_ratio > 0.5
+        latency_pressure = frame_latency > latency_target and not self.ignore_latency
+        calm = (cpu_usage < self.config.cpu_budget * margin
+                and (self.ignore_latency or frame_latency < latency_target * margin))
+
+        logger.trace("Governor: cpu %.2f %s, frame latency %.0f ms, drone misses %.0f%%, level %d",
+                     cpu_usage, self.cpu_usage, frame_latency * cc.MILLISECONDS_PER_SECOND,
+                     drone_miss_ratio * 100, self.level)
+
+        if cpu_pressure or latency_pressure:
+            self.calm_evaluations = 0
+            step = self._next_step(cpu_pressure, latency_pressure)
+            if step is not None:
+                self.latency_evaluations = 0
+                logger.info("Over budget (cpu %.2f, frame latency %.0f ms). Reducing %s",
+                            cpu_usage, frame_latency * cc.MILLISECONDS_PER_SECOND, step.name)
+                step.degrade()
+                self.degraded.append(step)
+                self._reset_frame_latency()
+            elif latency_pressure and not cpu_pressure:
+                self._check_latency_recovery(frame_latency)
+        elif calm and self.degraded:
+            self.calm_evaluations += 1
+            if self.calm_evaluations >= self.config.restore_after:
+                self.calm_evaluations = 0
+                step = self.degraded.pop()
+                logger.info("Within budget (cpu %.2f). Restoring %s", cpu_usage, step.name)
+                step.restore()
+                self._reset_frame_latency()
+        else:
+            self.calm_evaluations = 0
+
+    def _next_step(self, cpu_pressure: bool, latency_pressure: bool) -> Optional[GovernorStep]:
+        """
+        Returns the first step not yet degraded which relieves the current pressure, if any.
+        """
+        for step in self.steps:
+            if step in self.degraded:
+                continue
+            if (cpu_pressure and step.reduces_cpu) or (latency_pressure and step.reduces_latency):
+                return step
+        return None
+
+    def _check_latency_recovery(self, frame_latency: float) -> None:
+        """
+        Counts evaluations over the latency target with every latency step degraded.
+        After as many as it takes to restore a step, the latency is taken to be beyond
+        the governor's control and is ignored until it is back under target.
+
+        Args:
+            frame_latency: Frame latency in seconds
+        """
+        self.latency_evaluations += 1
+        if self.latency_evaluations < self.config.restore_after:
+            return
+
+        self.latency_evaluations = 0
+        self.ignore_latency = True
+        logger.warning("Frame latency %.0f ms is still over target with every latency step degraded. "
+                       "Ignoring it until it recovers", frame_latency * cc.MILLISECONDS_PER_SECOND)
+
+    def _reset_frame_latency(self) -> None:
+        """
+        Discards the frame latency measured before a step changed, so the next
+        evaluation only sees frames produced since.
+        """
+        self.frame_latency = None
+        self._new_frames = 0
+
+    def stop(self) -> None:
+        """
+        Stops the governor, leaving the current degradations in place.
+        """
+        self.timer.stop()
+
+    # =========== Steps ===========
+
+    def _set_thread_data(self, module: str, key: str, value: object) -> None:
+        with self.data_lock:
+            self.thread_data[module][key] = value
+
+    def _set_timer_fps(self, name: str, fps: float) -> None:
+        timer = self.timers.get(name)
+        if timer is not None:
+            timer.setInterval(fps_to_ms(fps))
+
+    def _reduce_telemetry(self) -> None:
+        scale = self.config.degraded.telemetry_scale
+        self._set_thread_data(cc.DRONE, cc.TELEMETRY_SCALE, scale)
+        self._set_timer_fps("battery", self.timers_fps.battery / scale)
+        self._set_timer_fps("flight_stats", self.timers_fps.flight_stats / scale)
+
+    def _restore_telemetry(self) -> None:
+        self._set_thread_data(cc.DRONE, cc.TELEMETRY_SCALE, 1)
+        self._set_timer_fps("battery", self.timers_fps.battery)
+        self._set_timer_fps("flight_stats", self.timers_fps.flight_stats)
+
+    def _reduce_webcam_fps(self) -> None:
+        self._set_timer_fps("webcam", min(self.timers_fps.webcam, self.config.degraded.webcam_fps))
+
+    def _restore_webcam_fps(self) -> None:
+        self._set_timer_fps("webcam", self.timers_fps.webcam)
+
+    def _reduce_overlay_quality(self) -> None:
+        self._set_thread_data(cc.EYE_TRACKING, cc.OVERLAY_QUALITY, cc.QUALITY_LOW)
+
+    def _restore_overlay_quality(self) -> None:
+        self._set_thread_data(cc.EYE_TRACKING, cc.OVERLAY_QUALITY, cc.QUALITY_HIGH)
+
+    def _reduce_preview_resolution(self) -> None:
+        self._set_thread_data(cc.EYE_TRACKING, cc.PREVIEW_SCALE, self.config.degraded.preview_scale)
+
+    def _restore_preview_resolution(self) -> None:
+        self._set_thread_data(cc.EYE_TRACKING, cc.PREVIEW_SCALE, 1.0)
+
+    def _reduce_gaze_tick_rate(self) -> None:
+        scheduler = get_scheduler(cc.EYE_TRACKING)
+        if scheduler is None:
+            return
+
+        self.gaze_target_rate = scheduler.target_rate
+        degraded_rate = self.config.degraded.gaze_tick_rate
+        if self.gaze_target_rate > 0:
+            degraded_rate = min(degraded_rate, self.gaze_target_rate)
+        scheduler.set_target_rate(degraded_rate)
+
+    def _restore_gaze_tick_rate(self) -> None:
+        scheduler = get_scheduler(cc.EYE_TRACKING)
+        if scheduler is None or self.gaze_target_rate is None:
+            return
+
+        scheduler.set_target_rate(self.gaze_target_rate)
+        self.gaze_target_rate = None
@@ -47,3 +47,31 @@ def get_assets_folder() -> Path:
     assets_folder = app_folder / "assets"
 
     return assets_folder
+
+
+def get_sessions_folder() -> Path:
+    """
+    Gets the path to the folder session recordings are written to.
+
+    Returns:
+        Path to the sessions folder
+    """
+
+    app_folder = get_app_folder()
+    sessions_folder = app_folder / "sessions"
+
+    return sessions_folder
+
+
+def get_startup_profile_file() -> Path:
+    """
+    Gets the path to the startup profile written at each launch.
+
+    Returns:
+        Path to the startup profile
+    """
+
+    app_folder = get_app_folder()
+    startup_profile_file = app_folder / "startup_profile.json"
+
+    return startup_profile_file
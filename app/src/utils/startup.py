@@ -0,0 +1,220 @@
+"""
+Startup orchestration and profiling for the app.
+
+Subsystem entry points are imported lazily on the thread which runs them, so the heavy
+dependencies of each subsystem (torch and mediapipe for eye tracking, djitellopy for the
+drone) load in parallel rather than one after another before any thread starts.
+"""
+
+from typing import Optional, Dict, List, Tuple, Callable, Iterator, Any
+import json
+import time
+import pathlib
+import threading
+import importlib
+from contextlib import contextmanager
+
+from common.logger_helper import init_logger
+from common import import_profiler
+
+from .progress_controller import ProgressController
+
+logger = init_logger()
+
+# Used when a phase has no recorded duration from a previous launch
+DEFAULT_PHASE_ESTIMATE = 1.0  # seconds
+
+
+class StartupProfiler:
+    """
+    Records how long each startup phase takes, on any thread. Phases run on the
+    initialisation thread are reported to the progress controller, using the
+    durations recorded at the previous launch as estimates.
+
+    Records every phase timed with `common.import_profiler`, including those of the
+    subsystems, so there is one phase API for the app and the subsystems.
+    """
+
+    def __init__(self, progress: Optional[ProgressController] = None, profile_path: Optional[pathlib.Path] = None):
+        """
+        Initialise the profiler. Should be created as early as possible since
+        milestones are measured from its creation.
+
+        Args:
+            progress: Progress controller to report phases to
+            profile_path: Where the profile is saved. Estimates are loaded from it if it exists.
+        """
+        self.launch_time = time.perf_counter()
+        self.progress = progress
+        self.profile_path = profile_path
+        self.estimates = self._load_estimates()
+
+        # Phase name -> (thread name, start offset, duration)
+        self.phases: Dict[str, Tuple[str, float, float]] = {}
+        # Milestone name -> time since launch
+        self.milestones: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        import_profiler.add_phase_recorder(self.record)
+
+    def _load_estimates(self) -> Dict[str, float]:
+        """
+        Loads the phase durations recorded at the previous launch.
+
+        Returns:
+            Phase durations in seconds
+        """
+        if self.profile_path is None or not self.profile_path.is_file():
+            return {}
+
+        try:
+            with open(self.profile_path, "r") as f:
+                profile = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to load startup profile: %s", e)
+            return {}
+
+        return {name: phase["duration"] for name, phase in profile.get("phases", {}).items()}
+
+    @contextmanager
+    def phase(self, name: str, report: bool = True) -> Iterator[None]:
+        """
+        Times a startup phase.
+
+        Args:
+            name: Name of the phase
+            report: Whether to report the phase as a loading task to the progress
+                    controller. Must be False for phases run off the initialisation thread.
+        """
+        if report and self.progress is not None:
+            self.progress.set_loading_task(name, self.estimates.get(name, DEFAULT_PHASE_ESTIMATE))
+
+        with import_profiler.phase(name):
+            yield
+
+    def record(self, name: str, start: float, duration: float) -> None:
+        """
+        Records a phase timed elsewhere.
+
+        Args:
+            name: Name of the phase
+            start: `time.perf_counter()` when the phase started
+            duration: Duration of the phase in seconds
+        """
+        thread_name = threading.current_thread().name
+        with self._lock:
+            self.phases[name] = (thread_name, start - self.launch_time, duration)
+
+        logger.info("Startup phase '%s' took %.3f s on %s", name, duration, thread_name)
+
+    def mark(self, name: str) -> float:
+        """
+        Records a milestone, such as the first frame of a video feed. Only the first
+        call for each milestone is recorded.
+
+        Args:
+            name: Name of the milestone
+
+        Returns:
+            Seconds since launch
+        """
+        elapsed = time.perf_counter() - self.launch_time
+        with self._lock:
+            if name in self.milestones:
+                return self.milestones[name]
+            self.milestones[name] = elapsed
+
+        logger.info("Startup milestone '%s' reached after %.3f s", name, elapsed)
+        return elapsed
+
+    def summary(self) -> List[Tuple[str, str, float, float]]:
+        """
+        Returns the recorded phases, slowest first.
+
+        Returns:
+            List of (phase, thread, start, duration)
+        """
+        with self._lock:
+            phases = [(name, *phase) for name, phase in self.phases.items()]
+
+        return sorted(phases, key=lambda phase: phase[3], reverse=True)
+
+    def log_summary(self) -> None:
+        """
+        Logs the startup profile.
+        """
+        lines = [f"{'phase':<50}{'thread':<28}{'start (s)':>10}{'duration (s)':>14}"]
+        for name, thread_name, start, duration in self.summary():
+            lines.append(f"{name:<50}{thread_name:<28}{start:>10.3f}{duration:>14.3f}")
+        for name, elapsed in self.milestones.items():
+            lines.append(f"{name:<78}{elapsed:>10.3f}")
+
+        logger.info("Startup profile:\n%s", "\n".join(lines))
+
+    def save(self) -> None:
+        """
+        Saves the profile so the next launch can use it for progress estimates.
+        """
+        if self.profile_path is None:
+            return
+
+        with self._lock:
+            profile = {
+                "phases": {name: {"thread": thread_name, "start": start, "duration": duration}
+                           for name, (thread_name, start, duration) in self.phases.items()},
+                "milestones": dict(self.milestones),
+            }
+
+        try:
+            self.profile_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.profile_path, "w") as f:
+                json.dump(profile, f, indent=4)
+        except OSError as e:
+            logger.warning("Failed to save startup profile: %s", e)
+
+
+class LazyEntryPoint:
+    """
+    Entry point of a subsystem which is only imported when called, on the calling
+    thread. Exposes the module path as `__module__` so it can be used anywhere a
+    subsystem's main function is expected.
+    """
+
+    def __init__(self, module_path: str, alias: str, profiler: Optional[StartupProfiler] = None):
+        """
+        Args:
+            module_path: Python module path of the entry point, e.g. "eye_tracking.src.main"
+            alias: Name of the entry point function in the module
+            profiler: Profiler to record the import time with
+        """
+        self.module_path = module_path
+        self.alias = alias
+        self.profiler = profiler
+        self.__module__ = module_path
+        self.__name__ = alias
+        self._entry_point: Optional[Callable] = None
+
+    def load(self) -> Callable:
+        """
+        Imports the entry point if it has not been imported yet.
+
+        Returns:
+            The entry point function
+        """
+        if self._entry_point is None:
+            logger.info("Importing module: %s", self.module_path)
+            if self.profiler is not None:
+                with self.profiler.phase(f"Importing {self.module_path}", report=False):
+                    module = importlib.import_module(self.module_path)
+            else:
+                module = importlib.import_module(self.module_path)
+
+            self._entry_point = getattr(module, self.alias)
+
+        return self._entry_point
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<LazyEntryPoint {self.module_path}.{self.alias}>"
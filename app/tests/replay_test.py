@@ -0,0 +1,163 @@
+"""
+Tests for replaying recorded sessions and comparing their outputs.
+
+    python -m pytest app/tests/replay_test.py
+"""
+
+from typing import Dict
+import sys
+import json
+import pathlib
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+# Replays run the real gaze detector and drone modules
+pytest.importorskip("torchvision")
+pytest.importorskip("djitellopy")
+
+# The replay entry point imports its helpers from app/src
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1] / "src"))
+
+from common import constants as cc
+from common.session_recorder import (DRONE_VIDEO, FLIGHT_STATISTICS, VOICE_COMMANDS, WEBCAM, SessionReader,
+                                     SessionRecorder)
+from app.src import replay
+from app.src.replay import CONTROLLER_TICK, ReplayCapture, SessionReplay, compare_events, ticks
+
+SHAPE = (48, 64, 3)
+SYSTEM = {"role": "system", "content": "Fly the drone."}
+DARK = 40
+BRIGHT = 220
+
+
+class BrightnessGazeDetector:
+    """
+    Stands in for the gaze detector, which needs a face and the gaze models. Looks left at
+    dark frames and right at bright ones.
+    """
+
+    def __init__(self, thread_data: Dict):
+        self.thread_data = thread_data
+        self.replay_capture = ReplayCapture()
+        self.calibrated = False
+        self.frames = 0
+
+    def _calibrate_landmarks(self) -> None:
+        self.calibrated = True
+
+    def _gaze_loop(self, tick_rate: float) -> bool:
+        ok, frame = self.replay_capture.read()
+        assert ok
+        self.frames += 1
+        self.thread_data[cc.EYE_TRACKING][cc.GAZE_SIDE] = cc.LEFT if frame.mean() < 128 else cc.RIGHT
+        return True
+
+
+def init_gaze_detector(self: SessionReplay) -> None:
+    self.gaze_detector = BrightnessGazeDetector(self.thread_data)
+    self.gaze_tick_rate = 30
+
+
+@pytest.fixture
+def session(tmp_path) -> pathlib.Path:
+    recorder = SessionRecorder(tmp_path / "test.session")
+    recorder.start()
+    start = recorder.start_time
+
+    recorder.record(FLIGHT_STATISTICS, {"battery": 90, "height": 0}, start)
+    for i in range(30):
+        value = DARK if i < 15 else BRIGHT
+        recorder.record_frame(WEBCAM, np.full(SHAPE, value, np.uint8), start + i / 30)
+        recorder.record_frame(DRONE_VIDEO, np.full(SHAPE, i, np.uint8), start + i / 30)
+    recorder.record(VOICE_COMMANDS, {cc.COMMAND_TEXT: "take off", cc.PARSED_COMMAND: [["takeoff", 0]]}, start + 0.2)
+    recorder.record(VOICE_COMMANDS, {cc.COMMAND_TEXT: "mumble", cc.PARSED_COMMAND: None}, start + 0.4)
+    recorder.stop()
+    return recorder.path
+
+
+@pytest.fixture
+def run_replay(session, monkeypatch):
+    monkeypatch.setattr(SessionReplay, "_init_gaze_detector", init_gaze_detector)
+    monkeypatch.setattr(replay, "init_context", lambda: [SYSTEM])
+
+    def run_replay():
+        with SessionReader(session) as reader:
+            session_replay = SessionReplay(reader)
+            try:
+                return session_replay, session_replay.run()
+            finally:
+                session_replay.close()
+
+    return run_replay
+
+
+def test_ticks():
+    assert [t for t, _, _ in ticks(0.25, 1.0)] == [0.0, 0.25, 0.5, 0.75, 1.0]
+    assert {stream for _, stream, _ in ticks(0.25, 1.0)} == {CONTROLLER_TICK}
+
+
+def test_replay_capture_reuses_image():
+    capture = ReplayCapture()
+    assert capture.read() == (False, None)
+
+    frame = np.full(SHAPE, 7, np.uint8)
+    capture.push(frame)
+    ok, image = capture.read()
+    assert ok and image is not frame
+
+    frame[:] = 9
+    ok, reused = capture.read(image)
+    assert reused is image
+    assert int(image[0, 0, 0]) == 9
+
+
+def test_replay_events(run_replay):
+    session_replay, events = run_replay()
+
+    gaze_events = [event for event in events if event["source"] == replay.GAZE]
+    assert [event["side"] for event in gaze_events] == [cc.LEFT, cc.RIGHT]
+    assert gaze_events[1]["t"] == pytest.approx(0.5, abs=1e-6)
+
+    # Round trip, as the events are written, so tuples compare equal to lists
+    voice_events = json.loads(json.dumps([event for event in events if event["source"] == replay.VOICE]))
+    assert voice_events == [
+        {"t": pytest.approx(0.2), "source": replay.VOICE, "text": "take off", "command": [["takeoff", 0]]},
+        {"t": pytest.approx(0.4), "source": replay.VOICE, "text": "mumble", "command": None},
+    ]
+
+    drone_commands = [event["command"] for event in events if event["source"] == replay.DRONE]
+    assert drone_commands[0] == "takeoff"
+    # The takeoff is sent on the first controller tick after the voice command
+    takeoff = next(event for event in events if event.get("command") == "takeoff")
+    assert 0.2 <= takeoff["t"] <= 0.2 + 1 / session_replay.controller_tick_rate
+
+    assert session_replay.gaze_detector.calibrated
+    assert session_replay.frames == {WEBCAM: 30, DRONE_VIDEO: 30}
+    assert session_replay.summary()["events"] == len(events)
+
+
+def test_replay_is_deterministic(run_replay, tmp_path):
+    _, events = run_replay()
+    _, repeated = run_replay()
+    assert repeated == events
+
+    output = tmp_path / "replay.jsonl"
+    output.write_text("".join(json.dumps(event) + "\n" for event in events))
+    assert compare_events(repeated, output)
+
+
+def test_compare_events(tmp_path):
+    events = [
+        {"t": 0.1, "source": replay.VOICE, "text": "take off", "command": [("takeoff", 0)]},
+        {"t": 0.2, "source": replay.DRONE, "command": "takeoff"},
+    ]
+    previous = tmp_path / "previous.jsonl"
+    previous.write_text("".join(json.dumps(event) + "\n" for event in events) + "\n")
+
+    # Tuples were written as lists
+    assert compare_events(events, previous)
+    assert not compare_events(events[:1], previous)
+    assert not compare_events(events + [{"t": 0.3, "source": replay.GAZE, "side": cc.LEFT}], previous)
+    assert not compare_events([events[0], {**events[1], "command": "land"}], previous)
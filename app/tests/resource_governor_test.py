@@ -0,0 +1,149 @@
+"""
+Tests for degrading and restoring the resource governor's steps.
+
+    python -m pytest app/tests/resource_governor_test.py
+"""
+
+from threading import Lock
+
+import pytest
+from omegaconf import OmegaConf
+
+pytest.importorskip("PyQt6")
+
+from common import constants as cc
+from app.src.constants import DEFAULT_GUI_CONFIG
+from app.src.resource_governor import ResourceGovernor
+
+RESTORE_AFTER = DEFAULT_GUI_CONFIG["governor"]["restore_after"]
+CPU_STEPS = ["telemetry", "webcam fps", "overlay quality", "preview resolution", "gaze tick rate"]
+LATENCY_STEPS = ["overlay quality", "preview resolution"]
+
+HIGH_CPU = 0.95
+MODERATE_CPU = 0.7
+LOW_CPU = 0.2
+HIGH_LATENCY = 0.3
+LOW_LATENCY = 0.05
+
+
+@pytest.fixture
+def governor(monkeypatch):
+    config = OmegaConf.create(DEFAULT_GUI_CONFIG)
+    config.governor.enable = False
+    thread_data = {cc.DRONE: {}, cc.EYE_TRACKING: {}}
+    governor = ResourceGovernor(config.governor, config.timers, {}, thread_data, Lock())
+
+    governor.cpu = LOW_CPU
+    governor.drone_miss_ratio = 0.0
+    monkeypatch.setattr(governor, "_measure_cpu", lambda: (governor.cpu, governor.drone_miss_ratio))
+    return governor
+
+
+def evaluate(governor: ResourceGovernor, cpu: float, latency: float = None, times: int = 1) -> None:
+    governor.cpu = cpu
+    for _ in range(times):
+        if latency is not None:
+            governor.record_frame_latency(latency)
+        governor.evaluate()
+
+
+def degraded(governor: ResourceGovernor):
+    return [step.name for step in governor.degraded]
+
+
+def test_cpu_pressure_walks_ladder(governor):
+    evaluate(governor, HIGH_CPU, LOW_LATENCY, times=len(CPU_STEPS) + 2)
+    assert degraded(governor) == CPU_STEPS
+    assert governor.thread_data[cc.DRONE][cc.TELEMETRY_SCALE] == governor.config.degraded.telemetry_scale
+    assert governor.thread_data[cc.EYE_TRACKING][cc.OVERLAY_QUALITY] == cc.QUALITY_LOW
+
+
+def test_drone_misses_count_as_cpu_pressure(governor):
+    governor.drone_miss_ratio = 0.8
+    evaluate(governor, LOW_CPU, LOW_LATENCY)
+    assert degraded(governor) == ["telemetry"]
+
+
+def test_latency_pressure_only_applies_latency_steps(governor):
+    evaluate(governor, LOW_CPU, HIGH_LATENCY, times=4)
+    assert degraded(governor) == LATENCY_STEPS
+
+
+def test_latency_reset_after_step(governor):
+    evaluate(governor, LOW_CPU, HIGH_LATENCY)
+    assert degraded(governor) == ["overlay quality"]
+    assert governor.frame_latency is None
+
+    # Latency measured before the step does not degrade another one
+    evaluate(governor, LOW_CPU, LOW_LATENCY)
+    assert degraded(governor) == ["overlay quality"]
+
+
+def test_latency_decays_without_frames(governor):
+    governor.record_frame_latency(0.2)
+    governor.measure()
+    assert governor.frame_latency == pytest.approx(0.2)
+
+    governor.measure()
+    assert governor.frame_latency == pytest.approx(0.1)
+
+
+def test_restored_after_calm_evaluations_in_reverse_order(governor):
+    evaluate(governor, HIGH_CPU, LOW_LATENCY, times=2)
+    assert degraded(governor) == ["telemetry", "webcam fps"]
+
+    evaluate(governor, LOW_CPU, LOW_LATENCY, times=RESTORE_AFTER - 1)
+    assert degraded(governor) == ["telemetry", "webcam fps"]
+    evaluate(governor, LOW_CPU, LOW_LATENCY)
+    assert degraded(governor) == ["telemetry"]
+
+    evaluate(governor, LOW_CPU, LOW_LATENCY, times=RESTORE_AFTER)
+    assert degraded(governor) == []
+    assert governor.thread_data[cc.DRONE][cc.TELEMETRY_SCALE] == 1
+
+
+def test_usage_within_margin_delays_restore(governor):
+    evaluate(governor, HIGH_CPU, LOW_LATENCY)
+
+    # Under budget but not by the recovery margin, which restarts the count
+    evaluate(governor, LOW_CPU, LOW_LATENCY, times=RESTORE_AFTER - 1)
+    evaluate(governor, MODERATE_CPU, LOW_LATENCY)
+    evaluate(governor, LOW_CPU, LOW_LATENCY, times=RESTORE_AFTER - 1)
+    assert degraded(governor) == ["telemetry"]
+
+    evaluate(governor, LOW_CPU, LOW_LATENCY)
+    assert degraded(governor) == []
+
+
+def test_pressure_restarts_restore_count(governor):
+    evaluate(governor, HIGH_CPU, LOW_LATENCY)
+    evaluate(governor, LOW_CPU, LOW_LATENCY, times=RESTORE_AFTER - 1)
+    evaluate(governor, HIGH_CPU, LOW_LATENCY)
+    assert degraded(governor) == ["telemetry", "webcam fps"]
+
+    evaluate(governor, LOW_CPU, LOW_LATENCY, times=RESTORE_AFTER - 1)
+    assert degraded(governor) == ["telemetry", "webcam fps"]
+
+
+def test_uncontrollable_latency_restored(governor):
+    # A slow gaze model keeps the latency high whatever is degraded
+    evaluate(governor, LOW_CPU, HIGH_LATENCY, times=len(LATENCY_STEPS))
+    assert degraded(governor) == LATENCY_STEPS
+
+    evaluate(governor, LOW_CPU, HIGH_LATENCY, times=RESTORE_AFTER)
+    assert governor.ignore_latency
+
+    evaluate(governor, LOW_CPU, HIGH_LATENCY, times=len(LATENCY_STEPS) * RESTORE_AFTER)
+    assert degraded(governor) == []
+
+    # Not degraded again while the latency stays high
+    evaluate(governor, LOW_CPU, HIGH_LATENCY, times=RESTORE_AFTER)
+    assert degraded(governor) == []
+
+    # Once it recovers, latency pressure applies again
+    governor.frame_latency = None
+    evaluate(governor, LOW_CPU, LOW_LATENCY)
+    assert not governor.ignore_latency
+    governor.frame_latency = None
+    evaluate(governor, LOW_CPU, HIGH_LATENCY)
+    assert degraded(governor) == ["overlay quality"]
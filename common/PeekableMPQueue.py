@@ -5,33 +5,49 @@ Hugo Burton
 11/10/2024
 """
 
-from typing import Any, Optional
-import time
-from multiprocessing import Queue as MPQueue, context, Manager
+from typing import Any, List, Optional
+import threading
+import multiprocessing
+from multiprocessing.util import register_after_fork
+from multiprocessing.queues import Queue as MPQueue
+from multiprocessing.reduction import ForkingPickler
 from queue import Empty
 
-_ForkingPickler = context.reduction.ForkingPickler
+# Marks an empty lookahead buffer (None is a valid queue item)
+_NO_ITEM = object()
 
 
-class PeekableMPQueue:
-    def __init__(self, manager=None):
+class PeekableMPQueue(MPQueue):
+    """
+    Multiprocessing queue with peek and batch get.
+
+    Peeking receives the next item from the underlying pipe into a lookahead buffer
+    local to the consuming process, so it is seen again by the next `peek` or `get`
+    in that process. As with any consumer, an item peeked by one process cannot be
+    received by another, so each queue should have a single consuming process.
+    """
+
+    def __init__(self, maxsize: int = 0, ctx: Optional[Any] = None):
         """
-        Initialize a manager and a queue.
+        Initialise the queue.
 
         Args:
-            manager (Optional[Manager]): An optional Manager instance.
+            maxsize (int): Maximum number of items in the queue. 0 for unbounded.
+            ctx (Optional[Any]): Multiprocessing context. Defaults to the default context.
         """
-        self.manager = manager if manager is not None else Manager()
-        self.queue = self.manager.Queue()
+        super().__init__(maxsize, ctx=ctx if ctx is not None else multiprocessing.get_context())
+        self._reset_lookahead()
+        register_after_fork(self, PeekableMPQueue._reset_lookahead)
 
-    def __getattr__(self, name):
-        """
-        Delegate attribute access to the internal queue object,
-        unless the attribute is 'peek'.
-        """
-        if name == "peek":
-            return self.peek
-        return getattr(self.queue, name)
+    def __setstate__(self, state: tuple) -> None:
+        super().__setstate__(state)
+        self._reset_lookahead()
+
+    def _reset_lookahead(self) -> None:
+        # Called on creation, after fork and after unpickling. A lookahead item belongs
+        # to the process which peeked it, so other processes start with an empty buffer.
+        self._lookahead = _NO_ITEM
+        self._lookahead_lock = threading.Lock()
 
     def peek(self, block: bool = True, timeout: Optional[float] = None) -> Any:
         """
@@ -48,28 +64,79 @@ class PeekableMPQueue:
         Raises:
             Empty: If the queue is empty.
         """
-        if self._closed:
-            raise ValueError(f"Queue {self!r} is closed.")
-
-        if block and timeout is None:
-            with self._rlock:
-                res = self._recv_bytes()
-        else:
-            if block:
-                deadline = time.monotonic() + timeout
-            if not self._rlock.acquire(block, timeout):
-                raise Empty
+        with self._lookahead_lock:
+            if self._lookahead is _NO_ITEM:
+                self._lookahead = super().get(block, timeout)
+            return self._lookahead
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        """
+        Remove and return the next item in the queue, including a peeked item.
+
+        Args:
+            block (bool): If True, blocks until an item is available.
+            timeout (Optional[float]): If block is True, specifies the
+                                       maximum time to wait.
+
+        Returns:
+            Any: The next item in the queue.
+
+        Raises:
+            Empty: If the queue is empty.
+        """
+        # Held across the underlying get, so a concurrent peek cannot take the next item
+        # into the lookahead buffer after it has been checked
+        with self._lookahead_lock:
+            if self._lookahead is not _NO_ITEM:
+                item = self._lookahead
+                self._lookahead = _NO_ITEM
+                return item
+            return super().get(block, timeout)
+
+    def get_many(self, max_items: int, block: bool = True, timeout: Optional[float] = None) -> List[Any]:
+        """
+        Remove and return up to `max_items` items. Waits for the first item as `get`
+        does, then takes whatever else is already available without waiting.
+
+        Args:
+            max_items (int): Maximum number of items to return.
+            block (bool): If True, blocks until at least one item is available.
+            timeout (Optional[float]): If block is True, specifies the
+                                       maximum time to wait for the first item.
+
+        Returns:
+            List[Any]: The items in queue order. Empty if no item became available.
+        """
+        items = []
+        if max_items <= 0:
+            return items
+
+        try:
+            items.append(self.get(block, timeout))
+        except Empty:
+            return items
+
+        # Drain whatever is already in the pipe under a single acquisition of the read lock
+        if len(items) < max_items and self._rlock.acquire(False):
             try:
-                if block:
-                    timeout = deadline - time.monotonic()
-                    if not self._poll(timeout):
-                        raise Empty
-                elif not self._poll():
-                    raise Empty
-
-                res = self._recv_bytes()
+                while len(items) < max_items and self._poll():
+                    res = self._recv_bytes()
+                    self._sem.release()
+                    items.append(ForkingPickler.loads(res))
             finally:
                 self._rlock.release()
 
-        # Unserialize the data after releasing the lock
-        return _ForkingPickler.loads(res)
+        return items
+
+    def qsize(self) -> int:
+        """
+        Returns the approximate number of items in the queue, including a peeked item.
+        Raises NotImplementedError on platforms without sem_getvalue (macOS).
+        """
+        return super().qsize() + (self._lookahead is not _NO_ITEM)
+
+    def empty(self) -> bool:
+        """
+        Returns True if the queue is approximately empty.
+        """
+        return self._lookahead is _NO_ITEM and super().empty()
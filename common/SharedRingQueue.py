@@ -0,0 +1,299 @@
+"""
+Fixed size ring queue in shared memory for passing small messages
+between processes without a manager server process.
+Hugo Burton
+19/10/2026
+"""
+
+from typing import Any, Optional
+import struct
+import marshal
+import pickle
+import multiprocessing
+from multiprocessing import shared_memory
+from queue import Empty, Full
+
+from .logger_helper import init_logger
+
+logger = init_logger()
+
+# Header holds the read (head) and write (tail) counters. Padded to a cache line
+# so the slots never share a line with the counters.
+_HEADER_FORMAT = "<QQ"
+_HEADER_SIZE = 64
+_HEAD_OFFSET = 0
+_TAIL_OFFSET = 8
+
+# Each slot starts with the payload length and an encoding tag
+_SLOT_HEADER_FORMAT = "<IB"
+_SLOT_HEADER_SIZE = struct.calcsize(_SLOT_HEADER_FORMAT)
+
+_INT_FORMAT = "<q"
+_INT_SIZE = struct.calcsize(_INT_FORMAT)
+_INT_MIN = -(1 << 63)
+_INT_MAX = (1 << 63) - 1
+
+# Encoding tags
+_TAG_INT = 0
+_TAG_MARSHAL = 1
+_TAG_PICKLE = 2
+
+
+class ItemTooLargeError(ValueError):
+    """
+    Raised when an item does not fit in a slot of the queue.
+    """
+
+
+def _encode(item: Any) -> tuple:
+    """
+    Encodes an item into the most compact supported representation. Key codes are
+    stored as raw 64 bit integers, builtin containers are marshalled and anything
+    else falls back to pickle.
+
+    Args:
+        item (Any): The item to encode.
+
+    Returns:
+        tuple: The encoding tag and the encoded bytes.
+    """
+    if type(item) is int and _INT_MIN <= item <= _INT_MAX:
+        return _TAG_INT, struct.pack(_INT_FORMAT, item)
+
+    try:
+        return _TAG_MARSHAL, marshal.dumps(item)
+    except ValueError:
+        return _TAG_PICKLE, pickle.dumps(item, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(tag: int, payload: bytes) -> Any:
+    """
+    Decodes an item encoded by `_encode`.
+
+    Args:
+        tag (int): The encoding tag.
+        payload (bytes): The encoded bytes.
+
+    Returns:
+        Any: The decoded item.
+    """
+    if tag == _TAG_INT:
+        return struct.unpack(_INT_FORMAT, payload)[0]
+    if tag == _TAG_MARSHAL:
+        return marshal.loads(payload)
+    return pickle.loads(payload)
+
+
+class SharedRingQueue:
+    """
+    Multi producer queue backed by a ring of fixed size slots in shared memory.
+
+    Follows the interface of `multiprocessing.Queue` (put, get, empty, qsize, full),
+    but `empty` and `qsize` only read two counters from shared memory rather than
+    making a round trip to a manager process. Items are copied straight into a slot
+    so no feeder thread is involved either.
+
+    The queue can be passed to a child process as a `Process` argument. The creating
+    process should call `unlink` once every process is finished with the queue.
+    """
+
+    def __init__(self, capacity: int = 64, slot_size: int = 1024, ctx: Optional[Any] = None):
+        """
+        Creates the shared memory block and the synchronisation primitives.
+
+        Args:
+            capacity (int): Maximum number of items held at once.
+            slot_size (int): Maximum encoded size of an item in bytes.
+            ctx (Optional[Any]): Multiprocessing context. Defaults to the default context.
+        """
+        if capacity < 1:
+            raise ValueError("'capacity' must be a positive integer")
+        if slot_size < _INT_SIZE:
+            raise ValueError(f"'slot_size' must be at least {_INT_SIZE} bytes")
+
+        ctx = ctx if ctx is not None else multiprocessing.get_context()
+
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self._stride = _SLOT_HEADER_SIZE + slot_size
+
+        size = _HEADER_SIZE + capacity * self._stride
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        struct.pack_into(_HEADER_FORMAT, self._shm.buf, 0, 0, 0)
+        self._owner = True
+
+        # Producers and consumers are serialised separately, so a put never waits on a get
+        self._put_lock = ctx.Lock()
+        self._get_lock = ctx.Lock()
+        self._items = ctx.Semaphore(0)
+        self._free = ctx.Semaphore(capacity)
+        self._closed = False
+
+        logger.debug("Created shared ring queue %s with %d slots of %d bytes",
+                     self._shm.name, capacity, slot_size)
+
+    def __getstate__(self) -> dict:
+        return {
+            "name": self._shm.name,
+            "capacity": self.capacity,
+            "slot_size": self.slot_size,
+            "put_lock": self._put_lock,
+            "get_lock": self._get_lock,
+            "items": self._items,
+            "free": self._free,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.capacity = state["capacity"]
+        self.slot_size = state["slot_size"]
+        self._stride = _SLOT_HEADER_SIZE + self.slot_size
+        self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._owner = False
+        self._put_lock = state["put_lock"]
+        self._get_lock = state["get_lock"]
+        self._items = state["items"]
+        self._free = state["free"]
+        self._closed = False
+
+    @property
+    def name(self) -> str:
+        """
+        The name of the shared memory block backing the queue.
+        """
+        return self._shm.name
+
+    def _check_closed(self) -> None:
+        if self._closed:
+            raise ValueError(f"Queue {self!r} is closed.")
+
+    def _slot_offset(self, counter: int) -> int:
+        return _HEADER_SIZE + (counter % self.capacity) * self._stride
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None) -> None:
+        """
+        Puts an item into the queue.
+
+        Args:
+            item (Any): The item to put. Must encode to at most `slot_size` bytes.
+            block (bool): If True, blocks until a slot is free.
+            timeout (Optional[float]): If block is True, the maximum time to wait.
+
+        Raises:
+            Full: If no slot became free.
+            ItemTooLargeError: If the item is too large for a slot.
+            ValueError: If the queue is closed.
+        """
+        self._check_closed()
+
+        tag, payload = _encode(item)
+        length = len(payload)
+        if length > self.slot_size:
+            raise ItemTooLargeError(
+                f"Item of {length} bytes does not fit in a {self.slot_size} byte slot")
+
+        if not self._free.acquire(block, timeout):
+            raise Full
+
+        buf = self._shm.buf
+        with self._put_lock:
+            tail = struct.unpack_from("<Q", buf, _TAIL_OFFSET)[0]
+            offset = self._slot_offset(tail)
+            struct.pack_into(_SLOT_HEADER_FORMAT, buf, offset, length, tag)
+            start = offset + _SLOT_HEADER_SIZE
+            buf[start:start + length] = payload
+            struct.pack_into("<Q", buf, _TAIL_OFFSET, tail + 1)
+
+        self._items.release()
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        """
+        Removes and returns the next item in the queue.
+
+        Args:
+            block (bool): If True, blocks until an item is available.
+            timeout (Optional[float]): If block is True, the maximum time to wait.
+
+        Returns:
+            Any: The next item.
+
+        Raises:
+            Empty: If no item became available.
+        """
+        self._check_closed()
+
+        if not self._items.acquire(block, timeout):
+            raise Empty
+
+        buf = self._shm.buf
+        with self._get_lock:
+            head = struct.unpack_from("<Q", buf, _HEAD_OFFSET)[0]
+            offset = self._slot_offset(head)
+            length, tag = struct.unpack_from(_SLOT_HEADER_FORMAT, buf, offset)
+            start = offset + _SLOT_HEADER_SIZE
+            payload = bytes(buf[start:start + length])
+            struct.pack_into("<Q", buf, _HEAD_OFFSET, head + 1)
+
+        self._free.release()
+        return _decode(tag, payload)
+
+    def put_nowait(self, item: Any) -> None:
+        """
+        Equivalent to put(item, False).
+        """
+        self.put(item, False)
+
+    def get_nowait(self) -> Any:
+        """
+        Equivalent to get(False).
+        """
+        return self.get(False)
+
+    def qsize(self) -> int:
+        """
+        Returns the approximate number of items in the queue. Items being
+        written or read at the time of the call may or may not be counted.
+
+        Returns:
+            int: The number of items in the queue.
+        """
+        self._check_closed()
+        head, tail = struct.unpack_from(_HEADER_FORMAT, self._shm.buf, 0)
+        return max(0, tail - head)
+
+    def empty(self) -> bool:
+        """
+        Returns True if the queue is approximately empty.
+        """
+        return self.qsize() == 0
+
+    def full(self) -> bool:
+        """
+        Returns True if the queue is approximately full.
+        """
+        return self.qsize() >= self.capacity
+
+    def close(self) -> None:
+        """
+        Detaches this process from the shared memory. The queue can no longer be used
+        from this process, but other processes are unaffected.
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """
+        Closes the queue and frees the shared memory. Should only be called by the
+        creating process once every other process has finished with the queue.
+        """
+        self.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                logger.debug("Shared ring queue %s already unlinked", self._shm.name)
+
+    def __repr__(self) -> str:
+        return f"<SharedRingQueue {self._shm.name} capacity={self.capacity} slot_size={self.slot_size}>"
@@ -6,6 +6,7 @@ Common constants used in the project
 
 ESC_KEY_CODE = 27
 QUIT_KEYS = {chr(ESC_KEY_CODE)}
+QUIT_ACTION = "quit"
 
 
 # Time constants
@@ -16,6 +17,10 @@ MILLISECONDS_PER_SECOND = 1000
 
 PROCESS_TIMEOUT = 3  # seconds
 
+# Startup profiling
+
+STARTUP_PROFILE_ENV = "DRONE_STARTUP_PROFILE"
+
 # Threads
 
 THREAD_CALLBACK = "callback"
@@ -26,17 +31,36 @@ THREAD_FPS = "fps"
 VOICE_CONTROL = "voice_control"
 DRONE = "drone"
 EYE_TRACKING = "eye_tracking"
+GUI = "gui"
 
 # Keyboard
 
 KEYBOARD_QUEUE = "keyboard_queue"
+KEY_ROUTER = "key_router"
 COMMAND_QUEUE = "command_queue"
 
+# Inter-process queues (shared memory ring queues)
+
+KEYBOARD_QUEUE_CAPACITY = 256
+KEYBOARD_QUEUE_SLOT_SIZE = 16  # bytes, key codes are sent as raw integers
+COMMAND_QUEUE_CAPACITY = 32
+COMMAND_QUEUE_SLOT_SIZE = 4096  # bytes
+COMMAND_QUEUE_PUT_TIMEOUT = 1.0  # seconds, before a command is dropped
+
 # Video
 
 VIDEO_FRAME = "video_frame"
+FRAME_TIME = "frame_time"
 TICK_RATE = "tick_rate"
 
+# Resource governor knobs, set in a module's thread data
+
+OVERLAY_QUALITY = "overlay_quality"
+QUALITY_HIGH = "high"
+QUALITY_LOW = "low"
+PREVIEW_SCALE = "preview_scale"
+TELEMETRY_SCALE = "telemetry_scale"
+
 # Eye Tracking
 LEFT = "left"
 RIGHT = "right"
@@ -0,0 +1,248 @@
+"""
+Pool of reusable frame buffers, so a video pipeline does not allocate and copy full
+frames on every tick.
+
+Buffers are handed out in a ring, but a buffer is only handed out again once nothing
+outside the pool references it. Consumers are tracked through the buffer's reference
+count, so a frame published to another thread, or a view of it, stays valid for as long
+as the consumer holds it, however many frames are acquired meanwhile. A stage whose
+buffers are all held gets a new buffer instead.
+
+Published frames are made read-only (copy-on-write): a consumer which needs to draw on
+one copies it first, and the pool makes the buffer writeable again when it reuses it.
+
+A `FrameFreeList` instead has its buffers handed back explicitly, for queues whose
+consumer knows when it has finished with a frame.
+"""
+
+from typing import Dict, List, Tuple, Optional
+import sys
+import threading
+import dataclasses
+
+import numpy as np
+
+from .logger_helper import init_logger
+
+logger = init_logger()
+
+# Buffers per ring. Enough for the frame being drawn, the frame last published and the
+# frame a consumer may still be reading.
+DEFAULT_DEPTH = 3
+# Rings grow to at most this many times their depth while consumers hold their buffers.
+# Past that, buffers are allocated without being pooled.
+MAX_GROWTH = 4
+# References to a buffer referenced only by its ring, counted within `_is_held`
+FREE_REFCOUNT = 3
+
+
+def _is_held(buffer: np.ndarray) -> bool:
+    """
+    Whether anything besides its ring references a buffer, directly or through a view.
+    """
+    # The ring, this function's argument and getrefcount's argument
+    return sys.getrefcount(buffer) > FREE_REFCOUNT
+
+
+@dataclasses.dataclass(frozen=True)
+class FramePoolStats:
+    """
+    Counters of a frame pool.
+    """
+
+    acquisitions: int
+    allocations: int
+    copies: int
+    held: int
+
+
+class FramePool:
+    """
+    Rings of preallocated frame buffers, one ring per named stage of a pipeline.
+    """
+
+    def __init__(self, depth: int = DEFAULT_DEPTH, name: Optional[str] = None):
+        """
+        Args:
+            depth: Buffers per ring
+            name: Name of the pool for logging
+        """
+        self.depth = depth
+        self.name = name
+        self._rings: Dict[str, List[np.ndarray]] = {}
+        self._next: Dict[str, int] = {}
+
+        self.acquisitions = 0
+        self.allocations = 0
+        self.copies = 0
+        # Acquisitions which skipped a buffer still held by a consumer
+        self.held = 0
+
+    def acquire(self, stage: str, shape: Tuple[int, ...], dtype: np.dtype = np.uint8) -> np.ndarray:
+        """
+        Gets the next free, writeable buffer of a stage's ring. Its contents are
+        undefined. Buffers are reallocated when the requested shape or dtype changes.
+
+        Args:
+            stage: Name of the pipeline stage
+            shape: Shape of the frame
+            dtype: Data type of the frame
+
+        Returns:
+            The buffer
+        """
+        ring = self._rings.setdefault(stage, [])
+        start = self._next.get(stage, 0)
+        self.acquisitions += 1
+
+        # The first free buffer from the ring's position. A new one while the ring is
+        # filling up, or if every buffer is held.
+        index = len(ring)
+        if start < len(ring):
+            for offset in range(len(ring)):
+                candidate = (start + offset) % len(ring)
+                if not _is_held(ring[candidate]):
+                    index = candidate
+                    break
+                self.held += 1
+
+        if index < len(ring) and ring[index].shape == tuple(shape) and ring[index].dtype == dtype:
+            buffer = ring[index]
+            buffer.flags.writeable = True
+        else:
+            buffer = np.empty(shape, dtype)
+            self.allocations += 1
+            if index < len(ring):
+                if index == 0:
+                    logger.debug("Frame pool %s reallocating %s buffers for shape %s", self.name, stage, shape)
+                ring[index] = buffer
+            elif len(ring) < self.depth * MAX_GROWTH:
+                if len(ring) >= self.depth:
+                    logger.debug("Frame pool %s growing %s ring past held buffers to %d",
+                                 self.name, stage, len(ring) + 1)
+                ring.append(buffer)
+            else:
+                logger.warning("Frame pool %s has every %s buffer held. Allocating an unpooled buffer",
+                               self.name, stage)
+                return buffer
+
+        # Wraps once the ring is full
+        self._next[stage] = (index + 1) % max(len(ring), self.depth)
+        return buffer
+
+    def copy(self, stage: str, frame: np.ndarray) -> np.ndarray:
+        """
+        Copies a frame into the next buffer of a stage's ring.
+
+        Args:
+            stage: Name of the pipeline stage
+            frame: The frame to copy
+
+        Returns:
+            The copy
+        """
+        buffer = self.acquire(stage, frame.shape, frame.dtype)
+        np.copyto(buffer, frame)
+        self.copies += 1
+        return buffer
+
+    def count_copy(self) -> None:
+        """
+        Counts a full frame copy made outside the pool, e.g. by an OpenCV function
+        writing into a pooled buffer.
+        """
+        self.copies += 1
+
+    @staticmethod
+    def publish(frame: np.ndarray) -> np.ndarray:
+        """
+        Makes a frame read-only before handing it to another thread. Its buffer is not
+        reused while the consumer holds the frame.
+
+        Args:
+            frame: The frame
+
+        Returns:
+            The frame
+        """
+        frame.flags.writeable = False
+        return frame
+
+    def stats(self) -> FramePoolStats:
+        """
+        Returns a snapshot of the pool's counters.
+        """
+        return FramePoolStats(self.acquisitions, self.allocations, self.copies, self.held)
+
+    def clear(self) -> None:
+        """
+        Releases every buffer.
+        """
+        self._rings.clear()
+        self._next.clear()
+
+
+class FrameFreeList:
+    """
+    Frame buffers which are reused once released. A producer copies each frame into a
+    free buffer, and the consumer releases the buffer when it has finished with it, e.g.
+    once the frame is written. May be used from any thread.
+    """
+
+    def __init__(self, name: Optional[str] = None):
+        """
+        Args:
+            name: Name of the free list for logging
+        """
+        self.name = name
+        self._free: List[np.ndarray] = []
+        self._lock = threading.Lock()
+
+        self.allocations = 0
+        self.copies = 0
+
+    def copy(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Copies a frame into a free buffer, allocating one if none of its shape and dtype
+        is free.
+
+        Args:
+            frame: The frame to copy
+
+        Returns:
+            The copy, owned by the caller until released
+        """
+        buffer = None
+        with self._lock:
+            while self._free:
+                candidate = self._free.pop()
+                if candidate.shape == frame.shape and candidate.dtype == frame.dtype:
+                    buffer = candidate
+                    break
+
+        if buffer is None:
+            buffer = np.empty(frame.shape, frame.dtype)
+            self.allocations += 1
+            if self.allocations % 100 == 0:
+                logger.debug("Frame free list %s has allocated %d buffers", self.name, self.allocations)
+
+        np.copyto(buffer, frame)
+        self.copies += 1
+        return buffer
+
+    def release(self, buffer: np.ndarray) -> None:
+        """
+        Returns a buffer from `copy` to be reused. The caller must not use it afterwards.
+
+        Args:
+            buffer: The buffer
+        """
+        with self._lock:
+            self._free.append(buffer)
+
+    @property
+    def free(self) -> int:
+        """
+        Number of buffers waiting to be reused.
+        """
+        return len(self._free)
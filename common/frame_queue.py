@@ -0,0 +1,138 @@
+"""
+Bounded queue of frames from a producer which must never block, to a writer thread.
+
+Frames are copied into buffers from a free list when queued, and the consumer releases
+each buffer once it has finished with the frame, so only as many buffers are allocated
+as there are frames in flight. When the queue is full, frames are dropped according to
+the drop policy rather than blocking the producer.
+"""
+
+from typing import Any, Optional, Tuple
+import queue
+
+import numpy as np
+
+from .logger_helper import init_logger
+from .frame_pool import FrameFreeList
+
+logger = init_logger()
+
+DROP_OLDEST = "oldest"
+DROP_NEWEST = "newest"
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST)
+
+
+class FrameQueue:
+    """
+    Queue of frame copies, each with the producer's details of the frame.
+    """
+
+    def __init__(self, maxsize: int, name: str, drop_policy: str = DROP_NEWEST):
+        """
+        Args:
+            maxsize: Frames which may wait for the consumer before frames are dropped
+            name: Name of the queue for logging
+            drop_policy: Which frame to drop when the queue is full, DROP_OLDEST or DROP_NEWEST
+
+        Raises:
+            ValueError: If the drop policy is not supported
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unsupported drop policy {drop_policy}")
+
+        self.name = name
+        self.drop_policy = drop_policy
+        self.buffers = FrameFreeList(name=name)
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, frame: np.ndarray, *details: Any) -> bool:
+        """
+        Queues a copy of a frame. Never blocks.
+
+        Args:
+            frame: The frame. Copied, so the caller may reuse it.
+            *details: Returned with the frame by `get`, e.g. its timestamp
+
+        Returns:
+            True if the frame was queued, False if it was dropped
+        """
+        if self.full():
+            if self.drop_policy == DROP_NEWEST:
+                self._drop()
+                return False
+            try:
+                dropped = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                if dropped is not None:
+                    self.buffers.release(dropped[0])
+                    self._drop()
+
+        buffer = self.buffers.copy(frame)
+        try:
+            self._queue.put_nowait((buffer, *details))
+        except queue.Full:
+            # Another producer filled the queue
+            self.buffers.release(buffer)
+            self._drop()
+            return False
+        return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[Any, ...]]:
+        """
+        Takes the next frame. The caller releases the frame once it has finished with it.
+
+        Args:
+            timeout: Seconds to wait for a frame, or None to wait until one is queued
+
+        Returns:
+            The frame and its details, or None once the queue is closed
+
+        Raises:
+            queue.Empty: If no frame was queued within the timeout
+        """
+        return self._queue.get(timeout=timeout)
+
+    def get_nowait(self) -> Optional[Tuple[Any, ...]]:
+        """
+        Takes the next frame without waiting. See `get`.
+        """
+        return self._queue.get_nowait()
+
+    def release(self, frame: np.ndarray) -> None:
+        """
+        Returns a frame from `get` to be reused. The caller must not use it afterwards.
+
+        Args:
+            frame: The frame
+        """
+        self.buffers.release(frame)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Queues None after the frames already queued, for the consumer to stop at.
+
+        Args:
+            timeout: Seconds to wait for space in the queue, or None to wait until there is
+
+        Returns:
+            True if closed, False if the queue stayed full
+        """
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return False
+        return True
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+    def full(self) -> bool:
+        return self._queue.full()
+
+    def _drop(self) -> None:
+        self.dropped += 1
+        if self.dropped == 1 or self.dropped % 100 == 0:
+            logger.warning("%s is behind. %d frames dropped", self.name, self.dropped)
@@ -0,0 +1,125 @@
+"""
+Compact description of the gaze overlay, published by the eye tracking module in
+place of a rendered frame, and a renderer which draws it onto a frame of any
+resolution, e.g. the drone feed.
+"""
+
+from typing import Dict, Optional, Tuple
+import dataclasses
+
+import numpy as np
+import cv2
+
+from . import image
+from .image import Point, Colour
+
+# Style of the overlay, shared with the eye tracking demo window. Colours are BGR.
+HITBOX_COLOUR: Colour = (0, 0, 255)
+HITBOX_ALPHA = 0.05
+# Added to the alpha of the hit-box being looked at
+LOOKING_ALPHA_BOOST = 0.2
+LOOKING_BORDER_COLOUR: Colour = (255, 0, 0)
+LOOKING_BORDER_THICKNESS = 2
+GAZE_POINT_COLOUR: Colour = (0, 0, 255)
+TEXT_COLOUR: Colour = (255, 255, 255)
+FONT_FACE = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 1.0
+TEXT_THICKNESS = 2
+
+
+@dataclasses.dataclass(frozen=True)
+class GazeOverlay:
+    """
+    The gaze overlay of one frame. Coordinates are in the resolution of the frame the
+    gaze was estimated on.
+    """
+
+    resolution: Tuple[int, int]
+    hitboxes: Dict[str, Tuple[Point, Point]]
+    gaze_side: Optional[str] = None
+    gaze_point: Optional[Point] = None
+    point_size: int = 3
+    alpha: float = HITBOX_ALPHA
+
+    def looking_text(self, side: str) -> str:
+        """
+        Label of a hit-box, empty unless it is being looked at.
+        """
+        return f"Looking {side}" if side == self.gaze_side else ""
+
+
+class GazeOverlayRenderer:
+    """
+    Draws gaze overlays onto frames in place. Hit-boxes are pre-rendered as tiles at
+    the target resolution and cached, so each frame only blits them and draws the point.
+    """
+
+    def __init__(self, rgb: bool = False):
+        """
+        Args:
+            rgb: Whether target frames are RGB rather than BGR
+        """
+        self.rgb = rgb
+        self.compositor = image.OverlayCompositor()
+        self._tiles: Dict[tuple, image.OverlayTile] = {}
+        self._tiles_resolution: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None
+
+    def _colour(self, colour: Colour) -> Colour:
+        return colour[::-1] if self.rgb else colour
+
+    def _get_tile(self, side: str, size: Point, overlay: GazeOverlay) -> image.OverlayTile:
+        looking = side == overlay.gaze_side
+        key = (side, size, looking, overlay.alpha)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            return tile
+
+        text = overlay.looking_text(side)
+        text_org = (0, 0)
+        if text:
+            (text_width, text_height), _ = cv2.getTextSize(text, FONT_FACE, FONT_SCALE, TEXT_THICKNESS)
+            text_org = ((size[0] - text_width) // 2, (size[1] + text_height) // 2)
+
+        alpha = overlay.alpha + LOOKING_ALPHA_BOOST if looking else overlay.alpha
+        border = self._colour(LOOKING_BORDER_COLOUR) if looking else None
+        tile = self._tiles[key] = image.render_labelled_tile(
+            size, self._colour(HITBOX_COLOUR), alpha, border, LOOKING_BORDER_THICKNESS, text, text_org,
+            FONT_FACE, FONT_SCALE, self._colour(TEXT_COLOUR), TEXT_THICKNESS, cv2.LINE_AA)
+        return tile
+
+    def render(self, frame: np.ndarray, overlay: GazeOverlay) -> None:
+        """
+        Draws the overlay onto the frame in place, scaled to the frame's resolution.
+
+        Args:
+            frame: The frame to draw on
+            overlay: The overlay to draw
+        """
+        height, width = frame.shape[:2]
+        source_height, source_width = overlay.resolution
+        scale_x, scale_y = width / source_width, height / source_height
+
+        resolution = ((height, width), overlay.resolution)
+        if resolution != self._tiles_resolution:
+            self._tiles.clear()
+            self._tiles_resolution = resolution
+
+        for side, (top_left, bottom_right) in overlay.hitboxes.items():
+            scaled_top_left = (int(top_left[0] * scale_x), int(top_left[1] * scale_y))
+            scaled_bottom_right = (int(bottom_right[0] * scale_x), int(bottom_right[1] * scale_y))
+            size = (scaled_bottom_right[0] - scaled_top_left[0] + 1, scaled_bottom_right[1] - scaled_top_left[1] + 1)
+            self.compositor.blit(self._get_tile(side, size, overlay), scaled_top_left)
+
+        self.compositor.flush(frame)
+
+        if overlay.gaze_point is not None:
+            point = (int(overlay.gaze_point[0] * scale_x), int(overlay.gaze_point[1] * scale_y))
+            radius = max(1, int(overlay.point_size * min(scale_x, scale_y)))
+            cv2.circle(frame, point, radius, self._colour(GAZE_POINT_COLOUR), cv2.FILLED)
+
+    def clear(self) -> None:
+        """
+        Discards the cached tiles.
+        """
+        self._tiles.clear()
+        self._tiles_resolution = None
@@ -2,10 +2,14 @@
 Common image utilities
 """
 
-from typing import Tuple
+from typing import Tuple, List, Optional
+import functools
 import numpy as np
 import cv2
 
+Point = Tuple[int, int]
+Colour = Tuple[int, int, int]
+
 
 def blend_frame(frame: np.ndarray, overlay: np.ndarray, alpha: float) -> np.ndarray:
     """
@@ -41,3 +45,296 @@ def rescale_frame(frame: np.ndarray, shape: Tuple[int, int, int]) -> np.ndarray:
     """
 
     return cv2.resize(frame, (shape[1], shape[0]), interpolation=cv2.INTER_AREA)
+
+
+def clip_rect(shape: Tuple[int, ...], top_left: Point, bottom_right: Point) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Clips a rectangle to a frame. Corners are inclusive, as with `cv2.rectangle`.
+
+    Args:
+        shape (Tuple[int, ...]): Shape of the frame
+        top_left (Point): Top left corner of the rectangle
+        bottom_right (Point): Bottom right corner of the rectangle
+
+    Returns:
+        Optional[Tuple[int, int, int, int]]: Slice bounds (x0, y0, x1, y1) of the clipped
+                                             rectangle, or None if it lies outside the frame
+    """
+    height, width = shape[:2]
+    x0 = max(int(top_left[0]), 0)
+    y0 = max(int(top_left[1]), 0)
+    x1 = min(int(bottom_right[0]) + 1, width)
+    y1 = min(int(bottom_right[1]) + 1, height)
+
+    if x0 >= x1 or y0 >= y1:
+        return None
+
+    return x0, y0, x1, y1
+
+
+def blend_rect(frame: np.ndarray, top_left: Point, bottom_right: Point, colour: Colour, alpha: float) -> None:
+    """
+    Fills a rectangle of the frame with a translucent colour, in place. Only the pixels
+    inside the rectangle are read or written, so the cost scales with its area.
+
+    Args:
+        frame (np.ndarray): The frame to draw on
+        top_left (Point): Top left corner of the rectangle (inclusive)
+        bottom_right (Point): Bottom right corner of the rectangle (inclusive)
+        colour (Colour): Fill colour, with one value per channel of the frame
+        alpha (float): Opacity of the fill
+    """
+    rect = clip_rect(frame.shape, top_left, bottom_right)
+    if rect is None:
+        return
+
+    x0, y0, x1, y1 = rect
+    roi = frame[y0:y1, x0:x1]
+
+    # Fixed point weights out of 256 keep the arithmetic in uint16
+    weight = int(round(alpha * 256))
+    if weight <= 0:
+        return
+    if weight >= 256:
+        roi[...] = colour
+        return
+
+    blended = roi.astype(np.uint16)
+    blended *= 256 - weight
+    blended += np.asarray(colour, np.uint16) * weight + 128
+    blended >>= 8
+    roi[...] = blended
+
+
+@functools.lru_cache(maxsize=16)
+def dot_offsets(radius: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pixel offsets of a filled dot, the sprite stamped by `draw_dots`.
+
+    Args:
+        radius (int): Radius of the dot in pixels
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Row and column offsets from the centre
+    """
+    radius = max(int(radius), 0)
+    dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    # The same pixels as a filled `cv2.circle` of this radius
+    inside = dx * dx + dy * dy <= radius * radius
+    dy, dx = dy[inside], dx[inside]
+    dy.flags.writeable = False
+    dx.flags.writeable = False
+    return dy, dx
+
+
+def draw_dots(frame: np.ndarray, points: np.ndarray, radius: int, colour: Colour) -> None:
+    """
+    Draws filled dots at many points at once, in place. Points are rounded together and
+    a precomputed dot sprite is stamped at each through fancy indexing, instead of one
+    `cv2.circle` call per point.
+
+    Args:
+        frame (np.ndarray): The frame to draw on
+        points (np.ndarray): N x 2 array of (x, y) points
+        radius (int): Radius of the dots in pixels
+        colour (Colour): Colour of the dots
+    """
+    if len(points) == 0:
+        return
+
+    centres = np.rint(points).astype(np.int32)
+    dy, dx = dot_offsets(radius)
+    ys = (centres[:, 1, np.newaxis] + dy).ravel()
+    xs = (centres[:, 0, np.newaxis] + dx).ravel()
+
+    height, width = frame.shape[:2]
+    inside = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < width)
+    frame[ys[inside], xs[inside]] = colour
+
+
+class OverlayTile:
+    """
+    A pre-rendered overlay layer, stored premultiplied so it can be blitted onto a
+    frame with one multiply and add per pixel.
+    """
+
+    def __init__(self, premultiplied: np.ndarray, inverse_weight: np.ndarray):
+        """
+        Args:
+            premultiplied (np.ndarray): Colour multiplied by its weight out of 256, as uint16
+            inverse_weight (np.ndarray): 256 minus the weight of each pixel, as uint16 with a
+                                         trailing channel axis of size 1
+        """
+        self.premultiplied = premultiplied
+        self.inverse_weight = inverse_weight
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """
+        Height and width of the tile.
+        """
+        return self.premultiplied.shape[:2]
+
+    def blit(self, frame: np.ndarray, top_left: Point) -> None:
+        """
+        Blends the tile onto the frame in place, clipped to the frame.
+
+        Args:
+            frame (np.ndarray): The frame to draw on
+            top_left (Point): Position of the tile's top left corner in the frame
+        """
+        height, width = self.shape
+        left, top = int(top_left[0]), int(top_left[1])
+        rect = clip_rect(frame.shape, (left, top), (left + width - 1, top + height - 1))
+        if rect is None:
+            return
+
+        x0, y0, x1, y1 = rect
+        roi = frame[y0:y1, x0:x1]
+        tile_slice = (slice(y0 - top, y1 - top), slice(x0 - left, x1 - left))
+
+        blended = roi.astype(np.uint16)
+        blended *= self.inverse_weight[tile_slice]
+        blended += self.premultiplied[tile_slice]
+        blended += 128
+        blended >>= 8
+        roi[...] = blended
+
+
+def render_labelled_tile(size: Point, colour: Colour, alpha: float, border_colour: Optional[Colour],
+                         border_thickness: int, text: str, text_org: Point, font_face: int, font_scale: float,
+                         text_colour: Colour, text_thickness: int, line_type: int) -> OverlayTile:
+    """
+    Renders a translucent rectangle with an inset border and opaque text as a tile.
+
+    Args:
+        size (Point): Width and height of the tile
+        colour (Colour): Fill colour
+        alpha (float): Opacity of the fill and border
+        border_colour (Optional[Colour]): Colour of the border, if any
+        border_thickness (int): Thickness of the border in pixels
+        text (str): Text drawn over the fill, may be empty
+        text_org (Point): Origin of the text relative to the tile
+        font_face (int): Font face of the text
+        font_scale (float): Scale of the font
+        text_colour (Colour): Colour of the text
+        text_thickness (int): Thickness of the text
+        line_type (int): Line type of the text
+
+    Returns:
+        OverlayTile: The rendered tile
+    """
+    width, height = int(size[0]), int(size[1])
+    colours = np.empty((height, width, 3), np.float32)
+    colours[...] = colour
+    if border_colour is not None and border_thickness > 0:
+        border = np.ones((height, width), bool)
+        border[border_thickness:height - border_thickness, border_thickness:width - border_thickness] = False
+        colours[border] = border_colour
+    weights = np.full((height, width, 1), alpha, np.float32)
+
+    if text:
+        coverage = np.zeros((height, width), np.uint8)
+        cv2.putText(coverage, text, text_org, font_face, font_scale, 255, text_thickness, line_type)
+        coverage = (coverage.astype(np.float32) / 255)[..., np.newaxis]
+        # Text composited over the fill
+        colours = (np.asarray(text_colour, np.float32) * coverage + colours * weights * (1 - coverage))
+        weights = coverage + weights * (1 - coverage)
+        colours /= np.maximum(weights, 1e-6)
+
+    weights = np.rint(weights * 256).astype(np.uint16)
+    premultiplied = np.rint(colours * weights).astype(np.uint16)
+    return OverlayTile(premultiplied, 256 - weights)
+
+
+class OverlayCompositor:
+    """
+    Collects the translucent fills, tiles and text of a frame's overlay and draws them
+    in a single pass. Fills are blended in place within their own rectangles, then tiles
+    are blitted and text is drawn on top, each in the order queued.
+    """
+
+    def __init__(self):
+        self._fills: List[Tuple[Point, Point, Colour, float]] = []
+        self._tiles: List[Tuple[OverlayTile, Point]] = []
+        self._texts: List[Tuple[str, Point, int, float, Colour, int, int]] = []
+
+    @property
+    def pending(self) -> bool:
+        """
+        Whether any draw operations are queued.
+        """
+        return bool(self._fills or self._tiles or self._texts)
+
+    def fill_rect(self, top_left: Point, bottom_right: Point, colour: Colour, alpha: float,
+                  border_colour: Optional[Colour] = None, border_thickness: int = 0) -> None:
+        """
+        Queues a translucent rectangle, optionally with a border of another colour inset
+        within it.
+
+        Args:
+            top_left (Point): Top left corner of the rectangle (inclusive)
+            bottom_right (Point): Bottom right corner of the rectangle (inclusive)
+            colour (Colour): Fill colour
+            alpha (float): Opacity of the fill and border
+            border_colour (Optional[Colour]): Colour of the border, if any
+            border_thickness (int): Thickness of the border in pixels
+        """
+        (left, top), (right, bottom) = top_left, bottom_right
+
+        if border_colour is not None and border_thickness > 0:
+            inner_top, inner_bottom = top + border_thickness, bottom - border_thickness
+            # Four strips, so no pixel is blended twice
+            self._fills.append(((left, top), (right, inner_top - 1), border_colour, alpha))
+            self._fills.append(((left, inner_bottom + 1), (right, bottom), border_colour, alpha))
+            self._fills.append(((left, inner_top), (left + border_thickness - 1, inner_bottom), border_colour, alpha))
+            self._fills.append(((right - border_thickness + 1, inner_top), (right, inner_bottom), border_colour, alpha))
+
+            left, top = left + border_thickness, inner_top
+            right, bottom = right - border_thickness, inner_bottom
+
+        self._fills.append(((left, top), (right, bottom), colour, alpha))
+
+    def blit(self, tile: OverlayTile, top_left: Point) -> None:
+        """
+        Queues a pre-rendered tile.
+
+        Args:
+            tile (OverlayTile): The tile
+            top_left (Point): Position of the tile's top left corner
+        """
+        self._tiles.append((tile, top_left))
+
+    def text(self, text: str, org: Point, font_face: int, font_scale: float, colour: Colour,
+             thickness: int, line_type: int) -> None:
+        """
+        Queues text, drawn over the fills. Arguments are as for `cv2.putText`.
+        """
+        if text:
+            self._texts.append((text, org, font_face, font_scale, colour, thickness, line_type))
+
+    def flush(self, frame: np.ndarray) -> None:
+        """
+        Draws the queued operations onto the frame in place and clears the queue.
+
+        Args:
+            frame (np.ndarray): The frame to draw on
+        """
+        for top_left, bottom_right, colour, alpha in self._fills:
+            blend_rect(frame, top_left, bottom_right, colour, alpha)
+
+        for tile, top_left in self._tiles:
+            tile.blit(frame, top_left)
+
+        for text, org, font_face, font_scale, colour, thickness, line_type in self._texts:
+            cv2.putText(frame, text, org, font_face, font_scale, colour, thickness, line_type)
+
+        self.clear()
+
+    def clear(self) -> None:
+        """
+        Discards the queued operations.
+        """
+        self._fills.clear()
+        self._tiles.clear()
+        self._texts.clear()
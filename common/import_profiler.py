@@ -0,0 +1,421 @@
+"""
+Import profiler. Records the time spent importing each module, aggregated by
+subsystem, and the time spent in initialisation phases such as `init.*` functions
+and model loading.
+
+Enabled by setting the DRONE_STARTUP_PROFILE environment variable before launching
+any entry point. Set it to 1 to log a ranked report at exit, or to a file path to
+also write the profile as JSON there:
+
+    DRONE_STARTUP_PROFILE=startup.json python app/src/main.py
+
+The profiler is installed when this module is first imported, so entry points import
+it before their remaining imports.
+
+Phases are timed with `profile_phase` or `phase`, and passed to the import profiler
+and to every recorder added with `add_phase_recorder`, such as the app's startup profiler.
+"""
+
+from typing import Optional, Dict, List, Any, Callable, Sequence, Iterator
+import os
+import sys
+import json
+import time
+import atexit
+import pathlib
+import functools
+import threading
+from contextlib import contextmanager
+from importlib.abc import MetaPathFinder
+from importlib.machinery import ModuleSpec
+
+from .logger_helper import init_logger
+from .file_handler import get_project_root
+from . import constants as cc
+
+logger = init_logger()
+
+# Subsystems are the top level folders of the project
+SUBSYSTEMS = (cc.EYE_TRACKING, cc.DRONE, cc.VOICE_CONTROL, "app", "common")
+UNATTRIBUTED = "unattributed"
+ENABLE_VALUES = {"1", "true", "yes"}
+
+
+class ImportRecord:
+    """
+    Time taken to import a single module.
+    """
+
+    __slots__ = ("name", "subsystem", "owner", "self_time", "inclusive_time")
+
+    def __init__(self, name: str, subsystem: Optional[str], owner: str):
+        """
+        Args:
+            name: Module name
+            subsystem: Project subsystem the module belongs to, None for third party modules
+            owner: Subsystem whose import triggered this import
+        """
+        self.name = name
+        self.subsystem = subsystem
+        self.owner = owner
+        self.self_time = 0.0
+        self.inclusive_time = 0.0
+
+    @property
+    def package(self) -> str:
+        """
+        Top level package of the module, or the subsystem for project modules.
+        """
+        return self.subsystem or self.name.partition(".")[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "package": self.package,
+            "owner": self.owner,
+            "self_time": self.self_time,
+            "inclusive_time": self.inclusive_time,
+        }
+
+
+class _Frame:
+    """
+    Module being executed on a thread's import stack.
+    """
+
+    __slots__ = ("record", "start", "child_time")
+
+    def __init__(self, record: ImportRecord, start: float):
+        self.record = record
+        self.start = start
+        self.child_time = 0.0
+
+
+class _TimedLoader:
+    """
+    Wraps a module's loader to time its execution. The original loader is restored on
+    the module once it has been executed.
+    """
+
+    def __init__(self, profiler: "ImportProfiler", loader: Any):
+        self._profiler = profiler
+        self._loader = loader
+
+    def create_module(self, spec: ModuleSpec) -> Any:
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: Any) -> None:
+        try:
+            self._profiler._time_exec(module.__spec__, self._loader.exec_module, module)
+        finally:
+            module.__loader__ = self._loader
+            if module.__spec__ is not None:
+                module.__spec__.loader = self._loader
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._loader, name)
+
+
+class ImportProfiler(MetaPathFinder):
+    """
+    Meta path finder which times every import found by the finders after it, and
+    collects the durations of profiled phases.
+    """
+
+    def __init__(self, output_path: Optional[pathlib.Path] = None):
+        """
+        Args:
+            output_path: File the profile is written to as JSON at exit, if any
+        """
+        self.output_path = output_path
+        self.start_time = time.perf_counter()
+        self.project_root = str(get_project_root())
+
+        self.records: Dict[str, ImportRecord] = {}
+        self.phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # =========== Import hooks ===========
+
+    def find_spec(self, fullname: str, path: Optional[Sequence[str]], target: Any = None) -> Optional[ModuleSpec]:
+        start = time.perf_counter()
+        spec = None
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find_spec = getattr(finder, "find_spec", None)
+            if find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        find_time = time.perf_counter() - start
+
+        if spec is None:
+            return None
+
+        record = self._get_record(fullname, spec)
+        record.self_time += find_time
+        record.inclusive_time += find_time
+        stack = self._stack()
+        if stack:
+            stack[-1].child_time += find_time
+
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(self, spec.loader)
+
+        return spec
+
+    def _time_exec(self, spec: ModuleSpec, exec_module: Callable, module: Any) -> None:
+        record = self._get_record(spec.name, spec)
+        stack = self._stack()
+        frame = _Frame(record, time.perf_counter())
+        stack.append(frame)
+        try:
+            exec_module(module)
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame.start
+            record.self_time += elapsed - frame.child_time
+            record.inclusive_time += elapsed
+            if stack:
+                stack[-1].child_time += elapsed
+
+    def _stack(self) -> List[_Frame]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _get_record(self, name: str, spec: ModuleSpec) -> ImportRecord:
+        with self._lock:
+            record = self.records.get(name)
+            if record is None:
+                # Namespace packages have no origin file, only search locations
+                origin = spec.origin or next(iter(spec.submodule_search_locations or ()), None)
+                subsystem = self._get_subsystem(origin)
+                record = self.records[name] = ImportRecord(name, subsystem, subsystem or self._get_owner())
+            return record
+
+    def _get_subsystem(self, origin: Optional[str]) -> Optional[str]:
+        """
+        Returns the project subsystem a module file belongs to, or None if it is not part of the project.
+        """
+        if not origin or not origin.startswith(self.project_root):
+            return None
+
+        relative = pathlib.PurePath(origin[len(self.project_root):].lstrip("\\/"))
+        if relative.parts and relative.parts[0] in SUBSYSTEMS:
+            return relative.parts[0]
+        return None
+
+    def _get_owner(self) -> str:
+        """
+        Returns the subsystem of the innermost project module being imported on this thread.
+        """
+        for frame in reversed(self._stack()):
+            if frame.record.subsystem is not None:
+                return frame.record.subsystem
+        return UNATTRIBUTED
+
+    # =========== Phases ===========
+
+    def record_phase(self, name: str, duration: float) -> None:
+        """
+        Records the duration of a phase. Durations of repeated phases are summed.
+
+        Args:
+            name: Name of the phase
+            duration: Duration in seconds
+        """
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    # =========== Reporting ===========
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the profile in the machine readable form written to the output file.
+        """
+        with self._lock:
+            records = list(self.records.values())
+            phases = dict(self.phases)
+
+        subsystems: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            subsystem = subsystems.setdefault(record.owner, {"time": 0.0, "modules": 0, "packages": {}})
+            subsystem["time"] += record.self_time
+            subsystem["modules"] += 1
+            subsystem["packages"][record.package] = subsystem["packages"].get(record.package, 0.0) + record.self_time
+
+        for subsystem in subsystems.values():
+            subsystem["packages"] = dict(sorted(subsystem["packages"].items(), key=lambda item: item[1], reverse=True))
+
+        records.sort(key=lambda record: record.self_time, reverse=True)
+        return {
+            "elapsed": time.perf_counter() - self.start_time,
+            "import_time": sum(record.self_time for record in records),
+            "subsystems": dict(sorted(subsystems.items(), key=lambda item: item[1]["time"], reverse=True)),
+            "phases": dict(sorted(phases.items(), key=lambda item: item[1], reverse=True)),
+            "modules": [record.to_dict() for record in records],
+        }
+
+    def format_report(self, top: int = 20) -> str:
+        """
+        Formats a ranked report of the slowest subsystems, packages, phases and modules.
+
+        Args:
+            top: Number of packages and modules to list
+
+        Returns:
+            The report
+        """
+        profile = self.to_dict()
+        lines = [f"Startup profile: {profile['elapsed']:.3f} s elapsed, {profile['import_time']:.3f} s importing "
+                 f"{len(profile['modules'])} modules"]
+
+        lines.append(f"{'subsystem':<40}{'modules':>8}{'import (s)':>12}")
+        for name, subsystem in profile["subsystems"].items():
+            lines.append(f"{name:<40}{subsystem['modules']:>8}{subsystem['time']:>12.3f}")
+            for package, package_time in list(subsystem["packages"].items())[:top]:
+                lines.append(f"    {package:<44}{package_time:>12.3f}")
+
+        if profile["phases"]:
+            lines.append(f"{'phase':<48}{'time (s)':>12}")
+            for name, duration in profile["phases"].items():
+                lines.append(f"{name:<48}{duration:>12.3f}")
+
+        lines.append(f"{'module':<48}{'self (s)':>12}{'cumulative (s)':>16}")
+        for module in profile["modules"][:top]:
+            lines.append(f"{module['name']:<48}{module['self_time']:>12.3f}{module['inclusive_time']:>16.3f}")
+
+        return "\n".join(lines)
+
+    def report(self) -> None:
+        """
+        Logs the report and writes the profile to the output file, if any.
+        """
+        logger.info("%s", self.format_report())
+
+        if self.output_path is None:
+            return
+
+        try:
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.output_path, "w") as f:
+                json.dump(self.to_dict(), f, indent=4)
+        except OSError as e:
+            logger.warning("Failed to write startup profile to %s: %s", self.output_path, e)
+
+
+profiler: Optional[ImportProfiler] = None
+# Called with (phase name, perf_counter at start, duration) for every phase
+phase_recorders: List[Callable[[str, float, float], None]] = []
+
+
+def install(output_path: Optional[pathlib.Path] = None) -> ImportProfiler:
+    """
+    Installs the import profiler, if not already installed, and reports at exit.
+    Only imports made after installing are recorded.
+
+    Args:
+        output_path: File the profile is written to as JSON at exit, if any
+
+    Returns:
+        The profiler
+    """
+    global profiler
+
+    if profiler is None:
+        profiler = ImportProfiler(output_path)
+        sys.meta_path.insert(0, profiler)
+        atexit.register(profiler.report)
+        logger.info("Startup profiling enabled")
+
+    return profiler
+
+
+def install_from_env() -> Optional[ImportProfiler]:
+    """
+    Installs the import profiler if enabled by the DRONE_STARTUP_PROFILE environment variable.
+
+    Returns:
+        The profiler, or None if profiling is disabled
+    """
+    value = os.environ.get(cc.STARTUP_PROFILE_ENV, "").strip()
+    if not value or value.lower() in {"0", "false", "no"}:
+        return None
+
+    output_path = None if value.lower() in ENABLE_VALUES else pathlib.Path(value)
+    return install(output_path)
+
+
+def add_phase_recorder(recorder: Callable[[str, float, float], None]) -> None:
+    """
+    Adds a recorder to be called with every phase, whether or not the import profiler
+    is installed.
+
+    Args:
+        recorder: Called with the phase name, `time.perf_counter()` at its start and its duration
+    """
+    phase_recorders.append(recorder)
+
+
+def record_phase(name: str, start: float, duration: float) -> None:
+    """
+    Records a phase with the import profiler, if installed, and every phase recorder.
+
+    Args:
+        name: Name of the phase
+        start: `time.perf_counter()` when the phase started
+        duration: Duration in seconds
+    """
+    if profiler is not None:
+        profiler.record_phase(name, duration)
+
+    for recorder in phase_recorders:
+        recorder(name, start, duration)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Times the enclosed block as a phase.
+
+    Args:
+        name: Name of the phase
+    """
+    if profiler is None and not phase_recorders:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, start, time.perf_counter() - start)
+
+
+def profile_phase(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """
+    Decorator timing each call to the function as a phase.
+
+    Args:
+        name: Name of the phase. Defaults to the function's module and qualified name.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        phase_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(phase_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+install_from_env()
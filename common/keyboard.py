@@ -2,14 +2,13 @@
 Common keyboard module
 """
 
-from typing import Dict, List
+from typing import Dict, List, Tuple, Optional, Any
 from threading import Lock
+from queue import Queue, Empty, Full
 
 import common.constants as cc
 
-from .PeekableQueue import PeekableQueue
 from .logger_helper import init_logger
-from .omegaconf_helper import conf_key_from_value
 
 logger = init_logger()
 
@@ -38,56 +37,219 @@ def get_key_chr(key_code: int) -> str:
     return key_chr
 
 
-def keyboard_event_loop(data_lock: Lock, keyboard_queue: PeekableQueue, keyboard_bindings: Dict) -> List[int]:
+def compile_key_bindings(keyboard_bindings: Optional[Dict], include_quit_keys: bool = True) -> Dict[int, str]:
     """
-    Keyboard event loop that reads key presses and adds them to the keyboard queue.
+    Compiles key bindings into a key code to action index. Bindings may be given either
+    as a key code or as a single character, which is bound in both cases so the
+    lookup matches `get_key_chr`.
 
     Args:
-        data_lock: The lock to protect the keyboard queue
-        keyboard_queue: The queue to add key presses to
-        keyboard_bindings: The dictionary containing the key bindings
+        keyboard_bindings: The dictionary (or config) mapping actions to keys
+        include_quit_keys: Whether to bind the quit keys to the quit action
 
     Returns:
-        key_buffer (List[int]): The list of key codes that were pressed
+        The dictionary mapping key codes to actions
     """
-    if keyboard_queue is None:
-        logger.warning("Keyboard queue not initialised in shared data.")
-        return []
+    key_index: Dict[int, str] = {}
 
-    # Define a buffer so that we are not locking the data for too long.
-    # Not critical while keyboard inputs are simple, however, this is good
-    # practice for more complex inputs.
-    key_buffer: List[int] = []
+    if include_quit_keys:
+        for quit_key in cc.QUIT_KEYS:
+            key_index[ord(quit_key)] = cc.QUIT_ACTION
 
-    with data_lock:
-        i = 0
-        while i < keyboard_queue.qsize():
-            key_code = keyboard_queue.peek(i)
-            is_bound = is_key_bound(keyboard_bindings, key_code)
-            if is_bound:
-                key_code = keyboard_queue.get()
-                key_buffer.append(key_code)
-            else:
-                i += 1
-                key_chr = get_key_chr(key_code)
-                logger.trace("Key %s not bound in keybindings",
-                             key_chr)
-
-    return key_buffer
-
-
-def is_key_bound(keyboard_bindings: Dict, key_code: int) -> bool:
+    if keyboard_bindings is None:
+        return key_index
+
+    for action, key in keyboard_bindings.items():
+        if isinstance(key, int):
+            key_index.setdefault(key, action)
+        elif isinstance(key, str) and len(key) == 1:
+            for key_chr in {key.lower(), key.upper()}:
+                key_index.setdefault(ord(key_chr), action)
+        else:
+            logger.warning("Invalid key %s bound to action %s", key, action)
+
+    return key_index
+
+
+class KeySubscription:
     """
-    Check if an action is bound to a key or if the key is a quit key.
+    A module's subscription to key presses. Keys routed to the subscription are
+    buffered in its own queue, so each module only ever sees the keys it binds.
+    """
+
+    def __init__(self, name: str, key_index: Optional[Dict[int, str]] = None, queue: Optional[Any] = None):
+        """
+        Initialise the subscription.
+
+        Args:
+            name: Name of the subscribing module
+            key_index: Compiled key code to action index. None to receive every key.
+            queue: Queue to deliver keys to. Defaults to a new thread safe queue.
+        """
+        self.name = name
+        self.key_index = key_index
+        self.queue = queue if queue is not None else Queue()
+
+    @property
+    def catch_all(self) -> bool:
+        """
+        Whether the subscription receives every key.
+        """
+        return self.key_index is None
+
+    def action(self, key_code: int) -> Optional[str]:
+        """
+        Looks up the action bound to a key.
+
+        Args:
+            key_code: The key code
+
+        Returns:
+            The bound action or None if the key is not bound
+        """
+        if self.key_index is None:
+            return None
+
+        return self.key_index.get(key_code)
+
+    def deliver(self, key_code: int) -> bool:
+        """
+        Delivers a key to the subscription without blocking.
+
+        Args:
+            key_code: The key code
+
+        Returns:
+            True if the key was delivered, False if the queue is full
+        """
+        try:
+            self.queue.put_nowait(key_code)
+        except Full:
+            logger.warning("Key queue of %s full. Dropping key %d", self.name, key_code)
+            return False
+
+        return True
+
+    def get_keys(self) -> List[int]:
+        """
+        Takes every key delivered since the last call.
+
+        Returns:
+            key_buffer (List[int]): The key codes in the order they were pressed
+        """
+        key_buffer: List[int] = []
+        while True:
+            try:
+                key_buffer.append(self.queue.get_nowait())
+            except Empty:
+                return key_buffer
+
+
+class KeyRouter:
+    """
+    Fans key presses out to the modules subscribed to them. The routing table is
+    rebuilt on (un)subscribe, so dispatching a key is a single dictionary lookup
+    and never takes the shared data lock.
+    """
+
+    def __init__(self):
+        self._subscriptions: List[KeySubscription] = []
+        self._routes: Dict[int, Tuple[KeySubscription, ...]] = {}
+        self._catch_all: Tuple[KeySubscription, ...] = ()
+        self._lock = Lock()
+
+    def subscribe(self, name: str, keyboard_bindings: Optional[Dict] = None,
+                  queue: Optional[Any] = None) -> KeySubscription:
+        """
+        Subscribes a module to the keys in its bindings.
+
+        Args:
+            name: Name of the subscribing module
+            keyboard_bindings: The module's key bindings. None to receive every key,
+                               e.g. for a module which routes keys itself.
+            queue: Queue to deliver keys to. Defaults to a new thread safe queue.
+
+        Returns:
+            The subscription to read keys from
+        """
+        key_index = None if keyboard_bindings is None else compile_key_bindings(keyboard_bindings)
+        subscription = KeySubscription(name, key_index, queue)
+
+        with self._lock:
+            self._subscriptions.append(subscription)
+            self._rebuild_routes()
+
+        logger.info("Subscribed %s to %s keys", name,
+                    "all" if subscription.catch_all else len(key_index))
+        return subscription
+
+    def unsubscribe(self, subscription: KeySubscription) -> None:
+        """
+        Stops routing keys to a subscription.
+
+        Args:
+            subscription: The subscription to remove
+        """
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+                self._rebuild_routes()
+
+    def _rebuild_routes(self) -> None:
+        """
+        Rebuilds the key code to subscriptions table. Must be called with the lock held.
+        The table is replaced rather than mutated so dispatch can read it without locking.
+        """
+        catch_all = tuple(s for s in self._subscriptions if s.catch_all)
+        routes: Dict[int, List[KeySubscription]] = {}
+        for subscription in self._subscriptions:
+            if subscription.catch_all:
+                continue
+            for key_code in subscription.key_index:
+                routes.setdefault(key_code, []).append(subscription)
+
+        self._routes = {key_code: tuple(subscriptions) + catch_all
+                        for key_code, subscriptions in routes.items()}
+        self._catch_all = catch_all
+
+    def dispatch(self, key_code: int) -> int:
+        """
+        Delivers a key to every subscription bound to it and every catch all subscription.
+
+        Args:
+            key_code: The key code
+
+        Returns:
+            The number of subscriptions the key was delivered to
+        """
+        subscriptions = self._routes.get(key_code, self._catch_all)
+        if not subscriptions:
+            logger.trace("Key %s not bound by any subscriber", get_key_chr(key_code))
+            return 0
+
+        return sum(subscription.deliver(key_code) for subscription in subscriptions)
+
+
+def subscribe_from_thread_data(thread_data: Dict, data_lock: Lock, name: str,
+                               keyboard_bindings: Optional[Dict]) -> Optional[KeySubscription]:
+    """
+    Subscribes a module to the key router in the shared thread data, if the
+    GUI has created it yet.
 
     Args:
-        keyboard_bindings: The dictionary containing the key bindings
-        key_code: The key code to check if it is bound
+        thread_data: Shared data dictionary
+        data_lock: Lock for the shared data
+        name: Name of the subscribing module
+        keyboard_bindings: The module's key bindings
 
     Returns:
-        True if the action is bound to a key, False otherwise
+        The subscription or None if the key router is not yet initialised
     """
+    with data_lock:
+        key_router: Optional[KeyRouter] = thread_data.get(cc.KEY_ROUTER)
+
+    if key_router is None:
+        logger.trace("Key router not yet initialised in shared data.")
+        return None
 
-    key_chr = get_key_chr(key_code)
-    key_action = conf_key_from_value(keyboard_bindings, key_code, key_chr)
-    return key_action is not None or key_chr in cc.QUIT_KEYS
+    return key_router.subscribe(name, keyboard_bindings)
@@ -2,10 +2,18 @@
 Logger helper module
 """
 
-from typing import Optional, Union
-import logging
-import inspect
+from typing import Callable, Optional, Union, Dict, List, Tuple
+import os
 import sys
+import time
+import atexit
+import logging
+import logging.handlers
+import multiprocessing.util
+import threading
+import weakref
+from queue import Queue, Full
+from types import FrameType
 from pathlib import Path
 
 from omegaconf import OmegaConf
@@ -42,9 +50,21 @@ def add_trace_level():
 add_trace_level()
 
 
+LOG_COLOURS = {
+    TRACE_LEVEL_NUM: GREY,
+    logging.DEBUG: BRIGHT_BLUE,
+    logging.INFO: BRIGHT_INFO,
+    logging.WARNING: BRIGHT_YELLOW,
+    logging.ERROR: BRIGHT_RED,
+    logging.CRITICAL: CRITICAL_RED,
+}
+
+
 class LoggerFormatter(logging.Formatter):
     def __init__(self, fmt=None, datefmt=None):
         super().__init__(fmt, datefmt)
+        # Title-cased output name per logger name, computed on the first record
+        self._output_names: Dict[str, str] = {}
 
     def format(self, record: logging.LogRecord) -> str:
         """
@@ -57,7 +77,10 @@ class LoggerFormatter(logging.Formatter):
             Formatted log record
         """
         # Add a custom field for title-cased logger name
-        record.output_name = to_title_case(record.name)
+        output_name = self._output_names.get(record.name)
+        if output_name is None:
+            output_name = self._output_names[record.name] = to_title_case(record.name)
+        record.output_name = output_name
 
         # Set color based on log level
         color = self.get_log_colour(record.levelno)
@@ -75,24 +98,7 @@ class LoggerFormatter(logging.Formatter):
         Returns:
             Log colour
         """
-        # Custom log levels
-        if level == TRACE_LEVEL_NUM:
-            return GREY
-
-        # Standard log levels
-        match level:
-            case logging.DEBUG:
-                return BRIGHT_BLUE
-            case logging.INFO:
-                return BRIGHT_INFO
-            case logging.WARNING:
-                return BRIGHT_YELLOW
-            case logging.ERROR:
-                return BRIGHT_RED
-            case logging.CRITICAL:
-                return CRITICAL_RED
-            case _:
-                return RESET
+        return LOG_COLOURS.get(level, RESET)
 
 
 def get_logger_config() -> OmegaConf:
@@ -111,7 +117,21 @@ def get_logger_config() -> OmegaConf:
     return logger_config
 
 
-def get_caller_module_name(caller_frame: inspect.FrameInfo) -> str:
+def get_caller_frame(depth: int = 1) -> FrameType:
+    """
+    Get the frame of a caller without building the frame info of the whole stack
+    as `inspect.stack` does.
+
+    Args:
+        depth: Number of frames above the function calling this one
+
+    Returns:
+        Caller's frame
+    """
+    return sys._getframe(depth + 1)
+
+
+def get_caller_module_name(caller_frame: FrameType) -> str:
     """
     Get the full name of the caller's module.
 
@@ -121,13 +141,14 @@ def get_caller_module_name(caller_frame: inspect.FrameInfo) -> str:
     Returns:
         Caller's module name
     """
-    caller_module = inspect.getmodule(caller_frame[0])
-    caller_name = caller_module.__name__
+    caller_globals = caller_frame.f_globals
+    caller_name = caller_globals.get("__name__", "__main__")
 
-    if caller_name.startswith("src"):
+    caller_file = caller_globals.get("__file__")
+    if caller_name.startswith("src") and caller_file is not None:
         # Running module standalone
         # Determine module from path
-        relative_path = Path(caller_module.__file__)
+        relative_path = Path(caller_file)
         rel_path_str = relative_path.as_posix()
         caller_relative_path = caller_name.replace(".", "/") + ".py"
         if rel_path_str.endswith(caller_relative_path):
@@ -167,33 +188,23 @@ def map_log_level(level: str) -> int:
     return log_level
 
 
-def get_log_level(level: Union[int, str]) -> Optional[int]:
+def get_log_level(level: Union[int, str], caller_name: Optional[str] = None) -> Optional[int]:
     """
     Get the logging level based on the caller's module name.
 
     Args:
         level: Logging level
+        caller_name: Module name of the logger's owner. Defaults to the caller's caller.
 
     Returns:
         Logging level
     """
 
-    loggers = logger_config.loggers
-
-    caller_frame = inspect.stack()[2]
-    caller_name = get_caller_module_name(caller_frame)
+    if caller_name is None:
+        caller_name = get_caller_module_name(get_caller_frame(2))
     top_level_module = caller_name.split(".")[0]
 
-    log_level = None
-    if top_level_module in loggers:
-        # Override the logging level with the specified level
-        log_level = loggers[top_level_module]
-        if log_level == False:
-            # Disable the logger
-            log_level = logging.CRITICAL + 1
-        else:
-            # Parse the logging level
-            log_level = map_log_level(log_level)
+    log_level = logger_levels.get(top_level_module)
 
     if log_level is None:
         if type(level) == int:
@@ -215,9 +226,8 @@ def init_logger(level: Union[int, str] = logging.INFO) -> logging.Logger:
         Logger instance
     """
 
-    # [1] gives the caller of this function
-    caller_frame = inspect.stack()[1]
-    caller_name = get_caller_module_name(caller_frame)
+    # Frame of the caller of this function
+    caller_name = get_caller_module_name(get_caller_frame())
 
     # Use the caller's module name for the logger
     if caller_name == "__main__":
@@ -229,7 +239,7 @@ def init_logger(level: Union[int, str] = logging.INFO) -> logging.Logger:
 
     logger = logging.getLogger(logger_name)
 
-    level = get_log_level(level)
+    level = get_log_level(level, caller_name)
     logger.setLevel(level)
 
     logger.propagate = False
@@ -237,12 +247,19 @@ def init_logger(level: Union[int, str] = logging.INFO) -> logging.Logger:
     if not logger.hasHandlers():
         attach_formatter(logger)
 
+    # Records below the logger's level are never created, and the handler
+    # drops anything else below it before formatting
+    for handler in logger.handlers:
+        handler.setLevel(level)
+
     return logger
 
 
 def attach_formatter(logger: logging.Logger) -> None:
     """
-    Attach a formatter to the logger.
+    Attach a formatter to the logger. If the logging pipeline is enabled, the
+    logger is given a queue handler and the formatter runs on the pipeline's
+    listener thread instead.
 
     Args:
         logger: Logger instance
@@ -251,7 +268,12 @@ def attach_formatter(logger: logging.Logger) -> None:
         None
     """
 
-    formatter = LoggerFormatter("%(asctime)s  %(output_name)-35s %(levelname)-13s%(message)s")
+    if log_pipeline is not None:
+        if not logger.handlers:
+            logger.addHandler(log_pipeline.create_handler())
+        return
+
+    formatter = create_formatter()
 
     if not logger.handlers:
         console_handler = logging.StreamHandler()
@@ -262,6 +284,286 @@ def attach_formatter(logger: logging.Logger) -> None:
             handler.setFormatter(formatter)
 
 
+def create_formatter(colour: bool = True) -> logging.Formatter:
+    """
+    Create the formatter for log output.
+
+    Args:
+        colour: Whether to colour records by level. Disable for file output.
+
+    Returns:
+        Formatter instance
+    """
+    fmt = "%(asctime)s  %(output_name)-35s %(levelname)-13s%(message)s"
+    if colour:
+        return LoggerFormatter(fmt)
+
+    return PlainLoggerFormatter(fmt)
+
+
+class PlainLoggerFormatter(LoggerFormatter):
+    """
+    Logger formatter without colour codes.
+    """
+
+    def get_log_colour(self, level: int) -> str:
+        return ""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return super().format(record)[:-len(RESET)]
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limits records repeated from the same call site. Each call site may log `burst`
+    records per `interval`, after which only one in every `sample_rate` records is
+    kept. The first record of the next interval reports how many were suppressed.
+    Call sites which go quiet are reported by `pop_suppressed` instead.
+    Records above `max_level` are never limited.
+    """
+
+    def __init__(self, interval: float, burst: int, sample_rate: int, max_level: int,
+                 clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.sample_rate = max(1, sample_rate)
+        self.max_level = max_level
+        self.clock = clock
+        # (logger name, line number) -> [interval start, count, suppressed, last suppressed record]
+        self._call_sites: Dict[Tuple[str, int], List] = {}
+        self._next_sweep = clock() + interval
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+
+        now = self.clock()
+        key = (record.name, record.lineno)
+        with self._lock:
+            state = self._call_sites.get(key)
+            if state is None or now - state[0] >= self.interval:
+                suppressed = state[2] if state is not None else 0
+                self._call_sites[key] = [now, 1, 0, None]
+                if suppressed and isinstance(record.msg, str):
+                    record.msg = f"{record.msg} (suppressed {suppressed} similar messages)"
+                return True
+
+            state[1] += 1
+            excess = state[1] - self.burst
+            if excess <= 0 or excess % self.sample_rate == 0:
+                return True
+
+            state[2] += 1
+            state[3] = record
+            return False
+
+    def pop_suppressed(self, force: bool = False) -> List[logging.LogRecord]:
+        """
+        Reports call sites whose interval has ended with records suppressed and no record
+        since to carry the count. Checks at most once per interval unless forced.
+
+        Args:
+            force: Whether to report every call site with suppressed records, e.g. at shutdown
+
+        Returns:
+            A summary record per call site, in the name and level of its last suppressed record
+        """
+        now = self.clock()
+        if not force and now < self._next_sweep:
+            return []
+
+        summaries = []
+        with self._lock:
+            self._next_sweep = now + self.interval
+            for key, state in list(self._call_sites.items()):
+                if not force and now - state[0] < self.interval:
+                    continue
+
+                del self._call_sites[key]
+                if state[2]:
+                    summaries.append(self._summary_record(state[3], state[2]))
+
+        return summaries
+
+    @staticmethod
+    def _summary_record(record: logging.LogRecord, suppressed: int) -> logging.LogRecord:
+        return logging.makeLogRecord({
+            "name": record.name,
+            "levelno": record.levelno,
+            "levelname": record.levelname,
+            "pathname": record.pathname,
+            "filename": record.filename,
+            "module": record.module,
+            "funcName": record.funcName,
+            "lineno": record.lineno,
+            "msg": f"Suppressed {suppressed} similar messages to: {record.getMessage()}",
+            "args": None,
+        })
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler which only merges the message arguments on the logging thread.
+    Formatting and output happen on the pipeline's listener thread.
+    """
+
+    def __init__(self, pipeline: "LogPipeline"):
+        super().__init__(pipeline.queue)
+        self.pipeline = pipeline
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # The queue is thread safe, so the handler lock taken by Handler.handle is not needed
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        self.pipeline.flush_suppressed()
+        return rv
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Arguments may be mutated after this call, so merge them now. The record is
+        # only seen by this handler, so it is updated in place rather than copied.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.pipeline.dropped += 1
+
+
+class LogPipeline:
+    """
+    Queue-backed logging pipeline shared by all loggers in a process. Loggers put
+    records on a queue and a single listener thread formats and writes them to the
+    console and optionally a rotating log file.
+    """
+
+    def __init__(self, pipeline_config: OmegaConf):
+        """
+        Args:
+            pipeline_config: The `pipeline` section of the logger configuration
+        """
+        self.config = pipeline_config
+        self.queue_size = int(pipeline_config.get("queue_size", 10000))
+        self.queue: Queue = Queue(self.queue_size)
+        self.dropped = 0
+
+        self.output_handlers = self._create_output_handlers()
+        self.rate_limit_filter = self._create_rate_limit_filter()
+
+        self._queue_handlers: "weakref.WeakSet[LogQueueHandler]" = weakref.WeakSet()
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._lock = threading.Lock()
+
+        atexit.register(self.stop)
+        self._register_process_finaliser()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
+        multiprocessing.util.register_after_fork(self, LogPipeline._register_process_finaliser)
+
+    def _create_output_handlers(self) -> List[logging.Handler]:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(create_formatter())
+        handlers = [console_handler]
+
+        file_config = self.config.get("file")
+        if file_config is not None and file_config.enable:
+            log_path = file_handler.get_project_root() / file_config.path
+            file_handler.create_folder_if_not_exists(log_path.parent)
+            rotating_handler = logging.handlers.RotatingFileHandler(
+                log_path, maxBytes=file_config.max_bytes, backupCount=file_config.backup_count)
+            rotating_handler.setFormatter(create_formatter(colour=False))
+            handlers.append(rotating_handler)
+
+        return handlers
+
+    def _create_rate_limit_filter(self) -> Optional[RateLimitFilter]:
+        rate_limit = self.config.get("rate_limit")
+        if rate_limit is None or not rate_limit.enable:
+            return None
+
+        return RateLimitFilter(rate_limit.interval, rate_limit.burst,
+                               rate_limit.sample_rate, map_log_level(rate_limit.max_level))
+
+    def create_handler(self) -> LogQueueHandler:
+        """
+        Create a queue handler for a logger, starting the listener if required.
+
+        Returns:
+            Queue handler instance
+        """
+        handler = LogQueueHandler(self)
+        if self.rate_limit_filter is not None:
+            handler.addFilter(self.rate_limit_filter)
+        self._queue_handlers.add(handler)
+        self.start()
+        return handler
+
+    def flush_suppressed(self, force: bool = False) -> None:
+        """
+        Queue a summary of the records suppressed by rate limiting at call sites which
+        have since gone quiet. See `RateLimitFilter.pop_suppressed`.
+
+        Args:
+            force: Whether to report every call site with suppressed records
+        """
+        if self.rate_limit_filter is None:
+            return
+
+        for summary in self.rate_limit_filter.pop_suppressed(force):
+            try:
+                self.queue.put_nowait(summary)
+            except Full:
+                self.dropped += 1
+
+    def start(self) -> None:
+        """
+        Start the listener thread if it is not running.
+        """
+        with self._lock:
+            if self._listener is not None:
+                return
+
+            self._listener = logging.handlers.QueueListener(self.queue, *self.output_handlers)
+            self._listener.start()
+
+    def stop(self) -> None:
+        """
+        Write any queued records and stop the listener thread.
+        """
+        with self._lock:
+            if self._listener is None:
+                return
+
+            self.flush_suppressed(force=True)
+            self._listener.stop()
+            self._listener = None
+
+        if self.dropped:
+            sys.stderr.write(f"Logging queue was full. Dropped {self.dropped} records.\n")
+
+    def _after_fork_in_child(self) -> None:
+        # The listener thread does not survive a fork and the queue's locks may have been
+        # held by another thread at the time, so the child starts with a fresh pipeline.
+        self.queue = Queue(self.queue_size)
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._listener = None
+        for handler in list(self._queue_handlers):
+            handler.queue = self.queue
+        if self._queue_handlers:
+            self.start()
+
+    def _register_process_finaliser(self) -> None:
+        # Multiprocessing children exit without running atexit handlers, so flush the queue
+        # from a finaliser, after the other finalisers have had a chance to log
+        multiprocessing.util.Finalize(None, self.stop, exitpriority=-100)
+
+
 def disable_logger(logger_name: str) -> None:
     """
     Disable a logger and all its handlers.
@@ -277,6 +579,45 @@ def disable_logger(logger_name: str) -> None:
     logger.setLevel(logging.CRITICAL + 1)
 
 
+def load_logger_levels(logger_config: OmegaConf) -> Dict[str, int]:
+    """
+    Parse the per-module logging level overrides once, rather than on every logger initialisation.
+
+    Args:
+        logger_config: Logger configuration
+
+    Returns:
+        Logging level override per top level module
+    """
+    logger_levels = {}
+    for module, log_level in logger_config.loggers.items():
+        if log_level == False:
+            # Disable the logger
+            logger_levels[module] = logging.CRITICAL + 1
+        else:
+            # Parse the logging level
+            logger_levels[module] = map_log_level(log_level)
+
+    return logger_levels
+
+
+def init_log_pipeline(logger_config: OmegaConf) -> Optional[LogPipeline]:
+    """
+    Create the logging pipeline if enabled in the logger configuration.
+
+    Args:
+        logger_config: Logger configuration
+
+    Returns:
+        The logging pipeline or None if loggers write directly to the console
+    """
+    pipeline_config = logger_config.get("pipeline")
+    if pipeline_config is None or not pipeline_config.queue:
+        return None
+
+    return LogPipeline(pipeline_config)
+
+
 def test_logger():
     """
     Test the logger helper functions
@@ -292,7 +633,10 @@ def test_logger():
     logger.critical("This is a critical message")
 
 
+logger_config = get_logger_config()
+logger_levels = load_logger_levels(logger_config)
+log_pipeline = init_log_pipeline(logger_config)
+
+
 if __name__ == "__main__":
     test_logger()
-
-logger_config = get_logger_config()
@@ -2,7 +2,12 @@
 Helper with loops
 """
 
+from typing import Optional, Dict, Callable, Any
 import time
+import threading
+import dataclasses
+
+import numpy as np
 
 from . import constants as c
 from .logger_helper import init_logger
@@ -10,6 +15,27 @@ from .gui_helper import fps_to_ms, ms_to_fps
 
 logger = init_logger()
 
+# Returned by a loop callback when there was no new input to process. The scheduler
+# yields to other threads instead of counting a tick.
+IDLE = object()
+
+# Smoothing factor of the exponential moving averages
+EMA_ALPHA = 0.1
+# Number of tick intervals kept for percentiles
+STATS_WINDOW = 240
+# Seconds between adjustments of an adaptive rate
+ADAPT_INTERVAL = 1.0
+# The rate is lowered when a tick's CPU time exceeds this proportion of the tick period
+PRESSURE_THRESHOLD = 0.9
+# and raised back towards the target while it would stay below this proportion
+RECOVERY_THRESHOLD = 0.6
+# Proportion of ticks missing their deadline which counts as pressure
+MISS_RATIO_THRESHOLD = 0.5
+RATE_DECREASE = 0.8
+RATE_INCREASE = 1.1
+# Seconds slept by an idle loop without a target rate
+IDLE_YIELD = 0.002
+
 
 def ms_delta(start_time: float, end_time: float) -> float:
     """
@@ -25,6 +51,293 @@ def ms_delta(start_time: float, end_time: float) -> float:
     return (end_time - start_time) * c.MILLISECONDS_PER_SECOND
 
 
+@dataclasses.dataclass(frozen=True)
+class TickStats:
+    """
+    Snapshot of a scheduler's statistics.
+    """
+
+    name: Optional[str]
+    target_rate: float
+    min_rate: float
+    rate: float
+    tick_rate: float
+    interval_p50_ms: float
+    interval_p95_ms: float
+    interval_p99_ms: float
+    work_ms: float
+    cpu_ms: float
+    load: float
+    ticks: int
+    idle_ticks: int
+    deadline_misses: int
+
+    @property
+    def degraded(self) -> bool:
+        """
+        Whether the rate has been lowered below the target.
+        """
+        return 0 < self.rate < self.target_rate
+
+
+_schedulers: Dict[str, "TickScheduler"] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(name: str) -> Optional["TickScheduler"]:
+    """
+    Gets a running scheduler by name.
+
+    Args:
+        name: Name of the scheduler
+
+    Returns:
+        The scheduler or None if no scheduler of that name is running
+    """
+    with _schedulers_lock:
+        return _schedulers.get(name)
+
+
+def get_schedulers() -> Dict[str, "TickScheduler"]:
+    """
+    Gets every running named scheduler.
+
+    Returns:
+        Schedulers by name
+    """
+    with _schedulers_lock:
+        return dict(_schedulers)
+
+
+class TickScheduler:
+    """
+    Runs a callback at a target rate. Sleeps until the next deadline rather than for a
+    fixed remainder so the average rate does not drift, counts ticks which miss their
+    deadline and keeps smoothed statistics of the tick rate.
+
+    An adaptive scheduler lowers its rate, down to a minimum, while its ticks use most
+    of the tick period in CPU time and raises it back towards the target once they no
+    longer do. Callbacks return IDLE when there was no new input, in which case the
+    scheduler yields to other threads without counting a tick.
+    """
+
+    def __init__(self, target_rate: float, min_rate: Optional[float] = None, adaptive: bool = False,
+                 name: Optional[str] = None, window: int = STATS_WINDOW):
+        """
+        Initialise the scheduler.
+
+        Args:
+            target_rate: Ticks per second. If 0, the loop runs as fast as possible.
+            min_rate: Lowest rate an adaptive scheduler lowers to. Defaults to the target rate.
+            adaptive: Whether to lower the rate under CPU pressure
+            name: Name to register the scheduler under while it runs, e.g. the module name
+            window: Number of tick intervals kept for percentiles
+        """
+        self.name = name
+        self.adaptive = adaptive
+        self._lock = threading.Lock()
+
+        self.target_rate = 0.0
+        self.min_rate = 0.0
+        self.rate = 0.0
+        self.set_target_rate(target_rate, min_rate)
+
+        self._intervals = np.zeros(window, dtype=np.float64)
+        self._interval_index = 0
+        self._interval_count = 0
+
+        self.tick_rate = 0.0
+        self.work_time = 0.0
+        self.cpu_time = 0.0
+        self.ticks = 0
+        self.idle_ticks = 0
+        self.deadline_misses = 0
+
+        self._adapt_time = 0.0
+        self._adapt_ticks = 0
+        self._adapt_misses = 0
+
+    @property
+    def period(self) -> float:
+        """
+        Seconds between ticks at the current rate, 0 if unlimited.
+        """
+        rate = self.rate
+        return 1 / rate if rate > 0 else 0.0
+
+    def set_target_rate(self, target_rate: float, min_rate: Optional[float] = None) -> None:
+        """
+        Sets the target rate. May be called from any thread while the scheduler runs.
+
+        Args:
+            target_rate: Ticks per second. If 0, the loop runs as fast as possible.
+            min_rate: Lowest rate an adaptive scheduler lowers to. Defaults to the
+                      current minimum, capped at the target rate.
+        """
+        with self._lock:
+            if min_rate is None:
+                min_rate = self.min_rate or target_rate
+            self.target_rate = float(target_rate)
+            self.min_rate = float(min(min_rate, target_rate))
+            self.rate = self.target_rate
+
+        logger.info("Tick scheduler %s target rate set to %.1f (min %.1f)", self.name, self.target_rate, self.min_rate)
+
+    def stats(self) -> TickStats:
+        """
+        Returns a snapshot of the scheduler's statistics.
+        """
+        count = self._interval_count
+        if count:
+            p50, p95, p99 = np.percentile(self._intervals[:count], (50, 95, 99)) * c.MILLISECONDS_PER_SECOND
+        else:
+            p50 = p95 = p99 = 0.0
+
+        period = self.period
+        return TickStats(
+            name=self.name,
+            target_rate=self.target_rate,
+            min_rate=self.min_rate,
+            rate=self.rate,
+            tick_rate=self.tick_rate,
+            interval_p50_ms=float(p50),
+            interval_p95_ms=float(p95),
+            interval_p99_ms=float(p99),
+            work_ms=self.work_time * c.MILLISECONDS_PER_SECOND,
+            cpu_ms=self.cpu_time * c.MILLISECONDS_PER_SECOND,
+            load=self.cpu_time / period if period > 0 else 0.0,
+            ticks=self.ticks,
+            idle_ticks=self.idle_ticks,
+            deadline_misses=self.deadline_misses,
+        )
+
+    def run(self, callback: Callable[..., Any], *args, **kwargs) -> None:
+        """
+        Runs the callback until it returns False. Passes the smoothed tick rate to the
+        callback as the `tick_rate` keyword argument.
+
+        Args:
+            callback: The function to be called in the loop. Returns False to exit the
+                      loop, or IDLE if there was no new input.
+            *args: Positional arguments to pass to the callback.
+            **kwargs: Keyword arguments to pass to the callback.
+        """
+        if self.name is not None:
+            with _schedulers_lock:
+                _schedulers[self.name] = self
+
+        try:
+            self._run(callback, args, kwargs)
+        finally:
+            if self.name is not None:
+                with _schedulers_lock:
+                    if _schedulers.get(self.name) is self:
+                        del _schedulers[self.name]
+
+    def _run(self, callback: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> None:
+        deadline = last_tick_start = self._adapt_time = time.perf_counter()
+
+        while True:
+            tick_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            callback_res = callback(*args, **kwargs, tick_rate=self.tick_rate)
+            if callback_res is False:
+                logger.debug("Callback returned False. Exiting loop...")
+                break
+
+            now = time.perf_counter()
+            period = self.period
+
+            if callback_res is IDLE:
+                # Nothing to do this tick. Yield, and run the next tick as soon as it is due.
+                self.idle_ticks += 1
+                deadline = max(deadline, now)
+                time.sleep(max(IDLE_YIELD, period / 4))
+                continue
+
+            self._record_tick(tick_start - last_tick_start, now - tick_start, time.thread_time() - cpu_start)
+            last_tick_start = tick_start
+
+            if self.adaptive and now - self._adapt_time >= ADAPT_INTERVAL:
+                self._adapt(now)
+                period = self.period
+
+            if period <= 0:
+                # Unlimited rate. Still release the GIL so other threads are not starved.
+                time.sleep(0)
+                continue
+
+            deadline += period
+            wait = deadline - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                self.deadline_misses += 1
+                self._adapt_misses += 1
+                if -wait > period:
+                    # Too far behind to catch up without a burst of ticks, so start afresh
+                    deadline = time.perf_counter()
+
+    def _record_tick(self, interval: float, work_time: float, cpu_time: float) -> None:
+        """
+        Updates the statistics with a tick.
+
+        Args:
+            interval: Seconds since the start of the previous tick
+            work_time: Seconds the callback took
+            cpu_time: CPU seconds the callback used on this thread
+        """
+        if self.ticks == 0:
+            self.work_time = work_time
+            self.cpu_time = cpu_time
+        else:
+            self._intervals[self._interval_index] = interval
+            self._interval_index = (self._interval_index + 1) % len(self._intervals)
+            self._interval_count = min(self._interval_count + 1, len(self._intervals))
+
+            tick_rate = ms_to_fps(interval * c.MILLISECONDS_PER_SECOND)
+            if self.tick_rate == 0:
+                self.tick_rate = tick_rate
+            else:
+                self.tick_rate += EMA_ALPHA * (tick_rate - self.tick_rate)
+            self.work_time += EMA_ALPHA * (work_time - self.work_time)
+            self.cpu_time += EMA_ALPHA * (cpu_time - self.cpu_time)
+
+        self.ticks += 1
+        self._adapt_ticks += 1
+
+    def _adapt(self, now: float) -> None:
+        """
+        Lowers the rate while ticks use most of the period in CPU time, or miss their
+        deadlines while using a good part of it, and raises it back towards the target
+        once a higher rate would leave headroom.
+
+        Args:
+            now: The current time
+        """
+        with self._lock:
+            rate = self.rate
+            if rate > 0:
+                load = self.cpu_time * rate
+                miss_ratio = self._adapt_misses / max(self._adapt_ticks, 1)
+
+                if load > PRESSURE_THRESHOLD or (miss_ratio > MISS_RATIO_THRESHOLD and load > RECOVERY_THRESHOLD):
+                    self.rate = max(self.min_rate, rate * RATE_DECREASE)
+                elif rate < self.target_rate and miss_ratio <= MISS_RATIO_THRESHOLD:
+                    raised_rate = min(self.target_rate, rate * RATE_INCREASE)
+                    if self.cpu_time * raised_rate < RECOVERY_THRESHOLD:
+                        self.rate = raised_rate
+
+            new_rate = self.rate
+
+        if new_rate != rate:
+            logger.info("Tick scheduler %s rate adapted from %.1f to %.1f", self.name, rate, new_rate)
+
+        self._adapt_time = now
+        self._adapt_ticks = 0
+        self._adapt_misses = 0
+
+
 def run_loop_with_max_tickrate(max_fps: int, callback: callable, *args, **kwargs) -> None:
     """
     Runs a loop with a minimum execution time. Passes the fps / tickrate to the callback.
@@ -37,23 +350,4 @@ def run_loop_with_max_tickrate(max_fps: int, callback: callable, *args, **kwargs
         *args: Positional arguments to pass to the callback.
         **kwargs: Keyword arguments to pass to the callback.
     """
-    min_loop_ms = fps_to_ms(max_fps)
-    last_loop_start_time = now = time.perf_counter()
-
-    while True:
-        now = time.perf_counter()
-        tick_rate = ms_to_fps(ms_delta(last_loop_start_time, now))
-
-        last_loop_start_time = now = time.perf_counter()
-        callback_res = callback(*args, **kwargs, tick_rate=tick_rate)
-        if callback_res is False:
-            logger.debug("Callback returned False. Exiting loop...")
-            break
-
-        if min_loop_ms > 0:
-            now = time.perf_counter()
-            ms_diff = ms_delta(last_loop_start_time, now)
-
-            if ms_diff < min_loop_ms:
-                second_to_wait = (min_loop_ms - ms_diff) / c.MILLISECONDS_PER_SECOND
-                time.sleep(second_to_wait)
+    TickScheduler(max_fps).run(callback, *args, **kwargs)
@@ -2,8 +2,10 @@
 OmegaConf helper functions
 """
 
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, Tuple, Iterator, Union
+from collections.abc import Mapping, Hashable
 import sys
+import threading
 from pathlib import Path
 
 from omegaconf import OmegaConf
@@ -31,22 +33,159 @@ def safe_get(conf: OmegaConf, attr: str) -> any:
         return None
 
 
-def conf_key_from_value(conf: OmegaConf, *values: Any) -> Optional[str]:
+class FrozenConfig(Mapping):
+    """
+    Read-only view of a config as plain Python containers. Nested configs are
+    frozen too and lists become tuples. Values are read with attribute or item
+    access like OmegaConf, but without OmegaConf's per-access node resolution.
+    """
+
+    __slots__ = ("_data", "_order", "_reverse")
+
+    def __init__(self, data: Dict[str, Any]):
+        """
+        Args:
+            data (Dict[str, Any]): Plain dictionary to freeze. Values are frozen recursively.
+        """
+        frozen = {key: _freeze(value) for key, value in data.items()}
+        object.__setattr__(self, "_data", frozen)
+        object.__setattr__(self, "_order", {key: i for i, key in enumerate(frozen)})
+        object.__setattr__(self, "_reverse", None)
+
+    def __getattr__(self, name: str) -> Any:
+        data = object.__getattribute__(self, "_data")
+        try:
+            return data[name]
+        except KeyError:
+            raise AttributeError(f"Config has no key '{name}'") from None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("FrozenConfig is read-only")
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __repr__(self) -> str:
+        return f"FrozenConfig({self._data!r})"
+
+    def __reduce__(self) -> Tuple:
+        return (FrozenConfig, (self.to_container(),))
+
+    def to_container(self) -> Dict[str, Any]:
+        """
+        Converts the config back to mutable plain containers.
+
+        Returns:
+            Dict[str, Any]: The config as a dictionary.
+        """
+        return {key: _thaw(value) for key, value in self._data.items()}
+
+    def key_from_value(self, *values: Any) -> Optional[str]:
+        """
+        Finds the first key holding any of the given values, like `conf_key_from_value`,
+        but through a reverse index built on first use.
+
+        Args:
+            values (Any): Values to find in the config
+
+        Returns:
+            Optional[str]: The first matching key or None if not found.
+        """
+        reverse = self._reverse
+        if reverse is None:
+            reverse = {}
+            for key, value in self._data.items():
+                if isinstance(value, Hashable):
+                    reverse.setdefault(value, key)
+            object.__setattr__(self, "_reverse", reverse)
+
+        matches = [reverse[value] for value in values
+                   if isinstance(value, Hashable) and value in reverse]
+        if not matches:
+            return None
+
+        return min(matches, key=self._order.__getitem__)
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, FrozenConfig):
+        return value
+    if isinstance(value, Mapping):
+        return FrozenConfig(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, FrozenConfig):
+        return value.to_container()
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+# Frozen views of read-only configs keyed by node identity. The node is kept
+# alongside its view so its id cannot be reused while the entry exists.
+_frozen_configs: Dict[int, Tuple[Any, FrozenConfig]] = {}
+_frozen_configs_lock = threading.Lock()
+
+
+def compile_config(conf: Union[OmegaConf, Mapping]) -> FrozenConfig:
+    """
+    Compiles a config into a FrozenConfig. Configs locked with `OmegaConf.set_readonly`
+    (including nodes of a locked config) are only converted once, after which the
+    same view is returned for the same node. Writable configs are converted on every
+    call since they may have changed.
+
+    Args:
+        conf (Union[OmegaConf, Mapping]): The config to compile
+
+    Returns:
+        FrozenConfig: The read-only view of the config
+    """
+    if isinstance(conf, FrozenConfig):
+        return conf
+
+    if not OmegaConf.is_config(conf):
+        return FrozenConfig(conf)
+
+    if not OmegaConf.is_readonly(conf):
+        logger.trace("Compiling writable config. Result will not be cached.")
+        return FrozenConfig(OmegaConf.to_container(conf, resolve=True))
+
+    cached = _frozen_configs.get(id(conf))
+    if cached is not None and cached[0] is conf:
+        return cached[1]
+
+    frozen = FrozenConfig(OmegaConf.to_container(conf, resolve=True))
+    with _frozen_configs_lock:
+        _frozen_configs[id(conf)] = (conf, frozen)
+
+    return frozen
+
+
+def conf_key_from_value(conf: Union[OmegaConf, FrozenConfig], *values: Any) -> Optional[str]:
     """
     Finds key in OmegaConf from value
 
     Args:
-        conf [Omegaconf]: Omegaconfig to find key from by value
-        values [Any]: Values to find in the OmegaConf
+        conf [Union[OmegaConf, FrozenConfig]]: Config to find key from by value
+        values [Any]: Values to find in the config
 
     Returns:
         [Optional[str]]: The key of the value or None if not found.
     """
-    dict = OmegaConf.to_container(conf)
-
-    for key, dict_value in dict.items():
-        if dict_value in values:
-            return key
+    return compile_config(conf).key_from_value(*values)
 
 
 def initialise_config(config_dict: Dict, config_path: Path) -> OmegaConf:
@@ -75,6 +214,7 @@ def initialise_config(config_dict: Dict, config_path: Path) -> OmegaConf:
 def load_or_create_config(config_path: Path, default_config: Dict) -> OmegaConf:
     """
     Load the configuration file if it exists, otherwise create it with default values.
+    Settings added to the defaults since the file was created take their default value.
 
     Args:
         config_path (Path): The path to the configuration file.
@@ -86,7 +226,7 @@ def load_or_create_config(config_path: Path, default_config: Dict) -> OmegaConf:
 
     if config_path.is_file():
         logger.info("Loading config from %s", config_path)
-        config = OmegaConf.load(config_path)
+        config = OmegaConf.merge(OmegaConf.create(default_config), OmegaConf.load(config_path))
     else:
         logger.info(
             "Config file not found at %s. Initialising with default values.", config_path)
@@ -0,0 +1,493 @@
+"""
+Session recorder. Records the webcam and drone video, gaze, flight statistics and voice
+commands of a session into one indexed file, with every stream timestamped by the same
+monotonic clock (`time.perf_counter`, relative to the start of the session).
+
+Producers only copy frames into a `FrameQueue` and queue records, and never block. A
+writer thread compresses frames as JPEG and batches them, and the records of each other
+stream, into chunks. Record chunks are JSON compressed with zlib. A record which cannot
+be serialised is logged and skipped. An index of the chunks is written
+at the end of the file, so a reader can seek straight to a stream and time range. A file
+left without an index, e.g. after a crash, can still be read by scanning its chunks.
+
+File layout:
+
+    MAGIC, header length, header JSON
+    CHUNK_MAGIC, chunk header length, payload length, chunk header JSON, payload
+    ...
+    INDEX_MAGIC, index length, index JSON
+    index offset, FOOTER_MAGIC
+"""
+
+from typing import Optional, Dict, List, Any, Tuple, Iterator, BinaryIO
+import io
+import json
+import zlib
+import queue
+import struct
+import pathlib
+import datetime
+import threading
+import dataclasses
+import time
+
+import numpy as np
+import cv2
+
+from .logger_helper import init_logger
+from .frame_queue import FrameQueue
+
+logger = init_logger()
+
+VERSION = 1
+MAGIC = b"DSESSN01"
+CHUNK_MAGIC = b"CHNK"
+INDEX_MAGIC = b"INDX"
+FOOTER_MAGIC = b"DSIDXEND"
+EXTENSION = "session"
+
+_LENGTH = struct.Struct("<I")
+_CHUNK_LENGTHS = struct.Struct("<II")
+_FOOTER = struct.Struct("<Q8s")
+
+FRAMES = "frames"
+RECORDS = "records"
+
+# Streams
+WEBCAM = "webcam"
+DRONE_VIDEO = "drone_video"
+GAZE = "gaze"
+GAZE_ESTIMATES = "gaze_estimates"
+FLIGHT_STATISTICS = "flight_statistics"
+VOICE_COMMANDS = "voice_commands"
+# Colour order of video streams, as produced by their sources
+FRAME_COLOURS = {WEBCAM: "bgr", DRONE_VIDEO: "rgb"}
+
+
+def _to_json(value: Any) -> Any:
+    """
+    Converts values json does not serialise natively.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    raise TypeError(f"Cannot record value of type {type(value).__name__}")
+
+
+@dataclasses.dataclass
+class _PendingChunk:
+    kind: str
+    times: List[float] = dataclasses.field(default_factory=list)
+    items: List[Any] = dataclasses.field(default_factory=list)
+
+
+class SessionRecorder:
+    """
+    Records timestamped frames and records of several streams on a writer thread.
+    """
+
+    def __init__(self, path: pathlib.Path, jpeg_quality: int = 80, chunk_records: int = 64,
+                 chunk_seconds: float = 2.0, queue_size: int = 64):
+        """
+        Args:
+            path: File to record to
+            jpeg_quality: JPEG quality of recorded frames, 0 to 100
+            chunk_records: Frames or records per stream batched into a chunk
+            chunk_seconds: Longest time a frame or record waits before its chunk is written
+            queue_size: Frames which may wait for the writer before frames are dropped
+        """
+        self.path = path
+        self.jpeg_quality = jpeg_quality
+        self.chunk_records = chunk_records
+        self.chunk_seconds = chunk_seconds
+
+        self.start_time = time.perf_counter()
+        self.frames = FrameQueue(queue_size, "Session recorder")
+        self.records: queue.SimpleQueue = queue.SimpleQueue()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+        self.frames_recorded = 0
+        self.records_recorded = 0
+        self.records_skipped = 0
+
+        self._file: Optional[BinaryIO] = None
+        self._pending: Dict[str, _PendingChunk] = {}
+        self._index: List[Dict[str, Any]] = []
+
+    def clock(self) -> float:
+        """
+        Seconds since the session started, on the clock shared by every stream.
+        """
+        return time.perf_counter() - self.start_time
+
+    def start(self) -> None:
+        """
+        Opens the file and starts the writer thread.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "wb")
+        header = {
+            "version": VERSION,
+            "created": datetime.datetime.now().isoformat(),
+            "clock": "perf_counter",
+            "frame_colours": FRAME_COLOURS,
+        }
+        self._file.write(MAGIC)
+        self._write_json(header)
+
+        self.thread = threading.Thread(target=self._write_loop, name="session_recorder", daemon=True)
+        self.thread.start()
+        logger.info("Recording session to %s", self.path)
+
+    def record_frame(self, stream: str, frame: np.ndarray, timestamp: Optional[float] = None) -> bool:
+        """
+        Queues a video frame. Never blocks.
+
+        Args:
+            stream: Name of the stream
+            frame: The frame. Copied, so the caller may reuse it.
+            timestamp: `time.perf_counter` time of the frame. Defaults to now.
+
+        Returns:
+            True if the frame was queued, False if it was dropped because the writer is behind
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        return self.frames.put(frame, stream, timestamp - self.start_time)
+
+    @property
+    def frames_dropped(self) -> int:
+        """
+        Frames dropped because the writer was behind.
+        """
+        return self.frames.dropped
+
+    def record(self, stream: str, data: Any, timestamp: Optional[float] = None) -> None:
+        """
+        Queues a record. Never blocks. Records are small, so are never dropped.
+
+        Args:
+            stream: Name of the stream
+            data: JSON serialisable data. Dataclasses and numpy values are converted. Data
+                  which cannot be serialised is logged and skipped by the writer.
+            timestamp: `time.perf_counter` time of the record. Defaults to now.
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        self.records.put((stream, timestamp - self.start_time, data))
+
+    def stop(self) -> None:
+        """
+        Writes everything queued, then the index, and closes the file.
+        """
+        if self.thread is None:
+            return
+
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        logger.info("Recorded session %s: %d frames, %d records, %d frames dropped, %d records skipped, %d chunks",
+                    self.path, self.frames_recorded, self.records_recorded, self.frames_dropped,
+                    self.records_skipped, len(self._index))
+
+    # =========== Writer thread ===========
+
+    def _write_loop(self) -> None:
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    self._add_frame(*self.frames.get(timeout=min(self.chunk_seconds, 0.1)))
+                except queue.Empty:
+                    pass
+                self._drain_records()
+                self._flush_chunks(force=False)
+
+            while not self.frames.empty():
+                self._add_frame(*self.frames.get_nowait())
+            self._drain_records()
+            self._flush_chunks(force=True)
+            self._write_index()
+        except Exception:
+            logger.exception("Session recorder failed. Recording stopped")
+        finally:
+            self._file.close()
+            self._file = None
+
+    def _add_frame(self, frame: np.ndarray, stream: str, timestamp: float) -> None:
+        try:
+            ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        finally:
+            self.frames.release(frame)
+        if not ok:
+            logger.warning("Failed to encode %s frame", stream)
+            return
+
+        pending = self._pending.setdefault(stream, _PendingChunk(FRAMES))
+        pending.times.append(timestamp)
+        pending.items.append((frame.shape, encoded.tobytes()))
+        self.frames_recorded += 1
+
+    def _drain_records(self) -> None:
+        while True:
+            try:
+                stream, timestamp, data = self.records.get_nowait()
+            except queue.Empty:
+                return
+
+            # Serialised here, so a record which cannot be is skipped alone
+            try:
+                record = json.dumps({"t": timestamp, "data": data}, default=_to_json)
+            except (TypeError, ValueError):
+                self.records_skipped += 1
+                logger.exception("Skipped %s record which cannot be serialised", stream)
+                continue
+
+            pending = self._pending.setdefault(stream, _PendingChunk(RECORDS))
+            pending.times.append(timestamp)
+            pending.items.append(record)
+            self.records_recorded += 1
+
+    def _flush_chunks(self, force: bool) -> None:
+        """
+        Writes the chunks of streams which are full or have waited long enough.
+        """
+        now = self.clock()
+        for stream, pending in self._pending.items():
+            if not pending.times:
+                continue
+            if force or len(pending.times) >= self.chunk_records or now - pending.times[0] >= self.chunk_seconds:
+                self._write_chunk(stream, pending)
+                pending.times.clear()
+                pending.items.clear()
+
+        self._file.flush()
+
+    def _write_chunk(self, stream: str, pending: _PendingChunk) -> None:
+        header: Dict[str, Any] = {
+            "stream": stream,
+            "kind": pending.kind,
+            "count": len(pending.times),
+            "start": pending.times[0],
+            "end": pending.times[-1],
+        }
+
+        if pending.kind == FRAMES:
+            header["frames"] = [{"t": t, "shape": list(shape), "length": len(data)}
+                                for t, (shape, data) in zip(pending.times, pending.items)]
+            payload = b"".join(data for _, data in pending.items)
+        else:
+            payload = zlib.compress(f"[{','.join(pending.items)}]".encode("utf-8"))
+
+        offset = self._file.tell()
+        header_bytes = json.dumps(header).encode("utf-8")
+        self._file.write(CHUNK_MAGIC)
+        self._file.write(_CHUNK_LENGTHS.pack(len(header_bytes), len(payload)))
+        self._file.write(header_bytes)
+        self._file.write(payload)
+
+        self._index.append({key: header[key] for key in ("stream", "kind", "count", "start", "end")} |
+                           {"offset": offset})
+
+    def _write_index(self) -> None:
+        offset = self._file.tell()
+        self._file.write(INDEX_MAGIC)
+        self._write_json({"chunks": self._index})
+        self._file.write(_FOOTER.pack(offset, FOOTER_MAGIC))
+
+    def _write_json(self, value: Dict[str, Any]) -> None:
+        data = json.dumps(value).encode("utf-8")
+        self._file.write(_LENGTH.pack(len(data)))
+        self._file.write(data)
+
+
+class SessionReader:
+    """
+    Reads a recorded session, seeking to chunks through the index.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        """
+        Args:
+            path: The session file
+
+        Raises:
+            ValueError: If the file is not a session recording
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a session recording")
+
+        self.header: Dict[str, Any] = self._read_json()
+        self._chunks_offset = self._file.tell()
+        self.chunks: List[Dict[str, Any]] = self._read_index() or self._scan_chunks()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "SessionReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def streams(self) -> Dict[str, str]:
+        """
+        Kind of each recorded stream, by name.
+        """
+        return {chunk["stream"]: chunk["kind"] for chunk in self.chunks}
+
+    @property
+    def duration(self) -> float:
+        """
+        Time of the last frame or record, in seconds since the session started.
+        """
+        return max((chunk["end"] for chunk in self.chunks), default=0.0)
+
+    def read(self, stream: str, start: float = 0.0, end: Optional[float] = None) -> Iterator[Tuple[float, Any]]:
+        """
+        Reads a stream's frames or records in a time range, in order.
+
+        Args:
+            stream: Name of the stream
+            start: Earliest time, in seconds since the session started
+            end: Latest time, or None for the end of the session
+
+        Yields:
+            Time and the decoded frame or the record's data
+        """
+        for chunk in self.chunks:
+            if chunk["stream"] != stream or chunk["end"] < start or (end is not None and chunk["start"] > end):
+                continue
+
+            for timestamp, item in self._read_chunk(chunk["offset"]):
+                if timestamp >= start and (end is None or timestamp <= end):
+                    yield timestamp, item
+
+    def _read_chunk(self, offset: int) -> List[Tuple[float, Any]]:
+        header, payload = self._read_chunk_at(offset)
+        if header["kind"] == RECORDS:
+            return [(record["t"], record["data"]) for record in json.loads(zlib.decompress(payload))]
+
+        items = []
+        position = 0
+        for frame in header["frames"]:
+            data = np.frombuffer(payload, np.uint8, frame["length"], position)
+            position += frame["length"]
+            items.append((frame["t"], cv2.imdecode(data, cv2.IMREAD_COLOR)))
+        return items
+
+    def _read_chunk_at(self, offset: int) -> Tuple[Dict[str, Any], bytes]:
+        self._file.seek(offset)
+        if self._file.read(len(CHUNK_MAGIC)) != CHUNK_MAGIC:
+            raise ValueError(f"No chunk at offset {offset} of {self.path}")
+        header_length, payload_length = _CHUNK_LENGTHS.unpack(self._file.read(_CHUNK_LENGTHS.size))
+        header = json.loads(self._file.read(header_length))
+        return header, self._file.read(payload_length)
+
+    def _read_json(self) -> Dict[str, Any]:
+        (length,) = _LENGTH.unpack(self._file.read(_LENGTH.size))
+        return json.loads(self._file.read(length))
+
+    def _read_index(self) -> Optional[List[Dict[str, Any]]]:
+        self._file.seek(0, io.SEEK_END)
+        if self._file.tell() < self._chunks_offset + _FOOTER.size:
+            return None
+
+        self._file.seek(-_FOOTER.size, io.SEEK_END)
+        offset, footer_magic = _FOOTER.unpack(self._file.read(_FOOTER.size))
+        if footer_magic != FOOTER_MAGIC:
+            return None
+
+        self._file.seek(offset)
+        if self._file.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            return None
+        return self._read_json()["chunks"]
+
+    def _scan_chunks(self) -> List[Dict[str, Any]]:
+        """
+        Rebuilds the index of a file which was not closed, up to its last complete chunk.
+        """
+        logger.warning("Session %s has no index. Scanning chunks", self.path)
+        chunks = []
+        offset = self._chunks_offset
+        while True:
+            self._file.seek(offset)
+            if self._file.read(len(CHUNK_MAGIC)) != CHUNK_MAGIC:
+                break
+            lengths = self._file.read(_CHUNK_LENGTHS.size)
+            if len(lengths) < _CHUNK_LENGTHS.size:
+                break
+            header_length, payload_length = _CHUNK_LENGTHS.unpack(lengths)
+            try:
+                header = json.loads(self._file.read(header_length))
+            except ValueError:
+                break
+            end = self._file.tell() + payload_length
+            self._file.seek(0, io.SEEK_END)
+            if end > self._file.tell():
+                break
+
+            chunks.append({key: header[key] for key in ("stream", "kind", "count", "start", "end")} |
+                          {"offset": offset})
+            offset = end
+
+        return chunks
+
+
+_recorder: Optional[SessionRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def start_session(output_dir: pathlib.Path, **kwargs) -> SessionRecorder:
+    """
+    Starts recording a session, named after the time it starts. Threads in this process
+    get the recorder with `get_session_recorder`.
+
+    Args:
+        output_dir: Folder to record to
+        **kwargs: Options passed to SessionRecorder
+
+    Returns:
+        The recorder
+    """
+    global _recorder
+
+    with _recorder_lock:
+        if _recorder is not None:
+            return _recorder
+
+        name = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        recorder = SessionRecorder(output_dir / f"{name}.{EXTENSION}", **kwargs)
+        recorder.start()
+        _recorder = recorder
+        return recorder
+
+
+def get_session_recorder() -> Optional[SessionRecorder]:
+    """
+    Gets the recorder of the session being recorded.
+
+    Returns:
+        The recorder, or None if no session is being recorded
+    """
+    return _recorder
+
+
+def stop_session() -> None:
+    """
+    Stops recording the session, if one is being recorded.
+    """
+    global _recorder
+
+    with _recorder_lock:
+        recorder, _recorder = _recorder, None
+
+    if recorder is not None:
+        recorder.stop()
@@ -0,0 +1,113 @@
+"""
+Benchmark of the gaze frame path with and without the frame pool. Counts the full frame
+copies and allocations per tick and times each tick, from the camera frame to the
+published preview.
+
+    python -m common.tests.frame_pool_benchmark --repeats 200
+"""
+
+from typing import Optional, List, Dict, Tuple
+import sys
+import json
+import time
+import pathlib
+import argparse
+
+import numpy as np
+import cv2
+
+from common.frame_pool import FramePool
+
+CAPTURE_SHAPE = (480, 640, 3)
+UPSCALE_DIM = (1500, 843)
+CAMERA_MATRIX = np.array([[640.0, 0.0, 320.0], [0.0, 640.0, 240.0], [0.0, 0.0, 1.0]])
+DIST_COEFFICIENTS = np.array([0.1, -0.05, 0.0, 0.0, 0.0])
+
+
+def unpooled_tick(capture: np.ndarray, counter: FramePool) -> Tuple[np.ndarray, int]:
+    """
+    The previous frame path. Returns the published frame and the number of full frame copies.
+    Copies are counted on a pool used only as a counter, as the pooled path counts them.
+    """
+    copies = counter.copies
+    frame = capture.copy()  # capture read into a new frame
+    counter.count_copy()
+    upscaled = cv2.resize(frame, UPSCALE_DIM)
+    counter.count_copy()
+    undistorted = cv2.undistort(upscaled, CAMERA_MATRIX, DIST_COEFFICIENTS)
+    counter.count_copy()
+    image = np.require(undistorted.copy(), np.uint8, "C")  # visualiser copy
+    counter.count_copy()
+    image = np.require(image[:, ::-1], np.uint8, "C")
+    counter.count_copy()
+    return image, counter.copies - copies
+
+
+def pooled_tick(capture: np.ndarray, pool: FramePool, maps: Dict[Tuple[int, int], Tuple]) -> Tuple[np.ndarray, int]:
+    """
+    The pooled frame path. Returns the published frame and the number of full frame copies.
+    """
+    copies = pool.copies
+    frame = pool.copy("capture", capture)  # capture read into a pooled buffer
+    upscaled = cv2.resize(frame, UPSCALE_DIM, dst=pool.acquire("upscaled", (UPSCALE_DIM[1], UPSCALE_DIM[0], 3)))
+    pool.count_copy()
+
+    if UPSCALE_DIM not in maps:
+        maps[UPSCALE_DIM] = cv2.initUndistortRectifyMap(
+            CAMERA_MATRIX, DIST_COEFFICIENTS, None, CAMERA_MATRIX, UPSCALE_DIM, cv2.CV_16SC2)
+    map1, map2 = maps[UPSCALE_DIM]
+    cv2.remap(upscaled, map1, map2, cv2.INTER_LINEAR, dst=pool.acquire("undistorted", upscaled.shape))
+    pool.count_copy()
+
+    cv2.flip(upscaled, 1, dst=upscaled)
+    return pool.publish(upscaled), pool.copies - copies
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the frame pool benchmark.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments.
+
+    Returns:
+        int: Exit code.
+    """
+    parser = argparse.ArgumentParser(description="Gaze frame path benchmark")
+    parser.add_argument("--repeats", type=int, default=100, help="Ticks per case")
+    parser.add_argument("--output", type=pathlib.Path, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    capture = rng.integers(0, 256, CAPTURE_SHAPE, dtype=np.uint8)
+    pool = FramePool()
+    counter = FramePool(name="unpooled")
+    maps: Dict[Tuple[int, int], Tuple] = {}
+
+    results = {}
+    cases = (("unpooled", lambda: unpooled_tick(capture, counter)),
+             ("pooled", lambda: pooled_tick(capture, pool, maps)))
+    for name, tick in cases:
+        times = []
+        copies = 0
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            _, copies = tick()
+            times.append((time.perf_counter() - start) * 1000)
+        results[name] = {"tick_ms": float(np.median(times)), "copies_per_tick": copies}
+
+    results["pooled"]["allocations"] = pool.stats().allocations
+    for name, result in results.items():
+        print(name)
+        for key, value in result.items():
+            print(f"    {key:<24}{value:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,146 @@
+"""
+Tests for reusing frame buffers while consumers may hold published frames.
+
+    python -m pytest common/tests/frame_pool_test.py
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from common.frame_pool import FramePool, MAX_GROWTH
+
+SHAPE = (4, 6, 3)
+
+
+@pytest.fixture
+def pool():
+    return FramePool(depth=3)
+
+
+def acquire_ids(pool: FramePool, count: int, stage: str = "frame"):
+    return [id(pool.acquire(stage, SHAPE)) for _ in range(count)]
+
+
+def test_free_buffers_reused_in_ring_order(pool):
+    first = acquire_ids(pool, 3)
+    assert len(set(first)) == 3
+    assert acquire_ids(pool, 6) == first * 2
+
+    stats = pool.stats()
+    assert (stats.acquisitions, stats.allocations, stats.held) == (9, 3, 0)
+
+
+def test_stages_have_separate_rings(pool):
+    frame = pool.acquire("frame", SHAPE)
+    preview = pool.acquire("preview", SHAPE)
+    assert frame is not preview
+
+
+def test_held_buffer_not_reused(pool):
+    held = pool.acquire("frame", SHAPE)
+    held[...] = 7
+    pool.publish(held)
+
+    others = acquire_ids(pool, 10)
+    assert id(held) not in others
+    assert np.all(held == 7)
+    assert not held.flags.writeable
+    assert pool.stats().held > 0
+
+
+def test_view_holds_buffer(pool):
+    buffer = pool.acquire("frame", SHAPE)
+    buffer_id = id(buffer)
+    flipped = buffer[:, ::-1]
+    del buffer
+
+    assert buffer_id not in acquire_ids(pool, 10)
+
+    del flipped
+    assert buffer_id in acquire_ids(pool, 3)
+
+
+def test_released_buffer_writeable_again(pool):
+    published = pool.publish(pool.acquire("frame", SHAPE))
+    published_id = id(published)
+    del published
+
+    reused = [pool.acquire("frame", SHAPE) for _ in range(3)]
+    buffer = next(buffer for buffer in reused if id(buffer) == published_id)
+    assert buffer.flags.writeable
+
+
+def test_ring_grows_while_buffers_held(pool):
+    held = [pool.acquire("frame", SHAPE) for _ in range(3)]
+    extra = pool.acquire("frame", SHAPE)
+
+    assert all(extra is not buffer for buffer in held)
+    assert pool.stats().allocations == 4
+
+
+def test_unpooled_buffers_past_growth_limit(pool):
+    held = [pool.acquire("frame", SHAPE) for _ in range(3 * MAX_GROWTH)]
+    allocations = pool.stats().allocations
+
+    unpooled = pool.acquire("frame", SHAPE)
+    assert all(unpooled is not buffer for buffer in held)
+    assert pool.stats().allocations == allocations + 1
+
+    # Once the consumers let go, the ring's buffers are reused again
+    held_ids = {id(buffer) for buffer in held}
+    del held, unpooled
+    assert id(pool.acquire("frame", SHAPE)) in held_ids
+
+
+def test_reallocated_on_shape_change(pool):
+    first = acquire_ids(pool, 3)
+    buffer = pool.acquire("frame", (2, 2, 3))
+    assert buffer.shape == (2, 2, 3)
+    assert id(buffer) not in first
+
+
+def test_copy(pool):
+    frame = np.arange(np.prod(SHAPE), dtype=np.uint8).reshape(SHAPE)
+    copy = pool.copy("frame", frame)
+
+    assert copy is not frame
+    assert np.array_equal(copy, frame)
+    pool.count_copy()
+    assert pool.stats().copies == 2
+
+
+def test_published_frames_intact_while_consumer_reads(pool):
+    # A consumer slower than the producer keeps each frame it takes unchanged
+    latest = {}
+    lock = threading.Lock()
+    stop = threading.Event()
+    corrupted = []
+
+    def consume():
+        while not stop.is_set():
+            with lock:
+                frame = latest.get("frame")
+            if frame is None:
+                continue
+            value = int(frame[0, 0, 0])
+            for _ in range(20):
+                if not np.all(frame == value):
+                    corrupted.append(value)
+                    return
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    try:
+        for i in range(300):
+            frame = pool.acquire("frame", SHAPE)
+            frame[...] = i % 256
+            with lock:
+                latest["frame"] = pool.publish(frame)
+            del frame
+    finally:
+        stop.set()
+        consumer.join()
+
+    assert corrupted == []
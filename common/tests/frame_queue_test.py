@@ -0,0 +1,103 @@
+"""
+Tests for queueing frame copies to a writer thread.
+
+    python -m pytest common/tests/frame_queue_test.py
+"""
+
+import queue
+
+import numpy as np
+import pytest
+
+from common.frame_pool import FrameFreeList
+from common.frame_queue import DROP_NEWEST, DROP_OLDEST, FrameQueue
+
+SHAPE = (48, 64, 3)
+
+
+def frame(value: int) -> np.ndarray:
+    return np.full(SHAPE, value, np.uint8)
+
+
+def test_free_list_reuses_released_buffers():
+    buffers = FrameFreeList()
+    first = buffers.copy(frame(1))
+    second = buffers.copy(frame(2))
+    assert buffers.allocations == 2
+
+    buffers.release(first)
+    third = buffers.copy(frame(3))
+    assert third is first
+    assert int(third[0, 0, 0]) == 3
+    assert int(second[0, 0, 0]) == 2
+    assert buffers.allocations == 2
+    assert buffers.copies == 3
+
+
+def test_free_list_allocates_for_new_shape():
+    buffers = FrameFreeList()
+    buffers.release(buffers.copy(frame(1)))
+
+    small = buffers.copy(np.zeros((4, 4, 3), np.uint8))
+    assert small.shape == (4, 4, 3)
+    assert buffers.allocations == 2
+
+
+def test_frames_copied_with_details():
+    frames = FrameQueue(4, "test")
+    source = frame(1)
+    assert frames.put(source, "webcam", 0.5)
+    source[:] = 2
+
+    queued, stream, timestamp = frames.get_nowait()
+    assert int(queued[0, 0, 0]) == 1
+    assert (stream, timestamp) == ("webcam", 0.5)
+
+
+def test_buffers_sized_by_frames_in_flight():
+    frames = FrameQueue(64, "test")
+    for i in range(100):
+        frames.put(frame(i))
+        queued, = frames.get_nowait()
+        frames.release(queued)
+
+    # Frames are taken as fast as they are queued, so one buffer is enough
+    assert frames.buffers.allocations == 1
+    assert frames.buffers.copies == 100
+
+
+@pytest.mark.parametrize("drop_policy, expected", [
+    (DROP_OLDEST, [2, 3]),
+    (DROP_NEWEST, [0, 1]),
+])
+def test_drop_policy(drop_policy, expected):
+    frames = FrameQueue(2, "test", drop_policy)
+    results = [frames.put(frame(i)) for i in range(4)]
+
+    assert results == [True, True, drop_policy == DROP_OLDEST, drop_policy == DROP_OLDEST]
+    assert frames.dropped == 2
+    assert [int(frames.get_nowait()[0][0, 0, 0]) for _ in expected] == expected
+    # Dropped frames return their buffers
+    assert frames.buffers.free == frames.buffers.allocations - 2
+
+
+def test_unsupported_drop_policy():
+    with pytest.raises(ValueError):
+        FrameQueue(2, "test", "random")
+
+
+def test_close_after_queued_frames():
+    frames = FrameQueue(2, "test")
+    frames.put(frame(0))
+    assert frames.close(timeout=0)
+
+    assert frames.get_nowait()[0] is not None
+    assert frames.get_nowait() is None
+    with pytest.raises(queue.Empty):
+        frames.get(timeout=0.01)
+
+
+def test_close_full_queue_times_out():
+    frames = FrameQueue(1, "test")
+    frames.put(frame(0))
+    assert not frames.close(timeout=0.01)
@@ -0,0 +1,241 @@
+"""
+Tests for the image drawing helpers.
+
+    python -m pytest common/tests/image_test.py
+"""
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from common import image
+
+HEIGHT, WIDTH = 48, 64
+COLOUR = (0, 128, 255)
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+
+def reference_blend(pixels: np.ndarray, colour, alpha: float) -> np.ndarray:
+    return pixels * (1 - alpha) + np.asarray(colour, np.float64) * alpha
+
+
+# =========== blend_rect ===========
+
+@pytest.mark.parametrize("alpha", [0.05, 0.25, 0.5, 0.9])
+def test_blend_rect_matches_float_blend(frame, alpha):
+    original = frame.copy()
+    image.blend_rect(frame, (10, 5), (30, 20), COLOUR, alpha)
+
+    expected = reference_blend(original[5:21, 10:31], COLOUR, alpha)
+    assert np.abs(frame[5:21, 10:31] - expected).max() <= 1
+
+
+def test_blend_rect_only_writes_inside_rect(frame):
+    original = frame.copy()
+    image.blend_rect(frame, (10, 5), (30, 20), COLOUR, 0.5)
+
+    changed = np.any(frame != original, axis=2)
+    ys, xs = np.nonzero(changed)
+    # Corners are inclusive
+    assert (ys.min(), ys.max(), xs.min(), xs.max()) == (5, 20, 10, 30)
+
+
+def test_blend_rect_clipped_to_frame(frame):
+    original = frame.copy()
+    image.blend_rect(frame, (-10, -10), (5, 5), COLOUR, 1.0)
+
+    assert np.all(frame[:6, :6] == COLOUR)
+    assert np.array_equal(frame[6:], original[6:])
+    assert np.array_equal(frame[:, 6:], original[:, 6:])
+
+
+@pytest.mark.parametrize("top_left, bottom_right", [
+    ((WIDTH, 0), (WIDTH + 10, 10)),
+    ((-20, -20), (-1, -1)),
+    ((10, 10), (5, 20)),
+])
+def test_blend_rect_outside_frame(frame, top_left, bottom_right):
+    original = frame.copy()
+    image.blend_rect(frame, top_left, bottom_right, COLOUR, 0.5)
+    assert np.array_equal(frame, original)
+
+
+def test_blend_rect_alpha_limits(frame):
+    original = frame.copy()
+    image.blend_rect(frame, (0, 0), (WIDTH - 1, HEIGHT - 1), COLOUR, 0.001)
+    assert np.array_equal(frame, original)
+
+    image.blend_rect(frame, (0, 0), (WIDTH - 1, HEIGHT - 1), COLOUR, 1.0)
+    assert np.all(frame == COLOUR)
+
+
+def test_blend_rect_extremes_do_not_overflow():
+    frame = np.full((4, 4, 3), 255, np.uint8)
+    image.blend_rect(frame, (0, 0), (3, 3), (255, 255, 255), 0.5)
+    assert np.all(frame == 255)
+
+    frame[...] = 0
+    image.blend_rect(frame, (0, 0), (3, 3), (0, 0, 0), 0.5)
+    assert np.all(frame == 0)
+
+
+def test_blend_rect_single_channel():
+    frame = np.full((4, 4), 100, np.uint8)
+    image.blend_rect(frame, (1, 1), (2, 2), 200, 0.5)
+    assert frame[1, 1] == 150
+    assert frame[0, 0] == 100
+
+
+# =========== OverlayTile ===========
+
+def test_tile_blit_matches_blend_rect(frame):
+    expected = frame.copy()
+    image.blend_rect(expected, (10, 5), (29, 24), COLOUR, 0.25)
+
+    tile = image.render_labelled_tile((20, 20), COLOUR, 0.25, None, 0, "", (0, 0), 0, 1.0, (255, 255, 255), 1, 8)
+    blitted = frame.copy()
+    tile.blit(blitted, (10, 5))
+
+    assert np.abs(blitted.astype(int) - expected).max() <= 1
+    assert np.array_equal(blitted[:5], frame[:5])
+
+
+def test_tile_premultiplied_arithmetic():
+    # A 1 x 2 tile: half opaque red, then fully transparent
+    premultiplied = np.array([[[0, 0, 128 * 255], [0, 0, 0]]], np.uint16)
+    inverse_weight = np.array([[[128], [256]]], np.uint16)
+    tile = image.OverlayTile(premultiplied, inverse_weight)
+
+    frame = np.full((1, 2, 3), 100, np.uint8)
+    tile.blit(frame, (0, 0))
+
+    assert frame[0, 0].tolist() == [50, 50, 178]
+    assert frame[0, 1].tolist() == [100, 100, 100]
+
+
+@pytest.mark.parametrize("top_left", [(-5, -3), (WIDTH - 8, HEIGHT - 6), (-5, HEIGHT - 6)])
+def test_tile_blit_clipped_to_frame(frame, top_left):
+    size = (12, 10)
+    tile = image.render_labelled_tile(size, COLOUR, 1.0, None, 0, "", (0, 0), 0, 1.0, (255, 255, 255), 1, 8)
+    original = frame.copy()
+    tile.blit(frame, top_left)
+
+    x0, y0 = max(top_left[0], 0), max(top_left[1], 0)
+    x1, y1 = min(top_left[0] + size[0], WIDTH), min(top_left[1] + size[1], HEIGHT)
+    assert np.all(frame[y0:y1, x0:x1] == COLOUR)
+
+    outside = np.ones((HEIGHT, WIDTH), bool)
+    outside[y0:y1, x0:x1] = False
+    assert np.array_equal(frame[outside], original[outside])
+
+
+def test_tile_blit_outside_frame(frame):
+    tile = image.render_labelled_tile((8, 8), COLOUR, 1.0, None, 0, "", (0, 0), 0, 1.0, (255, 255, 255), 1, 8)
+    original = frame.copy()
+    tile.blit(frame, (WIDTH, 0))
+    tile.blit(frame, (-8, -8))
+    assert np.array_equal(frame, original)
+
+
+def test_tile_text_opaque_over_fill():
+    tile = image.render_labelled_tile((60, 30), COLOUR, 0.25, (255, 0, 0), 2, "Hi", (5, 25),
+                                      cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2, cv2.LINE_8)
+    frame = np.zeros((30, 60, 3), np.uint8)
+    tile.blit(frame, (0, 0))
+
+    coverage = np.zeros((30, 60), np.uint8)
+    cv2.putText(coverage, "Hi", (5, 25), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 255, 2, cv2.LINE_8)
+    assert np.all(frame[coverage == 255] == 255)
+    # The border is blended at the fill's opacity
+    assert frame[0, 30].tolist() == [64, 0, 0]
+
+
+# =========== OverlayCompositor ===========
+
+def test_fill_rect_border_blended_once(frame):
+    original = frame.copy()
+    compositor = image.OverlayCompositor()
+    compositor.fill_rect((10, 10), (29, 29), COLOUR, 0.5, (255, 0, 0), 3)
+    compositor.flush(frame)
+
+    expected = original.astype(np.float64)
+    expected[10:30, 10:30] = reference_blend(original[10:30, 10:30], (255, 0, 0), 0.5)
+    expected[13:27, 13:27] = reference_blend(original[13:27, 13:27], COLOUR, 0.5)
+    assert np.abs(frame - expected).max() <= 1
+    assert not compositor.pending
+
+
+def test_flush_draws_tiles_then_text(frame):
+    compositor = image.OverlayCompositor()
+    tile = image.render_labelled_tile((WIDTH, HEIGHT), (0, 0, 0), 1.0, None, 0, "", (0, 0), 0, 1.0,
+                                      (255, 255, 255), 1, 8)
+    compositor.text("Hi", (5, 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2, cv2.LINE_8)
+    compositor.blit(tile, (0, 0))
+    compositor.flush(frame)
+
+    assert frame.max() == 255
+    assert np.all((frame == 0) | (frame == 255))
+
+
+# =========== draw_dots ===========
+
+@pytest.mark.parametrize("radius", [0, 1, 2, 3])
+def test_dot_matches_filled_circle(radius):
+    frame = np.zeros((16, 16, 3), np.uint8)
+    image.draw_dots(frame, np.array([[8, 8]]), radius, COLOUR)
+
+    expected = np.zeros_like(frame)
+    cv2.circle(expected, (8, 8), radius, COLOUR, cv2.FILLED)
+    assert np.array_equal(frame, expected)
+
+
+def test_dots_rounded_to_nearest_pixel():
+    frame = np.zeros((8, 8, 3), np.uint8)
+    image.draw_dots(frame, np.array([[2.4, 5.6], [5.5, 0.2]]), 0, COLOUR)
+
+    ys, xs = np.nonzero(frame[..., 2])
+    assert sorted(zip(xs.tolist(), ys.tolist())) == [(2, 6), (6, 0)]
+
+
+@pytest.mark.parametrize("point", [(0, 0), (WIDTH - 1, HEIGHT - 1), (-2, 10), (WIDTH + 1, 10), (10, -2)])
+def test_dots_clipped_at_edges(point):
+    radius = 3
+    frame = np.zeros((HEIGHT, WIDTH, 3), np.uint8)
+    image.draw_dots(frame, np.array([point]), radius, COLOUR)
+
+    padded = np.zeros((HEIGHT + 20, WIDTH + 20, 3), np.uint8)
+    cv2.circle(padded, (point[0] + 10, point[1] + 10), radius, COLOUR, cv2.FILLED)
+    # Pixels past an edge are dropped, not wrapped around to the opposite edge
+    assert np.array_equal(frame, padded[10:-10, 10:-10])
+
+
+def test_dots_outside_frame_ignored(frame):
+    original = frame.copy()
+    image.draw_dots(frame, np.array([[-10, -10], [WIDTH + 10, HEIGHT + 10], [10, -10]]), 3, COLOUR)
+    image.draw_dots(frame, np.empty((0, 2)), 3, COLOUR)
+    assert np.array_equal(frame, original)
+
+
+def test_many_dots_match_circles():
+    rng = np.random.default_rng(1)
+    points = rng.uniform(-5, [WIDTH + 5, HEIGHT + 5], (200, 2))
+    frame = np.zeros((HEIGHT, WIDTH, 3), np.uint8)
+    image.draw_dots(frame, points, 2, COLOUR)
+
+    expected = np.zeros_like(frame)
+    for x, y in np.rint(points).astype(int):
+        cv2.circle(expected, (int(x), int(y)), 2, COLOUR, cv2.FILLED)
+    assert np.array_equal(frame, expected)
+
+
+def test_dot_offsets_read_only():
+    dy, dx = image.dot_offsets(2)
+    assert image.dot_offsets(2)[0] is dy
+    with pytest.raises(ValueError):
+        dy[0] = 0
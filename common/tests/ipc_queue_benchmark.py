@@ -0,0 +1,188 @@
+"""
+Benchmark of the inter-process queues.
+
+Compares the shared memory ring queue against the `Manager` queue it replaced and a plain
+`multiprocessing.Queue`, using the two message types sent between the GUI and the voice
+control process: key codes and parsed voice commands.
+
+    python -m common.tests.ipc_queue_benchmark --messages 5000
+"""
+
+from typing import Optional, List, Dict, Callable, Any
+import sys
+import json
+import time
+import pathlib
+import argparse
+import multiprocessing
+
+from common import constants as cc
+from common.SharedRingQueue import SharedRingQueue
+
+KEY_MESSAGE = 65
+COMMAND_MESSAGE = {
+    cc.COMMAND_TEXT: "turn right 90 degrees then land",
+    cc.PARSED_COMMAND: [("cw", 90), ("land", 0)],
+}
+MESSAGES = {"key": KEY_MESSAGE, "command": COMMAND_MESSAGE}
+
+
+def create_queues(manager: Any) -> Dict[str, Callable[[], Any]]:
+    """
+    Returns factories for each queue implementation under test.
+
+    Args:
+        manager (Any): A started `multiprocessing.Manager`.
+
+    Returns:
+        Dict[str, Callable[[], Any]]: Maps the queue name to a factory.
+    """
+    return {
+        "manager": manager.Queue,
+        "mp_queue": multiprocessing.Queue,
+        "shared_ring": lambda: SharedRingQueue(cc.COMMAND_QUEUE_CAPACITY, cc.COMMAND_QUEUE_SLOT_SIZE),
+    }
+
+
+def release(queue: Any) -> None:
+    """
+    Frees a queue's resources if it holds any.
+
+    Args:
+        queue (Any): The queue.
+    """
+    if isinstance(queue, SharedRingQueue):
+        queue.unlink()
+    elif hasattr(queue, "close") and hasattr(queue, "join_thread"):
+        queue.close()
+        queue.join_thread()
+
+
+def producer(queue: Any, message: Any, count: int) -> None:
+    """
+    Puts `count` copies of a message into the queue. Runs in a child process.
+
+    Args:
+        queue (Any): The queue.
+        message (Any): The message to send.
+        count (int): The number of messages.
+    """
+    for _ in range(count):
+        queue.put(message)
+
+
+def time_round_trip(queue: Any, message: Any, count: int) -> float:
+    """
+    Times a put immediately followed by a get within one process.
+
+    Returns:
+        float: Mean microseconds per round trip.
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        queue.put(message)
+        queue.get()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def time_poll(queue: Any, count: int) -> float:
+    """
+    Times the `empty` and `qsize` calls the GUI timers make on every tick.
+
+    Returns:
+        float: Mean microseconds per poll.
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        if not queue.empty():
+            queue.qsize()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def time_cross_process(queue: Any, message: Any, count: int) -> float:
+    """
+    Times a child process sending messages to this process.
+
+    Returns:
+        float: Messages per second.
+    """
+    process = multiprocessing.Process(target=producer, args=(queue, message, count))
+    start = time.perf_counter()
+    process.start()
+    for _ in range(count):
+        queue.get()
+    elapsed = time.perf_counter() - start
+    process.join()
+    return count / elapsed
+
+
+def run_benchmark(messages: int) -> Dict[str, Dict[str, float]]:
+    """
+    Runs every measurement for every queue.
+
+    Args:
+        messages (int): Number of messages per measurement.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Results keyed by queue name then measurement.
+    """
+    results = {}
+    with multiprocessing.Manager() as manager:
+        for name, factory in create_queues(manager).items():
+            queue = factory()
+            try:
+                result = {"poll_us": time_poll(queue, messages)}
+                for message_name, message in MESSAGES.items():
+                    result[f"{message_name}_round_trip_us"] = time_round_trip(queue, message, messages)
+                    result[f"{message_name}_per_second"] = time_cross_process(queue, message, messages)
+            finally:
+                release(queue)
+            results[name] = result
+
+    return results
+
+
+def format_results(results: Dict[str, Dict[str, float]]) -> str:
+    """
+    Formats the results as a table.
+
+    Args:
+        results (Dict[str, Dict[str, float]]): The benchmark results.
+
+    Returns:
+        str: The table.
+    """
+    columns = list(next(iter(results.values())).keys())
+    lines = [f"{'queue':<12}" + "".join(f"{column:>26}" for column in columns)]
+    for name, result in results.items():
+        lines.append(f"{name:<12}" + "".join(f"{result[column]:>26.1f}" for column in columns))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the IPC queue benchmark.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments.
+
+    Returns:
+        int: Exit code.
+    """
+    parser = argparse.ArgumentParser(description="Inter-process queue benchmark")
+    parser.add_argument("--messages", type=int, default=5000, help="Messages per measurement")
+    parser.add_argument("--output", type=pathlib.Path, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.messages)
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,116 @@
+"""
+Tests for compiling key bindings and routing key presses to subscribers.
+
+    python -m pytest common/tests/keyboard_test.py
+"""
+
+from threading import Lock
+from queue import Queue
+
+import common.constants as cc
+from common.keyboard import (KeyRouter, compile_key_bindings, get_key_chr,
+                             subscribe_from_thread_data)
+
+UP_ARROW = 16777235
+DRONE_BINDINGS = {"takeoff": 32, "land": "l", "up": UP_ARROW, "cw": "E"}
+GAZE_BINDINGS = {"calibrate": "c", "land": "l"}
+ESC = ord(next(iter(cc.QUIT_KEYS)))
+
+
+def test_get_key_chr():
+    assert get_key_chr(ord("A")) == "a"
+    assert get_key_chr(-1) == ""
+    assert get_key_chr(UP_ARROW) == ""
+
+
+def test_compile_binds_both_cases():
+    key_index = compile_key_bindings(DRONE_BINDINGS)
+
+    assert key_index[ord("l")] == key_index[ord("L")] == "land"
+    assert key_index[ord("e")] == key_index[ord("E")] == "cw"
+    assert key_index[32] == "takeoff"
+    assert key_index[UP_ARROW] == "up"
+    assert key_index[ESC] == cc.QUIT_ACTION
+
+
+def test_compile_skips_invalid_keys():
+    key_index = compile_key_bindings({"land": "land", "up": None}, include_quit_keys=False)
+    assert key_index == {}
+
+
+def test_compile_keeps_first_binding():
+    key_index = compile_key_bindings({"land": "l", "left": "l"}, include_quit_keys=False)
+    assert key_index[ord("l")] == "land"
+
+
+def test_keys_routed_to_bound_subscribers_only():
+    router = KeyRouter()
+    drone = router.subscribe("drone", DRONE_BINDINGS)
+    gaze = router.subscribe("gaze", GAZE_BINDINGS)
+
+    assert router.dispatch(ord("c")) == 1
+    assert router.dispatch(ord("L")) == 2
+    assert router.dispatch(UP_ARROW) == 1
+    assert router.dispatch(ord("z")) == 0
+
+    assert drone.get_keys() == [ord("L"), UP_ARROW]
+    assert gaze.get_keys() == [ord("c"), ord("L")]
+    assert drone.action(ord("L")) == "land"
+    assert gaze.get_keys() == []
+
+
+def test_quit_key_reaches_every_subscriber():
+    router = KeyRouter()
+    drone = router.subscribe("drone", DRONE_BINDINGS)
+    gaze = router.subscribe("gaze", GAZE_BINDINGS)
+
+    assert router.dispatch(ESC) == 2
+    assert drone.get_keys() == gaze.get_keys() == [ESC]
+
+
+def test_catch_all_receives_every_key():
+    router = KeyRouter()
+    drone = router.subscribe("drone", DRONE_BINDINGS)
+    voice = router.subscribe("voice", None)
+
+    assert router.dispatch(ord("l")) == 2
+    assert router.dispatch(ord("z")) == 1
+
+    assert drone.get_keys() == [ord("l")]
+    assert voice.get_keys() == [ord("l"), ord("z")]
+    assert voice.catch_all
+    assert voice.action(ord("l")) is None
+
+
+def test_unsubscribe():
+    router = KeyRouter()
+    drone = router.subscribe("drone", DRONE_BINDINGS)
+    voice = router.subscribe("voice", None)
+
+    router.unsubscribe(drone)
+    assert router.dispatch(ord("l")) == 1
+    assert drone.get_keys() == []
+
+    router.unsubscribe(voice)
+    router.unsubscribe(voice)
+    assert router.dispatch(ord("l")) == 0
+
+
+def test_full_queue_drops_key():
+    router = KeyRouter()
+    drone = router.subscribe("drone", DRONE_BINDINGS, Queue(maxsize=1))
+
+    assert router.dispatch(ord("l")) == 1
+    assert router.dispatch(32) == 0
+    assert drone.get_keys() == [ord("l")]
+
+
+def test_subscribe_from_thread_data():
+    thread_data = {}
+    lock = Lock()
+    assert subscribe_from_thread_data(thread_data, lock, "drone", DRONE_BINDINGS) is None
+
+    thread_data[cc.KEY_ROUTER] = KeyRouter()
+    drone = subscribe_from_thread_data(thread_data, lock, "drone", DRONE_BINDINGS)
+    thread_data[cc.KEY_ROUTER].dispatch(32)
+    assert drone.get_keys() == [32]
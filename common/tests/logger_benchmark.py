@@ -0,0 +1,219 @@
+"""
+Benchmark of logger initialisation and record formatting.
+
+Imports a generated package of modules which each call `init_logger` at import, as every
+module of the project does. Then times the cost on the logging thread of records written
+directly, through the queue-backed pipeline with and without rate limiting, and filtered by
+level. The cost of `inspect.stack`, which loggers used to resolve their caller with, is
+reported for reference.
+
+    python -m common.tests.logger_benchmark --modules 40
+"""
+
+from typing import Optional, List, Dict
+import io
+import sys
+import json
+import time
+import inspect
+import logging
+import pathlib
+import argparse
+import tempfile
+import importlib
+
+from omegaconf import OmegaConf
+
+from common import logger_helper
+
+MODULE_SOURCE = "from common.logger_helper import init_logger\n\nlogger = init_logger()\n"
+
+
+class SlowStream(io.StringIO):
+    """
+    In-memory stream with a fixed latency per write, standing in for a terminal.
+    """
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+
+    def write(self, text: str) -> int:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return super().write(text)
+
+
+def create_package(folder: pathlib.Path, name: str, modules: int) -> List[str]:
+    """
+    Writes a package of modules which initialise a logger at import.
+
+    Args:
+        folder (pathlib.Path): Folder to create the package in.
+        name (str): Package name.
+        modules (int): Number of modules.
+
+    Returns:
+        List[str]: The module names to import.
+    """
+    package = folder / name
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+
+    module_names = []
+    for i in range(modules):
+        (package / f"module_{i:03d}.py").write_text(MODULE_SOURCE)
+        module_names.append(f"{name}.module_{i:03d}")
+
+    return module_names
+
+
+def time_imports(modules: int) -> float:
+    """
+    Times importing modules which each initialise a logger.
+
+    Returns:
+        float: Mean milliseconds per module.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        module_names = create_package(pathlib.Path(tmp_dir), "logger_benchmark_modules", modules)
+        sys.path.insert(0, tmp_dir)
+        importlib.invalidate_caches()
+        try:
+            start = time.perf_counter()
+            for module_name in module_names:
+                importlib.import_module(module_name)
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.path.remove(tmp_dir)
+            for module_name in module_names:
+                sys.modules.pop(module_name, None)
+            sys.modules.pop("logger_benchmark_modules", None)
+
+    return elapsed / modules * 1e3
+
+
+def time_inspect_stack(count: int) -> float:
+    """
+    Times `inspect.stack` from this frame, for reference.
+
+    Returns:
+        float: Mean milliseconds per call.
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        inspect.stack()
+    return (time.perf_counter() - start) / count * 1e3
+
+
+def create_benchmark_logger(handler: logging.Handler) -> logging.Logger:
+    """
+    Creates a logger set to INFO with a single handler.
+
+    Args:
+        handler (logging.Handler): The handler.
+
+    Returns:
+        logging.Logger: The logger.
+    """
+    logger = logging.getLogger("logger_benchmark")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.handlers.clear()
+    logger.addHandler(handler)
+    return logger
+
+
+def time_records(logger: logging.Logger, count: int, level: int) -> float:
+    """
+    Times logging records from one call site, as hot loops do.
+
+    Returns:
+        float: Mean microseconds per record on the logging thread.
+    """
+    start = time.perf_counter()
+    for i in range(count):
+        logger.log(level, "Gaze 2d point %s", (i, i))
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def time_direct_records(count: int, level: int, sink_latency: float) -> float:
+    """
+    Times records formatted and written on the logging thread.
+    """
+    handler = logging.StreamHandler(SlowStream(sink_latency))
+    handler.setFormatter(logger_helper.create_formatter())
+    return time_records(create_benchmark_logger(handler), count, level)
+
+
+def time_queued_records(count: int, rate_limit: bool, sink_latency: float) -> float:
+    """
+    Times records put on the logging pipeline's queue, while the listener writes them.
+    """
+    pipeline_config = OmegaConf.create({
+        "queue_size": count + 1,
+        "rate_limit": {"enable": rate_limit, "interval": 1.0, "burst": 5, "sample_rate": 50, "max_level": "INFO"},
+    })
+    pipeline = logger_helper.LogPipeline(pipeline_config)
+    for handler in pipeline.output_handlers:
+        handler.setStream(SlowStream(sink_latency))
+
+    try:
+        return time_records(create_benchmark_logger(pipeline.create_handler()), count, logging.INFO)
+    finally:
+        pipeline.stop()
+
+
+def run_benchmark(modules: int, records: int, sink_latency: float) -> Dict[str, float]:
+    """
+    Runs every measurement.
+
+    Args:
+        modules (int): Number of modules to import.
+        records (int): Number of records to log per measurement.
+        sink_latency (float): Seconds taken by each write to the output stream.
+
+    Returns:
+        Dict[str, float]: The benchmark results.
+    """
+    return {
+        "init_logger_import_ms": time_imports(modules),
+        "inspect_stack_ms": time_inspect_stack(modules),
+        "direct_record_us": time_direct_records(records, logging.INFO, sink_latency),
+        "queued_record_us": time_queued_records(records, False, sink_latency),
+        "rate_limited_record_us": time_queued_records(records, True, sink_latency),
+        "filtered_record_us": time_direct_records(records, logging.DEBUG, sink_latency),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the logger benchmark.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments.
+
+    Returns:
+        int: Exit code.
+    """
+    parser = argparse.ArgumentParser(description="Logger initialisation and formatting benchmark")
+    parser.add_argument("--modules", type=int, default=40, help="Modules initialising a logger")
+    parser.add_argument("--records", type=int, default=20000, help="Records per measurement")
+    parser.add_argument("--sink-latency", type=float, default=50e-6,
+                        help="Seconds per write to the output stream, 0 for memory speed")
+    parser.add_argument("--output", type=pathlib.Path, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.modules, args.records, args.sink_latency)
+    for name, value in results.items():
+        print(f"{name:<24}{value:>10.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
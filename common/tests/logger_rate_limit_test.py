@@ -0,0 +1,129 @@
+"""
+Tests for rate limiting repeated log records and reporting the suppressed counts.
+
+    python -m pytest common/tests/logger_rate_limit_test.py
+"""
+
+import logging
+
+import pytest
+from omegaconf import OmegaConf
+
+from common.logger_helper import LogPipeline, RateLimitFilter
+
+INTERVAL = 1.0
+BURST = 2
+SAMPLE_RATE = 3
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append(record.getMessage())
+
+
+def make_record(msg: str = "gaze %d", args=(1,), lineno: int = 10, level: int = logging.DEBUG):
+    return logging.LogRecord("gaze", level, "gaze.py", lineno, msg, args, None)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def rate_filter(clock):
+    return RateLimitFilter(INTERVAL, BURST, SAMPLE_RATE, logging.INFO, clock)
+
+
+def test_burst_then_sampled(rate_filter):
+    kept = [rate_filter.filter(make_record()) for _ in range(11)]
+    # 2 in the burst, then every third record
+    assert kept == [True, True, False, False, True, False, False, True, False, False, True]
+
+
+def test_call_sites_limited_separately(rate_filter):
+    for _ in range(BURST):
+        rate_filter.filter(make_record(lineno=10))
+
+    assert not rate_filter.filter(make_record(lineno=10))
+    assert rate_filter.filter(make_record(lineno=20))
+
+
+def test_records_above_max_level_not_limited(rate_filter):
+    assert all(rate_filter.filter(make_record(level=logging.WARNING)) for _ in range(20))
+
+
+def test_next_interval_reports_suppressed(rate_filter, clock):
+    for _ in range(BURST + 2):
+        rate_filter.filter(make_record())
+
+    clock.now += INTERVAL
+    record = make_record()
+    assert rate_filter.filter(record)
+    assert record.getMessage() == "gaze 1 (suppressed 2 similar messages)"
+    assert rate_filter.pop_suppressed() == []
+
+
+def test_quiet_call_site_reported(rate_filter, clock):
+    for i in range(BURST + 2):
+        rate_filter.filter(make_record(args=(i,)))
+
+    # Not until the interval has ended
+    assert rate_filter.pop_suppressed() == []
+
+    clock.now += INTERVAL
+    summaries = rate_filter.pop_suppressed()
+    assert [summary.getMessage() for summary in summaries] == ["Suppressed 2 similar messages to: gaze 3"]
+    assert summaries[0].name == "gaze"
+    assert summaries[0].levelno == logging.DEBUG
+    assert summaries[0].lineno == 10
+
+    # Reported once only
+    clock.now += INTERVAL
+    assert rate_filter.pop_suppressed() == []
+
+
+def test_force_reports_current_interval(rate_filter):
+    for _ in range(BURST + 1):
+        rate_filter.filter(make_record())
+
+    summaries = rate_filter.pop_suppressed(force=True)
+    assert [summary.getMessage() for summary in summaries] == ["Suppressed 1 similar messages to: gaze 1"]
+
+
+def test_default_config_does_not_limit():
+    from common.logger_helper import logger_config
+    rate_limit = logger_config.pipeline.rate_limit
+    assert not rate_limit.enable
+    assert rate_limit.max_level == "DEBUG"
+
+
+def test_pipeline_flushes_suppressed_on_stop(clock):
+    pipeline = LogPipeline(OmegaConf.create({
+        "queue_size": 100,
+        "rate_limit": {"enable": True, "interval": INTERVAL, "burst": BURST,
+                       "sample_rate": SAMPLE_RATE, "max_level": "INFO"},
+    }))
+    output = ListHandler()
+    pipeline.output_handlers = [output]
+    pipeline.rate_limit_filter.clock = clock
+
+    logger = logging.Logger("gaze", logging.DEBUG)
+    logger.addHandler(pipeline.create_handler())
+    for i in range(BURST + 1):
+        logger.debug("gaze %d", i)
+    pipeline.stop()
+
+    assert output.messages == ["gaze 0", "gaze 1", "Suppressed 1 similar messages to: gaze 2"]
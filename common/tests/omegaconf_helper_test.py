@@ -0,0 +1,112 @@
+"""
+Tests for frozen config views and their reverse index.
+
+    python -m pytest common/tests/omegaconf_helper_test.py
+"""
+
+import pickle
+
+import pytest
+from omegaconf import OmegaConf
+
+from common.omegaconf_helper import (FrozenConfig, compile_config, conf_key_from_value,
+                                     load_or_create_config)
+
+BINDINGS = {
+    "land": "l",
+    "takeoff": 32,
+    "left": "a",
+    "right": "d",
+    "land_again": "l",
+    "sides": ["a", "d"],
+}
+
+
+def readonly(data: dict):
+    conf = OmegaConf.create(data)
+    OmegaConf.set_readonly(conf, True)
+    return conf
+
+
+def test_attribute_and_item_access():
+    frozen = compile_config(OmegaConf.create({"demo": {"fps": 30, "sides": ["left", "right"]}}))
+
+    assert frozen.demo.fps == frozen["demo"]["fps"] == 30
+    assert frozen.demo.sides == ("left", "right")
+    assert "demo" in frozen
+    assert list(frozen) == ["demo"]
+    assert len(frozen.demo) == 2
+    with pytest.raises(AttributeError):
+        frozen.missing
+
+
+def test_read_only():
+    frozen = compile_config({"fps": 30})
+    with pytest.raises(AttributeError):
+        frozen.fps = 60
+    with pytest.raises(TypeError):
+        frozen["fps"] = 60
+
+
+def test_resolves_interpolations():
+    frozen = compile_config(OmegaConf.create({"base": 10, "double": "${base}"}))
+    assert frozen.double == 10
+
+
+def test_round_trip():
+    data = {"demo": {"fps": 30, "sides": ["left", {"name": "right"}]}}
+    frozen = compile_config(data)
+
+    assert frozen.to_container() == data
+    assert pickle.loads(pickle.dumps(frozen)) == frozen
+
+
+def test_readonly_config_compiled_once():
+    conf = readonly({"demo": {"fps": 30}})
+    assert compile_config(conf) is compile_config(conf)
+    assert compile_config(conf.demo) is compile_config(conf.demo)
+
+
+def test_writable_config_recompiled():
+    conf = OmegaConf.create({"fps": 30})
+    assert compile_config(conf).fps == 30
+
+    conf.fps = 60
+    assert compile_config(conf).fps == 60
+
+
+@pytest.mark.parametrize("values, expected", [
+    (("l",), "land"),
+    ((32,), "takeoff"),
+    (("d", "a"), "left"),
+    (("L", "l"), "land"),
+    (("z",), None),
+    ((["a", "d"],), None),
+    ((), None),
+])
+def test_key_from_value(values, expected):
+    assert compile_config(BINDINGS).key_from_value(*values) == expected
+
+
+def test_key_from_value_matches_linear_search():
+    conf = readonly(BINDINGS)
+    for values in [("l",), (32,), ("d", "a"), ("z", 32), ("q",)]:
+        linear = next((key for key, value in conf.items() if value in values), None)
+        assert conf_key_from_value(conf, *values) == linear
+
+
+def test_load_or_create_config_adds_new_defaults(tmp_path):
+    config_path = tmp_path / "configs" / "drone.yaml"
+    defaults = {"controller": {"max_tick_rate": 30}}
+
+    config = load_or_create_config(config_path, defaults)
+    assert config_path.is_file()
+    assert config.controller.max_tick_rate == 30
+
+    config.controller.max_tick_rate = 15
+    OmegaConf.save(config, config_path)
+
+    config = load_or_create_config(config_path, {"controller": {"max_tick_rate": 30, "min_tick_rate": 10}})
+    assert config.controller.max_tick_rate == 15
+    assert config.controller.min_tick_rate == 10
+    assert isinstance(compile_config(config), FrozenConfig)
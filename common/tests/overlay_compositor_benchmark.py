@@ -0,0 +1,142 @@
+"""
+Benchmark of the overlay compositor against drawing each labelled rectangle on a full
+frame overlay and blending it with the whole frame, as the visualiser used to, and of
+blitting the rectangles as cached pre-rendered tiles.
+
+    python -m common.tests.overlay_compositor_benchmark --repeats 200
+"""
+
+from typing import Optional, List, Dict, Tuple
+import sys
+import json
+import time
+import pathlib
+import argparse
+
+import numpy as np
+import cv2
+
+from common import image
+
+RESOLUTIONS = {"720p": (720, 1280), "1080p": (1080, 1920)}
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+def hitboxes(height: int, width: int) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """
+    Left and right hitboxes, as drawn by the gaze detector.
+    """
+    third = width // 3
+    return [((0, 0), (third, height - 1)), ((width - third, 0), (width - 1, height - 1))]
+
+
+def full_frame_blends(frame: np.ndarray) -> None:
+    """
+    The previous approach: a full frame overlay and blend per rectangle.
+    """
+    height, width = frame.shape[:2]
+    for i, (top_left, bottom_right) in enumerate(hitboxes(height, width)):
+        overlay = np.zeros_like(frame)
+        cv2.rectangle(overlay, top_left, bottom_right, (0, 0, 255), cv2.FILLED)
+        if i == 0:
+            cv2.rectangle(overlay, top_left, bottom_right, (255, 0, 0), 2)
+        frame[...] = image.blend_frame(frame, overlay, 0.25 if i == 0 else 0.05)
+        cv2.putText(frame, "Looking left", (top_left[0] + 20, height // 2), FONT, 1.0, (255, 255, 255), 2, cv2.LINE_AA)
+
+
+def compositor(frame: np.ndarray, overlay: image.OverlayCompositor) -> None:
+    """
+    Queues the same rectangles and text and draws them in a single pass.
+    """
+    height, width = frame.shape[:2]
+    for i, (top_left, bottom_right) in enumerate(hitboxes(height, width)):
+        border = (255, 0, 0) if i == 0 else None
+        overlay.fill_rect(top_left, bottom_right, (0, 0, 255), 0.25 if i == 0 else 0.05, border, 2)
+        overlay.text("Looking left", (top_left[0] + 20, height // 2), FONT, 1.0, (255, 255, 255), 2, cv2.LINE_AA)
+    overlay.flush(frame)
+
+
+def cached_tiles(frame: np.ndarray, overlay: image.OverlayCompositor,
+                 tiles: Dict[int, image.OverlayTile]) -> None:
+    """
+    Renders each rectangle with its text once, then only blits the tiles.
+    """
+    height, width = frame.shape[:2]
+    for i, (top_left, bottom_right) in enumerate(hitboxes(height, width)):
+        tile = tiles.get(i)
+        if tile is None:
+            size = (bottom_right[0] - top_left[0] + 1, bottom_right[1] - top_left[1] + 1)
+            border = (255, 0, 0) if i == 0 else None
+            tile = tiles[i] = image.render_labelled_tile(
+                size, (0, 0, 255), 0.25 if i == 0 else 0.05, border, 2, "Looking left", (20, height // 2),
+                FONT, 1.0, (255, 255, 255), 2, cv2.LINE_AA)
+        overlay.blit(tile, top_left)
+    overlay.flush(frame)
+
+
+def time_case(shape: Tuple[int, int], repeats: int) -> Dict[str, float]:
+    """
+    Times each approach on a random frame.
+
+    Args:
+        shape (Tuple[int, int]): Height and width of the frame.
+        repeats (int): Number of frames drawn per approach.
+
+    Returns:
+        Dict[str, float]: Median milliseconds per frame of each approach, and speedups.
+    """
+    rng = np.random.default_rng(0)
+    source = rng.integers(0, 256, (*shape, 3), dtype=np.uint8)
+    overlay = image.OverlayCompositor()
+    tiles: Dict[int, image.OverlayTile] = {}
+
+    results = {}
+    cases = (
+        ("full_frame_ms", full_frame_blends),
+        ("compositor_ms", lambda f: compositor(f, overlay)),
+        ("cached_tiles_ms", lambda f: cached_tiles(f, overlay, tiles)),
+    )
+    for name, draw in cases:
+        times = []
+        for _ in range(repeats):
+            frame = source.copy()
+            start = time.perf_counter()
+            draw(frame)
+            times.append((time.perf_counter() - start) * 1000)
+        results[name] = float(np.median(times))
+
+    results["compositor_speedup"] = results["full_frame_ms"] / results["compositor_ms"]
+    results["cached_tiles_speedup"] = results["full_frame_ms"] / results["cached_tiles_ms"]
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the overlay compositor benchmark.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments.
+
+    Returns:
+        int: Exit code.
+    """
+    parser = argparse.ArgumentParser(description="Overlay compositor benchmark")
+    parser.add_argument("--repeats", type=int, default=100, help="Frames drawn per approach")
+    parser.add_argument("--output", type=pathlib.Path, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {name: time_case(shape, args.repeats) for name, shape in RESOLUTIONS.items()}
+    for name, result in results.items():
+        print(name)
+        for key, value in result.items():
+            print(f"    {key:<24}{value:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
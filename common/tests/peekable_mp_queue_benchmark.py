@@ -0,0 +1,117 @@
+"""
+Throughput benchmark of the peekable multiprocessing queue.
+
+A child process produces key codes while this process consumes them with plain `get`,
+`peek` followed by `get` (selective consumption) and batched `get_many`, compared to a
+plain `multiprocessing.Queue`.
+
+    python -m common.tests.peekable_mp_queue_benchmark --messages 20000
+"""
+
+from typing import Optional, List, Dict, Callable, Any
+import sys
+import json
+import time
+import pathlib
+import argparse
+import multiprocessing
+
+from common.PeekableMPQueue import PeekableMPQueue
+
+KEY_MESSAGE = 65
+
+
+def producer(queue: Any, count: int) -> None:
+    """
+    Puts `count` key codes into the queue. Runs in a child process.
+    """
+    for _ in range(count):
+        queue.put(KEY_MESSAGE)
+
+
+def consume_get(queue: Any, count: int) -> None:
+    for _ in range(count):
+        queue.get()
+
+
+def consume_peek(queue: PeekableMPQueue, count: int) -> None:
+    for _ in range(count):
+        if queue.peek() == KEY_MESSAGE:
+            queue.get()
+
+
+def consume_batch(queue: PeekableMPQueue, count: int, batch_size: int = 64) -> None:
+    received = 0
+    while received < count:
+        received += len(queue.get_many(min(batch_size, count - received)))
+
+
+def time_consumer(factory: Callable[[], Any], consumer: Callable[[Any, int], None], count: int) -> Dict[str, float]:
+    """
+    Times a consumer draining `count` messages sent by a child process. Throughput is
+    usually bound by the producer, so the consumer's own CPU time is reported too.
+
+    Returns:
+        Dict[str, float]: Messages per second and consumer CPU microseconds per message.
+    """
+    queue = factory()
+    process = multiprocessing.Process(target=producer, args=(queue, count))
+    start = time.perf_counter()
+    start_cpu = time.thread_time()
+    process.start()
+    consumer(queue, count)
+    cpu = time.thread_time() - start_cpu
+    elapsed = time.perf_counter() - start
+    process.join()
+    queue.close()
+    queue.join_thread()
+    return {"per_second": count / elapsed, "consumer_cpu_us": cpu / count * 1e6}
+
+
+def run_benchmark(messages: int) -> Dict[str, Dict[str, float]]:
+    """
+    Runs every consumer.
+
+    Args:
+        messages (int): Number of messages per measurement.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Results keyed by consumer.
+    """
+    cases = {
+        "mp_queue_get": (multiprocessing.Queue, consume_get),
+        "peekable_get": (PeekableMPQueue, consume_get),
+        "peekable_peek_get": (PeekableMPQueue, consume_peek),
+        "peekable_get_many": (PeekableMPQueue, consume_batch),
+    }
+    return {name: time_consumer(factory, consumer, messages) for name, (factory, consumer) in cases.items()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the peekable queue benchmark.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments.
+
+    Returns:
+        int: Exit code.
+    """
+    parser = argparse.ArgumentParser(description="Peekable multiprocessing queue throughput benchmark")
+    parser.add_argument("--messages", type=int, default=20000, help="Messages per measurement")
+    parser.add_argument("--output", type=pathlib.Path, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.messages)
+    for name, result in results.items():
+        print(f"{name:<20}{result['per_second']:>12.0f} msg/s{result['consumer_cpu_us']:>10.2f} us/msg consumer CPU")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
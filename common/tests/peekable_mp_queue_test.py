@@ -0,0 +1,178 @@
+"""
+Tests for the peekable multiprocessing queue.
+
+    python -m pytest common/tests/peekable_mp_queue_test.py
+"""
+
+import time
+import threading
+import multiprocessing
+from queue import Empty
+
+import pytest
+
+from common.PeekableMPQueue import PeekableMPQueue
+
+START_METHODS = [method for method in ("fork", "spawn")
+                 if method in multiprocessing.get_all_start_methods()]
+
+
+def produce(queue: PeekableMPQueue, items: list) -> None:
+    for item in items:
+        queue.put(item)
+
+
+def consume_with_peek(queue: PeekableMPQueue, results: PeekableMPQueue, count: int) -> None:
+    for _ in range(count):
+        peeked = queue.peek(timeout=5)
+        results.put((peeked, queue.get(timeout=5)))
+
+
+@pytest.fixture
+def queue():
+    queue = PeekableMPQueue()
+    yield queue
+    queue.close()
+    queue.join_thread()
+
+
+def test_peek_does_not_remove(queue):
+    queue.put(1)
+    queue.put(2)
+
+    assert queue.peek(timeout=1) == 1
+    assert queue.peek(timeout=1) == 1
+    assert queue.get(timeout=1) == 1
+    assert queue.peek(timeout=1) == 2
+    assert queue.get(timeout=1) == 2
+
+
+def test_peek_none_item(queue):
+    queue.put(None)
+
+    assert queue.peek(timeout=1) is None
+    assert not queue.empty()
+    assert queue.get(timeout=1) is None
+    assert queue.empty()
+
+
+def test_peek_non_blocking_empty(queue):
+    with pytest.raises(Empty):
+        queue.peek(block=False)
+
+    with pytest.raises(Empty):
+        queue.get(block=False)
+
+
+def test_peek_timeout(queue):
+    start = time.monotonic()
+    with pytest.raises(Empty):
+        queue.peek(timeout=0.1)
+
+    assert time.monotonic() - start >= 0.1
+
+
+def test_qsize_and_empty_include_peeked_item(queue):
+    queue.put("a")
+    queue.put("b")
+    queue.peek(timeout=1)
+
+    # The feeder thread may still be flushing the second item
+    deadline = time.monotonic() + 1
+    while queue.qsize() < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert queue.qsize() == 2
+    assert not queue.empty()
+
+    queue.get()
+    queue.get(timeout=1)
+    assert queue.qsize() == 0
+    assert queue.empty()
+
+
+def test_get_many(queue):
+    for i in range(5):
+        queue.put(i)
+    queue.peek(timeout=1)
+
+    # Wait for every item to reach the pipe so the batch is deterministic
+    deadline = time.monotonic() + 1
+    while queue.qsize() < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert queue.get_many(3, timeout=1) == [0, 1, 2]
+    assert queue.get_many(10, timeout=1) == [3, 4]
+    assert queue.get_many(10, block=False) == []
+    assert queue.get_many(0) == []
+
+
+def test_get_many_timeout(queue):
+    start = time.monotonic()
+    assert queue.get_many(5, timeout=0.1) == []
+    assert time.monotonic() - start >= 0.1
+
+
+def test_concurrent_peek_keeps_order(queue):
+    items = list(range(200))
+    produce(queue, items)
+    done = threading.Event()
+
+    def peek():
+        while not done.is_set():
+            try:
+                queue.peek(timeout=0.01)
+            except Empty:
+                pass
+
+    peeker = threading.Thread(target=peek)
+    peeker.start()
+    try:
+        received = [queue.get(timeout=5) for _ in items]
+    finally:
+        done.set()
+        peeker.join(5)
+
+    assert received == items
+
+
+@pytest.mark.parametrize("start_method", START_METHODS)
+def test_peek_items_from_child_process(start_method):
+    ctx = multiprocessing.get_context(start_method)
+    queue = PeekableMPQueue(ctx=ctx)
+    items = [65, "command", {"text": "land", "parsed_command": [("land", 0)]}]
+
+    process = ctx.Process(target=produce, args=(queue, items))
+    process.start()
+
+    received = []
+    for _ in items:
+        peeked = queue.peek(timeout=5)
+        assert queue.get(timeout=5) == peeked
+        received.append(peeked)
+
+    process.join(5)
+    assert received == items
+
+
+@pytest.mark.parametrize("start_method", START_METHODS)
+def test_peek_in_child_process(start_method):
+    ctx = multiprocessing.get_context(start_method)
+    queue = PeekableMPQueue(ctx=ctx)
+    results = PeekableMPQueue(ctx=ctx)
+    items = list(range(20))
+
+    # Peek in this process before the child starts; the child must not inherit the item
+    queue.put("parent")
+    assert queue.peek(timeout=1) == "parent"
+
+    process = ctx.Process(target=consume_with_peek, args=(queue, results, len(items)))
+    process.start()
+    produce(queue, items)
+
+    pairs = [results.get(timeout=5) for _ in items]
+    process.join(5)
+
+    assert all(peeked == got for peeked, got in pairs)
+    assert [got for _, got in pairs] == items
+    assert queue.get(block=False) == "parent"
@@ -0,0 +1,91 @@
+"""
+Tests for recording sessions and reading them back.
+
+    python -m pytest common/tests/session_recorder_test.py
+"""
+
+import dataclasses
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from common.session_recorder import (FLIGHT_STATISTICS, INDEX_MAGIC, VOICE_COMMANDS, WEBCAM, SessionReader,
+                                     SessionRecorder)
+
+SHAPE = (48, 64, 3)
+
+
+@dataclasses.dataclass
+class Statistics:
+    battery: int
+    height: float
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = SessionRecorder(tmp_path / "test.session", chunk_records=4)
+    recorder.start()
+    yield recorder
+    recorder.stop()
+
+
+def test_records_read_back_in_order(recorder):
+    start = recorder.start_time
+    for i in range(10):
+        recorder.record(FLIGHT_STATISTICS, {"battery": 100 - i, "height": np.float32(i)}, start + i)
+    recorder.record(FLIGHT_STATISTICS, Statistics(80, 1.5), start + 10)
+    recorder.stop()
+
+    with SessionReader(recorder.path) as reader:
+        records = list(reader.read(FLIGHT_STATISTICS))
+        assert [t for t, _ in records] == list(range(11))
+        assert records[3][1] == {"battery": 97, "height": 3.0}
+        assert records[-1][1] == {"battery": 80, "height": 1.5}
+
+        assert [t for t, _ in reader.read(FLIGHT_STATISTICS, 2, 4)] == [2, 3, 4]
+        assert reader.streams == {FLIGHT_STATISTICS: "records"}
+
+
+def test_unserialisable_record_skipped(recorder):
+    start = recorder.start_time
+    recorder.record(VOICE_COMMANDS, "take off", start)
+    recorder.record(VOICE_COMMANDS, object(), start + 1)
+    recorder.record(VOICE_COMMANDS, "land", start + 2)
+    recorder.stop()
+
+    assert recorder.records_recorded == 2
+    assert recorder.records_skipped == 1
+    with SessionReader(recorder.path) as reader:
+        assert list(reader.read(VOICE_COMMANDS)) == [(0, "take off"), (2, "land")]
+
+
+def test_frames_read_back(recorder):
+    start = recorder.start_time
+    for i in range(5):
+        assert recorder.record_frame(WEBCAM, np.full(SHAPE, i * 40, np.uint8), start + i / 30)
+    recorder.stop()
+
+    assert recorder.frames_recorded == 5
+    # Encoded frames return their buffers
+    assert recorder.frames.buffers.free == recorder.frames.buffers.allocations
+    with SessionReader(recorder.path) as reader:
+        frames = list(reader.read(WEBCAM))
+        assert len(frames) == 5
+        assert frames[2][1].shape == SHAPE
+        assert abs(int(frames[2][1][0, 0, 0]) - 80) <= 2
+
+
+def test_unindexed_session_scanned(recorder):
+    start = recorder.start_time
+    for i in range(8):
+        recorder.record(VOICE_COMMANDS, f"command {i}", start + i)
+    recorder.stop()
+
+    # Cut off the index, as if the recorder had crashed
+    data = recorder.path.read_bytes()
+    recorder.path.write_bytes(data[:data.rindex(INDEX_MAGIC)])
+
+    with SessionReader(recorder.path) as reader:
+        assert [data for _, data in reader.read(VOICE_COMMANDS)] == [f"command {i}" for i in range(8)]
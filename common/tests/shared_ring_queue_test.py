@@ -0,0 +1,153 @@
+"""
+Tests for the shared memory ring queue.
+
+    python -m pytest common/tests/shared_ring_queue_test.py
+"""
+
+import time
+import multiprocessing
+from queue import Empty, Full
+
+import pytest
+
+from common.SharedRingQueue import SharedRingQueue, ItemTooLargeError
+
+START_METHODS = [method for method in ("fork", "spawn")
+                 if method in multiprocessing.get_all_start_methods()]
+
+
+def produce(queue: SharedRingQueue, items: list) -> None:
+    for item in items:
+        queue.put(item, timeout=5)
+
+
+def echo(requests: SharedRingQueue, replies: SharedRingQueue, count: int) -> None:
+    for _ in range(count):
+        replies.put(requests.get(timeout=5), timeout=5)
+
+
+@pytest.fixture
+def queue():
+    queue = SharedRingQueue(capacity=4, slot_size=64)
+    yield queue
+    queue.unlink()
+
+
+def test_fifo_order_and_encodings(queue):
+    items = [65, -(1 << 63), {"text": "land", "parsed_command": [("land", 0)]}, 1 << 70]
+    for item in items:
+        queue.put(item)
+
+    assert [queue.get() for _ in items] == items
+
+
+def test_wraparound(queue):
+    # Many more items than slots, with the queue kept partly full
+    received = []
+    for i in range(3):
+        queue.put(i)
+    for i in range(3, 50):
+        received.append(queue.get())
+        queue.put(i)
+    while not queue.empty():
+        received.append(queue.get())
+
+    assert received == list(range(50))
+
+
+def test_full_and_empty(queue):
+    assert queue.empty()
+    assert queue.qsize() == 0
+
+    for i in range(queue.capacity):
+        queue.put_nowait(i)
+
+    assert queue.full()
+    assert queue.qsize() == queue.capacity
+    with pytest.raises(Full):
+        queue.put_nowait("overflow")
+
+    for i in range(queue.capacity):
+        assert queue.get_nowait() == i
+
+    assert queue.empty()
+    with pytest.raises(Empty):
+        queue.get_nowait()
+
+
+def test_put_timeout(queue):
+    for i in range(queue.capacity):
+        queue.put(i)
+
+    start = time.monotonic()
+    with pytest.raises(Full):
+        queue.put("overflow", timeout=0.1)
+    assert time.monotonic() - start >= 0.1
+    assert queue.qsize() == queue.capacity
+
+
+def test_get_timeout(queue):
+    start = time.monotonic()
+    with pytest.raises(Empty):
+        queue.get(timeout=0.1)
+    assert time.monotonic() - start >= 0.1
+
+
+def test_item_too_large(queue):
+    with pytest.raises(ItemTooLargeError):
+        queue.put("x" * 100)
+
+    # A rejected item does not use up a slot
+    assert queue.empty()
+    for i in range(queue.capacity):
+        queue.put_nowait(i)
+
+
+def test_closed_queue(queue):
+    queue.close()
+    with pytest.raises(ValueError):
+        queue.put(1)
+
+
+@pytest.mark.parametrize("start_method", START_METHODS)
+def test_items_from_child_process(start_method):
+    ctx = multiprocessing.get_context(start_method)
+    queue = SharedRingQueue(capacity=4, slot_size=256, ctx=ctx)
+    items = [65, "command", {"text": "land", "parsed_command": [("land", 0)]}] * 10
+
+    try:
+        # More items than slots, so the child blocks until they are read
+        process = ctx.Process(target=produce, args=(queue, items))
+        process.start()
+
+        received = [queue.get(timeout=5) for _ in items]
+        process.join(5)
+    finally:
+        queue.unlink()
+
+    assert received == items
+    assert process.exitcode == 0
+
+
+@pytest.mark.parametrize("start_method", START_METHODS)
+def test_round_trip_through_child_process(start_method):
+    ctx = multiprocessing.get_context(start_method)
+    requests = SharedRingQueue(capacity=2, slot_size=64, ctx=ctx)
+    replies = SharedRingQueue(capacity=2, slot_size=64, ctx=ctx)
+    items = list(range(20))
+
+    try:
+        process = ctx.Process(target=echo, args=(requests, replies, len(items)))
+        process.start()
+
+        received = []
+        for item in items:
+            requests.put(item, timeout=5)
+            received.append(replies.get(timeout=5))
+        process.join(5)
+    finally:
+        requests.unlink()
+        replies.unlink()
+
+    assert received == items
+    assert process.exitcode == 0
@@ -0,0 +1,192 @@
+"""
+Startup regression benchmark.
+
+Imports the entry point of each subsystem in a fresh interpreter with the import
+profiler enabled, and reports the median import time per target and subsystem. When
+given a baseline, exits with an error if any target is slower than the baseline by more
+than the threshold.
+
+    python -m common.tests.startup_benchmark --save-baseline startup_baseline.json
+    python -m common.tests.startup_benchmark --baseline startup_baseline.json --threshold 0.2
+"""
+
+from typing import Optional, List, Dict, Any
+import os
+import sys
+import json
+import pathlib
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+from common import constants as cc
+from common.file_handler import get_project_root
+
+PROFILE_SOURCE = """
+import sys
+sys.path.insert(0, {project_root!r})
+{setup}
+from common import import_profiler
+try:
+    import {module}
+except Exception as e:
+    print(f"{{type(e).__name__}}: {{e}}")
+    sys.exit(1)
+"""
+
+# Target name -> (setup statements, entry point module)
+TARGETS = {
+    "app": ("sys.path.insert(0, {app_src!r})", "main"),
+    cc.EYE_TRACKING: ("", "eye_tracking.src.main"),
+    cc.DRONE: ("", "drone.src.main"),
+    cc.VOICE_CONTROL: ("", "voice_control.src.main"),
+}
+
+
+def profile_target(target: str, profile_path: pathlib.Path) -> Dict[str, Any]:
+    """
+    Imports a target's entry point in a fresh interpreter with the import profiler enabled.
+
+    Args:
+        target (str): Name of the target in TARGETS.
+        profile_path (pathlib.Path): File the profile is written to.
+
+    Returns:
+        Dict[str, Any]: The profile.
+
+    Raises:
+        RuntimeError: If the entry point could not be imported.
+    """
+    project_root = get_project_root()
+    setup, module = TARGETS[target]
+    source = PROFILE_SOURCE.format(project_root=str(project_root), module=module,
+                                   setup=setup.format(app_src=str(project_root / "app" / "src")))
+
+    env = dict(os.environ, **{cc.STARTUP_PROFILE_ENV: str(profile_path)})
+    result = subprocess.run([sys.executable, "-c", source], cwd=project_root, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    if result.returncode != 0:
+        # Import errors are printed last to stdout, the profiler's report goes to stderr
+        output = result.stdout.strip().splitlines()
+        raise RuntimeError(output[-1] if output else f"exit code {result.returncode}")
+
+    with open(profile_path, "r") as f:
+        return json.load(f)
+
+
+def benchmark_target(target: str, repeats: int) -> Dict[str, Any]:
+    """
+    Profiles a target repeatedly and takes the median of each measurement.
+
+    Args:
+        target (str): Name of the target in TARGETS.
+        repeats (int): Number of fresh interpreters to profile.
+
+    Returns:
+        Dict[str, Any]: Median import time in total and per subsystem, or the error.
+    """
+    profiles = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i in range(repeats):
+            try:
+                profiles.append(profile_target(target, pathlib.Path(tmp_dir) / f"profile_{i}.json"))
+            except RuntimeError as e:
+                return {"error": str(e)}
+
+    subsystems = {name for profile in profiles for name in profile["subsystems"]}
+    return {
+        "import_time": statistics.median(profile["import_time"] for profile in profiles),
+        "modules": len(profiles[-1]["modules"]),
+        "subsystems": {
+            name: statistics.median(profile["subsystems"].get(name, {"time": 0.0})["time"] for profile in profiles)
+            for name in sorted(subsystems)
+        },
+        "slowest_modules": profiles[-1]["modules"][:10],
+    }
+
+
+def find_regressions(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                     threshold: float, min_delta: float) -> List[str]:
+    """
+    Compares results to a baseline.
+
+    Args:
+        results (Dict[str, Dict[str, Any]]): Benchmark results keyed by target.
+        baseline (Dict[str, Dict[str, Any]]): Baseline results keyed by target.
+        threshold (float): Allowed relative increase in import time.
+        min_delta (float): Increase in seconds below which a change is considered noise.
+
+    Returns:
+        List[str]: Description of each regression.
+    """
+    regressions = []
+    for target, expected in baseline.items():
+        result = results.get(target)
+        if result is None or "import_time" not in expected:
+            continue
+        if "error" in result:
+            regressions.append(f"{target}: failed to import ({result['error']})")
+            continue
+
+        delta = result["import_time"] - expected["import_time"]
+        if delta > min_delta and delta > expected["import_time"] * threshold:
+            subsystems = result["subsystems"]
+            slower = sorted(subsystems, key=lambda name: subsystems[name] - expected["subsystems"].get(name, 0.0),
+                            reverse=True)
+            regressions.append(f"{target}: {expected['import_time']:.3f} s -> {result['import_time']:.3f} s "
+                               f"(+{delta / expected['import_time']:.0%}), mostly in {slower[0]}")
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the startup benchmark.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments.
+
+    Returns:
+        int: Exit code. 1 if startup regressed against the baseline.
+    """
+    parser = argparse.ArgumentParser(description="Startup import time regression benchmark")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS), help="Entry points")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--baseline", type=pathlib.Path, help="Baseline to compare against")
+    parser.add_argument("--save-baseline", type=pathlib.Path, help="Write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative increase in import time")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="Seconds of increase ignored as noise")
+    parser.add_argument("--output", type=pathlib.Path, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {target: benchmark_target(target, args.repeats) for target in args.targets}
+    for target, result in results.items():
+        if "error" in result:
+            print(f"{target:<16}failed to import: {result['error']}")
+            continue
+
+        print(f"{target:<16}{result['import_time']:>8.3f} s{result['modules']:>8} modules")
+        for name, subsystem_time in sorted(result["subsystems"].items(), key=lambda item: item[1], reverse=True):
+            print(f"    {name:<20}{subsystem_time:>8.3f} s")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=4)
+
+    if args.baseline is None:
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+
+    regressions = find_regressions(results, baseline, args.threshold, args.min_delta)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,158 @@
+"""
+Benchmark of the tick scheduler against a fixed remainder sleep loop.
+
+Two worker loops (standing in for the gaze and drone loops) run CPU bound ticks while a
+third thread, standing in for the GUI thread, times how late its own 60 Hz timer fires.
+Tick work is scaled by `--slowdown` to simulate a slow laptop.
+
+    python -m common.tests.tick_scheduler_benchmark --slowdown 3
+"""
+
+from typing import Optional, List, Dict, Callable
+import sys
+import json
+import time
+import pathlib
+import argparse
+import threading
+
+import numpy as np
+
+from common.gui_helper import fps_to_ms, ms_to_fps
+from common.loop import TickScheduler, ms_delta
+from common import constants as c
+
+GUI_RATE = 60
+# Ticks per second and CPU milliseconds per tick of each worker loop on a fast machine
+WORKERS = {"gaze": (30, 12.0), "drone": (30, 4.0)}
+
+
+def fixed_remainder_loop(max_fps: int, callback: Callable[..., bool]) -> None:
+    """
+    The loop used before the tick scheduler, which sleeps for the remainder of each tick.
+    """
+    min_loop_ms = fps_to_ms(max_fps)
+    last_loop_start_time = time.perf_counter()
+
+    while True:
+        now = time.perf_counter()
+        tick_rate = ms_to_fps(ms_delta(last_loop_start_time, now))
+        last_loop_start_time = now
+        if callback(tick_rate=tick_rate) is False:
+            break
+
+        if min_loop_ms > 0:
+            ms_diff = ms_delta(last_loop_start_time, time.perf_counter())
+            if ms_diff < min_loop_ms:
+                time.sleep((min_loop_ms - ms_diff) / c.MILLISECONDS_PER_SECOND)
+
+
+def busy_work(milliseconds: float) -> None:
+    end = time.thread_time() + milliseconds / c.MILLISECONDS_PER_SECOND
+    while time.thread_time() < end:
+        pass
+
+
+def gui_thread(stop_event: threading.Event, lateness: List[float]) -> None:
+    """
+    Fires a 60 Hz timer and records how late each firing is, in milliseconds.
+    """
+    # Offset by half a period so the timer is not phase locked to the worker loops
+    period = 1 / GUI_RATE
+    deadline = time.perf_counter() + period * 1.5
+    while not stop_event.is_set():
+        time.sleep(max(0.0, deadline - time.perf_counter()))
+        lateness.append(ms_delta(deadline, time.perf_counter()))
+        busy_work(1.0)
+        deadline = max(deadline + period, time.perf_counter())
+
+
+def run_case(adaptive: bool, slowdown: float, duration: float) -> Dict[str, float]:
+    """
+    Runs the worker loops and the GUI thread for `duration` seconds.
+
+    Args:
+        adaptive (bool): Whether the workers use adaptive tick schedulers rather than
+                         the fixed remainder loop.
+        slowdown (float): Factor applied to each tick's CPU time.
+        duration (float): Seconds to run for.
+
+    Returns:
+        Dict[str, float]: Worker tick rates and GUI timer lateness.
+    """
+    stop_event = threading.Event()
+    ticks = {name: 0 for name in WORKERS}
+    schedulers = {}
+
+    def make_callback(name: str, work_ms: float) -> Callable[..., bool]:
+        def callback(tick_rate: float) -> bool:
+            ticks[name] += 1
+            busy_work(work_ms * slowdown)
+            return not stop_event.is_set()
+        return callback
+
+    threads = []
+    for name, (rate, work_ms) in WORKERS.items():
+        callback = make_callback(name, work_ms)
+        if adaptive:
+            schedulers[name] = TickScheduler(rate, rate / 3, True)
+            target = schedulers[name].run
+            args = (callback,)
+        else:
+            target = fixed_remainder_loop
+            args = (rate, callback)
+        threads.append(threading.Thread(target=target, args=args, name=name))
+
+    lateness: List[float] = []
+    threads.append(threading.Thread(target=gui_thread, args=(stop_event, lateness), name="gui"))
+
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+
+    results = {f"{name}_rate": ticks[name] / duration for name in WORKERS}
+    for name, scheduler in schedulers.items():
+        results[f"{name}_deadline_misses"] = scheduler.deadline_misses
+    results["gui_late_p50_ms"] = float(np.percentile(lateness, 50))
+    results["gui_late_p95_ms"] = float(np.percentile(lateness, 95))
+    results["gui_rate"] = len(lateness) / duration
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the tick scheduler benchmark.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments.
+
+    Returns:
+        int: Exit code.
+    """
+    parser = argparse.ArgumentParser(description="Tick scheduler benchmark")
+    parser.add_argument("--slowdown", type=float, default=3.0, help="Factor applied to each tick's CPU time")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per case")
+    parser.add_argument("--output", type=pathlib.Path, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {
+        "fixed_remainder": run_case(False, args.slowdown, args.duration),
+        "tick_scheduler": run_case(True, args.slowdown, args.duration),
+    }
+    for case, result in results.items():
+        print(case)
+        for name, value in result.items():
+            print(f"    {name:<24}{value:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,192 @@
+"""
+Tests for scheduling loop ticks, run against a fake clock.
+
+    python -m pytest common/tests/tick_scheduler_test.py
+"""
+
+from typing import List
+
+import pytest
+
+from common import loop
+from common.loop import IDLE, TickScheduler, get_scheduler
+
+RATE = 10
+PERIOD = 1 / RATE
+
+
+class FakeTime:
+    """
+    Stands in for the time module. Time only passes when slept or worked.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.cpu = 0.0
+        self.sleeps: List[float] = []
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def thread_time(self) -> float:
+        return self.cpu
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def work(self, seconds: float) -> None:
+        self.now += seconds
+        self.cpu += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(loop, "time", clock)
+    return clock
+
+
+class Callback:
+    """
+    Records the time of each tick, working for the given seconds each tick.
+    """
+
+    def __init__(self, clock: FakeTime, ticks: int, work=0.0):
+        self.clock = clock
+        self.ticks = ticks
+        self.work = work if callable(work) else (lambda tick: work)
+        self.times: List[float] = []
+        self.tick_rates: List[float] = []
+
+    def __call__(self, tick_rate: float):
+        if len(self.times) == self.ticks:
+            return False
+
+        self.times.append(self.clock.now)
+        self.tick_rates.append(tick_rate)
+        self.clock.work(self.work(len(self.times)))
+        return True
+
+    @property
+    def intervals(self) -> List[float]:
+        return [b - a for a, b in zip(self.times, self.times[1:])]
+
+
+def test_ticks_at_target_rate(clock):
+    callback = Callback(clock, 20)
+    scheduler = TickScheduler(RATE)
+    scheduler.run(callback)
+
+    assert callback.intervals == pytest.approx([PERIOD] * 19)
+    assert scheduler.ticks == 20
+    assert scheduler.deadline_misses == 0
+    assert callback.tick_rates[-1] == pytest.approx(RATE)
+
+
+def test_sleeps_until_deadline_without_drift(clock):
+    callback = Callback(clock, 20, work=lambda tick: 0.03 if tick % 2 else 0.07)
+    TickScheduler(RATE).run(callback)
+
+    # Ticks start on the deadlines, however long each tick worked
+    assert callback.intervals == pytest.approx([PERIOD] * 19)
+
+
+def test_late_tick_counted_as_missed(clock):
+    callback = Callback(clock, 5, work=lambda tick: 0.15 if tick == 2 else 0.0)
+    scheduler = TickScheduler(RATE)
+    scheduler.run(callback)
+
+    assert scheduler.deadline_misses == 1
+    # The next tick runs straight away, then the schedule is kept
+    assert callback.intervals == pytest.approx([PERIOD, 0.15, 0.05, PERIOD])
+
+
+def test_far_behind_starts_schedule_afresh(clock):
+    callback = Callback(clock, 4, work=lambda tick: 0.35 if tick == 2 else 0.0)
+    scheduler = TickScheduler(RATE)
+    scheduler.run(callback)
+
+    assert scheduler.deadline_misses == 1
+    # No burst of ticks to catch up with the missed deadlines
+    assert callback.intervals == pytest.approx([PERIOD, 0.35, PERIOD])
+
+
+def test_idle_ticks_not_counted(clock):
+    results = iter([True, IDLE, IDLE, True, False])
+    scheduler = TickScheduler(RATE)
+    scheduler.run(lambda tick_rate: next(results))
+
+    assert scheduler.ticks == 2
+    assert scheduler.idle_ticks == 2
+    assert clock.sleeps[1:3] == [PERIOD / 4, PERIOD / 4]
+
+
+def test_unlimited_rate_yields(clock):
+    callback = Callback(clock, 3, work=0.01)
+    TickScheduler(0).run(callback)
+
+    assert callback.intervals == pytest.approx([0.01, 0.01])
+    assert clock.sleeps == [0, 0, 0]
+
+
+def test_adaptive_rate_lowered_under_pressure_and_restored(clock):
+    heavy_ticks = 40
+    callback = Callback(clock, 200, work=lambda tick: 0.095 if tick <= heavy_ticks else 0.01)
+    rates = []
+    scheduler = TickScheduler(RATE, min_rate=5, adaptive=True)
+
+    def record_rate(tick_rate):
+        rates.append(scheduler.rate)
+        return callback(tick_rate)
+
+    scheduler.run(record_rate)
+
+    lowest = min(rates)
+    assert 5 <= lowest < RATE
+    assert rates.index(lowest) <= heavy_ticks + 1
+    assert scheduler.rate == RATE
+
+
+def test_adaptive_rate_not_below_min(clock):
+    callback = Callback(clock, 100, work=0.2)
+    scheduler = TickScheduler(RATE, min_rate=5, adaptive=True)
+    scheduler.run(callback)
+
+    assert scheduler.rate == 5
+
+
+def test_fixed_rate_not_adapted(clock):
+    callback = Callback(clock, 50, work=0.2)
+    scheduler = TickScheduler(RATE, min_rate=5)
+    scheduler.run(callback)
+
+    assert scheduler.rate == RATE
+
+
+def test_registered_while_running(clock):
+    seen = []
+    scheduler = TickScheduler(RATE, name="drone")
+
+    def callback(tick_rate):
+        seen.append(get_scheduler("drone"))
+        return len(seen) < 2
+
+    scheduler.run(callback)
+
+    assert seen == [scheduler, scheduler]
+    assert get_scheduler("drone") is None
+
+
+def test_stats(clock):
+    callback = Callback(clock, 11, work=0.02)
+    scheduler = TickScheduler(RATE)
+    scheduler.run(callback)
+    stats = scheduler.stats()
+
+    assert stats.ticks == 11
+    assert stats.interval_p50_ms == pytest.approx(PERIOD * 1000)
+    assert stats.interval_p99_ms == pytest.approx(PERIOD * 1000)
+    assert stats.work_ms == pytest.approx(20)
+    assert stats.load == pytest.approx(0.2)
+    assert not stats.degraded
@@ -0,0 +1,119 @@
+"""
+Tests for recording video on a background thread.
+
+    python -m pytest common/tests/video_recorder_test.py
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from common.frame_queue import DROP_NEWEST, DROP_OLDEST
+from common.video_recorder import TIMESTAMPS_SUFFIX, VideoRecorder
+
+SHAPE = (48, 64, 3)
+
+
+def frame(value: int) -> np.ndarray:
+    return np.full(SHAPE, value, np.uint8)
+
+
+class BlockedWriter:
+    """
+    Stands in for `VideoRecorder._write_frame`, holding the writer thread until released
+    and recording the value of each frame it is given.
+    """
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.values = []
+
+    def __call__(self, frame: np.ndarray, timestamp: float) -> None:
+        self.release.wait(5)
+        self.values.append(int(frame[0, 0, 0]))
+
+
+def recorder(tmp_path, **kwargs) -> VideoRecorder:
+    return VideoRecorder(tmp_path, "test", "avi", 30, **kwargs)
+
+
+def test_writes_video_and_timestamps(tmp_path):
+    video = recorder(tmp_path)
+    for i in range(5):
+        assert video.write(frame(i * 10), i / 30)
+    video.stop()
+
+    assert video.frames_written == 5
+    assert (tmp_path / "test.avi").is_file()
+    rows = (tmp_path / f"test{TIMESTAMPS_SUFFIX}").read_text().splitlines()
+    assert rows[0] == "frame,seconds"
+    assert len(rows) == 6
+
+
+def test_queued_frames_not_overwritten(tmp_path, monkeypatch):
+    video = recorder(tmp_path, queue_size=4)
+    writer = BlockedWriter()
+    monkeypatch.setattr(video, "_write_frame", writer)
+
+    source = frame(0)
+    for i in range(4):
+        # The producer reuses its frame, and the recorder's buffers are in use by the
+        # writer or the queue
+        source[:] = i
+        video.write(source, float(i))
+    writer.release.set()
+    video.stop()
+
+    assert writer.values == [0, 1, 2, 3]
+    # Buffers are returned once written, so only those in flight were allocated
+    assert video.frames.buffers.allocations <= 5
+    assert video.frames.buffers.free == video.frames.buffers.allocations
+
+
+@pytest.mark.parametrize("drop_policy, expected", [
+    (DROP_OLDEST, [0, 3, 4]),
+    (DROP_NEWEST, [0, 1, 2]),
+])
+def test_drop_policy(tmp_path, monkeypatch, drop_policy, expected):
+    video = recorder(tmp_path, queue_size=2, drop_policy=drop_policy)
+    writer = BlockedWriter()
+    monkeypatch.setattr(video, "_write_frame", writer)
+
+    video.write(frame(0), 0.0)
+    # Wait for the writer thread to take the first frame, leaving the queue empty
+    while not video.frames.empty():
+        pass
+    for i in range(1, 5):
+        video.write(frame(i), float(i))
+    writer.release.set()
+    video.stop()
+
+    assert writer.values == expected
+    assert video.frames_dropped == 2
+    assert video.frames.buffers.free == video.frames.buffers.allocations
+
+
+def test_first_segment_failure_raised_on_caller(tmp_path):
+    video = recorder(tmp_path / "missing")
+    with pytest.raises(RuntimeError):
+        video.write(frame(0), 0.0)
+    assert video.thread is None
+
+
+def test_writer_thread_failure_raised_by_next_write(tmp_path, monkeypatch):
+    video = recorder(tmp_path)
+
+    def fail(frame, timestamp):
+        raise RuntimeError("Encoder failed")
+
+    monkeypatch.setattr(video, "_write_frame", fail)
+    video.write(frame(0), 0.0)
+    video.thread.join(5)
+
+    with pytest.raises(RuntimeError) as error:
+        video.write(frame(1), 1.0)
+    assert str(error.value.__cause__) == "Encoder failed"
+    video.stop()
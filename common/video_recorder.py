@@ -0,0 +1,216 @@
+"""
+Records video on a background thread, so encoding does not add to the latency of the
+loop producing the frames.
+
+Frames are passed to the writer thread through a `FrameQueue`, so when the writer falls
+behind, frames are dropped according to the drop policy rather than blocking the
+producer. Each segment's frame timestamps are
+written to a CSV sidecar next to it, for variable rate playback, and long recordings are
+split into segments of a fixed duration.
+
+The first segment is opened on the thread writing the first frame, so a writer which
+cannot be opened raises there. A later failure on the writer thread stops the recording
+and is raised by the next `write`.
+"""
+
+from typing import Optional, Tuple, TextIO
+import csv
+import pathlib
+import threading
+import time
+
+import numpy as np
+import cv2
+
+from .logger_helper import init_logger
+from .frame_queue import FrameQueue, DROP_OLDEST
+
+logger = init_logger()
+
+FOURCC = {"mp4": "H264", "avi": "PIM1"}
+TIMESTAMPS_SUFFIX = ".timestamps.csv"
+
+
+class VideoRecorder:
+    """
+    Writes frames to segmented video files on a writer thread.
+    """
+
+    def __init__(self, output_dir: pathlib.Path, name: str, extension: str, fps: float,
+                 queue_size: int = 32, drop_policy: str = DROP_OLDEST, segment_seconds: Optional[float] = None):
+        """
+        Args:
+            output_dir: Folder to write the video and timestamp files to
+            name: Name of the recording. Segments after the first are suffixed with their index.
+            extension: Video file extension, one of FOURCC
+            fps: Nominal frame rate of the video files. Actual frame times are in the sidecar.
+            queue_size: Frames which may wait for the writer before frames are dropped
+            drop_policy: Which frame to drop when the queue is full, DROP_OLDEST or DROP_NEWEST
+            segment_seconds: Duration of each segment, or None to record a single file
+
+        Raises:
+            ValueError: If the extension or drop policy is not supported
+        """
+        if extension not in FOURCC:
+            raise ValueError(f"Unsupported video extension {extension}")
+
+        self.output_dir = output_dir
+        self.name = name
+        self.extension = extension
+        self.fps = fps if fps > 0 else 30
+        self.segment_seconds = segment_seconds
+
+        self.frames = FrameQueue(queue_size, f"Recorder {name}", drop_policy)
+        self.thread: Optional[threading.Thread] = None
+        self.start_time: Optional[float] = None
+        # Exception which stopped the writer thread, if any
+        self.error: Optional[BaseException] = None
+
+        self.frames_written = 0
+        self.segment_index = -1
+
+        self._writer: Optional[cv2.VideoWriter] = None
+        self._timestamps_file: Optional[TextIO] = None
+        self._timestamps: Optional[csv.writer] = None
+        self._segment_start = 0.0
+        self._segment_frames = 0
+
+    def start(self, start_time: Optional[float] = None, shape: Optional[Tuple[int, ...]] = None) -> None:
+        """
+        Starts the writer thread.
+
+        Args:
+            start_time: `time.perf_counter` time the recording starts at. Defaults to now.
+            shape: Shape of the frames. If given, the first segment is opened before the
+                   writer thread starts, so a failure to open it is raised here.
+
+        Raises:
+            RuntimeError: If the first segment could not be opened
+        """
+        if self.thread is not None:
+            return
+
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        if shape is not None:
+            try:
+                self._open_segment(shape, 0.0)
+            except RuntimeError:
+                self._close_segment()
+                self.segment_index = -1
+                raise
+
+        self.thread = threading.Thread(target=self._write_loop, name=f"{self.name}_recorder", daemon=True)
+        self.thread.start()
+        logger.info("Recording %s to %s", self.name, self.output_dir)
+
+    def write(self, frame: np.ndarray, timestamp: Optional[float] = None) -> bool:
+        """
+        Queues a frame to be written. Never blocks.
+
+        Args:
+            frame: The frame. Copied, so the caller may reuse it.
+            timestamp: `time.perf_counter` time of the frame. Defaults to now.
+
+        Returns:
+            True if the frame was queued, False if it was dropped
+
+        Raises:
+            RuntimeError: If the first segment could not be opened, or the writer thread
+                          has stopped with an error
+        """
+        if self.error is not None:
+            raise RuntimeError(f"Recorder {self.name} stopped after an error") from self.error
+
+        if timestamp is None:
+            timestamp = time.perf_counter()
+
+        if self.thread is None:
+            self.start(timestamp, frame.shape)
+
+        return self.frames.put(frame, timestamp - self.start_time)
+
+    @property
+    def frames_dropped(self) -> int:
+        """
+        Frames dropped because the writer was behind.
+        """
+        return self.frames.dropped
+
+    def stop(self) -> None:
+        """
+        Writes the queued frames and closes the files.
+        """
+        if self.thread is None:
+            return
+
+        # The writer thread no longer empties the queue if it stopped with an error
+        while self.thread.is_alive() and not self.frames.close(timeout=0.1):
+            pass
+        self.thread.join()
+        self.thread = None
+        logger.info("Recorded %s: %d frames written, %d dropped, %d segments", self.name,
+                    self.frames_written, self.frames_dropped, self.segment_index + 1)
+
+    # =========== Writer thread ===========
+
+    def _write_loop(self) -> None:
+        try:
+            while True:
+                item = self.frames.get()
+                if item is None:
+                    break
+
+                frame, timestamp = item
+                try:
+                    self._write_frame(frame, timestamp)
+                finally:
+                    self.frames.release(frame)
+        except Exception as e:
+            logger.exception("Recorder %s failed. Recording stopped", self.name)
+            self.error = e
+        finally:
+            self._close_segment()
+
+    def _write_frame(self, frame: np.ndarray, timestamp: float) -> None:
+        segment_elapsed = timestamp - self._segment_start
+        if self._writer is None or (self.segment_seconds and segment_elapsed >= self.segment_seconds):
+            self._open_segment(frame.shape, timestamp)
+
+        self._writer.write(frame)
+        self._timestamps.writerow((self._segment_frames, f"{timestamp:.6f}"))
+        self._segment_frames += 1
+        self.frames_written += 1
+
+    def _segment_path(self) -> pathlib.Path:
+        name = self.name if self.segment_index == 0 else f"{self.name}_{self.segment_index:03d}"
+        return self.output_dir / f"{name}.{self.extension}"
+
+    def _open_segment(self, shape: Tuple[int, ...], timestamp: float) -> None:
+        """
+        Closes the current segment, if any, and opens the next sized for the frame.
+        """
+        self._close_segment()
+        self.segment_index += 1
+        self._segment_start = timestamp
+        self._segment_frames = 0
+
+        path = self._segment_path()
+        height, width = shape[:2]
+        fourcc = cv2.VideoWriter_fourcc(*FOURCC[self.extension])
+        self._writer = cv2.VideoWriter(path.as_posix(), fourcc, self.fps, (width, height))
+        if not self._writer.isOpened():
+            raise RuntimeError(f"Failed to open video writer for {path}")
+
+        self._timestamps_file = open(path.with_suffix(TIMESTAMPS_SUFFIX), "w", newline="")
+        self._timestamps = csv.writer(self._timestamps_file)
+        self._timestamps.writerow(("frame", "seconds"))
+        logger.info("Recording segment %s", path)
+
+    def _close_segment(self) -> None:
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+        if self._timestamps_file is not None:
+            self._timestamps_file.close()
+            self._timestamps_file = None
+            self._timestamps = None
@@ -80,6 +80,8 @@ DEFAULT_CONFIG = {
     "controller": {
         "connect_to_drone": True,
         "max_tick_rate": 30,
+        "min_tick_rate": 10,
+        "adaptive_tick_rate": True,
         "keyboard_bindings": {
             "land": "l",
             "takeoff": 32,  # Space key
@@ -96,6 +98,17 @@ DEFAULT_CONFIG = {
             "motor on": "9",
             "motor off": "0",
         },
+        "gaze_control": {
+            # discrete: rotate by rotation_angle every repeat_interval
+            # continuous: set the yaw velocity from the gaze offset at control_rate
+            "mode": "discrete",
+            "dwell_time": 0.3,
+            "hysteresis": 0.05,
+            "repeat_interval": 1.0,
+            "rotation_angle": 35,
+            "control_rate": 10,
+            "max_yaw_speed": 60,
+        },
         "drone_stat_params": {
             FlightStatistics.BATTERY.value: 0.2,
             FLIGHT_STATISTICS: 0.2
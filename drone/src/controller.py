@@ -12,13 +12,15 @@ import cv2
 
 from common import constants as cc, keyboard
 from common.logger_helper import init_logger
-from common.omegaconf_helper import conf_key_from_value
-from common.loop import run_loop_with_max_tickrate, fps_to_ms
+from common.omegaconf_helper import conf_key_from_value, compile_config
+from common.loop import TickScheduler, IDLE, fps_to_ms
 from common.PeekableQueue import PeekableQueue
+from common import session_recorder
 
 from . import constants as c
 from .drone_actions import DroneActions
 from .flight_statistics import FlightStatistics
+from .gaze_intent import GazeIntent, GazeCommand, CONTINUOUS, DISCRETE
 from .models.tello_drone import TelloDrone
 from .models.mavic_drone import MavicDrone
 
@@ -79,7 +81,8 @@ class Controller:
             logger.info("Running in main mode")
 
         self.model = drone
-        self.config = controller_config
+        # Read-only view of the config for cheap access on every tick
+        self.config = compile_config(controller_config)
         self.connect_to_drone = self.config.connect_to_drone
         self._check_drone_connected()
 
@@ -87,10 +90,35 @@ class Controller:
             self.drone_video_fps = self.model.video_fps
 
         self.keyboard_bindings = self.config.keyboard_bindings
+        self.key_subscription: Optional[keyboard.KeySubscription] = None
+
+        # Last frame read from the drone, to detect when no new frame has been decoded
+        self.last_frame: Optional[cv2.typing.MatLike] = None
+
+        # Time source for gaze dwell and command timing. Replaced when replaying sessions.
+        self.clock = time.perf_counter
+        self.gaze_intent = self._create_gaze_intent()
 
         self._init_stat_params()
         logger.info("Drone controller initialised.")
 
+    def _create_gaze_intent(self) -> GazeIntent:
+        """
+        Creates the gaze intent from the config. Continuous gaze control falls back to
+        discrete if the drone does not support velocity control.
+
+        Returns:
+            GazeIntent: The gaze intent
+        """
+
+        gaze_intent = GazeIntent(self.config.gaze_control)
+        if gaze_intent.mode == CONTINUOUS and self.model is not None and not self.model.supports_rc_control:
+            logger.warning("%s does not support velocity control, using discrete gaze control",
+                           type(self.model).__name__)
+            gaze_intent.mode = DISCRETE
+
+        return gaze_intent
+
     def _init_stat_params(self) -> None:
         """
         Initialises the drone statistics parameters and times for the controller.
@@ -98,8 +126,7 @@ class Controller:
 
         logger.info("Initialising drone statistics parameters...")
         self.drone_stat_times = dict()
-        self.drone_stat_params = OmegaConf.to_container(
-            self.config.drone_stat_params, resolve=True)
+        self.drone_stat_params = dict(self.config.drone_stat_params)
 
         for param, tick_rate in self.drone_stat_params.items():
             milliseconds = fps_to_ms(tick_rate)
@@ -117,7 +144,8 @@ class Controller:
             tick_rate (float): The tick rate of the loop
 
         Returns:
-            True if the loop should continue, False otherwise
+            True if the loop should continue, False otherwise. IDLE if the drone
+            has not decoded a new frame since the last iteration.
         """
 
         logger.debug(">>> Begin drone loop")
@@ -125,12 +153,19 @@ class Controller:
         self._event_loop()
 
         if self.drone_connected:
+            # Telemetry is polled on its own schedule, whether or not there is a new frame
+            self._get_drone_statistics()
+
             ok, frame = self.model.read_camera()
             if not ok:
                 return False
 
+            if frame is self.last_frame:
+                self.thread_loop_handler(self.stop_event)
+                return IDLE
+
+            self.last_frame = frame
             self._render_frame(frame, tick_rate)
-            self._get_drone_statistics()
 
         self.thread_loop_handler(self.stop_event)
         logger.debug("<<< End drone loop")
@@ -145,8 +180,9 @@ class Controller:
             logger.debug(
                 "Drone module running in thread mode. Local GUI disabled.")
 
-            run_loop_with_max_tickrate(
-                self.config.max_tick_rate, self._controller_loop)
+            scheduler = TickScheduler(self.config.max_tick_rate, self.config.min_tick_rate,
+                                      self.config.adaptive_tick_rate, cc.DRONE)
+            scheduler.run(self._controller_loop)
         else:
             logger.debug("Importing PyQt6...")
 
@@ -181,19 +217,24 @@ class Controller:
             self.thread_data[cc.DRONE][cc.VIDEO_FRAME] = frame
             self.thread_data[cc.DRONE][cc.TICK_RATE] = tick_rate
 
-    def _has_waited(self, key: str) -> bool:
+        recorder = session_recorder.get_session_recorder()
+        if recorder is not None:
+            recorder.record_frame(session_recorder.DRONE_VIDEO, frame)
+
+    def _has_waited(self, key: str, telemetry_scale: float = 1) -> bool:
         """
         Checks the drone stat times to see if we have waited enough before updating the value corresponding to the key
 
         Args:
             key (str): The key to check
+            telemetry_scale (float): Factor to lengthen the wait by, set by the resource governor
 
         Returns:
             bool: True if we have waited enough, False otherwise
         """
         now = time.perf_counter()
         stat_time = self.drone_stat_times[key]
-        stat_wait = self.drone_stat_params[key]
+        stat_wait = self.drone_stat_params[key] / cc.MILLISECONDS_PER_SECOND * telemetry_scale
 
         return now - stat_time > stat_wait
 
@@ -209,9 +250,11 @@ class Controller:
 
         now = time.perf_counter()
         stat_vals = dict()
+        with self.data_lock:
+            telemetry_scale = self.thread_data[cc.DRONE].get(cc.TELEMETRY_SCALE, 1)
 
         # Battery
-        if self._has_waited(FlightStatistics.BATTERY.value):
+        if self._has_waited(FlightStatistics.BATTERY.value, telemetry_scale):
             logger.debug("Getting battery level...")
             self.model.battery_level = self.model.get_battery()
             logger.info("Drone battery: %d", self.model.battery_level)
@@ -219,7 +262,7 @@ class Controller:
 
         stat_vals[FlightStatistics.BATTERY.value] = self.model.battery_level
 
-        if self._has_waited(c.FLIGHT_STATISTICS):
+        if self._has_waited(c.FLIGHT_STATISTICS, telemetry_scale):
             for statistic in FlightStatistics:
                 statistic_value = statistic.value
                 if statistic_value == FlightStatistics.BATTERY.value:
@@ -241,6 +284,10 @@ class Controller:
         with self.data_lock:
             self.thread_data[cc.DRONE][cc.FLIGHT_STATISTICS] = stat_vals
 
+        recorder = session_recorder.get_session_recorder()
+        if recorder is not None:
+            recorder.record(session_recorder.FLIGHT_STATISTICS, stat_vals)
+
     def _event_loop(self) -> None:
         """
         Wraps all event handling for the drone controller.
@@ -268,13 +315,13 @@ class Controller:
             logger.warning("_wait_key should not be called in main mode")
             return False
 
-        if cc.KEYBOARD_QUEUE not in self.thread_data.keys():
-            logger.trace("Keyboard queue not yet initialised in shared data.")
-            return False
+        if self.key_subscription is None:
+            self.key_subscription = keyboard.subscribe_from_thread_data(
+                self.thread_data, self.data_lock, cc.DRONE, self.keyboard_bindings)
+            if self.key_subscription is None:
+                return False
 
-        keyboard_queue: PeekableQueue = self.thread_data[cc.KEYBOARD_QUEUE]
-        key_buffer = keyboard.keyboard_event_loop(
-            self.data_lock, keyboard_queue, self.keyboard_bindings)
+        key_buffer = self.key_subscription.get_keys()
         if not self.drone_connected:
             return
 
@@ -367,10 +414,11 @@ class Controller:
 
     def _wait_gaze_command(self) -> bool:
         """
-        Handles gaze commands. If the gaze command is recognised, it will be performed.
+        Handles gaze commands. The gaze is passed through the gaze intent, which decides
+        when a rotation should be sent, so a command is not sent on every tick.
 
         Returns:
-            True if a recognised gaze command is received, False otherwise.
+            True if a gaze command is sent, False otherwise.
         """
 
         if not self.running_in_thread:
@@ -389,23 +437,43 @@ class Controller:
                     "Gaze queue not yet initialised in shared data.")
                 return False
 
-            gaze_command = eye_tracking_data[cc.GAZE_SIDE]
+            gaze_side = eye_tracking_data[cc.GAZE_SIDE]
+            gaze_overlay = eye_tracking_data.get(cc.GAZE_OVERLAY)
 
         if not self.drone_connected:
-            return
+            return False
 
+        if gaze_side not in (None, cc.LEFT, cc.RIGHT):
+            logger.warning("Gaze command %s not recognised", gaze_side)
+            return False
+
+        gaze_command = self.gaze_intent.update(self.clock(), gaze_side, gaze_overlay)
         if gaze_command is None:
             return False
 
         logger.info("Received gaze command: %s", gaze_command)
-        match gaze_command:
-            case cc.LEFT:
-                self.perform_action(DroneActions.ROTATE_CCW.value)
-            case cc.RIGHT:
-                self.perform_action(DroneActions.ROTATE_CW.value)
-            case _:
-                logger.warning("Gaze command %s not recognised", gaze_command)
-                return False
+        if gaze_command.yaw_velocity is not None:
+            return self._send_yaw_velocity(gaze_command)
+
+        return self.perform_action(gaze_command.action, gaze_command.measurement)
+
+    def _send_yaw_velocity(self, gaze_command: GazeCommand) -> bool:
+        """
+        Sets the yaw velocity of the drone. Only sent in continuous gaze control, which
+        requires the drone to support velocity control.
+
+        Args:
+            gaze_command (GazeCommand): The gaze command with the yaw velocity
+
+        Returns:
+            True if the velocity was sent, False otherwise.
+        """
+
+        try:
+            self.model.send_rc_control(0, 0, 0, gaze_command.yaw_velocity)
+        except Exception as e:
+            logger.error("Error sending yaw velocity %d: %s", gaze_command.yaw_velocity, e)
+            return False
 
         return True
 
@@ -0,0 +1,192 @@
+"""
+Turns the user's gaze into drone rotation commands.
+
+Rather than rotating on every controller tick the gaze is on a side, a side must be
+looked at for `dwell_time` before it is acted on. It is then held until the gaze moves
+`hysteresis` (a fraction of half the screen width) back past the edge of the side's
+hit-box, so noise at the edge of a hit-box does not toggle it.
+
+While a side is held the drone either rotates by a fixed step every `repeat_interval`
+(discrete mode), or has its yaw velocity set with `send_rc_control` (continuous mode),
+in proportion to how far past the release edge the gaze is. Yaw velocities are sent at
+most `control_rate` times a second, and only when they change or every
+`repeat_interval` to keep the drone's last value fresh.
+"""
+
+from typing import Optional, Tuple, TYPE_CHECKING
+import dataclasses
+
+from omegaconf import OmegaConf
+
+from common import constants as cc
+from common.logger_helper import init_logger
+
+from .drone_actions import DroneActions
+
+if TYPE_CHECKING:
+    from common.gaze_overlay import GazeOverlay
+
+logger = init_logger()
+
+DISCRETE = "discrete"
+CONTINUOUS = "continuous"
+GAZE_CONTROL_MODES = (DISCRETE, CONTINUOUS)
+
+# Direction of rotation for each side, as the sign of the yaw velocity
+SIDE_DIRECTIONS = {cc.LEFT: -1, cc.RIGHT: 1}
+SIDE_ACTIONS = {cc.LEFT: DroneActions.ROTATE_CCW.value, cc.RIGHT: DroneActions.ROTATE_CW.value}
+
+
+@dataclasses.dataclass(frozen=True)
+class GazeCommand:
+    """
+    A command for the drone from the gaze. Either a discrete action or a yaw velocity.
+    """
+
+    action: Optional[str] = None
+    measurement: Optional[int] = None
+    yaw_velocity: Optional[int] = None
+
+
+def gaze_offset(overlay: Optional["GazeOverlay"], side: str) -> Optional[Tuple[float, float]]:
+    """
+    Measures how far the gaze point is towards a side, relative to the edge of the side's
+    hit-box.
+
+    Args:
+        overlay: The gaze overlay published by the gaze detector
+        side: LEFT or RIGHT
+
+    Returns:
+        The distance of the gaze point and of the inner edge of the hit-box from the
+        centre of the frame, towards the side, as fractions of half the frame width.
+        None if the overlay has no gaze point.
+    """
+    if overlay is None or overlay.gaze_point is None or side not in overlay.hitboxes:
+        return None
+
+    half_width = overlay.resolution[1] / 2
+    top_left, bottom_right = overlay.hitboxes[side]
+    inner_edge = bottom_right[0] if side == cc.LEFT else top_left[0]
+    direction = SIDE_DIRECTIONS[side]
+
+    offset = direction * (overlay.gaze_point[0] - half_width) / half_width
+    edge = direction * (inner_edge - half_width) / half_width
+    return offset, edge
+
+
+class GazeIntent:
+    """
+    State machine deciding when and how the drone should rotate from the gaze.
+    """
+
+    def __init__(self, gaze_control_config: OmegaConf):
+        """
+        Args:
+            gaze_control_config: The gaze control config
+
+        Raises:
+            ValueError: If the mode is not recognised
+        """
+        if gaze_control_config.mode not in GAZE_CONTROL_MODES:
+            raise ValueError(f"Invalid gaze control mode: {gaze_control_config.mode}")
+
+        self.mode = gaze_control_config.mode
+        self.dwell_time = gaze_control_config.dwell_time
+        self.hysteresis = gaze_control_config.hysteresis
+        self.repeat_interval = gaze_control_config.repeat_interval
+        self.rotation_angle = gaze_control_config.rotation_angle
+        self.control_period = 1 / gaze_control_config.control_rate
+        self.max_yaw_speed = gaze_control_config.max_yaw_speed
+
+        # Side being looked at and when the gaze arrived there
+        self.looked_side: Optional[str] = None
+        self.looked_since: Optional[float] = None
+        # Side being acted on
+        self.active_side: Optional[str] = None
+
+        self.last_command_time: Optional[float] = None
+        self.last_yaw_velocity = 0
+
+    def _looked_side(self, gaze_side: Optional[str], overlay: Optional["GazeOverlay"]) -> Optional[str]:
+        """
+        The side being looked at. The active side is held until the gaze moves back past
+        the release edge.
+        """
+        if self.active_side is not None:
+            offsets = gaze_offset(overlay, self.active_side)
+            if offsets is not None:
+                offset, edge = offsets
+                if offset >= edge - self.hysteresis:
+                    return self.active_side
+
+        return gaze_side
+
+    def _yaw_velocity(self, overlay: Optional["GazeOverlay"]) -> int:
+        """
+        Yaw velocity for the active side, proportional to how far past the release edge
+        the gaze is. Full speed if the gaze point is not known.
+        """
+        direction = SIDE_DIRECTIONS[self.active_side]
+        offsets = gaze_offset(overlay, self.active_side)
+        if offsets is None:
+            return direction * self.max_yaw_speed
+
+        offset, edge = offsets
+        release = edge - self.hysteresis
+        fraction = min(max((offset - release) / max(1 - release, 1e-6), 0.0), 1.0)
+        return direction * round(fraction * self.max_yaw_speed)
+
+    def update(self, now: float, gaze_side: Optional[str],
+               overlay: Optional["GazeOverlay"] = None) -> Optional[GazeCommand]:
+        """
+        Updates the intent with the latest gaze.
+
+        Args:
+            now: Current time in seconds
+            gaze_side: The hit-box being looked at, if any
+            overlay: The gaze overlay, for the position of the gaze point
+
+        Returns:
+            The command to send to the drone, if any
+        """
+        looked_side = self._looked_side(gaze_side, overlay)
+        if looked_side != self.looked_side:
+            self.looked_side = looked_side
+            self.looked_since = now
+
+        if self.active_side is not None and looked_side != self.active_side:
+            logger.info("Gaze released %s", self.active_side)
+            self.active_side = None
+            if self.mode == CONTINUOUS and self.last_yaw_velocity != 0:
+                return self._yaw_command(now, 0)
+
+        if self.active_side is None:
+            if looked_side is None or now - self.looked_since < self.dwell_time:
+                return None
+
+            logger.info("Gaze dwelled on %s", looked_side)
+            self.active_side = looked_side
+            self.last_command_time = None
+
+        if self.mode == DISCRETE:
+            if self.last_command_time is not None and now - self.last_command_time < self.repeat_interval:
+                return None
+
+            self.last_command_time = now
+            return GazeCommand(action=SIDE_ACTIONS[self.active_side], measurement=self.rotation_angle)
+
+        if self.last_command_time is not None and now - self.last_command_time < self.control_period:
+            return None
+
+        yaw_velocity = self._yaw_velocity(overlay)
+        keep_alive = self.last_command_time is None or now - self.last_command_time >= self.repeat_interval
+        if yaw_velocity == self.last_yaw_velocity and not keep_alive:
+            return None
+
+        return self._yaw_command(now, yaw_velocity)
+
+    def _yaw_command(self, now: float, yaw_velocity: int) -> GazeCommand:
+        self.last_command_time = now
+        self.last_yaw_velocity = yaw_velocity
+        return GazeCommand(yaw_velocity=yaw_velocity)
@@ -10,6 +10,7 @@ from omegaconf import DictConfig, OmegaConf
 
 from common.logger_helper import init_logger
 from common import omegaconf_helper as oh
+from common.import_profiler import profile_phase
 
 from .utils import file_handler as fh
 from . import constants as c
@@ -35,6 +36,7 @@ def init_config() -> DictConfig:
     return config
 
 
+@profile_phase()
 def init() -> DictConfig:
     """
     Initialises the drone module
@@ -54,6 +56,7 @@ def init() -> DictConfig:
     return config
 
 
+@profile_phase()
 def init_drone(config: OmegaConf, stop_event: Optional[Event] = None) -> Optional[Union[models.TelloDrone, models.MavicDrone]]:
     """
     Initialises the drone
@@ -13,6 +13,9 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
 print("Project root: ", project_root)
 sys.path.insert(0, project_root)
 
+# Installs the import profiler, if enabled, so the remaining imports are profiled
+from common import import_profiler  # noqa: F401
+
 from common.logger_helper import init_logger
 
 from .controller import Controller
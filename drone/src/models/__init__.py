@@ -1,3 +1,4 @@
 from .mavic_drone import MavicDrone
 from .tello_drone import TelloDrone
+from .simulated_drone import SimulatedDrone
 from .drone import Drone
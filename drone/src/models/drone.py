@@ -9,6 +9,9 @@ import cv2
 
 
 class Drone(ABC):
+    # Whether the drone's velocities can be set with send_rc_control
+    supports_rc_control = False
+
     @abstractmethod
     def connect(self):
         """
@@ -143,6 +146,24 @@ class Drone(ABC):
         """
         pass
 
+    def send_rc_control(self, left_right: int, forward_backward: int, up_down: int, yaw: int) -> None:
+        """Set the velocities of the drone, as with a remote control. Only drones which
+        set supports_rc_control implement this.
+
+        Args:
+            left_right (int): Velocity to the right, from -100 to 100.
+            forward_backward (int): Velocity forward, from -100 to 100.
+            up_down (int): Velocity up, from -100 to 100.
+            yaw (int): Clockwise yaw velocity, from -100 to 100.
+
+        Raises:
+            NotImplementedError: If the drone does not set supports_rc_control.
+
+        Returns:
+            None
+        """
+        raise NotImplementedError
+
     # Polling methods
     @abstractmethod
     def get_height(self) -> int:
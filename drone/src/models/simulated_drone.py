@@ -0,0 +1,152 @@
+"""
+Defines a simulated drone, replaying recorded video and telemetry. Used to run the
+controller without a drone, e.g. when replaying a recorded session.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import time
+
+import cv2
+
+from common.logger_helper import init_logger
+
+from ..flight_statistics import FlightStatistics
+
+from .drone import Drone
+
+logger = init_logger()
+
+
+class RecordedTelemetry:
+    """
+    Stands in for the drone SDK the controller reads flight statistics from. Each
+    `get_<statistic>` method returns the statistic's last recorded value.
+    """
+
+    def __init__(self):
+        self.statistics: Dict[str, Any] = dict()
+
+    def __getattr__(self, name: str) -> Callable[[], Any]:
+        if not name.startswith("get_"):
+            raise AttributeError(name)
+
+        statistic = name[len("get_"):]
+        return lambda: self.statistics.get(statistic)
+
+
+class SimulatedDrone(Drone):
+    """
+    Drone which shows frames and telemetry set from outside and records the commands
+    sent to it instead of flying.
+    """
+
+    supports_rc_control = True
+
+    def __init__(self, video_fps: int = 30, clock: Optional[Callable[[], float]] = None):
+        """
+        Initialises the simulated drone
+
+        Args:
+            video_fps (int): Frame rate of the video which will be set
+            clock (Optional[Callable[[], float]]): Time source for the command log.
+                                                   Defaults to `time.perf_counter`.
+        """
+        self.drone = RecordedTelemetry()
+        self.clock = clock or time.perf_counter
+        self.video_fps = video_fps
+        self.frame: Optional[cv2.typing.MatLike] = None
+
+        # Time and command string of each command sent, in Tello SDK syntax
+        self.commands: List[Tuple[float, str]] = []
+
+        self.battery_level = None
+        self.in_flight = False
+        self.success = self.connect()
+
+    def ext_connect(self) -> bool:
+        self.success = self.connect()
+        return self.success
+
+    def connect(self) -> bool:
+        logger.info("Simulated drone connected")
+        return True
+
+    def set_frame(self, frame: cv2.typing.MatLike) -> None:
+        """
+        Sets the frame returned by the drone's camera.
+
+        Args:
+            frame (cv2.typing.MatLike): The frame
+        """
+        self.frame = frame
+
+    def set_statistics(self, statistics: Dict[str, Any]) -> None:
+        """
+        Updates the flight statistics reported by the drone.
+
+        Args:
+            statistics (Dict[str, Any]): Statistic values by name, as in FlightStatistics
+        """
+        self.drone.statistics.update(statistics)
+
+    def read_camera(self) -> Tuple[bool, cv2.typing.MatLike]:
+        return True, self.frame
+
+    def get_battery(self) -> Optional[int]:
+        return self.drone.get_battery()
+
+    def get_height(self) -> int:
+        return self.drone.statistics.get(FlightStatistics.HEIGHT.value, 0)
+
+    def _send_command(self, command: str) -> None:
+        timestamp = self.clock()
+        logger.info("Simulated drone command at %.3f: %s", timestamp, command)
+        self.commands.append((timestamp, command))
+
+    def rotate_clockwise(self, degrees: int) -> None:
+        self._send_command(f"cw {degrees}")
+
+    def rotate_counter_clockwise(self, degrees: int) -> None:
+        self._send_command(f"ccw {degrees}")
+
+    def move_up(self, cm: int) -> None:
+        self._send_command(f"up {cm}")
+
+    def move_down(self, cm: int) -> None:
+        self._send_command(f"down {cm}")
+
+    def move_left(self, cm: int) -> None:
+        self._send_command(f"left {cm}")
+
+    def move_right(self, cm: int) -> None:
+        self._send_command(f"right {cm}")
+
+    def move_forward(self, cm: int) -> None:
+        self._send_command(f"forward {cm}")
+
+    def move_backward(self, cm: int) -> None:
+        self._send_command(f"back {cm}")
+
+    def takeoff(self) -> None:
+        self._send_command("takeoff")
+        self.in_flight = True
+
+    def land(self) -> None:
+        self._send_command("land")
+        self.in_flight = False
+
+    def flip_forward(self) -> None:
+        self._send_command("flip f")
+
+    def emergency(self) -> None:
+        self._send_command("emergency")
+        self.in_flight = False
+
+    def motor_on(self) -> None:
+        self._send_command("motoron")
+
+    def motor_off(self) -> None:
+        self._send_command("motoroff")
+
+    def send_rc_control(self, left_right: int, forward_backward: int, up_down: int, yaw: int) -> None:
+        self._send_command(f"rc {left_right} {forward_backward} {up_down} {yaw}")
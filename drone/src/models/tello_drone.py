@@ -34,6 +34,8 @@ class TelloDrone(Drone):
     Implements a Tello drone wrapper class
     """
 
+    supports_rc_control = True
+
     def __init__(self, tello_config: OmegaConf, stop_event: Optional[Event]) -> None:
         """
         Initialises the Tello drone
@@ -301,6 +303,10 @@ class TelloDrone(Drone):
     def motor_off(self) -> None:
         self.drone.turn_motor_off()
 
+    def send_rc_control(self, left_right: int, forward_backward: int, up_down: int, yaw: int) -> None:
+        # RC commands get no response, so are not spaced out like other commands
+        self.drone.send_rc_control(left_right, forward_backward, up_down, yaw)
+
     def __getattribute__(self, name: str) -> Any:
         if name != "drone" and name in self.drone.__dict__:
             return getattr(self.drone, name)
@@ -0,0 +1,119 @@
+"""
+Tests for turning the gaze into drone rotation commands.
+
+    python -m pytest drone/tests/gaze_intent_test.py
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from omegaconf import OmegaConf
+
+from common import constants as cc
+from drone.src.constants import DEFAULT_CONFIG
+from drone.src.drone_actions import DroneActions
+from drone.src.gaze_intent import GazeIntent, GazeCommand, CONTINUOUS, DISCRETE
+
+TICK = 1 / 30
+WIDTH = 640
+HEIGHT = 480
+HITBOXES = {
+    cc.LEFT: ((0, 0), (160, HEIGHT)),
+    cc.RIGHT: ((480, 0), (WIDTH, HEIGHT)),
+}
+
+
+def overlay(x: int) -> SimpleNamespace:
+    # Stands in for GazeOverlay, which needs OpenCV
+    return SimpleNamespace(resolution=(HEIGHT, WIDTH), hitboxes=HITBOXES, gaze_point=(x, HEIGHT // 2))
+
+
+def side_of(x: int):
+    if x < HITBOXES[cc.LEFT][1][0]:
+        return cc.LEFT
+    if x >= HITBOXES[cc.RIGHT][0][0]:
+        return cc.RIGHT
+    return None
+
+
+def run(intent: GazeIntent, xs, start: float = 0.0):
+    commands = []
+    for i, x in enumerate(xs):
+        command = intent.update(start + i * TICK, side_of(x), overlay(x))
+        if command is not None:
+            commands.append(command)
+    return commands
+
+
+def create_intent(**overrides) -> GazeIntent:
+    config = OmegaConf.merge(OmegaConf.create(DEFAULT_CONFIG["controller"]["gaze_control"]), overrides)
+    return GazeIntent(config)
+
+
+def test_glance_is_ignored():
+    intent = create_intent()
+    assert run(intent, [600] * 5 + [320] * 30) == []
+
+
+def test_discrete_repeats_at_interval():
+    intent = create_intent()
+    # Three seconds looking right at 30 Hz
+    commands = run(intent, [600] * 90)
+    expected = GazeCommand(action=DroneActions.ROTATE_CW.value, measurement=35)
+    assert commands == [expected] * 3
+
+
+def test_left_rotates_counter_clockwise():
+    intent = create_intent()
+    commands = run(intent, [20] * 30)
+    assert commands[0].action == DroneActions.ROTATE_CCW.value
+
+
+def test_hysteresis_holds_side_at_edge():
+    intent = create_intent(repeat_interval=100)
+    # Dwell, then jitter either side of the hit-box edge without going past the release edge
+    xs = [600] * 15 + [475, 485] * 30
+    run(intent, xs)
+    assert intent.active_side == cc.RIGHT
+
+    run(intent, [320], start=len(xs) * TICK)
+    assert intent.active_side is None
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        create_intent(mode="teleport")
+
+
+def test_continuous_scales_and_stops():
+    intent = create_intent(mode=CONTINUOUS)
+    commands = run(intent, [WIDTH] * 30 + [320] * 5)
+    yaws = [command.yaw_velocity for command in commands]
+
+    assert yaws[0] == 60
+    assert yaws[-1] == 0
+    # Unchanged velocities are not resent within the keep alive interval
+    assert len(yaws) == 2
+
+
+def test_continuous_rate_limited():
+    intent = create_intent(mode=CONTINUOUS, control_rate=10)
+    # Sweep further and further left, changing the velocity every tick
+    xs = [150] * 10 + list(range(150, 0, -5))
+    commands = run(intent, xs)
+    assert all(command.yaw_velocity < 0 for command in commands)
+    assert len(commands) <= len(xs) * TICK * 10 + 1
+
+
+@pytest.mark.parametrize("supports_rc_control, mode", [(True, CONTINUOUS), (False, DISCRETE)])
+def test_controller_uses_discrete_without_rc_control(supports_rc_control, mode):
+    pytest.importorskip("djitellopy")
+    from drone.src.controller import Controller
+    from drone.src.models import SimulatedDrone
+
+    drone = SimulatedDrone()
+    drone.supports_rc_control = supports_rc_control
+    config = OmegaConf.merge(OmegaConf.create(DEFAULT_CONFIG["controller"]),
+                             {"connect_to_drone": True, "gaze_control": {"mode": CONTINUOUS}})
+
+    assert Controller(drone, config).gaze_intent.mode == mode
@@ -6,6 +6,7 @@ Last Updated: 10/09/2024
 
 import datetime
 import pathlib
+import time
 from typing import Optional, Tuple, Dict
 from threading import Event, Lock
 
@@ -15,11 +16,15 @@ from omegaconf import OmegaConf
 
 from common import constants as cc, keyboard
 from common.logger_helper import init_logger
-from common.omegaconf_helper import conf_key_from_value
-from common.loop import run_loop_with_max_tickrate
-from common.PeekableQueue import PeekableQueue
+from common.omegaconf_helper import conf_key_from_value, compile_config
+from common.loop import TickScheduler
+from common import gaze_overlay
+from common.frame_pool import FramePool
+from common.video_recorder import VideoRecorder
+from common import session_recorder
 
 from . import constants as c
+from . import gaze_filters
 from .face import Face
 from .face_model_mediapipe import FaceModelMediaPipe
 from .face_parts import FacePartsName
@@ -78,14 +83,18 @@ class GazeDetector:
         else:
             logger.info("Running in main mode")
 
-        self.config = config
+        # Read-only view of the config for cheap access on every frame
+        self.config = compile_config(config)
         self.gaze_estimator = GazeEstimator(config)
         face_model_3d = FaceModelMediaPipe()
         self.camera_visualiser = Visualiser(
             self.gaze_estimator.camera, face_model_3d.NOSE_INDEX)
-        if self.running_in_thread:
-            self.gaze_visualiser = Visualiser(
-                self.gaze_estimator.camera, face_model_3d.NOSE_INDEX)
+
+        # Reused frame buffers, so the frame path does not allocate or copy full frames
+        self.frame_pool = FramePool(name=cc.EYE_TRACKING)
+        self.pool_copies = 0
+        self.capture_shape: Optional[Tuple[int, ...]] = None
+        self.undistort_maps: Optional[Tuple[Tuple[int, int], np.ndarray, np.ndarray]] = None
 
         self.cap = self._create_capture()
         self.output_dir = self._create_output_dir()
@@ -109,15 +118,40 @@ class GazeDetector:
         self.average_eye_center = None
         self.average_gaze_vector = None
 
+        self.blinking = False
+
         # Point on screen
-        self.point_buffer = []
+        self.gaze_filter = gaze_filters.create_gaze_filter(self.config.gaze_point)
         self.gaze_2d_point = None
 
         # Hitboxes
         self.hitboxes = None
+        self.hitbox_key: Optional[Tuple[Tuple[int, int], float]] = None
 
         # Keyboard bindings
         self.keyboard_bindings = self.config.keyboard_bindings
+        self.key_subscription: Optional[keyboard.KeySubscription] = None
+
+        # Set by the resource governor in the main GUI
+        self.overlay_quality = cc.QUALITY_HIGH
+        self.preview_scale = 1.0
+        self.frame_time: Optional[float] = None
+
+    def _update_hitboxes(self) -> None:
+        """
+        Initialises the hit-boxes, or re-initialises them when the resolution or hit-box
+        width changes, discarding the overlay layers cached for the old hit-boxes.
+
+        Returns:
+            None
+        """
+        hitbox_key = (self.camera_visualiser.get_2d_resolution(), self.config.demo.hitbox_width_proprtion)
+        if self.hitboxes is not None and hitbox_key == self.hitbox_key:
+            return
+
+        self.hitboxes = self._init_hitboxes()
+        self.hitbox_key = hitbox_key
+        self.camera_visualiser.clear_layer_cache()
 
     def _init_hitboxes(self) -> Dict[str, Tuple[Tuple[int, int], Tuple[int, int]]]:
         """
@@ -211,12 +245,13 @@ class GazeDetector:
             else:
                 logger.info("Video feed will be displayed on screen")
 
-        run_loop_with_max_tickrate(
-            self.config.demo.max_tick_rate, self._gaze_loop)
+        scheduler = TickScheduler(self.config.demo.max_tick_rate, self.config.demo.min_tick_rate,
+                                  self.config.demo.adaptive_tick_rate, cc.EYE_TRACKING)
+        scheduler.run(self._gaze_loop)
 
         self.cap.release()
         if self.writer:
-            self.writer.release()
+            self.writer.stop()
 
         if self.running_in_thread:
             # Exit parent thread
@@ -233,6 +268,7 @@ class GazeDetector:
 
         if self.running_in_thread:
             self.thread_loop_handler(self.stop_event)
+            self._read_resource_settings()
 
         if self.config.demo.display_on_screen:
             self._wait_key()
@@ -242,15 +278,34 @@ class GazeDetector:
         ok, frame = self._read_camera()
         if not ok:
             return False
+        self.frame_time = time.perf_counter()
 
-        self._process_image(frame)
+        self._process_image(frame, owned=True)
 
         if self.config.demo.display_on_screen:
             self._render_frame("frame", tick_rate)
 
+        copies = self.frame_pool.copies - self.pool_copies
+        self.pool_copies = self.frame_pool.copies
+        logger.debug("Full frame copies this tick: %d", copies)
+
         logger.debug("<<< End eye tracking loop")
         return not self.stop
 
+    def _read_resource_settings(self) -> None:
+        """
+        Reads the overlay quality and preview scale set by the resource governor.
+        """
+        with self.data_lock:
+            eye_tracking_data: Dict = self.thread_data[cc.EYE_TRACKING]
+            overlay_quality = eye_tracking_data.get(cc.OVERLAY_QUALITY, cc.QUALITY_HIGH)
+            self.preview_scale = eye_tracking_data.get(cc.PREVIEW_SCALE, 1.0)
+
+        if overlay_quality != self.overlay_quality:
+            logger.info("Overlay quality set to %s", overlay_quality)
+            self.overlay_quality = overlay_quality
+            self.camera_visualiser.set_quality(overlay_quality)
+
     def _render_frame(self, win_name: str, tick_rate: float) -> None:
         """
         Renders a frame where it needs to go
@@ -268,8 +323,20 @@ class GazeDetector:
                 logger.trace("No image to render.")
                 return
 
+            frame = self.camera_visualiser.image
+            if self.preview_scale < 1:
+                height, width = frame.shape[:2]
+                preview_size = (int(width * self.preview_scale), int(height * self.preview_scale))
+                preview = self.frame_pool.acquire("preview", (preview_size[1], preview_size[0], frame.shape[2]))
+                frame = cv2.resize(frame, preview_size, dst=preview, interpolation=cv2.INTER_AREA)
+                self.frame_pool.count_copy()
+
+            # Consumers copy the frame if they need to draw on it
+            self.frame_pool.publish(frame)
+
             with self.data_lock:
-                self.thread_data[cc.EYE_TRACKING][cc.VIDEO_FRAME] = self.camera_visualiser.image
+                self.thread_data[cc.EYE_TRACKING][cc.VIDEO_FRAME] = frame
+                self.thread_data[cc.EYE_TRACKING][cc.FRAME_TIME] = self.frame_time
                 self.thread_data[cc.EYE_TRACKING][cc.TICK_RATE] = tick_rate
 
             logger.debug("Set video frame in shared data.")
@@ -282,38 +349,55 @@ class GazeDetector:
 
     def _read_camera(self) -> Tuple[bool, np.ndarray]:
         """
-        Read the camera feed and upscale the frame.
+        Read the camera feed and upscale the frame, into buffers from the frame pool.
 
         Returns:
             Tuple of boolean and frame
         """
-        ok, frame = self.cap.read()
+        # Read into a pooled buffer once the shape of the camera's frames is known
+        buffer = None
+        if self.capture_shape is not None:
+            buffer = self.frame_pool.acquire("capture", self.capture_shape)
+        ok, frame = self.cap.read(buffer)
         if not ok:
             return ok, frame
+        self.capture_shape = frame.shape
+
+        upscaled_width, upscaled_height = self.config.demo.upscale_dim
+        if frame.shape[:2] == (upscaled_height, upscaled_width):
+            return ok, frame
 
         # Upscale feed
+        upscaled = self.frame_pool.acquire("upscaled", (upscaled_height, upscaled_width, frame.shape[2]))
         upscaled_frame = transforms.upscale(
-            frame, self.config.demo.upscale_dim)
+            frame, (upscaled_width, upscaled_height), dst=upscaled)
+        self.frame_pool.count_copy()
         return ok, upscaled_frame
 
-    def _process_image(self, image) -> None:
+    def _process_image(self, image: np.ndarray, owned: bool = False) -> None:
         """
         Process the image to detect faces and estimate gaze.
 
         Args:
             image: Image to process
+            owned: Whether the image is a frame pool buffer which may be drawn on in
+                   place. Otherwise it is copied first.
 
         Returns:
             None
         """
+        recorder = session_recorder.get_session_recorder()
+        if recorder is not None:
+            # The raw frame, before anything is drawn on it
+            recorder.record_frame(session_recorder.WEBCAM, image, self.frame_time)
+
         undistorted = self._undistort_image(image)
-        self.camera_visualiser.set_image(image.copy())
-        if self.running_in_thread:
-            self.gaze_visualiser.set_image(np.zeros_like(image))
+        if not owned:
+            image = self.frame_pool.copy("frame", image)
+        self.camera_visualiser.set_image(image)
 
         if self.loop_enabled:
-            if self.hitboxes is None:
-                self.hitboxes = self._init_hitboxes()
+            self._update_hitboxes()
 
             faces = self.gaze_estimator.detect_faces(undistorted)
             for face in faces:
@@ -329,8 +413,6 @@ class GazeDetector:
 
         if self.config.demo.use_camera:
             self.camera_visualiser.flip_image()
-            if self.running_in_thread:
-                self.gaze_visualiser.flip_image()
 
             if self.loop_enabled:
                 self._flip_points()
@@ -340,12 +422,22 @@ class GazeDetector:
                 if self.calibrated:
                     self._draw_gaze_region()
 
+        # Draw anything still queued before the frame is rendered or recorded
+        self.camera_visualiser.composite()
+
         if self.writer:
-            self.writer.write(self.camera_visualiser.image)
+            try:
+                self.writer.write(self.camera_visualiser.image, self.frame_time)
+            except RuntimeError as e:
+                logger.error("Stopping video recording: %s", e)
+                self.writer.stop()
+                self.writer = None
 
     def _undistort_image(self, image: np.ndarray) -> np.ndarray:
         """
-        Undistort the image using the camera matrix and distortion coefficients.
+        Undistort the image using the camera matrix and distortion coefficients. The
+        undistortion maps are computed once per resolution and the result is written
+        into a buffer from the frame pool.
 
         Args:
             image: Image to undistort
@@ -353,7 +445,18 @@ class GazeDetector:
         Returns:
             Undistorted image
         """
-        return cv2.undistort(image, self.gaze_estimator.camera.camera_matrix, self.gaze_estimator.camera.dist_coefficients)
+        height, width = image.shape[:2]
+        if self.undistort_maps is None or self.undistort_maps[0] != (width, height):
+            camera = self.gaze_estimator.camera
+            map1, map2 = cv2.initUndistortRectifyMap(
+                camera.camera_matrix, camera.dist_coefficients, None, camera.camera_matrix,
+                (width, height), cv2.CV_16SC2)
+            self.undistort_maps = ((width, height), map1, map2)
+
+        _, map1, map2 = self.undistort_maps
+        undistorted = self.frame_pool.acquire("undistorted", image.shape, image.dtype)
+        self.frame_pool.count_copy()
+        return cv2.remap(image, map1, map2, cv2.INTER_LINEAR, dst=undistorted)
 
     def _create_capture(self) -> Optional[cv2.VideoCapture]:
         """
@@ -408,37 +511,30 @@ class GazeDetector:
         dt = datetime.datetime.now()
         return dt.strftime("%Y%m%d_%H%M%S")
 
-    def _create_video_writer(self) -> Optional[cv2.VideoWriter]:
+    def _create_video_writer(self) -> Optional[VideoRecorder]:
         """
-        Create a video writer object if the user has specified an output directory.
+        Create a video recorder if the user has specified an output directory. Frames
+        are encoded on the recorder's thread.
 
         Returns:
-            VideoWriter object or None
+            VideoRecorder object or None
         """
         if self.config.demo.image_path:
             return None
         if not self.output_dir:
             return None
-        ext = self.config.demo.output_file_extension
-        if ext == "mp4":
-            fourcc = cv2.VideoWriter_fourcc(*"H264")
-        elif ext == "avi":
-            fourcc = cv2.VideoWriter_fourcc(*"PIM1")
-        else:
-            raise ValueError
         if self.config.demo.use_camera:
-            output_name = f"{self._create_timestamp()}.{ext}"
+            output_name = self._create_timestamp()
         elif self.config.demo.video_path:
-            name = pathlib.Path(self.config.demo.video_path).stem
-            output_name = f"{name}.{ext}"
+            output_name = pathlib.Path(self.config.demo.video_path).stem
         else:
             raise ValueError
-        output_path = self.output_dir / output_name
-        writer = cv2.VideoWriter(output_path.as_posix(
-        ), fourcc, 30, (self.gaze_estimator.camera.width, self.gaze_estimator.camera.height))
-        if writer is None:
-            raise RuntimeError
-        return writer
+
+        segment_minutes = self.config.demo.recording_segment_minutes
+        return VideoRecorder(
+            self.output_dir, output_name, self.config.demo.output_file_extension, self.config.demo.max_tick_rate,
+            queue_size=self.config.demo.recording_queue_size, drop_policy=self.config.demo.recording_drop_policy,
+            segment_seconds=segment_minutes * 60 if segment_minutes else None)
 
     def _wait_key(self) -> bool:
         """
@@ -452,14 +548,13 @@ class GazeDetector:
         """
 
         if self.running_in_thread:
-            if cc.KEYBOARD_QUEUE not in self.thread_data.keys():
-                logger.trace(
-                    "Keyboard queue not yet initialised in shared data.")
-                return False
+            if self.key_subscription is None:
+                self.key_subscription = keyboard.subscribe_from_thread_data(
+                    self.thread_data, self.data_lock, cc.EYE_TRACKING, self.keyboard_bindings)
+                if self.key_subscription is None:
+                    return False
 
-            keyboard_queue: PeekableQueue = self.thread_data[cc.KEYBOARD_QUEUE]
-            key_buffer = keyboard.keyboard_event_loop(
-                self.data_lock, keyboard_queue, self.keyboard_bindings)
+            key_buffer = self.key_subscription.get_keys()
 
             accepted_keys = []
             for key_code in key_buffer:
@@ -568,23 +663,9 @@ class GazeDetector:
             None
         """
         if self.gaze_2d_point is not None:
-            self.gaze_2d_point = self._get_gaze_visualiser().flip_point_x(
+            self.gaze_2d_point = self.camera_visualiser.flip_point_x(
                 self.gaze_2d_point)
 
-    def _get_gaze_visualiser(self) -> Visualiser:
-        """
-        Get the appropriate visualiser for gaze overlay
-        depending on the application mode.
-
-        Returns:
-            Visualiser object
-        """
-
-        if self.running_in_thread:
-            return self.gaze_visualiser
-        else:
-            return self.camera_visualiser
-
     def _draw_face_bbox(self, face: Face) -> None:
         """
         Wrapper to draw a bounding box around the face.
@@ -707,6 +788,9 @@ class GazeDetector:
         self.average_eye_center = (face.reye.center + face.leye.center) / 2
         self.average_gaze_vector = (
             face.reye.gaze_vector + face.leye.gaze_vector) / 2
+        blink_threshold = self.config.gaze_point.filter.blink_threshold
+        # Blink handling is off when the threshold is 0, so the landmarks are not measured
+        self.blinking = blink_threshold > 0 and gaze_filters.eye_openness(face.landmarks) < blink_threshold
 
         end_point = self.average_eye_center + length * self.average_gaze_vector
         self.camera_visualiser.draw_3d_line(self.average_eye_center, end_point)
@@ -730,19 +814,31 @@ class GazeDetector:
         )
         point_on_screen[1] *= self.config.gaze_point.gaze_vector_y_scale
 
-        # Update buffer and calculate smoothed point
-        self.point_buffer.append(point_on_screen)
-        if len(self.point_buffer) > self.config.gaze_point.smoothing_frames:
-            self.point_buffer.pop(0)
-
-        smoothed_3d_point = np.mean(self.point_buffer, axis=0)
-        self.gaze_2d_point = self._get_gaze_visualiser().draw_3d_point(
-            smoothed_3d_point, color=(0, 0, 255), size=self.config.gaze_point.dot_size, clamp_to_screen=True
-        )
+        timestamp = self.frame_time if self.frame_time is not None else time.perf_counter()
+        recorder = session_recorder.get_session_recorder()
+        if recorder is not None:
+            # Unfiltered, so gaze filters can be evaluated offline
+            recorder.record(session_recorder.GAZE_ESTIMATES,
+                            {"point": point_on_screen, "blinking": self.blinking}, timestamp)
+
+        smoothed_3d_point = self.gaze_filter.update(point_on_screen, timestamp, self.blinking)
+        if smoothed_3d_point is None:
+            # No valid estimate since the eyes closed
+            self.gaze_2d_point = None
+            return
+        if self.running_in_thread:
+            # Drawn by the GUI from the published gaze overlay
+            self.gaze_2d_point = self.camera_visualiser.project_3d_point(smoothed_3d_point, clamp_to_screen=True)
+        else:
+            self.gaze_2d_point = self.camera_visualiser.draw_3d_point(
+                smoothed_3d_point, color=gaze_overlay.GAZE_POINT_COLOUR, size=self.config.gaze_point.dot_size,
+                clamp_to_screen=True
+            )
 
     def _draw_gaze_region(self) -> None:
         """
-        Highlights the region on the screen the user is looking at.
+        Highlights the region on the screen the user is looking at. When running in a
+        thread, publishes the gaze overlay for the GUI to draw instead.
 
         Returns:
             None
@@ -750,44 +846,57 @@ class GazeDetector:
         if not self.show_gaze_vector:
             return
 
-        base_bg_alpha = 0.05
-        bg_alpha_boost_hitbox = 0.2
-        bg_color = (0, 0, 255)
+        if self.gaze_2d_point is None:
+            if self.running_in_thread:
+                with self.data_lock:
+                    self.thread_data[cc.EYE_TRACKING][cc.GAZE_SIDE] = None
+                    self.thread_data[cc.EYE_TRACKING][cc.GAZE_OVERLAY] = None
+            return
 
         # Determine if user is looking in one of the hit-boxes
         logger.info("Gaze 2d Point: %s", str(self.gaze_2d_point))
 
         # Set only when looking at a hitbox
         gaze_side = None
-
-        visualiser = self._get_gaze_visualiser()
-
         for side in cc.SIDES:
-            looking_hitbox = None
             side_hitbox = self.hitboxes[side]
             if side_hitbox[c.TOP_LEFT][0] <= self.gaze_2d_point[0] <= side_hitbox[c.BOTTOM_RIGHT][0]:
-                looking_hitbox = side
                 gaze_side = side
 
-            text = f"Looking {looking_hitbox}" if looking_hitbox else ""
-            border = None
-            if looking_hitbox:
-                bg_alpha = base_bg_alpha + bg_alpha_boost_hitbox
-                border = (255, 0, 0)
-            else:
-                bg_alpha = base_bg_alpha
-
-            top_left = side_hitbox[c.TOP_LEFT]
-            bottom_right = side_hitbox[c.BOTTOM_RIGHT]
-
-            visualiser.draw_labelled_rectangle(
-                top_left, bottom_right, bg_color, bg_alpha, text, border_color=border
+        if self.running_in_thread:
+            overlay = gaze_overlay.GazeOverlay(
+                resolution=self.camera_visualiser.get_2d_resolution(),
+                hitboxes={side: (hitbox[c.TOP_LEFT], hitbox[c.BOTTOM_RIGHT])
+                          for side, hitbox in self.hitboxes.items()},
+                gaze_side=gaze_side,
+                gaze_point=(int(self.gaze_2d_point[0]), int(self.gaze_2d_point[1])),
+                point_size=self.config.gaze_point.dot_size,
             )
 
-        if self.running_in_thread:
             logger.info("Setting gaze side to %s in shared data.", gaze_side)
             with self.data_lock:
                 self.thread_data[cc.EYE_TRACKING][cc.GAZE_SIDE] = gaze_side
-                self.thread_data[cc.EYE_TRACKING][cc.GAZE_OVERLAY] = self.gaze_visualiser.image
+                self.thread_data[cc.EYE_TRACKING][cc.GAZE_OVERLAY] = overlay
+
+            recorder = session_recorder.get_session_recorder()
+            if recorder is not None:
+                recorder.record(session_recorder.GAZE, overlay, self.frame_time)
 
             logger.debug("Shared data updated.")
+            return
+
+        for side in cc.SIDES:
+            looking = side == gaze_side
+            bg_alpha = gaze_overlay.HITBOX_ALPHA
+            if looking:
+                bg_alpha += gaze_overlay.LOOKING_ALPHA_BOOST
+
+            self.camera_visualiser.draw_labelled_rectangle(
+                self.hitboxes[side][c.TOP_LEFT], self.hitboxes[side][c.BOTTOM_RIGHT],
+                gaze_overlay.HITBOX_COLOUR, bg_alpha, f"Looking {side}" if looking else "",
+                border_color=gaze_overlay.LOOKING_BORDER_COLOUR if looking else None,
+                border_thickness=gaze_overlay.LOOKING_BORDER_THICKNESS
+            )
+
+        # Blend the queued hitbox overlay in one pass
+        self.camera_visualiser.composite()
@@ -5,7 +5,9 @@ Last Updated: 17/09/2024
 """
 
 from common.logger_helper import init_logger
+from common.import_profiler import profile_phase
 from typing import List
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import torch
@@ -40,19 +42,27 @@ class GazeEstimator:
 
         self._config = config
 
-        self._face_model3d = FaceModelMediaPipe()
+        # Loading the checkpoint and initialising FaceMesh are both slow and mostly
+        # release the GIL, so the model is loaded in a worker in the meantime.
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="gaze_model_loader") as executor:
+            model_future = executor.submit(self._load_model)
 
-        self.camera = Camera(config.gaze_estimator.camera_params)
-        self._normalized_camera = Camera(
-            config.gaze_estimator.normalized_camera_params)
+            self._face_model3d = FaceModelMediaPipe()
 
-        self._landmark_estimator = LandmarkEstimator(config)
-        self._head_pose_normalizer = HeadPoseNormalizer(
-            self.camera, self._normalized_camera, self._config.gaze_estimator.normalized_camera_distance
-        )
-        self._gaze_estimation_model = self._load_model()
-        self._transform = transforms.create_transform()
+            self.camera = Camera(config.gaze_estimator.camera_params)
+            self._normalized_camera = Camera(
+                config.gaze_estimator.normalized_camera_params)
 
+            self._landmark_estimator = LandmarkEstimator(config)
+            self._landmark_estimator.warm_up(self.camera.width, self.camera.height)
+            self._head_pose_normalizer = HeadPoseNormalizer(
+                self.camera, self._normalized_camera, self._config.gaze_estimator.normalized_camera_distance
+            )
+            self._transform = transforms.create_transform()
+
+            self._gaze_estimation_model = model_future.result()
+
+    @profile_phase("eye_tracking: load gaze model")
     def _load_model(self) -> torch.nn.Module:
         """
         Load the gaze estimation model from checkpoint
@@ -66,8 +76,23 @@ class GazeEstimator:
         model.load_state_dict(checkpoint["model"])
         model.to(torch.device(self._config.device))
         model.eval()
+        self._warm_up_model(model)
         return model
 
+    @torch.no_grad()
+    def _warm_up_model(self, model: torch.nn.Module) -> None:
+        """
+        Runs the model once on blank eye images so the first real frame does not pay
+        for lazy initialisation (allocator, kernel selection, CUDA context).
+
+        Args:
+            model: Gaze estimation model
+        """
+        device = torch.device(self._config.device)
+        images = torch.zeros((len(self.EYE_KEYS), 1, 36, 60), device=device)
+        head_poses = torch.zeros((len(self.EYE_KEYS), 2), device=device)
+        model(images, head_poses)
+
     def detect_faces(self, image: np.ndarray) -> List[Face]:
         """
         Detect faces in the image and return a list of Face objects
@@ -0,0 +1,392 @@
+"""
+Temporal filters for gaze estimates.
+
+A filter smooths the noisy per-frame gaze point and estimates its velocity, so the
+point can be extrapolated to compensate for pipeline latency. The filter engine wraps a
+filter with outlier rejection and blink handling:
+
+-   An estimate far from the filter's prediction, relative to the typical innovation, is
+    rejected as an outlier. If it persists for several frames it is taken as a saccade
+    and the filter jumps to it.
+-   While the user blinks the gaze model's output is meaningless, so the last estimate is
+    held for up to `blink_hold` seconds. A longer gap resets the filter.
+"""
+
+from typing import Optional, List, Tuple
+from abc import ABC, abstractmethod
+import math
+
+import numpy as np
+from omegaconf import OmegaConf
+
+from common.logger_helper import init_logger
+
+logger = init_logger()
+
+BOXCAR = "boxcar"
+ONE_EURO = "one_euro"
+KALMAN = "kalman"
+FILTER_TYPES = (BOXCAR, ONE_EURO, KALMAN)
+
+# Shortest time step between estimates, so repeated timestamps do not divide by zero
+MIN_TIME_STEP = 1e-3
+
+# MediaPipe face mesh landmarks of each eye: (outer corner, inner corner, upper lid, lower lid)
+REYE_OPENNESS_INDICES = np.array([33, 133, 159, 145])
+LEYE_OPENNESS_INDICES = np.array([263, 362, 386, 374])
+
+# Smoothing of the typical innovation used to detect outliers, and the number of
+# innovations averaged before outliers are rejected
+INNOVATION_SMOOTHING = 0.1
+INNOVATION_WARM_UP = 10
+
+
+def eye_openness(landmarks: np.ndarray) -> float:
+    """
+    Computes the eye aspect ratio, the height of the eye opening over its width, averaged
+    over both eyes. Around 0.3 for an open eye and close to zero during a blink.
+
+    Args:
+        landmarks: MediaPipe face mesh landmarks in pixels, of shape (478, 2)
+
+    Returns:
+        The eye aspect ratio
+    """
+    ratios = []
+    for indices in (REYE_OPENNESS_INDICES, LEYE_OPENNESS_INDICES):
+        outer, inner, upper, lower = landmarks[indices, :2]
+        width = np.linalg.norm(outer - inner)
+        if width > 0:
+            ratios.append(np.linalg.norm(upper - lower) / width)
+
+    return float(np.mean(ratios)) if ratios else 0.0
+
+
+class GazeFilter(ABC):
+    """
+    Causal filter of a stream of gaze points. Points may have any number of dimensions.
+    """
+
+    def __init__(self):
+        self.estimate: Optional[np.ndarray] = None
+        self.velocity: Optional[np.ndarray] = None
+        # Time the estimate applies to
+        self.estimate_time: Optional[float] = None
+
+    @abstractmethod
+    def update(self, point: np.ndarray, timestamp: float) -> np.ndarray:
+        """
+        Adds a measured point to the filter.
+
+        Args:
+            point: The measured point
+            timestamp: Time of the measurement in seconds
+
+        Returns:
+            The filtered point
+        """
+        pass
+
+    def predict(self, timestamp: float) -> Optional[np.ndarray]:
+        """
+        Extrapolates the filtered point to a time at its estimated velocity.
+
+        Args:
+            timestamp: Time in seconds
+
+        Returns:
+            The predicted point, or None before the first update
+        """
+        if self.estimate is None:
+            return None
+        return self.estimate + self.velocity * (timestamp - self.estimate_time)
+
+    def reset(self) -> None:
+        """
+        Forgets every point, so the next point initialises the filter.
+        """
+        self.estimate = None
+        self.velocity = None
+        self.estimate_time = None
+
+
+class BoxcarFilter(GazeFilter):
+    """
+    Moving average of the last `window` points, in a preallocated ring array. The
+    average lags the newest point by half the window, which prediction compensates for.
+    """
+
+    def __init__(self, window: int):
+        """
+        Args:
+            window: Number of points averaged
+        """
+        super().__init__()
+        self.window = max(1, int(window))
+        self.points: Optional[np.ndarray] = None
+        self.times = np.zeros(self.window)
+        self.count = 0
+        self.index = 0
+
+    def update(self, point: np.ndarray, timestamp: float) -> np.ndarray:
+        if self.points is None or self.points.shape[1] != len(point):
+            self.points = np.zeros((self.window, len(point)))
+
+        self.points[self.index] = point
+        self.times[self.index] = timestamp
+        oldest = (self.index + 1) % self.window if self.count == self.window else 0
+        self.index = (self.index + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+
+        points = self.points[:self.count]
+        times = self.times[:self.count]
+        self.estimate = points.mean(axis=0)
+        self.estimate_time = float(times.mean())
+
+        newest = (self.index - 1) % self.window
+        time_span = self.times[newest] - self.times[oldest]
+        if self.count > 1 and time_span > 0:
+            self.velocity = (self.points[newest] - self.points[oldest]) / time_span
+        else:
+            self.velocity = np.zeros_like(self.estimate)
+
+        return self.estimate
+
+    def reset(self) -> None:
+        super().reset()
+        self.count = 0
+        self.index = 0
+
+
+class OneEuroFilter(GazeFilter):
+    """
+    One Euro filter (Casiez et al. 2012): an exponential smoother whose cutoff frequency
+    rises with speed, smoothing jitter while fixating without lagging behind saccades.
+    """
+
+    def __init__(self, min_cutoff: float, beta: float, derivative_cutoff: float):
+        """
+        Args:
+            min_cutoff: Cutoff frequency in Hz while still. Lower is smoother.
+            beta: Increase of the cutoff frequency with speed. Higher lags less.
+            derivative_cutoff: Cutoff frequency in Hz of the speed estimate
+        """
+        super().__init__()
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+
+    @staticmethod
+    def _smoothing_factor(cutoff: np.ndarray, time_step: float) -> np.ndarray:
+        time_constant = 1 / (2 * math.pi * cutoff)
+        return 1 / (1 + time_constant / time_step)
+
+    def update(self, point: np.ndarray, timestamp: float) -> np.ndarray:
+        point = np.asarray(point, dtype=np.float64)
+        if self.estimate is None:
+            self.estimate = point.copy()
+            self.velocity = np.zeros_like(point)
+            self.estimate_time = timestamp
+            return self.estimate
+
+        time_step = max(timestamp - self.estimate_time, MIN_TIME_STEP)
+        velocity = (point - self.estimate) / time_step
+        alpha = self._smoothing_factor(self.derivative_cutoff, time_step)
+        self.velocity = self.velocity + alpha * (velocity - self.velocity)
+
+        cutoff = self.min_cutoff + self.beta * np.abs(self.velocity)
+        alpha = self._smoothing_factor(cutoff, time_step)
+        self.estimate = self.estimate + alpha * (point - self.estimate)
+        self.estimate_time = timestamp
+        return self.estimate
+
+
+class KalmanFilter(GazeFilter):
+    """
+    Constant velocity Kalman filter, with each axis filtered independently. The gaze is
+    modelled as moving at a constant velocity perturbed by random accelerations.
+    """
+
+    def __init__(self, process_noise: float, measurement_noise: float):
+        """
+        Args:
+            process_noise: Variance of the random acceleration, per second
+            measurement_noise: Variance of a measured point
+        """
+        super().__init__()
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        # Covariance of each axis' position and velocity
+        self.position_variance: Optional[np.ndarray] = None
+        self.covariance: Optional[np.ndarray] = None
+        self.velocity_variance: Optional[np.ndarray] = None
+
+    def update(self, point: np.ndarray, timestamp: float) -> np.ndarray:
+        point = np.asarray(point, dtype=np.float64)
+        if self.estimate is None:
+            self.estimate = point.copy()
+            self.velocity = np.zeros_like(point)
+            self.estimate_time = timestamp
+            self.position_variance = np.full_like(point, self.measurement_noise)
+            self.covariance = np.zeros_like(point)
+            self.velocity_variance = np.full_like(point, self.measurement_noise)
+            return self.estimate
+
+        # Predict
+        time_step = max(timestamp - self.estimate_time, MIN_TIME_STEP)
+        q = self.process_noise
+        position = self.estimate + self.velocity * time_step
+        position_variance = (self.position_variance + 2 * time_step * self.covariance
+                             + time_step ** 2 * self.velocity_variance + q * time_step ** 4 / 4)
+        covariance = self.covariance + time_step * self.velocity_variance + q * time_step ** 3 / 2
+        velocity_variance = self.velocity_variance + q * time_step ** 2
+
+        # Update
+        innovation = point - position
+        innovation_variance = position_variance + self.measurement_noise
+        position_gain = position_variance / innovation_variance
+        velocity_gain = covariance / innovation_variance
+
+        self.estimate = position + position_gain * innovation
+        self.velocity = self.velocity + velocity_gain * innovation
+        self.position_variance = (1 - position_gain) * position_variance
+        self.velocity_variance = velocity_variance - velocity_gain * covariance
+        self.covariance = (1 - position_gain) * covariance
+        self.estimate_time = timestamp
+        return self.estimate
+
+
+class GazeFilterEngine:
+    """
+    Filters gaze estimates, rejecting outliers, holding the gaze through blinks and
+    predicting ahead to compensate for latency.
+    """
+
+    def __init__(self, gaze_filter: GazeFilter, outlier_factor: float = 0.0, outlier_frames: int = 3,
+                 blink_hold: float = 0.0, prediction: float = 0.0):
+        """
+        Args:
+            gaze_filter: The filter
+            outlier_factor: Multiple of the typical innovation beyond which an estimate is
+                            an outlier. 0 disables outlier rejection.
+            outlier_frames: Consecutive outliers after which the gaze is taken to have moved
+            blink_hold: Seconds to hold the gaze for while the eyes are closed
+            prediction: Seconds to predict ahead, usually the latency from capture to display
+        """
+        self.filter = gaze_filter
+        self.outlier_factor = outlier_factor
+        self.outlier_frames = outlier_frames
+        self.blink_hold = blink_hold
+        self.prediction = prediction
+
+        # Typical distance of an estimate from the filter's prediction
+        self.innovation_scale = 0.0
+        self.innovations = 0
+        # Consecutive rejected estimates and their times
+        self.outliers: List[Tuple[np.ndarray, float]] = []
+        self.last_valid_time: Optional[float] = None
+        self.output: Optional[np.ndarray] = None
+
+    def update(self, point: Optional[np.ndarray], timestamp: float, blinking: bool = False) -> Optional[np.ndarray]:
+        """
+        Adds a gaze estimate.
+
+        Args:
+            point: The estimated gaze point, or None if no estimate was made
+            timestamp: Time of the estimate in seconds
+            blinking: Whether the eyes were closed
+
+        Returns:
+            The filtered gaze point, or None if there is no recent valid estimate
+        """
+        if point is None or blinking:
+            return self._hold(timestamp)
+
+        self.last_valid_time = timestamp
+        if self._is_outlier(point, timestamp):
+            if len(self.outliers) + 1 < self.outlier_frames:
+                self.outliers.append((np.array(point, dtype=np.float64), timestamp))
+                logger.debug("Rejected gaze outlier %d", len(self.outliers))
+                return self.output
+
+            # Restart from the estimates since the gaze moved. The noise of the estimates
+            # is unchanged, so the innovation scale is kept.
+            logger.debug("Gaze moved after %d outliers. Resetting filter", len(self.outliers) + 1)
+            self.filter.reset()
+            for outlier, outlier_time in self.outliers:
+                self.filter.update(outlier, outlier_time)
+
+        self.outliers.clear()
+        self.filter.update(point, timestamp)
+        if self.prediction > 0:
+            self.output = self.filter.predict(timestamp + self.prediction)
+        else:
+            self.output = self.filter.estimate
+        return self.output
+
+    def _hold(self, timestamp: float) -> Optional[np.ndarray]:
+        if self.last_valid_time is not None and timestamp - self.last_valid_time <= self.blink_hold:
+            return self.output
+
+        if self.output is not None:
+            logger.debug("No valid gaze estimate for %.2f s. Resetting filter", self.blink_hold)
+        self.reset()
+        return None
+
+    def _is_outlier(self, point: np.ndarray, timestamp: float) -> bool:
+        if self.outlier_factor <= 0:
+            return False
+
+        predicted = self.filter.predict(timestamp)
+        if predicted is None:
+            return False
+
+        innovation = float(np.linalg.norm(point - predicted))
+        if self.innovations >= INNOVATION_WARM_UP and innovation > self.outlier_factor * self.innovation_scale:
+            return True
+
+        # Mean of the first innovations, then an exponential moving average
+        self.innovations += 1
+        smoothing = max(INNOVATION_SMOOTHING, 1 / self.innovations)
+        self.innovation_scale += smoothing * (innovation - self.innovation_scale)
+        return False
+
+    def reset(self) -> None:
+        """
+        Forgets every estimate.
+        """
+        self.filter.reset()
+        self.innovation_scale = 0.0
+        self.innovations = 0
+        self.outliers.clear()
+        self.last_valid_time = None
+        self.output = None
+
+
+def create_gaze_filter(gaze_point_config: OmegaConf) -> GazeFilterEngine:
+    """
+    Creates the gaze filter engine selected in the config.
+
+    Args:
+        gaze_point_config: The gaze point config
+
+    Returns:
+        The gaze filter engine
+
+    Raises:
+        ValueError: If the filter type is not recognised
+    """
+    filter_config = gaze_point_config.filter
+    if filter_config.type == BOXCAR:
+        gaze_filter = BoxcarFilter(gaze_point_config.smoothing_frames)
+    elif filter_config.type == ONE_EURO:
+        gaze_filter = OneEuroFilter(filter_config.one_euro.min_cutoff, filter_config.one_euro.beta,
+                                    filter_config.one_euro.derivative_cutoff)
+    elif filter_config.type == KALMAN:
+        gaze_filter = KalmanFilter(filter_config.kalman.process_noise, filter_config.kalman.measurement_noise)
+    else:
+        raise ValueError(f"Invalid gaze filter type: {filter_config.type}")
+
+    logger.info("Using %s gaze filter", filter_config.type)
+    return GazeFilterEngine(gaze_filter, filter_config.outlier_factor, filter_config.outlier_frames,
+                            filter_config.blink_hold, filter_config.prediction)
@@ -4,10 +4,13 @@ import mediapipe
 import numpy as np
 from omegaconf import DictConfig
 
+from common.import_profiler import profile_phase
+
 from ..face import Face
 
 
 class LandmarkEstimator:
+    @profile_phase("eye_tracking: load FaceMesh")
     def __init__(self, config: DictConfig):
         self.mode = config.face_detector.mode
         self.detector = mediapipe.solutions.face_mesh.FaceMesh(
@@ -16,6 +19,18 @@ class LandmarkEstimator:
             refine_landmarks=True,  # Adds eye pupil landmarks (468-477)
         )
 
+    @profile_phase("eye_tracking: warm up FaceMesh")
+    def warm_up(self, width: int, height: int) -> None:
+        """
+        Runs the detector on a blank frame so the graph is initialised before the
+        first webcam frame arrives.
+
+        Args:
+            width: Frame width
+            height: Frame height
+        """
+        self.detector.process(np.zeros((height, width, 3), dtype=np.uint8))
+
     def detect_faces(self, image: np.ndarray) -> List[Face]:
         """
         Calculated landmarks scaled to the image size with a bounding box
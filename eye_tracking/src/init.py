@@ -8,6 +8,7 @@ import pathlib
 from omegaconf import DictConfig, OmegaConf
 
 from common.logger_helper import init_logger
+from common.import_profiler import profile_phase
 
 from .utils.model import (
     check_path_all,
@@ -39,6 +40,7 @@ def init_ptgaze_config() -> DictConfig:
     return config
 
 
+@profile_phase()
 def init_ptgaze() -> DictConfig:
     """
     Initialises ptgaze for eye tracking
@@ -13,6 +13,9 @@ import sys
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
 sys.path.insert(0, project_root)
 
+# Installs the import profiler, if enabled, so the remaining imports are profiled
+from common import import_profiler  # noqa: F401
+
 from . import init
 from .gaze_detector import GazeDetector
 
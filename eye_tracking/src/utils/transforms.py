@@ -4,7 +4,7 @@ Author: Hugo Burton
 Last Updated: 23/08/2024
 """
 
-from typing import Tuple
+from typing import Tuple, Optional
 import cv2
 import numpy as np
 from common.logger_helper import init_logger
@@ -24,36 +24,40 @@ def create_transform() -> T.ToTensor:
     return T.ToTensor()
 
 
-def upscale(frame: cv2.VideoCapture, upscaled_dim: Tuple[int, int]) -> cv2.VideoCapture:
+def upscale(frame: cv2.VideoCapture, upscaled_dim: Tuple[int, int], dst: Optional[np.ndarray] = None) -> cv2.VideoCapture:
     """
     Upscale the frame
 
     Args:
         frame: The frame to upscale
         upscaled_dim: The dimensions to upscale to (width, height)
+        dst: Buffer to write the upscaled frame into, if it has the right shape
 
     Returns:
         cv2.VideoCapture: The upscaled frame
     """
 
     logger.debug("Upscaling frame to %s", str(upscaled_dim))
-    upscaled_frame = cv2.resize(frame, upscaled_dim)
+    upscaled_frame = cv2.resize(frame, upscaled_dim, dst=dst)
 
     return upscaled_frame
 
 
-def flip_image(image: np.ndarray) -> np.ndarray:
+def flip_image(image: np.ndarray, in_place: bool = False) -> np.ndarray:
     """
     Flip the image
 
     Args:
         image: The image to flip
+        in_place: Whether to flip the image's own buffer rather than return a view
 
     Returns:
         np.ndarray: The flipped image
     """
 
     logger.debug("Flipping image")
+    if in_place:
+        return cv2.flip(image, 1, dst=image)
     return image[:, ::-1]
 
 
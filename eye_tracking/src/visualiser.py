@@ -2,7 +2,7 @@
 This module contains the Visualizer class, which is responsible for visualising the output of the eye tracking system.
 """
 
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Dict
 import numpy as np
 
 import cv2
@@ -10,6 +10,7 @@ from scipy.spatial.transform import Rotation
 
 from common.logger_helper import init_logger
 from common import image
+from common import constants as cc
 
 from . import constants as c
 from .camera import Camera
@@ -29,10 +30,29 @@ class Visualiser:
         self._camera = camera
         self._center_point_index = center_point_index
         self.image: Optional[np.ndarray] = None
+        self.compositor = image.OverlayCompositor()
+        # Pre-rendered labelled rectangles, valid for one image resolution
+        self._layer_cache: Dict[tuple, image.OverlayTile] = {}
+        self._layer_resolution: Optional[Tuple[int, int]] = None
+        self.set_quality(cc.QUALITY_HIGH)
+
+    def set_quality(self, quality: str) -> None:
+        """
+        Sets the drawing quality. Low quality draws lines without anti-aliasing and
+        rectangles as outlines instead of translucent fills, which are cheaper.
+
+        Args:
+            quality: cc.QUALITY_HIGH or cc.QUALITY_LOW
+        """
+        self.quality = quality
+        high_quality = quality == cc.QUALITY_HIGH
+        self.line_type = cv2.LINE_AA if high_quality else cv2.LINE_8
+        self.blend_overlays = high_quality
 
     def set_image(self, image: np.ndarray) -> None:
         """
-        Binds the image to the visualizer state
+        Binds the image to the visualizer state. Discards any overlay queued
+        for the previous image.
 
         Args:
             image: The image to be bound
@@ -40,16 +60,39 @@ class Visualiser:
         Returns:
             None
         """
-        image = np.require(image, np.uint8, "C")
+        image = np.require(image, np.uint8, "CW")
         self.image = image
+        self.compositor.clear()
+
+        resolution = image.shape[:2]
+        if resolution != self._layer_resolution:
+            self.clear_layer_cache()
+            self._layer_resolution = resolution
+
+    def clear_layer_cache(self) -> None:
+        """
+        Discards the pre-rendered labelled rectangles, e.g. when the hit-boxes change.
+
+        Returns:
+            None
+        """
+        if self._layer_cache:
+            logger.debug("Clearing %d cached overlay layers", len(self._layer_cache))
+        self._layer_cache.clear()
 
     def flip_image(self) -> None:
         """
-        Flips the image horizontally
+        Flips the image horizontally, in place when the image is writeable.
 
         Returns:
             None
         """
+        # Queued overlay is drawn in the orientation it was queued in
+        self.composite()
+        if self.image.flags.writeable:
+            transforms.flip_image(self.image, in_place=True)
+            return
+
         flipped_image = transforms.flip_image(self.image)
         self.set_image(flipped_image)
 
@@ -130,6 +173,7 @@ class Visualiser:
     def draw_points(self, points: np.ndarray, color: Tuple[int, int, int] = (0, 0, 255), size: int = 3) -> None:
         """
         Draws points from 2D image coordinates onto the image (direct drawing).
+        All points are drawn in one batch.
 
         Args:
             points: The points to be drawn
@@ -142,9 +186,7 @@ class Visualiser:
 
         assert self.image is not None
         assert points.shape[1] == 2
-        for pt in points:
-            pt = self._convert_pt(pt)
-            cv2.circle(self.image, pt, size, color, cv2.FILLED)
+        image.draw_dots(self.image, points, size, color)
 
     def create_opacity(self, overlay: np.ndarray, opacity: float):
         """
@@ -212,9 +254,13 @@ class Visualiser:
         border_color: Optional[Tuple[int, int, int]] = None,
         border_thickness: int = 2,
         text_org: Optional[Tuple[int, int]] = None,
-    ) -> np.ndarray:
+    ) -> None:
         """
-        Draws a labelled rectangle on the specified overlay
+        Queues a translucent labelled rectangle on the overlay. Drawn by `composite`.
+        Each distinct rectangle is rendered once and cached as a tile, so drawing it
+        again only blits the tile. A tile clips its text to the rectangle, so when the
+        text does not fit the rectangle is blended directly each frame instead, with
+        the text drawn over it in full.
 
         Args:
             top_left: The top left corner of the rectangle.
@@ -229,31 +275,81 @@ class Visualiser:
             text_org: The origin of the text.
 
         Returns:
-            np.ndarray: The overlay with the labelled rectangle.
+            None
         """
 
         assert self.image is not None
+
+        key = (top_left, bottom_right, bg_color, bg_alpha, text, text_font_face, font_scale,
+               border_color, border_thickness, text_org, self.line_type)
+        tile = self._layer_cache.get(key)
+        if self.blend_overlays and tile is not None:
+            self.compositor.blit(tile, top_left)
+            return
+
         if text_org is None:
             text_org = self.calculate_text_org(
                 text, text_font_face, font_scale, 2, top_left, bottom_right)
 
-        overlay = np.zeros_like(self.image, np.uint8)
-        if border_color is not None:
-            cv2.rectangle(overlay, top_left, bottom_right, border_color, -1)
+        if not self.blend_overlays:
+            cv2.rectangle(self.image, top_left, bottom_right, border_color or bg_color, border_thickness)
+            self.compositor.text(text, text_org, text_font_face, font_scale, (255, 255, 255), 2, self.line_type)
+            return
+
+        if key not in self._layer_cache:
+            size = (bottom_right[0] - top_left[0] + 1, bottom_right[1] - top_left[1] + 1)
+            tile_text_org = (text_org[0] - top_left[0], text_org[1] - top_left[1])
+            tile = None
+            if self.text_fits(text, text_font_face, font_scale, 2, tile_text_org, size):
+                tile = image.render_labelled_tile(
+                    size, bg_color, bg_alpha, border_color, border_thickness, text, tile_text_org,
+                    text_font_face, font_scale, (255, 255, 255), 2, self.line_type)
+                logger.debug("Cached overlay layer '%s' of size %s", text, size)
+            else:
+                logger.debug("Text '%s' does not fit overlay layer of size %s", text, size)
+            self._layer_cache[key] = tile
+
+        if tile is None:
+            self.compositor.fill_rect(top_left, bottom_right, bg_color, bg_alpha, border_color, border_thickness)
+            self.compositor.text(text, text_org, text_font_face, font_scale, (255, 255, 255), 2, self.line_type)
+            return
+
+        self.compositor.blit(tile, top_left)
+
+    @staticmethod
+    def text_fits(text: str, text_font_face: int, font_scale: float, thickness: int,
+                  text_org: Tuple[int, int], size: Tuple[int, int]) -> bool:
+        """
+        Checks whether text lies entirely within a rectangle.
+
+        Args:
+            text: The text.
+            text_font_face: The font face of the text.
+            font_scale: The scale of the font.
+            thickness: The thickness of the text.
+            text_org: The origin of the text, relative to the rectangle.
+            size: The width and height of the rectangle.
 
-            # Insets the rectangle to create a border effect
-            top_left = transforms.add_2d_point(
-                top_left, (border_thickness, border_thickness))
-            bottom_right = transforms.add_2d_point(
-                bottom_right, (-border_thickness, -border_thickness))
+        Returns:
+            True if the text fits
+        """
+        if not text:
+            return True
 
-        cv2.rectangle(overlay, top_left, bottom_right, bg_color, -1)
-        self.create_opacity(overlay, bg_alpha)
+        (text_width, text_height), baseline = cv2.getTextSize(text, text_font_face, font_scale, thickness)
+        return (text_org[0] >= 0 and text_org[0] + text_width <= size[0]
+                and text_org[1] - text_height >= 0 and text_org[1] + baseline <= size[1])
 
-        self.draw_text(text, text_org, color=(
-            255, 255, 255), font_face=text_font_face, font_scale=font_scale, on_image=self.image)
+    def composite(self) -> None:
+        """
+        Draws the queued overlay onto the image in a single pass.
 
-        return overlay
+        Returns:
+            None
+        """
+        if self.compositor.pending:
+            assert self.image is not None
+            self.compositor.flush(self.image)
 
     def draw_text(
         self,
@@ -263,7 +359,7 @@ class Visualiser:
         font_face=cv2.FONT_HERSHEY_SIMPLEX,
         font_scale=1.0,
         thickness=2,
-        line_type=cv2.LINE_AA,
+        line_type: Optional[int] = None,
         on_image: Optional[np.ndarray] = None,
     ) -> None:
         """
@@ -276,7 +372,7 @@ class Visualiser:
             font_face: The font face of the text
             font_scale: The scale of the font
             thickness: The thickness of the text
-            line_type: The line type of the text
+            line_type: The line type of the text. Defaults to the visualiser's quality.
             on_image: The image to draw the text on. Default is None
 
         Returns:
@@ -285,6 +381,8 @@ class Visualiser:
 
         if on_image is None:
             on_image = self.image
+        if line_type is None:
+            line_type = self.line_type
 
         assert on_image is not None
         cv2.putText(on_image, text, org, font_face,
@@ -306,12 +404,27 @@ class Visualiser:
             The 2D point
         """
 
+        point2d = self.project_3d_point(point3d, clamp_to_screen)
+        self.draw_points(point2d[np.newaxis], color=color, size=size)
+        return point2d
+
+    def project_3d_point(self, point3d: np.ndarray, clamp_to_screen: bool = False) -> np.ndarray:
+        """
+        Projects a point from 3D world coordinates onto the image without drawing it.
+
+        Args:
+            point3d: The 3D point to be projected
+            clamp_to_screen: Whether to clamp the point to the screen. Default is False
+
+        Returns:
+            The 2D point
+        """
+
         assert self.image is not None
         assert point3d.shape == (3,)
         point2d = self._camera.project_point(point3d)
         if clamp_to_screen:
             point2d = self._clamp_point(point2d)
-        self.draw_points(point2d[np.newaxis], color=color, size=size)
         return point2d
 
     def draw_3d_points(
@@ -357,7 +470,7 @@ class Visualiser:
         points2d = self._camera.project_points(points3d)
         pt0 = self._convert_pt(points2d[0])
         pt1 = self._convert_pt(points2d[1])
-        cv2.line(self.image, pt0, pt1, color, lw, cv2.LINE_AA)
+        cv2.line(self.image, pt0, pt1, color, lw, self.line_type)
 
     def draw_model_axes(self, face: Face, length: float, lw: int = 2) -> None:
         """
@@ -387,7 +500,7 @@ class Visualiser:
         center = self._convert_pt(center)
         for pt, color in zip(axes2d, c.AXIS_COLORS):
             pt = self._convert_pt(pt)
-            cv2.line(self.image, center, pt, color, lw, cv2.LINE_AA)
+            cv2.line(self.image, center, pt, color, lw, self.line_type)
 
     def _clamp_point(self, point_or_points: np.ndarray) -> np.ndarray:
         """
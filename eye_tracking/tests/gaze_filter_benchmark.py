@@ -0,0 +1,301 @@
+"""
+Offline evaluation of the gaze filters on gaze traces.
+
+Traces are the unfiltered gaze estimates of recorded sessions, or a synthetic trace of
+fixations and saccades with noise, outliers and blinks when no session is given. Each
+filter type configured in `mpiigaze.yaml` is run over every trace and scored on:
+
+-   error: RMS distance from the true gaze point. Recorded sessions have no ground truth,
+    so a centred (zero lag) median of the estimates is used instead.
+-   jitter: RMS frame to frame movement of the filtered point once the gaze has been
+    still for half a second, so catching up after a saccade is not counted.
+-   settle_ms: Median time after a saccade for the filtered point to come within 20% of
+    the jump of the new fixation. Synthetic traces only.
+-   update_us: Mean time per filter update.
+
+    python -m eye_tracking.tests.gaze_filter_benchmark --sessions app/sessions/*.session
+"""
+
+from typing import Optional, List, Dict, Tuple
+import sys
+import json
+import time
+import pathlib
+import argparse
+import dataclasses
+
+import numpy as np
+from omegaconf import OmegaConf
+
+from common.session_recorder import SessionReader, GAZE_ESTIMATES
+from eye_tracking.src import gaze_filters
+
+CONFIG_PATH = pathlib.Path(__file__).parent.parent / "configs/mpiigaze.yaml"
+
+RAW = "raw"
+FRAME_RATE = 30
+# Frames either side of each estimate in the reference for recorded traces
+REFERENCE_HALF_WINDOW = 7
+# Frame to frame movement of the reference, in metres, below which the gaze is taken to be still
+STILL_MOVEMENT = 0.005
+# Frames the gaze must have been still for before jitter is measured
+STILL_FRAMES = FRAME_RATE // 2
+SETTLE_FRACTION = 0.2
+
+
+@dataclasses.dataclass
+class GazeTrace:
+    """
+    Unfiltered gaze estimates, with the true gaze point if known.
+    """
+
+    name: str
+    times: np.ndarray
+    points: np.ndarray
+    blinking: np.ndarray
+    truth: Optional[np.ndarray] = None
+    saccade_times: Optional[np.ndarray] = None
+
+
+def synthetic_trace(seconds: float, noise: float, seed: int) -> GazeTrace:
+    """
+    Generates fixations at random points joined by instant saccades, with Gaussian noise,
+    occasional outliers and blinks during which the estimates are meaningless.
+
+    Args:
+        seconds (float): Length of the trace.
+        noise (float): Standard deviation of the estimate noise, in metres.
+        seed (int): Random seed.
+
+    Returns:
+        GazeTrace: The trace.
+    """
+    rng = np.random.default_rng(seed)
+    times = np.arange(0, seconds, 1 / FRAME_RATE)
+
+    truth = np.empty((len(times), 3))
+    saccade_times = []
+    fixation_end = 0.0
+    target = np.zeros(3)
+    for i, t in enumerate(times):
+        if t >= fixation_end:
+            target = np.array([rng.uniform(-0.3, 0.3), rng.uniform(-0.05, 0.05), 0.0])
+            fixation_end = t + rng.uniform(0.5, 1.5)
+            if i > 0:
+                saccade_times.append(t)
+        truth[i] = target
+
+    points = truth + rng.normal(0, noise, truth.shape)
+
+    outliers = rng.random(len(times)) < 0.02
+    points[outliers] += rng.normal(0, 0.2, (outliers.sum(), 3))
+
+    blinking = np.zeros(len(times), bool)
+    for blink_start in np.arange(rng.uniform(1, 4), seconds, 4):
+        blink = (times >= blink_start) & (times < blink_start + 0.15)
+        blinking[blink] = True
+        points[blink] += rng.normal(0, 0.3, (blink.sum(), 3))
+
+    return GazeTrace("synthetic", times, points, blinking, truth, np.array(saccade_times))
+
+
+def recorded_trace(session_path: pathlib.Path) -> Optional[GazeTrace]:
+    """
+    Reads the unfiltered gaze estimates of a recorded session.
+
+    Args:
+        session_path (pathlib.Path): The session recording.
+
+    Returns:
+        Optional[GazeTrace]: The trace, or None if the session has no gaze estimates.
+    """
+    with SessionReader(session_path) as reader:
+        records = list(reader.read(GAZE_ESTIMATES))
+
+    if not records:
+        return None
+
+    times = np.array([t for t, _ in records])
+    points = np.array([data["point"] for _, data in records], dtype=np.float64)
+    blinking = np.array([data["blinking"] for _, data in records], dtype=bool)
+    return GazeTrace(session_path.stem, times, points, blinking)
+
+
+def reference_points(trace: GazeTrace) -> np.ndarray:
+    """
+    Estimates the true gaze of a recorded trace as the centred median of the estimates made
+    with the eyes open.
+
+    Args:
+        trace (GazeTrace): The trace.
+
+    Returns:
+        np.ndarray: The reference point of each estimate.
+    """
+    if trace.truth is not None:
+        return trace.truth
+
+    reference = np.empty_like(trace.points)
+    open_points = np.where(~trace.blinking[:, None], trace.points, np.nan)
+    for i in range(len(trace.points)):
+        window = open_points[max(0, i - REFERENCE_HALF_WINDOW):i + REFERENCE_HALF_WINDOW + 1]
+        if np.isnan(window).all():
+            reference[i] = trace.points[i]
+        else:
+            reference[i] = np.nanmedian(window, axis=0)
+    return reference
+
+
+def create_engine(filter_type: str, gaze_point_config: OmegaConf) -> Optional[gaze_filters.GazeFilterEngine]:
+    """
+    Creates the engine of a filter type, with the remaining settings from the config.
+
+    Args:
+        filter_type (str): One of the gaze filter types, or RAW for no filtering.
+        gaze_point_config (OmegaConf): The gaze point config.
+
+    Returns:
+        Optional[gaze_filters.GazeFilterEngine]: The engine, or None for RAW.
+    """
+    if filter_type == RAW:
+        return None
+
+    config = OmegaConf.merge(gaze_point_config, {"filter": {"type": filter_type}})
+    return gaze_filters.create_gaze_filter(config)
+
+
+def run_filter(engine: Optional[gaze_filters.GazeFilterEngine], trace: GazeTrace) -> Tuple[np.ndarray, float]:
+    """
+    Filters a trace.
+
+    Args:
+        engine (Optional[gaze_filters.GazeFilterEngine]): The engine, or None to pass the estimates through.
+        trace (GazeTrace): The trace.
+
+    Returns:
+        Tuple[np.ndarray, float]: The filtered points, NaN where there is no output, and the
+                                  mean seconds per update.
+    """
+    filtered = np.full_like(trace.points, np.nan)
+    start = time.perf_counter()
+    for i, (t, point, blinking) in enumerate(zip(trace.times, trace.points, trace.blinking)):
+        output = point if engine is None else engine.update(point, t, bool(blinking))
+        if output is not None:
+            filtered[i] = output
+    elapsed = time.perf_counter() - start
+    return filtered, elapsed / max(1, len(trace.points))
+
+
+def settle_times(trace: GazeTrace, filtered: np.ndarray) -> List[float]:
+    """
+    Measures how long the filtered point takes to reach each new fixation.
+
+    Args:
+        trace (GazeTrace): A trace with ground truth.
+        filtered (np.ndarray): The filtered points.
+
+    Returns:
+        List[float]: Seconds from each saccade until settled, for saccades which settled
+                     before the next.
+    """
+    times = []
+    boundaries = list(trace.saccade_times) + [np.inf]
+    for saccade_time, next_saccade in zip(boundaries, boundaries[1:]):
+        start = np.searchsorted(trace.times, saccade_time)
+        if start == 0:
+            continue
+        jump = np.linalg.norm(trace.truth[start] - trace.truth[start - 1])
+        fixation = (trace.times >= saccade_time) & (trace.times < next_saccade)
+        distance = np.linalg.norm(filtered[fixation] - trace.truth[start], axis=1)
+        settled = np.flatnonzero(distance <= SETTLE_FRACTION * jump)
+        if len(settled):
+            times.append(trace.times[fixation][settled[0]] - saccade_time)
+    return times
+
+
+def score(trace: GazeTrace, filtered: np.ndarray, update_seconds: float) -> Dict[str, float]:
+    """
+    Scores the filtered points of a trace.
+
+    Args:
+        trace (GazeTrace): The trace.
+        filtered (np.ndarray): The filtered points.
+        update_seconds (float): Mean seconds per update.
+
+    Returns:
+        Dict[str, float]: The metrics.
+    """
+    reference = reference_points(trace)
+    valid = ~np.isnan(filtered).any(axis=1)
+    error = np.linalg.norm(filtered[valid] - reference[valid], axis=1)
+
+    moving = np.ones(len(reference), bool)
+    moving[1:] = np.linalg.norm(np.diff(reference, axis=0), axis=1) >= STILL_MOVEMENT
+    # Frames since the gaze last moved
+    last_moved = np.maximum.accumulate(np.where(moving, np.arange(len(reference)), 0))
+    still = (np.arange(len(reference)) - last_moved >= STILL_FRAMES) & valid & np.roll(valid, 1)
+    movement = np.linalg.norm(np.diff(filtered, axis=0), axis=1)[still[1:]]
+
+    results = {
+        "error": float(np.sqrt(np.mean(error ** 2))) if len(error) else float("nan"),
+        "jitter": float(np.sqrt(np.mean(movement ** 2))) if len(movement) else float("nan"),
+        "coverage": float(valid.mean()),
+        "update_us": update_seconds * 1e6,
+    }
+    if trace.truth is not None:
+        settled = settle_times(trace, filtered)
+        results["settle_ms"] = float(np.median(settled) * 1000) if settled else float("nan")
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the gaze filter evaluation.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments.
+
+    Returns:
+        int: Exit code.
+    """
+    parser = argparse.ArgumentParser(description="Offline gaze filter evaluation")
+    parser.add_argument("--sessions", type=pathlib.Path, nargs="*", default=[],
+                        help="Session recordings with gaze estimates. Defaults to a synthetic trace.")
+    parser.add_argument("--seconds", type=float, default=60, help="Length of the synthetic trace")
+    parser.add_argument("--noise", type=float, default=0.02, help="Noise of the synthetic trace in metres")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=pathlib.Path, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    gaze_point_config = OmegaConf.load(CONFIG_PATH).gaze_point
+
+    traces = [trace for trace in map(recorded_trace, args.sessions) if trace is not None]
+    if not args.sessions:
+        traces.append(synthetic_trace(args.seconds, args.noise, args.seed))
+    if not traces:
+        print("No gaze estimates in the given sessions")
+        return 1
+
+    results = {}
+    for trace in traces:
+        results[trace.name] = {}
+        for filter_type in (RAW,) + gaze_filters.FILTER_TYPES:
+            filtered, update_seconds = run_filter(create_engine(filter_type, gaze_point_config), trace)
+            results[trace.name][filter_type] = score(trace, filtered, update_seconds)
+
+    for name, trace_results in results.items():
+        print(name)
+        for filter_type, result in trace_results.items():
+            print(f"    {filter_type}")
+            for key, value in result.items():
+                print(f"        {key:<20}{value:>10.4f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
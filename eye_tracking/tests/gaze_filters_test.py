@@ -0,0 +1,160 @@
+"""
+Tests for the gaze filters and the filter engine's outlier and blink handling.
+
+    python -m pytest eye_tracking/tests/gaze_filters_test.py
+"""
+
+import pathlib
+
+import numpy as np
+import pytest
+from omegaconf import OmegaConf
+
+from eye_tracking.src.gaze_filters import (LEYE_OPENNESS_INDICES, REYE_OPENNESS_INDICES, BoxcarFilter,
+                                           GazeFilterEngine, KalmanFilter, OneEuroFilter, create_gaze_filter,
+                                           eye_openness)
+
+CONFIG_PATH = pathlib.Path(__file__).parent.parent / "configs/mpiigaze.yaml"
+
+TICK = 1 / 30
+NOISE = 0.01
+FIXATION = np.array([0.1, -0.05, 0.6])
+SACCADE = np.array([-0.2, 0.05, 0.6])
+
+
+def fixation(point: np.ndarray, frames: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return point + rng.normal(0, NOISE, (frames, len(point)))
+
+
+def run(engine: GazeFilterEngine, points: np.ndarray, start: float = 0.0) -> list:
+    return [engine.update(point, start + i * TICK) for i, point in enumerate(points)]
+
+
+def default_engine(**overrides) -> GazeFilterEngine:
+    gaze_point_config = OmegaConf.merge(OmegaConf.load(CONFIG_PATH).gaze_point, {"filter": overrides})
+    return create_gaze_filter(gaze_point_config)
+
+
+def test_default_boxcar_matches_moving_average():
+    engine = default_engine()
+    window = OmegaConf.load(CONFIG_PATH).gaze_point.smoothing_frames
+    # Fixations, a saccade and a single glitch, which the previous moving average did not treat specially
+    points = np.concatenate([fixation(FIXATION, 20), fixation(SACCADE, 20, seed=1)])
+    points[30] += 1.0
+
+    buffer = []
+    for i, point in enumerate(points):
+        buffer.append(point)
+        if len(buffer) > window:
+            buffer.pop(0)
+        output = engine.update(point, i * TICK)
+        np.testing.assert_allclose(output, np.mean(buffer, axis=0))
+
+
+def test_boxcar_velocity():
+    boxcar = BoxcarFilter(4)
+    velocity = np.array([0.3, 0.0])
+    for i in range(10):
+        boxcar.update(velocity * i * TICK, i * TICK)
+
+    np.testing.assert_allclose(boxcar.velocity, velocity)
+    # The average lags by half the window, which prediction makes up
+    np.testing.assert_allclose(boxcar.predict(9 * TICK), velocity * 9 * TICK)
+
+
+@pytest.mark.parametrize("gaze_filter", [
+    OneEuroFilter(min_cutoff=1.0, beta=5.0, derivative_cutoff=1.0),
+    KalmanFilter(process_noise=0.5, measurement_noise=NOISE ** 2),
+], ids=["one_euro", "kalman"])
+def test_converges_to_fixation(gaze_filter):
+    engine = GazeFilterEngine(gaze_filter)
+    outputs = run(engine, fixation(FIXATION, 60))
+
+    # Smoother than the estimates, and centred on the fixation
+    assert np.linalg.norm(outputs[-1] - FIXATION) < 2 * NOISE
+    assert np.std(np.diff(outputs[30:], axis=0)) < NOISE
+
+    outputs = run(engine, fixation(SACCADE, 30, seed=1), start=2.0)
+    # Caught up with the saccade within half a second
+    assert np.linalg.norm(outputs[15] - SACCADE) < 3 * NOISE
+
+
+def test_kalman_estimates_velocity():
+    kalman = KalmanFilter(process_noise=0.5, measurement_noise=NOISE ** 2)
+    velocity = np.array([0.5, -0.2])
+    for i in range(60):
+        kalman.update(velocity * i * TICK, i * TICK)
+
+    np.testing.assert_allclose(kalman.velocity, velocity, atol=0.01)
+    np.testing.assert_allclose(kalman.predict(2.0 + 0.1), velocity * 2.1, atol=0.01)
+
+
+def test_outlier_rejected():
+    engine = GazeFilterEngine(BoxcarFilter(8), outlier_factor=4.0, outlier_frames=3)
+    points = fixation(FIXATION, 30)
+    outputs = run(engine, points[:20])
+
+    glitch = points[20] + np.array([0.5, 0.0, 0.0])
+    assert engine.update(glitch, 20 * TICK) is outputs[-1]
+
+    outputs = run(engine, points[21:], start=21 * TICK)
+    assert np.linalg.norm(outputs[-1] - FIXATION) < 2 * NOISE
+
+
+def test_saccade_resets_filter():
+    engine = GazeFilterEngine(BoxcarFilter(8), outlier_factor=4.0, outlier_frames=3)
+    run(engine, fixation(FIXATION, 20))
+
+    outputs = run(engine, fixation(SACCADE, 3, seed=1), start=20 * TICK)
+    # Held until the gaze has stayed away for outlier_frames estimates
+    assert outputs[0] is outputs[1]
+    assert np.linalg.norm(outputs[1] - FIXATION) < 2 * NOISE
+    # Then restarted from those estimates alone, with no lag from the previous fixation
+    assert np.linalg.norm(outputs[2] - SACCADE) < 2 * NOISE
+    assert engine.filter.count == 3
+
+
+def test_blink_held_then_reset():
+    engine = GazeFilterEngine(BoxcarFilter(8), blink_hold=0.3)
+    outputs = run(engine, fixation(FIXATION, 10))
+    held = outputs[-1]
+
+    for i in range(10, 17):
+        # Estimates during a blink are meaningless
+        assert engine.update(SACCADE, i * TICK, blinking=True) is held
+    assert engine.update(None, 17 * TICK) is held
+
+    assert engine.update(SACCADE, 20 * TICK, blinking=True) is None
+    assert engine.filter.estimate is None
+
+    # Starts again from the next open eye estimate
+    np.testing.assert_allclose(engine.update(SACCADE, 21 * TICK), SACCADE)
+
+
+def test_prediction():
+    velocity = np.array([0.3, 0.0])
+    engine = GazeFilterEngine(KalmanFilter(process_noise=0.5, measurement_noise=NOISE ** 2), prediction=0.1)
+    for i in range(60):
+        output = engine.update(velocity * i * TICK, i * TICK)
+
+    np.testing.assert_allclose(output, velocity * (59 * TICK + 0.1), atol=0.01)
+
+
+def test_eye_openness():
+    landmarks = np.zeros((478, 2))
+    for indices in (REYE_OPENNESS_INDICES, LEYE_OPENNESS_INDICES):
+        outer, inner, upper, lower = indices
+        landmarks[outer] = (0, 5)
+        landmarks[inner] = (10, 5)
+        landmarks[upper] = (5, 3.5)
+        landmarks[lower] = (5, 6.5)
+    assert eye_openness(landmarks) == pytest.approx(0.3)
+
+    landmarks[REYE_OPENNESS_INDICES[2:]] = (5, 5)
+    assert eye_openness(landmarks) == pytest.approx(0.15)
+
+
+def test_invalid_filter_type():
+    with pytest.raises(ValueError):
+        default_engine(type="median")
@@ -0,0 +1,127 @@
+"""
+Append-only conversation context for the LLM.
+
+Each message has its token count computed once when it is added, so the running total is always
+known and trimming the context only costs as much as the number of messages removed.
+"""
+
+from typing import List, Dict, Optional
+import json
+import pathlib
+from collections import deque
+
+from common.logger_helper import init_logger
+
+from .utils import message_token_len, REPLY_PRIMING_TOKENS
+
+logger = init_logger()
+
+
+class ContextStore:
+    """
+    Conversation context between the user and the LLM. The first message (the system prompt) is pinned
+    and is never trimmed. New messages are appended to the context file on disk rather than rewriting it.
+    """
+
+    def __init__(self, messages: List[Dict[str, str]], context_path: Optional[pathlib.Path] = None):
+        """
+        Initialises the context store.
+
+        Args:
+            messages (List[Dict[str, str]]): The existing context, with the pinned message first.
+            context_path (Optional[pathlib.Path]): File to append new messages to. If None, the
+                                                   context is only kept in memory.
+        """
+
+        self.context_path = context_path
+
+        self._pinned: Optional[Dict[str, str]] = None
+        self._pinned_tokens = 0
+        self._messages: deque[Dict[str, str]] = deque()
+        self._token_counts: deque[int] = deque()
+        self.total_tokens = REPLY_PRIMING_TOKENS
+        # Messages appended since loading, including any since trimmed
+        self.appended = 0
+
+        for i, message in enumerate(messages):
+            if i == 0:
+                self._pinned = message
+                self._pinned_tokens = message_token_len(message)
+                self.total_tokens += self._pinned_tokens
+            else:
+                self._push(message)
+
+        logger.debug("Loaded context of %d messages (%d tokens)", len(self), self.total_tokens)
+
+    def __len__(self) -> int:
+        return len(self._messages) + (self._pinned is not None)
+
+    def _push(self, message: Dict[str, str]) -> None:
+        """
+        Adds a message to the in memory context, counting its tokens.
+
+        Args:
+            message (Dict[str, str]): The message to add.
+        """
+        token_count = message_token_len(message)
+        self._messages.append(message)
+        self._token_counts.append(token_count)
+        self.total_tokens += token_count
+
+    def append(self, role: str, content: str, persist: bool = True) -> None:
+        """
+        Appends a message to the context.
+
+        Args:
+            role (str): The role of the message, e.g. 'user' or 'assistant'.
+            content (str): The message content.
+            persist (bool): Whether to also append the message to the context file.
+        """
+        message = {"role": role, "content": content}
+        self.appended += 1
+        if self._pinned is None:
+            self._pinned = message
+            self._pinned_tokens = message_token_len(message)
+            self.total_tokens += self._pinned_tokens
+        else:
+            self._push(message)
+
+        if persist and self.context_path is not None:
+            with open(self.context_path, "a") as f:
+                f.write(json.dumps(message) + "\n")
+
+    def trim(self, max_tokens: int) -> int:
+        """
+        Removes the oldest (unpinned) messages until the context fits within the token limit.
+
+        Args:
+            max_tokens (int): The maximum number of tokens allowed in the context.
+
+        Returns:
+            int: The number of messages removed.
+        """
+        removed = 0
+        while self.total_tokens > max_tokens and self._messages:
+            self._messages.popleft()
+            self.total_tokens -= self._token_counts.popleft()
+            removed += 1
+
+        if removed:
+            logger.info(
+                "Warning: Context truncated. Only the most recent %d messages are being used.", len(self))
+            logger.info(
+                "Older messages have been removed to fit within the token limit.")
+
+        return removed
+
+    @property
+    def messages(self) -> List[Dict[str, str]]:
+        """
+        The context in the form expected by the chat completions API.
+
+        Returns:
+            List[Dict[str, str]]: The messages, pinned message first.
+        """
+        messages = [self._pinned] if self._pinned is not None else []
+        messages.extend(self._messages)
+        return messages
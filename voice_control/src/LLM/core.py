@@ -2,9 +2,8 @@
 Core functionality for interacting with the language model and executing code in the agent's environment.
 """
 
-from typing import List, Tuple, Dict, Callable
-import json
-import os
+from typing import List, Tuple, Dict, Callable, Iterator, Optional
+import time
 import contextlib
 from io import StringIO
 from code import InteractiveConsole
@@ -12,13 +11,14 @@ from code import InteractiveConsole
 from common.logger_helper import init_logger
 
 from .wrappers import AgentIsDone
-from .utils import ask_llm
+from .context import ContextStore
+from .utils import ask_llm, stream_llm
 from .formatting import add_terminal_line_decorators, extract_terminal_entries
 
 from common import str_helper
 
-from ..file_handler import get_context_file
 from ..constants import MAX_LOOP
+from ..latency import LatencyRecorder, LLM_ROUND
 
 
 logger = init_logger()
@@ -139,7 +139,9 @@ def correct_format(response: str) -> bool:
 def run_until_halt(
     interactive_console: AgentInteractiveConsole,
     ask_fn: Callable[[List[Dict[str, str]], bool], str],
-    context: List[Dict[str, str]],
+    context: ContextStore,
+    stream_fn: Optional[Callable[[List[Dict[str, str]]], Iterator[str]]] = None,
+    latency: Optional[LatencyRecorder] = None,
 ) -> Tuple[bool, str]:
     """
     Continuously executes code provided by a language model until an agent signals completion or a valid output is produced.
@@ -151,7 +153,10 @@ def run_until_halt(
     Args:
         interactive_console (AgentInteractiveConsole): The console in which the code entries will be executed.
         ask_fn (Callable): A function to call the LLM, expecting the current context and a boolean to guide the request.
-        context (List[Dict[str, str]]): The conversation context between the user and the assistant, updated throughout execution.
+        context (ContextStore): The conversation context between the user and the assistant, updated throughout execution.
+        stream_fn (Optional[Callable]): A function to stream the LLM response. If given, each terminal entry is executed
+                                        as soon as it has been received rather than after the full completion.
+        latency (Optional[LatencyRecorder]): If given, records the duration of each round trip to the LLM.
 
     Returns:
         Tuple[bool, str]:
@@ -168,10 +173,13 @@ def run_until_halt(
     while not (agent_is_done or message != "") and loop_count < MAX_LOOP:
         captured_output = ""
         executed_entries = list()
+        round_start_time = time.perf_counter()
 
-        terminal_code = ask_llm(context, ask_fn)
-
-        terminal_entries = extract_terminal_entries(terminal_code)
+        if stream_fn is not None:
+            terminal_entries = stream_llm(context, stream_fn, ask_fn)
+        else:
+            terminal_code = ask_llm(context, ask_fn)
+            terminal_entries = extract_terminal_entries(terminal_code)
 
         for entry_code in terminal_entries:
             (
@@ -187,11 +195,18 @@ def run_until_halt(
             if agent_is_done or captured_output != "":
                 break
 
+        if stream_fn is not None:
+            # Stop receiving the rest of the streamed response
+            terminal_entries.close()
+
+        if latency is not None:
+            latency.record(LLM_ROUND, time.perf_counter() - round_start_time)
+
         executed_code = "\n".join(executed_entries)
-        context.append({"role": "assistant", "content": executed_code})
+        context.append("assistant", executed_code)
         logger.info("Executed code: %s", str_helper.trim(executed_code))
         if captured_output != "":
-            context.append({"role": "user", "content": captured_output})
+            context.append("user", captured_output)
             logger.info("Captured output: {str_helper.trim(captured_output)}")
             if correct_format(captured_output):
                 break
@@ -207,21 +222,25 @@ def run_until_halt(
 def react(
     interactive_console: AgentInteractiveConsole,
     ask_fn: Callable[[List[Dict[str, str]], bool], str],
-    context: List[Dict[str, str]],
+    context: ContextStore,
     user_command: str,
+    stream_fn: Optional[Callable[[List[Dict[str, str]]], Iterator[str]]] = None,
+    latency: Optional[LatencyRecorder] = None,
 ) -> Tuple[bool, str]:
     """
-    Handles user commands by updating context, saving it, and interacting with the LLM until a task is completed or output is produced.
+    Handles user commands by updating context and interacting with the LLM until a task is completed or output is produced.
 
-    This function processes a user command, stores it in a context file, and then appends it to the provided `context`.
+    This function appends the user command to the provided `context`, which persists it to the context file.
     The context is used to query the LLM via `ask_fn` and execute responses using the `interactive_console`.
     It continues interacting with the LLM until the agent signals completion or produces valid output.
 
     Args:
         interactive_console (AgentInteractiveConsole): The console in which LLM-provided code entries will be executed.
         ask_fn (Callable): A function for querying the LLM, providing the current context and a boolean parameter.
-        context (List[Dict[str, str]]): The conversation history and context between the user and the assistant.
+        context (ContextStore): The conversation history and context between the user and the assistant.
         user_command (str): The command provided by the user to be processed.
+        stream_fn (Optional[Callable]): A function to stream the LLM response. See `run_until_halt`.
+        latency (Optional[LatencyRecorder]): If given, records the duration of each LLM round.
 
     Returns:
         Tuple[bool, str]:
@@ -230,29 +249,14 @@ def react(
             - str: The final output produced by the execution, if available.
 
     Behavior:
-        - The function first reads from the context file (if it exists), appends the user command, and saves the updated context.
-        - It then logs and updates the context before invoking `run_until_halt` to interact with the LLM and execute code.
+        - The function appends the user command to the context before invoking `run_until_halt`.
         - The function runs until the agent completes its task or produces an actionable output.
 
     Side effects:
-        - Modifies the context file by appending the user command and the ongoing conversation context.
+        - Appends the user command and the ongoing conversation to the context file.
     """
-    context_file = get_context_file()
-    stored_context = []
-
-    if os.path.exists(context_file) and os.path.getsize(context_file) > 0:
-        with open(context_file, "r") as f:
-            for line in f:
-                parsed = json.loads(line)
-                stored_context.append(parsed)
-
-    stored_context.append({"role": "user", "content": user_command})
-    with open(context_file, "w") as f:
-        for entry in stored_context:
-            f.write(json.dumps(entry) + "\n")
-
     logger.info(user_command)
-    context.append({"role": "user", "content": user_command})
+    context.append("user", user_command)
     agent_is_done, message, output = run_until_halt(
-        interactive_console, ask_fn, stored_context)
+        interactive_console, ask_fn, context, stream_fn, latency)
     return agent_is_done, message, output
@@ -5,7 +5,8 @@ This module contains the default values for the LLM model.
 import json
 import os
 
-from ..file_handler import get_data_folder, get_context_file
+from .context import ContextStore
+from ..file_handler import get_context_file, get_initial_context_file, get_system_prompt_file
 
 
 def init_context() -> list[dict]:
@@ -13,23 +14,21 @@ def init_context() -> list[dict]:
     Initialises the context for the LLM model.
 
     This function reads the initial context from the 'context.jsonl' file in the 'data' folder.
+    If it does not exist yet, it is seeded from the system prompt and 'initial.jsonl'. The seed
+    files are only ever read so that they can be used to detect prompt changes (see CommandCache).
 
     Returns:
         list[dict]: The initial context as a list of dictionaries
     """
 
-    data_folder = get_data_folder()
     context_path = get_context_file()
-    initial_path = data_folder / "initial.jsonl"
+    initial_path = get_initial_context_file()
 
     if os.path.exists(context_path) and os.path.getsize(context_path) > 0:
         with open(context_path, "r") as f:
             initial_context = [json.loads(line) for line in f]
-        with open(initial_path, "w") as f:
-            for entry in initial_context:
-                f.write(json.dumps(entry) + "\n")
     else:
-        system_prompt_path = data_folder / "system_prompt.txt"
+        system_prompt_path = get_system_prompt_file()
         with open(system_prompt_path, "r") as f:
             system_prompt = f.read().strip().replace("\n", " ")
 
@@ -41,3 +40,14 @@ def init_context() -> list[dict]:
                 f.write(json.dumps(entry) + "\n")
 
     return initial_context
+
+
+def init_context_store() -> ContextStore:
+    """
+    Initialises the append-only context store for the LLM model from the 'context.jsonl' file.
+
+    Returns:
+        ContextStore: The context store, persisting new messages to 'context.jsonl'.
+    """
+
+    return ContextStore(init_context(), get_context_file())
@@ -2,10 +2,14 @@
 Module for formatting code and terminal entries.
 """
 
-from typing import List, Dict, Callable
+from typing import List, Dict, Callable, Optional
+
+from common.logger_helper import init_logger
 
 from ..constants import PYTHON_PROMPT, CONTINUATION_PROMPT, PYTHON_SHELL, ELLIPSIS
 
+logger = init_logger()
+
 
 def remove_terminal_line_decorators(terminal_code: str) -> str:
     """
@@ -154,3 +158,158 @@ def extract_terminal_entries(terminal_code: str) -> List[str]:
                0 else e for i, e in enumerate(entries)]
 
     return [remove_terminal_line_decorators(e) for e in entries]
+
+
+class TerminalEntryStream:
+    """
+    Incrementally extracts terminal entries from a streamed LLM response.
+
+    Text is fed in as it arrives from the API. An entry is complete once the start of the next line shows it
+    is not a continuation ('... ') of the current entry, so entries can be executed before the full completion
+    has been received. Lines are formatted with the same rules as `ensure_terminal_formatting_strict`.
+
+    If a line without a terminal decorator is received, the response is not terminal formatted and entries can
+    no longer be split reliably. No further entries are emitted and the rest of the response is kept in
+    `unformatted_code`, to be formatted as a whole with `ensure_terminal_formatting` like a full completion.
+    """
+
+    def __init__(self):
+        """
+        Initialises the entry stream.
+        """
+        self._partial_line = ""
+        self._entry_lines: List[str] = []
+        self.formatted = True
+        self._unformatted_lines: List[str] = []
+
+    @property
+    def unformatted_code(self) -> str:
+        """
+        The code received since the last emitted entry, once the response is found not to be terminal formatted.
+
+        Returns:
+            str: The code, or an empty string if the response is terminal formatted.
+        """
+        return "\n".join(self._unformatted_lines)
+
+    def _add_line(self, line: str) -> List[str]:
+        """
+        Adds a formatted line to the current entry.
+
+        Args:
+            line (str): The formatted line.
+
+        Returns:
+            List[str]: The entry completed by the line, if any.
+        """
+        if self.formatted and not line.startswith((PYTHON_PROMPT, CONTINUATION_PROMPT)):
+            logger.warning("Streamed response is not terminal formatted, formatting the rest as a whole")
+            self.formatted = False
+            self._unformatted_lines = self._entry_lines
+            self._entry_lines = []
+
+        if not self.formatted:
+            self._unformatted_lines.append(line)
+            return []
+
+        completed = []
+        if line.startswith(PYTHON_PROMPT):
+            completed.extend(self._finish_entry())
+        self._entry_lines.append(line)
+        return completed
+
+    def _format_line(self, line: str) -> Optional[str]:
+        """
+        Applies strict terminal formatting and code block removal to a single line.
+
+        Args:
+            line (str): The raw line from the response.
+
+        Returns:
+            Optional[str]: The formatted line or None if it should be skipped.
+        """
+        line = remove_code_block_formatting(line) if "```" in line else line
+        line = line.rstrip("\r")
+        if not line:
+            return None
+
+        if line[0] == "#":
+            line = PYTHON_PROMPT + line
+
+        if line in {PYTHON_SHELL, ELLIPSIS}:
+            line += " "
+
+        return line
+
+    def _finish_entry(self) -> List[str]:
+        """
+        Completes the current entry, if any.
+
+        Returns:
+            List[str]: The completed entry with decorators removed, or an empty list.
+        """
+        if not self._entry_lines:
+            return []
+
+        entry = remove_terminal_line_decorators("\n".join(self._entry_lines))
+        self._entry_lines = []
+        return [entry]
+
+    def _starts_new_entry(self, line_start: str) -> Optional[bool]:
+        """
+        Determines whether the (possibly partial) line begins a new entry.
+
+        Args:
+            line_start (str): The start of the line.
+
+        Returns:
+            Optional[bool]: True if it ends the current entry, False if it continues it and None if
+                            not enough of the line has been received to know.
+        """
+        if len(line_start) < len(PYTHON_PROMPT) and (
+                PYTHON_PROMPT.startswith(line_start) or CONTINUATION_PROMPT.startswith(line_start)):
+            return None
+
+        return line_start.startswith(PYTHON_PROMPT) or line_start[0] == "#"
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Feeds more of the response into the stream.
+
+        Args:
+            text (str): The newly received text.
+
+        Returns:
+            List[str]: Any entries completed by the new text.
+        """
+        completed = []
+        self._partial_line += text
+
+        while "\n" in self._partial_line:
+            line, self._partial_line = self._partial_line.split("\n", 1)
+            line = self._format_line(line)
+            if line is not None:
+                completed.extend(self._add_line(line))
+
+        # Emit the current entry early if the next line has started and is not a continuation
+        if self._entry_lines and self._partial_line.strip("`"):
+            if self._starts_new_entry(self._partial_line):
+                completed.extend(self._finish_entry())
+
+        return completed
+
+    def close(self) -> List[str]:
+        """
+        Marks the end of the response, flushing any remaining entry.
+
+        Returns:
+            List[str]: The remaining entries.
+        """
+        completed = []
+        line = self._format_line(self._partial_line)
+        self._partial_line = ""
+        if line is not None:
+            completed.extend(self._add_line(line))
+
+        completed.extend(self._finish_entry())
+        return completed
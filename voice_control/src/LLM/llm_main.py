@@ -2,16 +2,14 @@
 Main logic for running the terminal agent in the Local Language Model (LLM) system.
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
 
 from omegaconf import OmegaConf
 import openai
 
 from common.logger_helper import init_logger
 
-from .core import AgentInteractiveConsole, react
-from .defaults import init_context
-from .wrappers import done, proxy_input
+from .session import AgentSession
 from .formatting import remove_code_block_formatting
 
 
@@ -36,6 +34,15 @@ class LLM:
 
         self.__check_config()
 
+        self.stream = self.config.get("stream", False)
+        api_base = self.config.get("api_base", None)
+        if api_base:
+            logger.info("Using OpenAI API base %s", api_base)
+            openai.api_base = api_base
+
+        stream_fn = self.ask_fn_stream if self.stream else None
+        self.session = AgentSession(self.ask_fn, stream_fn)
+
     def __check_config(self) -> None:
         """
         Checks if the configuration object contains the required parameters.
@@ -65,28 +72,41 @@ class LLM:
         clean_code = remove_code_block_formatting(terminal_code)
         return clean_code
 
-    def run_terminal_agent(self, user_input: str) -> Optional[str]:
+    def ask_fn_stream(self, context: List[Dict[str, str]]) -> Iterator[str]:
         """
-        Runs an interactive terminal agent that reacts to user input and executes commands in a console environment.
-        If no user input is provided, the function will return empty output.
+        Sends a streamed chat completion request to the OpenAI API, yielding the response content as it arrives.
 
         Args:
-            user_input (str): The initial user input. Can be an empty string.
+            context (List[Dict[str, str]]): A list of dictionaries representing the conversation history.
+                                            Each dictionary should contain keys like 'role' and 'content'.
 
         Returns:
-            Optional[str]: The output generated by the agent in response to the user's command. None if no command is given.
+            Iterator[str]: The content of the response as it is received from the OpenAI API.
         """
+        response = openai.ChatCompletion.create(
+            model=self.config.model, temperature=self.config.temperature, messages=context, stream=True)
+        for chunk in response:
+            choices = chunk["choices"]
+            if not choices:
+                continue
 
-        if not user_input:
-            return None
+            content = choices[0].get("delta", {}).get("content")
+            if content:
+                yield content
 
-        interactive_console = AgentInteractiveConsole(locals={"done": done, "input": proxy_input})
-        context = init_context()
+    def run_terminal_agent(self, user_input: str) -> Optional[str]:
+        """
+        Runs the interactive terminal agent on the user's input. The agent's console and context are kept
+        between commands, see `AgentSession`. If no user input is provided, the function will return empty output.
+
+        Args:
+            user_input (str): The initial user input. Can be an empty string.
 
-        user_command = f">>> # User: {user_input}"
-        _, _, output = react(interactive_console, self.ask_fn, context, user_command)
+        Returns:
+            Optional[str]: The output generated by the agent in response to the user's command. None if no command is given.
+        """
 
-        return output
+        return self.session.run(user_input)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+"""
+Long-lived terminal agent session.
+
+Keeps the interactive console, the tokenised context and the HTTP connection pool alive between
+voice commands so no per-command setup is required.
+"""
+
+from typing import Any, List, Dict, Callable, Iterator, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import openai
+import requests
+
+from common.logger_helper import init_logger
+
+from .core import AgentInteractiveConsole, react
+from .context import ContextStore
+from .defaults import init_context_store
+from .wrappers import done, proxy_input
+from ..latency import LatencyRecorder
+
+logger = init_logger()
+
+
+class AgentSession:
+    """
+    Terminal agent session reused across user commands.
+
+    Commands can either be run synchronously via `run` or submitted via `submit`, which processes
+    them in order on a single background worker. This allows one request to be in flight while the
+    next utterance is being captured and transcribed. Other work which must stay in order with the
+    submitted commands can be queued on the same worker with `enqueue`.
+    """
+
+    def __init__(
+        self,
+        ask_fn: Callable[[List[Dict[str, str]], bool], str],
+        stream_fn: Optional[Callable[[List[Dict[str, str]]], Iterator[str]]] = None,
+        context_factory: Callable[[], ContextStore] = init_context_store,
+    ):
+        """
+        Initialises the agent session. The context is loaded lazily on the first command.
+
+        Args:
+            ask_fn (Callable): Function sending the context to the LLM and returning the full response.
+            stream_fn (Optional[Callable]): Function streaming the LLM response. If None, responses are not streamed.
+            context_factory (Callable[[], ContextStore]): Loads the context when the session starts or is reset.
+        """
+
+        self.ask_fn = ask_fn
+        self.stream_fn = stream_fn
+        self.context_factory = context_factory
+
+        self.context: Optional[ContextStore] = None
+        self.console = self._create_console()
+        self.latency: Optional[LatencyRecorder] = None
+        # Messages added to the context by the last command after the user's command
+        self.last_turns: List[Dict[str, str]] = []
+
+        # Share one connection pool across requests instead of reconnecting per command
+        self.http_session = requests.Session()
+        openai.requestssession = self.http_session
+
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: List[Future] = []
+
+    def _create_console(self) -> AgentInteractiveConsole:
+        """
+        Creates the interactive console the agent's code is executed in.
+
+        Returns:
+            AgentInteractiveConsole: The console.
+        """
+        return AgentInteractiveConsole(locals={"done": done, "input": proxy_input})
+
+    def reset(self, reload_context: bool = True) -> None:
+        """
+        Resets the session, discarding any variables defined by the agent.
+
+        Args:
+            reload_context (bool): If True, the in memory context is discarded and reloaded from disk
+                                   on the next command.
+        """
+        with self._lock:
+            logger.info("Resetting agent session")
+            self.console = self._create_console()
+            if reload_context:
+                self.context = None
+
+    def run(self, user_input: str) -> Optional[str]:
+        """
+        Runs the agent on a user command.
+
+        Args:
+            user_input (str): The user's command. Can be an empty string.
+
+        Returns:
+            Optional[str]: The output generated by the agent in response to the user's command. None if no command is given.
+        """
+        if not user_input:
+            return None
+
+        with self._lock:
+            if self.context is None:
+                self.context = self.context_factory()
+
+            appended = self.context.appended
+            user_command = f">>> # User: {user_input}"
+            _, _, output = react(
+                self.console, self.ask_fn, self.context, user_command, self.stream_fn, self.latency)
+
+            turn_count = min(self.context.appended - appended, len(self.context)) - 1
+            self.last_turns = self.context.messages[-turn_count:] if turn_count > 0 else []
+
+        return output
+
+    def record(self, user_input: str, turns: List[Dict[str, str]]) -> None:
+        """
+        Adds a command answered without the LLM to the context, as if the agent had run it, so later
+        commands referring back to it are understood.
+
+        Args:
+            user_input (str): The user's command.
+            turns (List[Dict[str, str]]): The messages the agent added after the user's command when
+                                          it last ran it.
+        """
+        with self._lock:
+            if self.context is None:
+                self.context = self.context_factory()
+
+            self.context.append("user", f">>> # User: {user_input}")
+            for turn in turns:
+                self.context.append(turn["role"], turn["content"])
+
+            self.last_turns = list(turns)
+
+    def submit(self, user_input: str, callback: Optional[Callable[[Optional[str]], None]] = None) -> Future:
+        """
+        Queues a user command to be run in the background. Commands are run one at a time in submission order.
+
+        Args:
+            user_input (str): The user's command.
+            callback (Optional[Callable[[Optional[str]], None]]): Called on the worker with the agent's output
+                                                                  (None if the agent failed) before the next
+                                                                  command is started.
+
+        Returns:
+            Future: Resolves to the agent's output (see `run`) once the callback has returned.
+        """
+        return self.enqueue(self._run_with_callback, user_input, callback)
+
+    def enqueue(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """
+        Queues a function to run on the background worker after all previously submitted work.
+
+        Args:
+            fn (Callable[..., Any]): The function to run.
+            *args (Any): Arguments to the function.
+
+        Returns:
+            Future: Resolves to the function's return value.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="AgentSession")
+
+        future = self._executor.submit(fn, *args)
+        self._pending = [f for f in self._pending if not f.done()]
+        self._pending.append(future)
+        return future
+
+    def _run_with_callback(self, user_input: str, callback: Optional[Callable[[Optional[str]], None]]) -> Optional[str]:
+        """
+        Runs the agent on a user command and passes the output to the callback.
+
+        Args:
+            user_input (str): The user's command.
+            callback (Optional[Callable[[Optional[str]], None]]): Called with the agent's output.
+
+        Returns:
+            Optional[str]: The output generated by the agent.
+        """
+        try:
+            output = self.run(user_input)
+        except Exception as e:
+            logger.error("Agent failed to process '%s'. Details: %s", user_input, e)
+            output = None
+
+        if callback is not None:
+            callback(output)
+
+        return output
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """
+        Waits for all submitted commands to finish.
+
+        Args:
+            timeout (Optional[float]): Maximum time to wait per command in seconds.
+        """
+        for future in list(self._pending):
+            try:
+                future.result(timeout)
+            except Exception as e:
+                logger.error("Submitted command failed. Details: %s", e)
+
+        self._pending = [f for f in self._pending if not f.done()]
+
+    def close(self) -> None:
+        """
+        Waits for submitted commands and releases the worker and connection pool.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+        self.http_session.close()
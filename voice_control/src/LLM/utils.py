@@ -2,70 +2,125 @@
 Utils for the Language Model (LLM) module.
 """
 
-from typing import List, Dict, Callable
-
-import tiktoken
+from typing import List, Dict, Callable, Iterator, Optional, TYPE_CHECKING
+import time
+import threading
 
 from common.logger_helper import init_logger
 
-from .formatting import ensure_terminal_formatting
+from .formatting import ensure_terminal_formatting, extract_terminal_entries, TerminalEntryStream
 
 from ..constants import MAX_TOKENS, GPT_4
 
-gpt_token_encoder = tiktoken.encoding_for_model(GPT_4)
+if TYPE_CHECKING:
+    import tiktoken
+
+    from .context import ContextStore
+
 logger = init_logger()
 
+# every message follows <|start|>{role/name}\n{content}<|end|>\n
+MESSAGE_FORMAT_TOKENS = 4
+# every reply is primed with <|start|>assistant<|message|>
+REPLY_PRIMING_TOKENS = 3
+# Rough number of characters per token, used when the encoder is unavailable
+APPROX_CHARS_PER_TOKEN = 4
 
-def context_token_len(context: List[Dict[str, str]]) -> int:
+
+def load_token_encoder() -> Optional["tiktoken.Encoding"]:
     """
-    Calculates the total number of tokens used in the given context for a conversation.
+    Loads the tiktoken encoder for the GPT-4 family. The encoding is downloaded on first use, so
+    when running offline (e.g. in CI) token counts are approximated instead.
 
-    This function iterates over a list of messages, represented as dictionaries with 'role' and 'content' keys,
-    and computes the total number of tokens required to represent the entire context. Each message adds a
-    set number of tokens for formatting, in addition to the number of tokens required by the message content.
+    Returns:
+        Optional[tiktoken.Encoding]: The encoder or None if it could not be loaded.
+    """
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_for_model(GPT_4)
+    except Exception as e:
+        logger.warning("Could not load token encoder, approximating token counts. Details: %s", e)
+        return None
+
+
+_token_encoder_lock = threading.Lock()
+_token_encoder_loaded = False
+_token_encoder: Optional["tiktoken.Encoding"] = None
+
+
+def get_token_encoder() -> Optional["tiktoken.Encoding"]:
+    """
+    Returns the token encoder, loading it on first use. Loading reads (or downloads) the
+    encoding's BPE ranks, so it is deferred from import to keep startup fast.
+
+    Returns:
+        Optional[tiktoken.Encoding]: The encoder or None if it could not be loaded.
+    """
+    global _token_encoder, _token_encoder_loaded
+
+    if _token_encoder_loaded:
+        return _token_encoder
+
+    with _token_encoder_lock:
+        if not _token_encoder_loaded:
+            _token_encoder = load_token_encoder()
+            _token_encoder_loaded = True
+
+    return _token_encoder
+
+
+def warm_up_token_encoder() -> threading.Thread:
+    """
+    Loads the token encoder in a background thread so it is ready by the first command.
+
+    Returns:
+        threading.Thread: The loading thread.
+    """
+    thread = threading.Thread(target=get_token_encoder, name="token_encoder_warm_up", daemon=True)
+    thread.start()
+    return thread
+
+
+def message_token_len(message: Dict[str, str]) -> int:
+    """
+    Calculates the number of tokens a single message contributes to the context.
 
     Args:
-        context (List[Dict[str, str]]): A list of dictionaries where each dictionary represents a message in the conversation.
-                                        Each message contains 'role' (e.g., 'user', 'assistant') and 'content' (the message text).
+        message (Dict[str, str]): A message with 'role' and 'content' keys.
 
     Returns:
-        int: The total number of tokens used in the context, including the content and formatting tokens.
+        int: The number of tokens used by the message, including formatting tokens.
     """
-    num_tokens = 0
-    for message in context:
-        # every message follows <|start|>{role/name}\n{content}<|end|>\n
-        num_tokens += 4
-        num_tokens += len(gpt_token_encoder.encode(message["content"]))
-    num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
-    return num_tokens
+    content = message["content"]
+    token_encoder = get_token_encoder()
+    if token_encoder is None:
+        return MESSAGE_FORMAT_TOKENS + len(content) // APPROX_CHARS_PER_TOKEN + 1
+
+    return MESSAGE_FORMAT_TOKENS + len(token_encoder.encode(content))
 
 
-def limit_context_length(context: List[Dict[str, str]]):
+def context_token_len(context: List[Dict[str, str]]) -> int:
     """
-    Trims the conversation context to ensure the total number of tokens does not exceed the maximum limit.
+    Calculates the total number of tokens used in the given context for a conversation.
 
-    This function continuously removes the earliest message (excluding the first one) from the conversation
-    context until the total token count falls below the maximum token limit. The first message is retained to
-    preserve the original context or system instructions.
+    This function iterates over a list of messages, represented as dictionaries with 'role' and 'content' keys,
+    and computes the total number of tokens required to represent the entire context. Each message adds a
+    set number of tokens for formatting, in addition to the number of tokens required by the message content.
 
     Args:
-        context (List[Dict[str, str]]): A list of dictionaries representing the conversation history.
-                                        Each dictionary contains 'role' and 'content' keys for each message.
+        context (List[Dict[str, str]]): A list of dictionaries where each dictionary represents a message in the conversation.
+                                        Each message contains 'role' (e.g., 'user', 'assistant') and 'content' (the message text).
 
     Returns:
-        None
+        int: The total number of tokens used in the context, including the content and formatting tokens.
     """
-    original_length = len(context)
-    while context_token_len(context) > MAX_TOKENS:
-        context.pop(1)
-    if len(context) < original_length:
-        logger.info(
-            "Warning: Context truncated. Only the most recent %d messages are being used.", len(context))
-        logger.info(
-            "Older messages have been removed to fit within the token limit.")
+    num_tokens = sum(message_token_len(message) for message in context)
+    num_tokens += REPLY_PRIMING_TOKENS
+    return num_tokens
 
 
-def ask_llm(context: List[Dict[str, str]], ask_fn: Callable[[List[Dict[str, str]], bool], str]) -> str:
+def ask_llm(context: "ContextStore", ask_fn: Callable[[List[Dict[str, str]], bool], str]) -> str:
     """
     Queries a language model (LLM) using the given conversation context and formats the response as terminal-style code.
 
@@ -74,15 +129,57 @@ def ask_llm(context: List[Dict[str, str]], ask_fn: Callable[[List[Dict[str, str]
     a function to ensure it adheres to terminal-style formatting.
 
     Args:
-        context (List[Dict[str, str]]): A list of dictionaries representing the conversation history, where each message
-                                        is stored with 'role' and 'content' keys.
+        context (ContextStore): The conversation history between the user and the assistant.
         ask_fn (Callable[[List[Dict[str, str]], bool], str]): A callable function that interacts with the LLM, taking the
                                                               current context and returning a string response.
 
     Returns:
         str: The formatted terminal-style code generated by the LLM in response to the provided context.
     """
-    limit_context_length(context)
-    terminal_code = ask_fn(context).strip()
+    context.trim(MAX_TOKENS)
+    terminal_code = ask_fn(context.messages).strip()
     formatted_code = ensure_terminal_formatting(terminal_code, ask_fn)
     return formatted_code
+
+
+def stream_llm(context: "ContextStore", stream_fn: Callable[[List[Dict[str, str]]], Iterator[str]],
+               ask_fn: Callable[[List[Dict[str, str]], bool], str]) -> Iterator[str]:
+    """
+    Queries a language model (LLM) with a streamed response, yielding terminal entries as soon as each one is complete.
+
+    If the response turns out not to be terminal formatted, the rest of it is received in full and formatted with
+    `ensure_terminal_formatting`, as in `ask_llm`, before its entries are yielded.
+
+    Args:
+        context (ContextStore): The conversation history between the user and the assistant.
+        stream_fn (Callable[[List[Dict[str, str]]], Iterator[str]]): A callable that sends the context to the LLM and
+                                                                    yields the response text as it arrives.
+        ask_fn (Callable[[List[Dict[str, str]], bool], str]): A callable used to reformat the response if needed.
+
+    Returns:
+        Iterator[str]: The terminal entries (with decorators removed) in the order they were received.
+    """
+    context.trim(MAX_TOKENS)
+    start_time = time.perf_counter()
+    first_entry = True
+
+    entry_stream = TerminalEntryStream()
+    response = stream_fn(context.messages)
+    try:
+        for text in response:
+            for entry in entry_stream.feed(text):
+                if first_entry:
+                    logger.debug("First terminal entry after %.0f ms",
+                                 (time.perf_counter() - start_time) * 1000)
+                    first_entry = False
+                yield entry
+
+        yield from entry_stream.close()
+
+        if not entry_stream.formatted:
+            formatted_code = ensure_terminal_formatting(entry_stream.unformatted_code, ask_fn)
+            yield from extract_terminal_entries(formatted_code)
+    finally:
+        close = getattr(response, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,479 @@
+"""
+Persistent cache of translated voice commands.
+
+Pilots tend to repeat the same handful of phrases, so the validated command list returned by the
+LLM is stored against the normalised transcript. Cache hits are answered locally without touching
+the network. The cache is invalidated whenever the prompt files the LLM is seeded with change.
+
+Only commands which mean the same whatever was said before are cached. Transcripts referring back
+to earlier commands ("do that again", "go back") are always sent to the LLM, which sees the live
+context. The context turns of each cached translation are kept with it so they can be replayed into
+the agent's context on a hit, keeping later context dependent commands meaningful.
+
+Changes are saved on a background timer, `SAVE_DELAY` after the first unsaved change, so storing
+a command never waits for the file to be written. `close` saves any change still pending.
+"""
+
+from typing import Optional, List, Tuple, Dict, Any
+import os
+import re
+import json
+import time
+import hashlib
+import difflib
+import pathlib
+import threading
+from collections import OrderedDict
+
+from omegaconf import OmegaConf
+
+from common.logger_helper import init_logger
+
+from . import file_handler
+
+logger = init_logger()
+
+CommandList = List[Tuple[str, int]]
+Message = Dict[str, str]
+
+CACHE_VERSION = 1
+# Seconds after a change before the cache is saved, so a burst of changes is written once
+SAVE_DELAY = 2.0
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+NON_WORD_PATTERN = re.compile(r"[^a-z0-9.]+")
+
+
+def normalise_transcript(transcript: str) -> str:
+    """
+    Normalises a transcript so that trivially different phrasings share a cache key.
+    Case, punctuation and repeated whitespace are discarded.
+
+    Args:
+        transcript (str): The transcript as returned by speech recognition.
+
+    Returns:
+        str: The normalised transcript.
+    """
+    lowered = transcript.lower()
+    words = NON_WORD_PATTERN.sub(" ", lowered)
+    # Full stops are only meaningful inside numbers
+    words = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", words)
+    return " ".join(words.split())
+
+
+def contains_phrase(key: str, phrases: List[str]) -> bool:
+    """
+    Checks whether a normalised transcript contains any of the given phrases as whole words.
+
+    Args:
+        key (str): The normalised transcript.
+        phrases (List[str]): The phrases to look for.
+
+    Returns:
+        bool: True if any phrase is found.
+    """
+    padded = f" {key} "
+    return any(f" {normalise_transcript(phrase)} " in padded for phrase in phrases)
+
+
+def is_valid_command_list(commands: Any) -> bool:
+    """
+    Checks whether a parsed LLM result is a list of (command, value) tuples.
+
+    Args:
+        commands (Any): The parsed result.
+
+    Returns:
+        bool: True if the result can be safely cached.
+    """
+    if not isinstance(commands, list):
+        return False
+
+    for command in commands:
+        if not isinstance(command, (tuple, list)) or len(command) != 2:
+            return False
+
+        action, value = command
+        if not isinstance(action, str):
+            return False
+
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+
+    return True
+
+
+class CommandCache:
+    """
+    LRU cache with a time to live mapping normalised transcripts to parsed drone commands.
+    The cache is persisted to the voice control data folder between sessions.
+    """
+
+    def __init__(self, cache_config: OmegaConf, cache_path: Optional[pathlib.Path] = None,
+                 prompt_files: Optional[List[pathlib.Path]] = None):
+        """
+        Initialises the command cache, loading any persisted entries.
+
+        Args:
+            cache_config (OmegaConf): The command cache configuration.
+            cache_path (Optional[pathlib.Path]): Where to persist the cache. Defaults to the data folder.
+            prompt_files (Optional[List[pathlib.Path]]): Files whose contents invalidate the cache when changed.
+                                                         Defaults to the system prompt and initial context.
+        """
+
+        self.config = cache_config
+        self.max_entries = max(1, int(self.config.max_entries))
+        self.ttl = float(self.config.ttl)
+        self.fuzzy_match = bool(self.config.fuzzy_match)
+        self.fuzzy_threshold = float(self.config.fuzzy_threshold)
+        self.context_phrases = list(self.config.context_phrases)
+
+        if cache_path is None:
+            cache_path = file_handler.get_command_cache_file()
+        self.cache_path = cache_path
+
+        if prompt_files is None:
+            prompt_files = [file_handler.get_system_prompt_file(),
+                            file_handler.get_initial_context_file()]
+        self.prompt_files = prompt_files
+
+        self.entries: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.context_dependent = 0
+
+        # Commands may be stored from a background agent session while the next one is looked up
+        self._lock = threading.RLock()
+        # Held while writing the file, so saves from different threads do not interleave
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+
+        self._prompt_signature = None
+        self._fingerprint = None
+        self.__refresh_fingerprint()
+        self._load()
+
+    def __refresh_fingerprint(self) -> bool:
+        """
+        Recomputes the prompt fingerprint if any prompt file has changed on disk. The files are only
+        hashed when their size or modification time changes, so this is cheap to call per lookup.
+
+        Returns:
+            bool: True if the fingerprint changed since the last call.
+        """
+        signature = []
+        for prompt_file in self.prompt_files:
+            try:
+                stat = os.stat(prompt_file)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        signature = tuple(signature)
+
+        if signature == self._prompt_signature:
+            return False
+
+        self._prompt_signature = signature
+        digest = hashlib.sha256()
+        for prompt_file in self.prompt_files:
+            digest.update(pathlib.Path(prompt_file).name.encode())
+            try:
+                with open(prompt_file, "rb") as f:
+                    digest.update(f.read())
+            except OSError:
+                digest.update(b"<missing>")
+
+        fingerprint = digest.hexdigest()
+        changed = self._fingerprint is not None and fingerprint != self._fingerprint
+        self._fingerprint = fingerprint
+        return changed
+
+    def _load(self) -> None:
+        """
+        Loads persisted entries from disk, discarding them if they were produced by different prompts.
+        """
+        if not os.path.exists(self.cache_path):
+            logger.debug("No command cache found at %s", self.cache_path)
+            return
+
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to load command cache: %s", e)
+            return
+
+        if data.get("version") != CACHE_VERSION or data.get("fingerprint") != self._fingerprint:
+            logger.info("Prompt files changed since command cache was saved. Discarding cache.")
+            self.invalidations += 1
+            return
+
+        now = time.time()
+        for key, entry in data.get("entries", []):
+            if self._is_expired(entry, now):
+                continue
+            entry["commands"] = [tuple(command) for command in entry["commands"]]
+            entry.setdefault("turns", [])
+            self.entries[key] = entry
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+        logger.info("Loaded %d cached voice commands", len(self.entries))
+
+    def save(self) -> None:
+        """
+        Persists the cache to disk. Written atomically so a crash cannot corrupt the cache file.
+        Only the snapshot of the entries is taken under the cache lock, so lookups are not blocked
+        while the file is written.
+        """
+        with self._save_lock:
+            with self._lock:
+                self._dirty = False
+                data = json.dumps({
+                    "version": CACHE_VERSION,
+                    "fingerprint": self._fingerprint,
+                    "entries": list(self.entries.items()),
+                })
+
+            tmp_path = pathlib.Path(f"{self.cache_path}.tmp")
+            try:
+                with open(tmp_path, "w") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                logger.warning("Failed to save command cache: %s", e)
+
+    def _schedule_save(self) -> None:
+        """
+        Marks the cache as changed, and starts the timer to save it if one is not already running.
+        Called with the cache lock held.
+        """
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(SAVE_DELAY, self._save_pending)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _save_pending(self) -> None:
+        with self._lock:
+            self._save_timer = None
+            if not self._dirty:
+                return
+        self.save()
+
+    def close(self) -> None:
+        """
+        Saves any unsaved changes and stops the save timer.
+        """
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+            dirty = self._dirty
+        if timer is not None:
+            timer.cancel()
+        if dirty:
+            self.save()
+
+    def _is_expired(self, entry: Dict[str, Any], now: float) -> bool:
+        """
+        Checks whether an entry has outlived the configured time to live.
+
+        Args:
+            entry (Dict[str, Any]): The cache entry.
+            now (float): The current epoch time.
+
+        Returns:
+            bool: True if the entry has expired.
+        """
+        return self.ttl > 0 and now - entry["created"] > self.ttl
+
+    def invalidate(self) -> None:
+        """
+        Clears all cached commands.
+        """
+        with self._lock:
+            logger.info("Invalidating %d cached voice commands", len(self.entries))
+            self.entries.clear()
+            self.invalidations += 1
+            self._schedule_save()
+
+    def _check_prompts(self) -> None:
+        """
+        Invalidates the cache if the prompt files have changed while running.
+        """
+        if self.__refresh_fingerprint():
+            logger.info("Prompt files changed. Invalidating command cache.")
+            self.invalidate()
+
+    def _fuzzy_key(self, key: str) -> Optional[str]:
+        """
+        Finds the closest cached transcript to the given key. Candidates must contain exactly the same
+        numbers as the key so that e.g. "forward 50" never resolves to "forward 60".
+
+        Args:
+            key (str): The normalised transcript.
+
+        Returns:
+            Optional[str]: The closest cached key or None if nothing is similar enough.
+        """
+        numbers = NUMBER_PATTERN.findall(key)
+        candidates = [candidate for candidate in self.entries
+                      if NUMBER_PATTERN.findall(candidate) == numbers]
+        matches = difflib.get_close_matches(key, candidates, n=1, cutoff=self.fuzzy_threshold)
+        return matches[0] if matches else None
+
+    def is_context_dependent(self, transcript: str) -> bool:
+        """
+        Checks whether the meaning of a transcript depends on the commands before it, in which case it
+        must not be cached or answered from the cache.
+
+        Args:
+            transcript (str): The transcript as returned by speech recognition.
+
+        Returns:
+            bool: True if the transcript refers back to earlier commands.
+        """
+        return contains_phrase(normalise_transcript(transcript), self.context_phrases)
+
+    def lookup(self, transcript: str) -> Optional[CommandList]:
+        """
+        Looks up the parsed command for a transcript.
+
+        Args:
+            transcript (str): The transcript as returned by speech recognition.
+
+        Returns:
+            Optional[CommandList]: The cached command list or None on a cache miss.
+        """
+        entry = self.lookup_entry(transcript)
+        return None if entry is None else list(entry["commands"])
+
+    def lookup_entry(self, transcript: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up the cache entry for a transcript.
+
+        Args:
+            transcript (str): The transcript as returned by speech recognition.
+
+        Returns:
+            Optional[Dict[str, Any]]: A copy of the entry, with the command list under "commands" and the
+                                      context turns of the translation under "turns". None on a cache miss.
+        """
+        with self._lock:
+            self._check_prompts()
+            key = normalise_transcript(transcript)
+
+            if contains_phrase(key, self.context_phrases):
+                self.context_dependent += 1
+                logger.debug("Not looking up context dependent command '%s'", key)
+                return None
+
+            entry = self.entries.get(key)
+            fuzzy = False
+            if entry is None and self.fuzzy_match:
+                fuzzy_key = self._fuzzy_key(key)
+                if fuzzy_key is not None:
+                    logger.debug("Fuzzy matched '%s' to cached '%s'", key, fuzzy_key)
+                    key = fuzzy_key
+                    entry = self.entries[key]
+                    fuzzy = True
+
+            if entry is not None and self._is_expired(entry, time.time()):
+                logger.debug("Cached command for '%s' expired", key)
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                logger.debug("Command cache miss for '%s'", key)
+                return None
+
+            self.entries.move_to_end(key)
+            entry["hits"] += 1
+            self.hits += 1
+            if fuzzy:
+                self.fuzzy_hits += 1
+
+            logger.info("Command cache hit for '%s' (hit rate %.0f%%)", key, self.hit_rate * 100)
+            return {
+                "commands": list(entry["commands"]),
+                "turns": [dict(turn) for turn in entry["turns"]],
+            }
+
+    def store(self, transcript: str, commands: CommandList, turns: Optional[List[Message]] = None) -> bool:
+        """
+        Stores a validated command list against a transcript.
+
+        Args:
+            transcript (str): The transcript as returned by speech recognition.
+            commands (CommandList): The parsed command list returned by the LLM.
+            turns (Optional[List[Message]]): The messages the translation added to the agent's context
+                                             after the user's command, replayed into the context on a hit.
+
+        Returns:
+            bool: True if the commands were cached.
+        """
+        with self._lock:
+            if not is_valid_command_list(commands):
+                logger.debug("Not caching invalid command list: %s", commands)
+                return False
+
+            key = normalise_transcript(transcript)
+            if not key:
+                return False
+
+            if contains_phrase(key, self.context_phrases):
+                logger.debug("Not caching context dependent command '%s'", key)
+                return False
+
+            self.entries[key] = {
+                "commands": [tuple(command) for command in commands],
+                "turns": list(turns or []),
+                "created": time.time(),
+                "hits": 0,
+            }
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                evicted_key, _ = self.entries.popitem(last=False)
+                self.evictions += 1
+                logger.debug("Evicted cached command for '%s'", evicted_key)
+
+            self._schedule_save()
+            return True
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The proportion of lookups answered from the cache.
+
+        Returns:
+            float: Hit rate in the range [0, 1].
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the cache statistics.
+
+        Returns:
+            Dict[str, float]: Counters and the hit rate of the cache.
+        """
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "context_dependent": self.context_dependent,
+        }
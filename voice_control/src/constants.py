@@ -11,6 +11,9 @@ OPENAI_API_KEY_CONFIG_KEY = "OPENAI_API_KEY"
 
 MAX_LOOP = 3
 
+# Longest command text sent to the drone controller when a command does not fit in the command queue
+MAX_COMMAND_TEXT_LENGTH = 256
+
 # Prompts
 ELLIPSIS = "..."
 CONTINUATION_PROMPT = "... "
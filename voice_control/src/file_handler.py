@@ -79,6 +79,39 @@ def get_context_file() -> pathlib.Path:
     return data_folder / "context.jsonl"
 
 
+def get_initial_context_file() -> pathlib.Path:
+    """
+    Returns the full path to the 'initial.jsonl' file in the 'data' folder inside 'voice_control'.
+
+    Returns:
+        pathlib.Path: The path to the 'initial.jsonl' file.
+    """
+    data_folder = get_data_folder()
+    return data_folder / "initial.jsonl"
+
+
+def get_system_prompt_file() -> pathlib.Path:
+    """
+    Returns the full path to the 'system_prompt.txt' file in the 'data' folder inside 'voice_control'.
+
+    Returns:
+        pathlib.Path: The path to the 'system_prompt.txt' file.
+    """
+    data_folder = get_data_folder()
+    return data_folder / "system_prompt.txt"
+
+
+def get_command_cache_file() -> pathlib.Path:
+    """
+    Returns the full path to the 'command_cache.json' file in the 'data' folder inside 'voice_control'.
+
+    Returns:
+        pathlib.Path: The path to the 'command_cache.json' file.
+    """
+    data_folder = get_data_folder()
+    return data_folder / "command_cache.json"
+
+
 def file_exists(file_path: pathlib.Path) -> bool:
     """
     Checks if a file exists at the specified path.
@@ -10,6 +10,7 @@ from omegaconf import DictConfig, OmegaConf
 import openai
 
 from common.logger_helper import init_logger
+from common.import_profiler import profile_phase
 
 from . import constants as c
 from . import file_handler
@@ -65,6 +66,7 @@ def init_openai():
     openai.api_key = api_key
 
 
+@profile_phase()
 def init() -> DictConfig:
     """
     Initialises the voice control program.
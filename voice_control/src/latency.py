@@ -0,0 +1,125 @@
+"""
+Per-stage latency recording for the voice pipeline. Only the most recent samples of each stage
+are kept, so recording in a long running voice process uses bounded memory.
+"""
+
+from typing import Deque, Dict, Optional
+import time
+import functools
+import contextlib
+from collections import defaultdict, deque
+
+import numpy as np
+
+from common.logger_helper import init_logger
+
+logger = init_logger()
+
+# Stages of the voice pipeline, in order
+CAPTURE = "capture"
+STT = "stt"
+LLM_ROUND = "llm_round"
+LLM = "llm"
+PARSE = "parse"
+QUEUE = "queue"
+TOTAL = "total"
+STAGES = [CAPTURE, STT, LLM_ROUND, LLM, PARSE, QUEUE, TOTAL]
+
+# Samples kept per stage
+MAX_SAMPLES = 1000
+
+
+class LatencyRecorder:
+    """
+    Records how long each stage of the voice pipeline takes for the most recent utterances.
+    """
+
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        """
+        Initialises the latency recorder.
+
+        Args:
+            max_samples (int): Number of most recent samples kept per stage.
+        """
+        self.samples: Dict[str, Deque[float]] = defaultdict(functools.partial(deque, maxlen=max_samples))
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """
+        Context manager timing the enclosed block as one sample of the given stage.
+
+        Args:
+            name (str): The stage name.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start_time)
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Records a sample for a stage.
+
+        Args:
+            name (str): The stage name.
+            seconds (float): The duration of the stage in seconds.
+        """
+        self.samples[name].append(seconds)
+        logger.trace("Stage %s took %.1f ms", name, seconds * 1000)
+
+    def last(self, name: str) -> Optional[float]:
+        """
+        Returns the most recent sample for a stage.
+
+        Args:
+            name (str): The stage name.
+
+        Returns:
+            Optional[float]: The duration in seconds or None if the stage has not been recorded.
+        """
+        samples = self.samples.get(name)
+        return samples[-1] if samples else None
+
+    def reset(self) -> None:
+        """
+        Clears all recorded samples.
+        """
+        self.samples.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarises the kept samples per stage, in milliseconds.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Count, mean, median, 95th percentile and max per stage.
+        """
+        summary = {}
+        ordered_stages = [s for s in STAGES if s in self.samples]
+        ordered_stages += [s for s in self.samples if s not in STAGES]
+        for name in ordered_stages:
+            samples_ms = np.array(self.samples[name]) * 1000
+            summary[name] = {
+                "count": int(samples_ms.size),
+                "mean": float(samples_ms.mean()),
+                "p50": float(np.percentile(samples_ms, 50)),
+                "p95": float(np.percentile(samples_ms, 95)),
+                "max": float(samples_ms.max()),
+            }
+
+        return summary
+
+    def format_summary(self) -> str:
+        """
+        Formats the summary as a table.
+
+        Returns:
+            str: The summary table.
+        """
+        lines = [f"{'stage':<12}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}"]
+        for name, stats in self.summary().items():
+            lines.append(
+                f"{name:<12}{stats['count']:>7}{stats['mean']:>10.1f}{stats['p50']:>10.1f}"
+                f"{stats['p95']:>10.1f}{stats['max']:>10.1f}")
+
+        return "\n".join(lines)
@@ -10,10 +10,14 @@ import sys
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
 sys.path.insert(0, project_root)
 
+# Installs the import profiler, if enabled, so the remaining imports are profiled
+from common import import_profiler  # noqa: F401
+
 from common.logger_helper import init_logger
 
 from . import init
 from .voice_controller import VoiceController
+from .LLM.utils import warm_up_token_encoder
 
 logger = init_logger()
 
@@ -30,6 +34,9 @@ def main(manager_data: Optional[Dict] = None):
         None
     """
 
+    # Load the tokenizer while the microphone and speech recogniser start up
+    warm_up_token_encoder()
+
     config = init.init()
 
     running_as_process = manager_data is not None
@@ -40,7 +47,10 @@ def main(manager_data: Optional[Dict] = None):
         logger.info("Running in main mode")
 
     voice_controller = VoiceController(config, manager_data)
-    voice_controller.run()
+    try:
+        voice_controller.run()
+    finally:
+        voice_controller.close()
 
     logger.info("Done.")
 
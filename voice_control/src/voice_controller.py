@@ -4,16 +4,22 @@ Controller for voice processing
 
 from typing import Optional, Tuple, List, Dict, Union
 import ast
+import time
+from queue import Full
 from multiprocessing import Queue as MPQueue
 
 from omegaconf import OmegaConf
 
 from common import constants as cc
 from common.logger_helper import init_logger
-from common.omegaconf_helper import conf_key_from_value
+from common.omegaconf_helper import conf_key_from_value, compile_config
+from common.SharedRingQueue import ItemTooLargeError
 
 from . import constants as c
 from .audio import AudioRecogniser
+from .command_cache import CommandCache, is_valid_command_list
+from . import latency
+from .latency import LatencyRecorder
 from .voice_actions import VoiceActions
 from .LLM import LLM
 
@@ -25,7 +31,8 @@ class VoiceController:
     Controller for drone voice command module.
     """
 
-    def __init__(self, config: OmegaConf, interprocess_data: Optional[Dict] = None):
+    def __init__(self, config: OmegaConf, interprocess_data: Optional[Dict] = None,
+                 audio_recogniser: Optional[AudioRecogniser] = None):
         """
         Initialises the voice controller.
 
@@ -33,6 +40,8 @@ class VoiceController:
             config (OmegaConf): Configuration for the voice controller.
             interprocess_data (Optional[Dict]): Interprocess communication (IPC) data dictionary:
                                            (Only provided if running as a child process)
+            audio_recogniser (Optional[AudioRecogniser]): Audio source to use instead of the microphone.
+                                                          Used to drive the pipeline from recordings.
 
         Returns:
             None
@@ -49,10 +58,20 @@ class VoiceController:
         else:
             logger.info("Running in main mode")
 
-        self.audio_recogniser = AudioRecogniser(config.audio)
+        if audio_recogniser is None:
+            audio_recogniser = AudioRecogniser(config.audio)
+        self.audio_recogniser = audio_recogniser
+
+        self.latency = LatencyRecorder()
         self.llm = LLM(config.llm)
+        self.llm.session.latency = self.latency
+        self.pipeline = config.llm.get("pipeline", False)
+
+        self.command_cache = None
+        if config.command_cache.enable:
+            self.command_cache = CommandCache(config.command_cache)
 
-        self.keybindings = self.voice_control_config.keyboard_bindings
+        self.keybindings = compile_config(self.voice_control_config.keyboard_bindings)
 
     def run(self) -> None:
         """
@@ -93,6 +112,19 @@ class VoiceController:
                     "    >>> Keyboard interrupt received. Exiting immediately.")
                 run = False
 
+    def close(self) -> None:
+        """
+        Saves the command cache and shuts down the LLM session's worker and connections. Called
+        once the voice processor has stopped.
+
+        Returns:
+            None
+        """
+
+        if self.command_cache is not None:
+            self.command_cache.close()
+        self.llm.session.close()
+
     def _wait_key(self) -> None:
         if not self.running_in_process:
             return
@@ -171,27 +203,109 @@ class VoiceController:
             if not self.audio_recogniser.microphone_available:
                 return False
 
-            user_audio = self.audio_recogniser.capture_voice_input()
+            with self.latency.stage(latency.CAPTURE):
+                user_audio = self.audio_recogniser.capture_voice_input()
             if user_audio is None:
                 # Keep the loop running
                 return True
 
-            text = self.audio_recogniser.convert_voice_to_text(user_audio)
+            start_time = time.perf_counter()
+            with self.latency.stage(latency.STT):
+                text = self.audio_recogniser.convert_voice_to_text(user_audio)
         else:
             text = input("Enter command: ")
+            start_time = time.perf_counter()
 
-        command_data = {cc.COMMAND_TEXT: text}
+        if self.voice_control_config.send_to_llm and self.pipeline:
+            # Translate in the background so the next utterance can be captured meanwhile
+            self.submit_voice_command(text, start_time)
+            return True
 
         parsed_command = None
         if self.voice_control_config.send_to_llm:
             parsed_command = self.process_voice_command(text)
 
-        command_data[cc.PARSED_COMMAND] = parsed_command
-
-        self.save_command_to_thread_data(command_data)
+        self._dispatch_command(text, parsed_command, start_time)
 
         return True
 
+    def _dispatch_command(self, text: str, parsed_command: Optional[List[Tuple[str, int]]],
+                          start_time: float) -> None:
+        """
+        Saves a translated command for the drone controller.
+
+        Args:
+            text (str): The voice command in text form.
+            parsed_command (Optional[List[Tuple[str, int]]]): The translated command or None.
+            start_time (float): When the utterance finished being captured (perf_counter).
+        """
+        command_data = {cc.COMMAND_TEXT: text, cc.PARSED_COMMAND: parsed_command}
+
+        with self.latency.stage(latency.QUEUE):
+            self.save_command_to_thread_data(command_data)
+
+        # Time from the end of capture until the command is queued for the drone
+        self.latency.record(latency.TOTAL, time.perf_counter() - start_time)
+
+    def _lookup_cached_command(self, user_command: str) -> Optional[List[Tuple[str, int]]]:
+        """
+        Looks up a previously translated command in the command cache. On a hit, the command is added
+        to the agent's context as if the LLM had translated it.
+
+        Args:
+            user_command (str): The voice command in text form.
+
+        Returns:
+            Optional[List[Tuple[str, int]]]: The cached command or None if not cached.
+        """
+        if self.command_cache is None:
+            return None
+
+        entry = self.command_cache.lookup_entry(user_command)
+        if entry is None:
+            return None
+
+        cached_commands = entry["commands"]
+        logger.info("Parsed voice command (cached): '%s'", cached_commands)
+
+        # Entries stored without their turns only record the printed command list
+        turns = entry["turns"] or [{"role": "user", "content": str(cached_commands)}]
+        self.llm.session.record(user_command, turns)
+
+        return cached_commands
+
+    def _parse_agent_output(self, user_command: str, result: Optional[str]) -> Optional[List[Tuple[str, int]]]:
+        """
+        Parses the output of the LLM agent into a command list, caching it if valid.
+
+        Args:
+            user_command (str): The voice command in text form.
+            result (Optional[str]): The output of the LLM agent.
+
+        Returns:
+            Optional[List[Tuple[str, int]]]: The parsed command or None if it could not be parsed.
+        """
+        if result is None:
+            logger.debug("No voice command detected.")
+            return None
+
+        # Parse the result into a list of tuples
+        parsed_commands = None
+        with self.latency.stage(latency.PARSE):
+            try:
+                parsed_commands = ast.literal_eval(result)
+            except Exception:
+                logger.error("Failed to parse result into dictionary.")
+
+        logger.info("Parsed voice command: '%s'", parsed_commands)
+        logger.trace("Parsed voice command of type %s", type(parsed_commands))
+
+        if self.command_cache is not None and is_valid_command_list(parsed_commands):
+            self.command_cache.store(user_command, parsed_commands, self.llm.session.last_turns)
+            logger.debug("Command cache stats: %s", self.command_cache.stats())
+
+        return parsed_commands
+
     def process_voice_command(self, user_command: str) -> Optional[List[Tuple[str, int]]]:
         """
         Takes in the voice in text form and sends it to LLM and returns the converted drone command.
@@ -206,25 +320,55 @@ class VoiceController:
                                              [()"command": int), ...] or None if the command
                                              is invalid.
         """
-        result = self.llm.run_terminal_agent(user_command)
         logger.info("Voice command: '%s'", user_command)
         logger.trace("Voice command of type %s", type(user_command))
 
-        if result is None:
-            logger.debug("No voice command detected.")
+        if not user_command:
             return None
 
-        # Parse the result into a list of tuples
-        parsed_commands = None
+        cached_commands = self._lookup_cached_command(user_command)
+        if cached_commands is not None:
+            return cached_commands
+
+        with self.latency.stage(latency.LLM):
+            result = self.llm.run_terminal_agent(user_command)
+
+        return self._parse_agent_output(user_command, result)
+
+    def submit_voice_command(self, user_command: str, start_time: float) -> None:
+        """
+        Translates the voice command in the background and saves the result for the drone controller
+        once ready. Commands are translated and saved in the order they are submitted, including those
+        answered from the command cache.
+
+        Args:
+            user_command (str): The voice command in text form.
+            start_time (float): When the utterance finished being captured (perf_counter).
+        """
+        self.llm.session.enqueue(self._translate_and_dispatch, user_command, start_time)
+
+    def _translate_and_dispatch(self, user_command: str, start_time: float) -> None:
+        """
+        Translates a submitted voice command and saves it for the drone controller. Runs on the agent
+        session's worker, after every command submitted before it.
+
+        Args:
+            user_command (str): The voice command in text form.
+            start_time (float): When the utterance finished being captured (perf_counter).
+        """
         try:
-            parsed_commands = ast.literal_eval(result)
-        except Exception:
-            logger.error("Failed to parse result into dictionary.")
+            parsed_command = self.process_voice_command(user_command)
+        except Exception as e:
+            logger.error("Failed to translate voice command '%s'. Details: %s", user_command, e)
+            parsed_command = None
 
-        logger.info("Parsed voice command: '%s'", parsed_commands)
-        logger.trace("Parsed voice command of type %s", type(parsed_commands))
+        self._dispatch_command(user_command, parsed_command, start_time)
 
-        return parsed_commands
+    def wait_for_pending_commands(self) -> None:
+        """
+        Blocks until every voice command submitted in the background has been translated and saved.
+        """
+        self.llm.session.wait()
 
     def save_command_to_thread_data(self, command_data: Dict[str, Union[str, List[Tuple[str, int]]]]) -> None:
         """
@@ -244,6 +388,36 @@ class VoiceController:
         command_text = command_data[cc.COMMAND_TEXT]
         logger.info("Setting voice command to '%s'", command_text)
         command_queue: MPQueue = self.interprocess_data[cc.VOICE_CONTROL][cc.COMMAND_QUEUE]
-        command_queue.put(command_data)
+        try:
+            self._put_command(command_queue, command_data)
+        except ItemTooLargeError:
+            # The text is only informational, so shorten it rather than lose the command
+            truncated_data = {**command_data, cc.COMMAND_TEXT: command_text[:c.MAX_COMMAND_TEXT_LENGTH]}
+            try:
+                self._put_command(command_queue, truncated_data)
+            except ItemTooLargeError as e:
+                logger.error("Voice command '%s' too large for command queue. Dropping. Details: %s",
+                             command_text[:c.MAX_COMMAND_TEXT_LENGTH], e)
+                return
+            logger.warning("Truncated text of voice command to fit in command queue.")
+        except Full:
+            logger.error("Command queue full for %.1f s. Dropping voice command '%s'.",
+                         cc.COMMAND_QUEUE_PUT_TIMEOUT, command_text)
+            return
+
         logger.debug(
             "Voice command added to command queue of length %d.", command_queue.qsize())
+
+    def _put_command(self, command_queue: MPQueue, command_data: Dict) -> None:
+        """
+        Puts a command into the command queue, waiting at most `COMMAND_QUEUE_PUT_TIMEOUT` for space.
+
+        Args:
+            command_queue (MPQueue): The command queue.
+            command_data (Dict): The command to put.
+
+        Raises:
+            Full: If the queue stayed full.
+            ItemTooLargeError: If the command does not fit in a slot of the queue.
+        """
+        command_queue.put(command_data, timeout=cc.COMMAND_QUEUE_PUT_TIMEOUT)
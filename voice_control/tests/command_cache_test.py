@@ -0,0 +1,182 @@
+"""
+Tests for the voice command cache.
+
+    python -m pytest voice_control/tests/command_cache_test.py
+"""
+
+import os
+import json
+
+import pytest
+from omegaconf import OmegaConf
+
+from voice_control.src import command_cache
+from voice_control.src.command_cache import CommandCache, normalise_transcript
+
+CONFIG = {
+    "enable": True,
+    "max_entries": 3,
+    "ttl": 60,
+    "fuzzy_match": False,
+    "fuzzy_threshold": 0.9,
+    "context_phrases": ["again", "that", "go back"],
+}
+
+FORWARD = [("forward", 50)]
+TURNS = [{"role": "assistant", "content": "print([('forward', 50)])"},
+         {"role": "user", "content": "[('forward', 50)]"}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(command_cache.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def prompt_file(tmp_path):
+    prompt_file = tmp_path / "system_prompt.txt"
+    prompt_file.write_text("You fly a drone.")
+    return prompt_file
+
+
+def create_cache(tmp_path, prompt_file, **overrides) -> CommandCache:
+    config = OmegaConf.create({**CONFIG, **overrides})
+    return CommandCache(config, tmp_path / "command_cache.json", [prompt_file])
+
+
+def test_normalise_transcript():
+    assert normalise_transcript("  Fly FORWARD, 50cm!  ") == "fly forward 50cm"
+    assert normalise_transcript("Go up 1.5 metres.") == "go up 1.5 metres"
+    assert normalise_transcript("Land. Now.") == "land now"
+
+
+def test_normalised_transcripts_share_entry(tmp_path, prompt_file, clock):
+    cache = create_cache(tmp_path, prompt_file)
+    assert cache.store("Forward 50.", FORWARD)
+    assert cache.lookup("forward   50") == FORWARD
+    assert cache.hits == 1
+
+
+def test_invalid_commands_not_cached(tmp_path, prompt_file, clock):
+    cache = create_cache(tmp_path, prompt_file)
+    assert not cache.store("forward 50", "forward")
+    assert not cache.store("forward 50", [("forward", True)])
+    assert cache.lookup("forward 50") is None
+
+
+def test_ttl(tmp_path, prompt_file, clock):
+    cache = create_cache(tmp_path, prompt_file)
+    cache.store("land", [("land", 0)])
+
+    clock.now += 59
+    assert cache.lookup("land") == [("land", 0)]
+
+    clock.now += 2
+    assert cache.lookup("land") is None
+    assert cache.expirations == 1
+
+
+def test_lru_eviction(tmp_path, prompt_file, clock):
+    cache = create_cache(tmp_path, prompt_file)
+    cache.store("up 10", [("up", 10)])
+    cache.store("up 20", [("up", 20)])
+    cache.store("up 30", [("up", 30)])
+    # Using the oldest entry makes "up 20" the least recently used
+    cache.lookup("up 10")
+    cache.store("up 40", [("up", 40)])
+
+    assert cache.lookup("up 20") is None
+    assert cache.lookup("up 10") == [("up", 10)]
+    assert cache.evictions == 1
+
+
+def test_fuzzy_match_preserves_numbers(tmp_path, prompt_file, clock):
+    cache = create_cache(tmp_path, prompt_file, fuzzy_match=True, fuzzy_threshold=0.8)
+    cache.store("move forward 50 centimetres", FORWARD)
+
+    assert cache.lookup("move forwards 50 centimetres") == FORWARD
+    assert cache.lookup("move forward 60 centimetres") is None
+    assert cache.fuzzy_hits == 1
+
+
+def test_prompt_change_invalidates(tmp_path, prompt_file, clock):
+    cache = create_cache(tmp_path, prompt_file)
+    cache.store("forward 50", FORWARD)
+
+    prompt_file.write_text("You fly a different drone.")
+    # Make sure the change is seen even on filesystems with coarse timestamps
+    os.utime(prompt_file, ns=(0, 0))
+    assert cache.lookup("forward 50") is None
+    assert cache.invalidations == 1
+
+
+def stored(tmp_path, prompt_file, *args) -> None:
+    cache = create_cache(tmp_path, prompt_file)
+    cache.store(*args)
+    cache.close()
+
+
+def test_persisted_cache_discarded_after_prompt_change(tmp_path, prompt_file, clock):
+    stored(tmp_path, prompt_file, "forward 50", FORWARD)
+    assert create_cache(tmp_path, prompt_file).lookup("forward 50") == FORWARD
+
+    prompt_file.write_text("You fly a different drone.")
+    cache = create_cache(tmp_path, prompt_file)
+    assert cache.lookup("forward 50") is None
+    assert cache.invalidations == 1
+
+
+def test_context_dependent_not_cached(tmp_path, prompt_file, clock):
+    cache = create_cache(tmp_path, prompt_file)
+    assert cache.is_context_dependent("Do that again")
+    assert not cache.store("do that again", FORWARD)
+    assert not cache.store("go back", [("backward", 100)])
+    assert cache.store("backward 100", [("backward", 100)])
+
+    assert cache.lookup("do that again") is None
+    assert cache.context_dependent == 1
+
+
+def test_turns_round_trip(tmp_path, prompt_file, clock):
+    stored(tmp_path, prompt_file, "forward 50", FORWARD, TURNS)
+
+    with open(tmp_path / "command_cache.json") as f:
+        assert json.load(f)["entries"][0][1]["turns"] == TURNS
+
+    entry = create_cache(tmp_path, prompt_file).lookup_entry("forward 50")
+    assert entry == {"commands": FORWARD, "turns": TURNS}
+
+
+def test_store_saved_later(tmp_path, prompt_file, clock, monkeypatch):
+    monkeypatch.setattr(command_cache, "SAVE_DELAY", 0.05)
+    cache = create_cache(tmp_path, prompt_file)
+    cache_path = tmp_path / "command_cache.json"
+
+    cache.store("forward 50", FORWARD)
+    cache.store("land", [("land", 0)])
+    # Not written while the command is stored
+    assert not cache_path.exists()
+
+    cache._save_timer.join(1)
+    with open(cache_path) as f:
+        assert [key for key, _ in json.load(f)["entries"]] == ["forward 50", "land"]
+    assert cache._save_timer is None
+
+
+def test_close_saves_pending_changes(tmp_path, prompt_file, clock):
+    cache = create_cache(tmp_path, prompt_file)
+    cache.store("forward 50", FORWARD)
+    cache.close()
+
+    assert cache._save_timer is None
+    assert create_cache(tmp_path, prompt_file).lookup("forward 50") == FORWARD
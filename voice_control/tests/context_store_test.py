@@ -0,0 +1,91 @@
+"""
+Tests for the append-only LLM context store.
+
+    python -m pytest voice_control/tests/context_store_test.py
+"""
+
+import json
+
+import pytest
+
+from voice_control.src.LLM import context
+from voice_control.src.LLM.context import ContextStore
+from voice_control.src.LLM.utils import REPLY_PRIMING_TOKENS
+
+
+@pytest.fixture(autouse=True)
+def token_len(monkeypatch):
+    # One token per character keeps the totals easy to follow
+    monkeypatch.setattr(context, "message_token_len", lambda message: len(message["content"]))
+
+
+def message(role: str, content: str) -> dict:
+    return {"role": role, "content": content}
+
+
+SYSTEM = message("system", "s" * 10)
+
+
+def test_total_tokens_counted_once():
+    store = ContextStore([SYSTEM, message("user", "a" * 5)])
+    store.append("assistant", "b" * 7, persist=False)
+    assert store.total_tokens == REPLY_PRIMING_TOKENS + 10 + 5 + 7
+    assert len(store) == 3
+
+
+def test_trim_keeps_pinned_message():
+    store = ContextStore([SYSTEM] + [message("user", str(i) * 10) for i in range(5)])
+
+    removed = store.trim(REPLY_PRIMING_TOKENS + 10 + 25)
+
+    assert removed == 3
+    assert store.messages == [SYSTEM, message("user", "3" * 10), message("user", "4" * 10)]
+    assert store.total_tokens == REPLY_PRIMING_TOKENS + 30
+
+
+def test_trim_within_limit_removes_nothing():
+    store = ContextStore([SYSTEM, message("user", "a")])
+    assert store.trim(1000) == 0
+    assert len(store) == 2
+
+
+def test_trim_never_removes_pinned_message():
+    store = ContextStore([SYSTEM, message("user", "a" * 10)])
+    assert store.trim(0) == 1
+    assert store.messages == [SYSTEM]
+    assert store.total_tokens == REPLY_PRIMING_TOKENS + 10
+
+
+def test_first_message_appended_is_pinned():
+    store = ContextStore([])
+    store.append("system", "prompt", persist=False)
+    store.append("user", "hello", persist=False)
+    assert store.trim(0) == 1
+    assert store.messages == [message("system", "prompt")]
+
+
+def test_append_persists_to_file(tmp_path):
+    context_path = tmp_path / "context.jsonl"
+    context_path.write_text(json.dumps(SYSTEM) + "\n")
+
+    store = ContextStore([SYSTEM], context_path)
+    store.append("user", "forward 50")
+    store.append("assistant", "not saved", persist=False)
+
+    with open(context_path) as f:
+        saved = [json.loads(line) for line in f]
+    assert saved == [SYSTEM, message("user", "forward 50")]
+    assert store.appended == 2
+
+
+def test_trimmed_messages_stay_on_disk(tmp_path):
+    context_path = tmp_path / "context.jsonl"
+    store = ContextStore([SYSTEM], context_path)
+    for i in range(3):
+        store.append("user", str(i) * 10)
+
+    store.trim(REPLY_PRIMING_TOKENS + 10)
+
+    with open(context_path) as f:
+        assert len(f.readlines()) == 3
+    assert store.messages == [SYSTEM]
@@ -0,0 +1,127 @@
+"""
+File based audio source for driving the voice pipeline from recordings.
+
+Each `.wav` file in a folder is treated as one utterance, in name order. Speech to text is
+answered from a sidecar `.txt` transcript next to the recording so no network access is needed.
+"""
+
+from typing import Optional, List
+import time
+import wave
+import pathlib
+
+import speech_recognition as sr
+from omegaconf import OmegaConf
+
+from common.logger_helper import init_logger
+
+from ..src import constants as c
+from ..src.audio import AudioRecogniser
+
+logger = init_logger()
+
+TRANSCRIPT_EXTENSION = ".txt"
+
+
+def write_silent_wav(file_path: pathlib.Path, duration: float = 0.5, sample_rate: int = 16_000) -> None:
+    """
+    Writes a silent mono 16 bit recording. Used to generate utterances when no recordings are available.
+
+    Args:
+        file_path (pathlib.Path): Where to write the recording.
+        duration (float): Length of the recording in seconds.
+        sample_rate (int): Sample rate in Hz.
+    """
+    with wave.open(str(file_path), c.WRITE_BINARY_MODE) as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(b"\x00\x00" * int(duration * sample_rate))
+
+
+class FileAudioRecogniser(AudioRecogniser):
+    """
+    Audio recogniser reading utterances from a folder of recordings instead of the microphone.
+    """
+
+    def __init__(self, audio_config: OmegaConf, audio_folder: pathlib.Path, stt_latency: float = 0.0):
+        """
+        Initialises the file audio recogniser. Unlike the microphone recogniser, no network
+        check is performed and no sound effects are loaded.
+
+        Args:
+            audio_config (OmegaConf): The audio configuration settings.
+            audio_folder (pathlib.Path): Folder of `.wav` recordings with `.txt` transcripts.
+            stt_latency (float): Simulated speech to text latency in seconds.
+        """
+
+        self.recogniser = sr.Recognizer()
+        self.config = audio_config
+
+        self.microphone_available = True
+        self.network_available = True
+
+        self.wake_command = self.config.wake_command
+        self.enable_sound_effects = False
+        self.sound_effects = {}
+
+        self.stt_latency = stt_latency
+        self.audio_files: List[pathlib.Path] = sorted(
+            f for f in pathlib.Path(audio_folder).iterdir() if f.suffix in c.AUDIO_FILE_EXTENSIONS)
+        self.transcripts = {}
+        self.next_index = 0
+
+        logger.info("Loaded %d recordings from %s", len(self.audio_files), audio_folder)
+
+    @property
+    def exhausted(self) -> bool:
+        """
+        Whether every recording has been played.
+
+        Returns:
+            bool: True once all recordings have been captured.
+        """
+        return self.next_index >= len(self.audio_files)
+
+    def check_network_connection(self) -> bool:
+        self.network_available = True
+        return True
+
+    def capture_voice_input(self) -> Optional[sr.AudioData]:
+        """
+        Returns the next recording in the folder.
+
+        Returns:
+            Optional[sr.AudioData]: The recording or None once all recordings have been played.
+        """
+        if self.exhausted:
+            return None
+
+        audio_file = self.audio_files[self.next_index]
+        self.next_index += 1
+
+        audio = self.load_audio_file(str(audio_file))
+        transcript_file = audio_file.with_suffix(TRANSCRIPT_EXTENSION)
+        if transcript_file.exists():
+            self.transcripts[id(audio)] = transcript_file.read_text().strip()
+
+        return audio
+
+    def convert_voice_to_text(self, audio: sr.AudioData) -> Optional[str]:
+        """
+        Returns the transcript of a recording from its sidecar file. Falls back to Google
+        speech recognition if the recording has no transcript.
+
+        Args:
+            audio (sr.AudioData): A recording returned by `capture_voice_input`.
+
+        Returns:
+            Optional[str]: The transcript.
+        """
+        transcript = self.transcripts.pop(id(audio), None)
+        if transcript is None:
+            return super().convert_voice_to_text(audio)
+
+        time.sleep(self.stt_latency)
+        logger.info("You said: '%s'", transcript)
+        return transcript
@@ -0,0 +1,262 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Serves scripted completions with configurable latency, both as a single response and as a
+server-sent event stream, so the voice pipeline can be exercised without network access.
+
+Run standalone with
+
+    python -m voice_control.tests.mock_openai_server --port 8000
+
+and point `llm.api_base` at http://127.0.0.1:8000/v1
+"""
+
+from typing import Optional, Dict, List
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from common.logger_helper import init_logger
+
+logger = init_logger()
+
+DEFAULT_RESPONSE = '>>> print([("takeoff", 0)])'
+TOKEN_PATTERN = re.compile(r"\s*\S+|\s+")
+
+
+def split_tokens(text: str) -> List[str]:
+    """
+    Splits a completion into pseudo tokens (words with their leading whitespace).
+
+    Args:
+        text (str): The completion text.
+
+    Returns:
+        List[str]: The pseudo tokens, which join back into the original text.
+    """
+    return TOKEN_PATTERN.findall(text)
+
+
+class MockChatCompletionServer:
+    """
+    Threaded HTTP server imitating the OpenAI chat completions API.
+
+    Responses are chosen by matching keywords against the last user message. Each request is
+    delayed by `first_token_latency` and every subsequent token by `token_latency`.
+    """
+
+    def __init__(self, responses: Optional[Dict[str, str]] = None, default_response: str = DEFAULT_RESPONSE,
+                 first_token_latency: float = 0.0, token_latency: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0):
+        """
+        Initialises the mock server. The server is not started until `start` is called.
+
+        Args:
+            responses (Optional[Dict[str, str]]): Maps a keyword in the user message (case insensitive) to a completion.
+            default_response (str): Completion returned when no keyword matches.
+            first_token_latency (float): Seconds before the first token is sent.
+            token_latency (float): Seconds between subsequent tokens.
+            host (str): Host to bind to.
+            port (int): Port to bind to. 0 picks a free port.
+        """
+
+        self.responses = {k.lower(): v for k, v in (responses or {}).items()}
+        self.default_response = default_response
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.requests: List[Dict] = []
+
+        self._server = ThreadingHTTPServer((host, port), self._create_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def api_base(self) -> str:
+        """
+        The base URL to configure the OpenAI client with.
+
+        Returns:
+            str: The API base URL.
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockChatCompletionServer":
+        """
+        Starts serving requests on a background thread.
+
+        Returns:
+            MockChatCompletionServer: The server itself for chaining.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MockOpenAI", daemon=True)
+        self._thread.start()
+        logger.info("Mock chat completions server listening at %s", self.api_base)
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops the server.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockChatCompletionServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def select_response(self, messages: List[Dict[str, str]]) -> str:
+        """
+        Chooses the completion for a request.
+
+        Args:
+            messages (List[Dict[str, str]]): The messages in the request.
+
+        Returns:
+            str: The scripted completion.
+        """
+        user_messages = [m["content"] for m in messages if m.get("role") == "user"]
+        last_message = user_messages[-1].lower() if user_messages else ""
+
+        # Prefer the longest keyword so that more specific scripts win
+        for keyword in sorted(self.responses, key=len, reverse=True):
+            if keyword in last_message:
+                return self.responses[keyword]
+
+        return self.default_response
+
+    def _create_handler(self) -> type:
+        """
+        Creates the request handler class bound to this server.
+
+        Returns:
+            type: The request handler class.
+        """
+        mock = self
+
+        class ChatCompletionHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args) -> None:
+                logger.trace(format, *args)
+
+            def do_POST(self) -> None:
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                mock.requests.append(request)
+
+                completion = mock.select_response(request.get("messages", []))
+                model = request.get("model", "mock")
+
+                time.sleep(mock.first_token_latency)
+                if request.get("stream"):
+                    self._stream_completion(completion, model)
+                else:
+                    self._send_completion(completion, model)
+
+            def _send_completion(self, completion: str, model: str) -> None:
+                tokens = split_tokens(completion)
+                time.sleep(mock.token_latency * max(len(tokens) - 1, 0))
+
+                body = json.dumps({
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": completion},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+                }).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _write_event(self, delta: Dict[str, str], model: str, finish_reason: Optional[str] = None) -> None:
+                event = {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+
+            def _stream_completion(self, completion: str, model: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                try:
+                    self._write_event({"role": "assistant"}, model)
+                    for i, token in enumerate(split_tokens(completion)):
+                        if i > 0:
+                            time.sleep(mock.token_latency)
+                        self._write_event({"content": token}, model)
+
+                    self._write_event({}, model, "stop")
+                    self._write_chunk(b"data: [DONE]\n\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped reading once it had the command it needed
+                    logger.debug("Client closed streamed completion early")
+                    self.close_connection = True
+
+        return ChatCompletionHandler
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Runs the mock server until interrupted.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--first-token-latency", type=float, default=0.3,
+                        help="Seconds before the first token is sent")
+    parser.add_argument("--token-latency", type=float, default=0.02,
+                        help="Seconds between tokens")
+    parser.add_argument("--responses", help="JSON file mapping keywords to completions")
+    args = parser.parse_args(argv)
+
+    responses = None
+    if args.responses:
+        with open(args.responses, "r") as f:
+            responses = json.load(f)
+
+    server = MockChatCompletionServer(responses, first_token_latency=args.first_token_latency,
+                                      token_latency=args.token_latency, host=args.host, port=args.port)
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
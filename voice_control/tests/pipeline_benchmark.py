@@ -0,0 +1,242 @@
+"""
+End to end benchmark of the voice pipeline.
+
+Drives `VoiceController.audio_loop` with recordings from disk and a local mock of the chat
+completions API, then reports the latency of each stage (capture, speech to text, LLM rounds,
+parsing and queueing). Runs entirely offline so it can be tracked in CI.
+
+    python -m voice_control.tests.pipeline_benchmark --output voice_latency.json
+"""
+
+from typing import Optional, List, Dict, Tuple
+import sys
+import json
+import time
+import queue
+import pathlib
+import argparse
+import tempfile
+
+import openai
+from omegaconf import OmegaConf
+
+from common import constants as cc
+from common.logger_helper import init_logger
+from common.SharedRingQueue import SharedRingQueue
+
+from ..src import file_handler
+from ..src import latency
+from ..src.voice_controller import VoiceController
+from ..src.LLM.context import ContextStore
+from .file_audio_source import FileAudioRecogniser, write_silent_wav, TRANSCRIPT_EXTENSION
+from .mock_openai_server import MockChatCompletionServer
+
+logger = init_logger()
+
+SYSTEM_PROMPT = (
+    "You are a drone pilot's assistant working in a python terminal. Translate the user's command into a list of "
+    "(command, value) tuples and print it."
+)
+
+# Utterances paired with the completion the mock LLM returns and the command list expected from it
+SCRIPT: List[Tuple[str, str, List[Tuple[str, int]]]] = [
+    ("take off",
+     '>>> print([("takeoff", 0)])',
+     [("takeoff", 0)]),
+    ("go forward 50 centimetres",
+     '>>> distance = 50\n>>> print([("forward", distance)])',
+     [("forward", 50)]),
+    ("turn right 90 degrees then land",
+     '>>> # Rotate clockwise then land\n>>> commands = [("cw", 90), ("land", 0)]\n>>> print(commands)',
+     [("cw", 90), ("land", 0)]),
+    ("go up 30 and turn left 45",
+     '>>> commands = []\n>>> for command in [("up", 30), ("ccw", 45)]:\n...     commands.append(command)\n'
+     '>>> print(commands)',
+     [("up", 30), ("ccw", 45)]),
+]
+
+
+def create_recordings(audio_folder: pathlib.Path, repeats: int) -> List[List[Tuple[str, int]]]:
+    """
+    Writes one silent recording and transcript per scripted utterance.
+
+    Args:
+        audio_folder (pathlib.Path): Folder to write the recordings to.
+        repeats (int): Number of times to repeat the script.
+
+    Returns:
+        List[List[Tuple[str, int]]]: The expected command list for each recording, in order.
+    """
+    expected = []
+    index = 0
+    for _ in range(repeats):
+        for transcript, _, commands in SCRIPT:
+            recording = audio_folder / f"utterance_{index:04d}.wav"
+            write_silent_wav(recording)
+            recording.with_suffix(TRANSCRIPT_EXTENSION).write_text(transcript)
+            expected.append(commands)
+            index += 1
+
+    return expected
+
+
+def create_config(api_base: str, stream: bool, pipeline: bool) -> OmegaConf:
+    """
+    Creates the voice control configuration for the benchmark.
+
+    Args:
+        api_base (str): Base URL of the mock chat completions server.
+        stream (bool): Whether to stream LLM responses.
+        pipeline (bool): Whether to translate commands in the background.
+
+    Returns:
+        OmegaConf: The configuration.
+    """
+    config_path = file_handler.get_package_folder() / "configs/config.yaml"
+    config = OmegaConf.load(config_path)
+    overrides = OmegaConf.create({
+        "voice_control": {"use_existing_recording": False, "detect_voice": True, "send_to_llm": True},
+        "audio": {"save_recordings": False, "sound_effects": {"enable": False}},
+        "llm": {"api_base": api_base, "stream": stream, "pipeline": pipeline},
+        "command_cache": {"enable": False},
+    })
+    config = OmegaConf.merge(config, overrides)
+    OmegaConf.set_readonly(config, True)
+    return config
+
+
+def run_benchmark(repeats: int, stream: bool, pipeline: bool, first_token_latency: float, token_latency: float,
+                  stt_latency: float) -> Dict:
+    """
+    Runs the scripted utterances through the voice pipeline.
+
+    Args:
+        repeats (int): Number of times to repeat the script.
+        stream (bool): Whether to stream LLM responses.
+        pipeline (bool): Whether to translate commands in the background.
+        first_token_latency (float): Mock LLM latency before the first token in seconds.
+        token_latency (float): Mock LLM latency between tokens in seconds.
+        stt_latency (float): Simulated speech to text latency in seconds.
+
+    Returns:
+        Dict: The benchmark results.
+    """
+    responses = {transcript: completion for transcript, completion, _ in SCRIPT}
+    server = MockChatCompletionServer(responses, first_token_latency=first_token_latency,
+                                      token_latency=token_latency)
+
+    with tempfile.TemporaryDirectory() as tmp_dir, server:
+        audio_folder = pathlib.Path(tmp_dir)
+        expected = create_recordings(audio_folder, repeats)
+
+        openai.api_key = "mock"
+        config = create_config(server.api_base, stream, pipeline)
+        audio_recogniser = FileAudioRecogniser(config.audio, audio_folder, stt_latency)
+
+        # Same queue type the app shares with the voice control process, sized so the
+        # benchmark never blocks on a full queue
+        command_queue = SharedRingQueue(len(expected), cc.COMMAND_QUEUE_SLOT_SIZE)
+        interprocess_data = {
+            cc.VOICE_CONTROL: {cc.COMMAND_QUEUE: command_queue},
+            cc.KEYBOARD_QUEUE: queue.Queue(),
+        }
+        voice_controller = VoiceController(config, interprocess_data, audio_recogniser)
+        # Keep the benchmark context in memory rather than in the user's data folder
+        voice_controller.llm.session.context = ContextStore([{"role": "system", "content": SYSTEM_PROMPT}])
+
+        start_time = time.perf_counter()
+        while not audio_recogniser.exhausted:
+            voice_controller.audio_loop()
+        voice_controller.wait_for_pending_commands()
+        elapsed = time.perf_counter() - start_time
+
+        mismatches = 0
+        for i, expected_commands in enumerate(expected):
+            command_data = command_queue.get_nowait()
+            parsed_command = command_data[cc.PARSED_COMMAND]
+            if parsed_command != expected_commands:
+                logger.error("Utterance %d: expected %s but got %s", i, expected_commands, parsed_command)
+                mismatches += 1
+
+        command_queue.unlink()
+
+    return {
+        "stream": stream,
+        "pipeline": pipeline,
+        "elapsed": elapsed,
+        "utterances": len(expected),
+        "llm_requests": len(server.requests),
+        "mismatches": mismatches,
+        "stages": voice_controller.latency.summary(),
+        "report": voice_controller.latency.format_summary(),
+    }
+
+
+def check_baseline(results: Dict, baseline_path: pathlib.Path, threshold: float) -> bool:
+    """
+    Compares the median end to end latency against a previous run.
+
+    Args:
+        results (Dict): The benchmark results.
+        baseline_path (pathlib.Path): JSON results of a previous run.
+        threshold (float): Allowed relative slowdown, e.g. 0.25 for 25%.
+
+    Returns:
+        bool: True if the latency is within the threshold of the baseline.
+    """
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+
+    baseline_total = baseline["stages"][latency.TOTAL]["p50"]
+    total = results["stages"][latency.TOTAL]["p50"]
+    logger.info("Median latency %.1f ms (baseline %.1f ms)", total, baseline_total)
+
+    if total > baseline_total * (1 + threshold):
+        logger.error("Voice command latency regressed by more than %.0f%%", threshold * 100)
+        return False
+
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Runs the voice pipeline benchmark.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments.
+
+    Returns:
+        int: Exit code. Non zero if a command was mistranslated or latency regressed.
+    """
+    parser = argparse.ArgumentParser(description="End to end voice pipeline latency benchmark")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of times to repeat the script")
+    parser.add_argument("--no-stream", action="store_true", help="Wait for full completions")
+    parser.add_argument("--no-pipeline", action="store_true", help="Wait for each translation before capturing")
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--stt-latency", type=float, default=0.0)
+    parser.add_argument("--output", type=pathlib.Path, help="Write results as JSON")
+    parser.add_argument("--baseline", type=pathlib.Path, help="Fail if slower than these JSON results")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.repeats, not args.no_stream, not args.no_pipeline, args.first_token_latency,
+                            args.token_latency, args.stt_latency)
+
+    print(results["report"])
+    print(f"{results['utterances']} utterances in {results['elapsed']:.2f} s, "
+          f"{results['llm_requests']} LLM requests, {results['mismatches']} mismatches")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({k: v for k, v in results.items() if k != "report"}, f, indent=4)
+
+    ok = results["mismatches"] == 0
+    if args.baseline:
+        ok = check_baseline(results, args.baseline, args.threshold) and ok
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
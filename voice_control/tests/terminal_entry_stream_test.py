@@ -0,0 +1,112 @@
+"""
+Tests for executing streamed LLM responses entry by entry.
+
+    python -m pytest voice_control/tests/terminal_entry_stream_test.py
+"""
+
+from typing import List
+
+import pytest
+import openai
+from omegaconf import OmegaConf
+
+from voice_control.src.LLM.context import ContextStore
+from voice_control.src.LLM.formatting import (TerminalEntryStream, extract_terminal_entries,
+                                              ensure_terminal_formatting_strict, remove_code_block_formatting)
+from voice_control.src.LLM.llm_main import LLM
+from voice_control.src.LLM.utils import ask_llm, stream_llm
+from voice_control.tests.mock_openai_server import MockChatCompletionServer, split_tokens
+
+RESPONSES = {
+    "take off": '>>> print([("takeoff", 0)])',
+    "forward": '>>> distance = 50\n>>> print([("forward", distance)])',
+    "comment": '>>> # Rotate clockwise then land\n>>> commands = [("cw", 90), ("land", 0)]\n>>> print(commands)',
+    "loop": '>>> commands = []\n>>> for command in [("up", 30), ("ccw", 45)]:\n...     commands.append(command)\n'
+            '>>> print(commands)',
+    "code block": '```python\n>>> print([("land", 0)])\n```',
+    "unformatted": 'distance = 50\nprint([("forward", distance)])',
+}
+
+
+def feed_tokens(entry_stream: TerminalEntryStream, text: str) -> List[str]:
+    entries = []
+    for token in split_tokens(text):
+        entries.extend(entry_stream.feed(token))
+    entries.extend(entry_stream.close())
+    return entries
+
+
+def no_reformat(context, *args) -> str:
+    raise AssertionError("Response should not need reformatting by the LLM")
+
+
+@pytest.fixture(scope="module")
+def server():
+    with MockChatCompletionServer(RESPONSES) as server:
+        yield server
+
+
+@pytest.fixture
+def llm(server, monkeypatch):
+    monkeypatch.setattr(openai, "api_key", "mock")
+    config = OmegaConf.create({"model": "mock", "temperature": 0, "stream": True, "api_base": server.api_base})
+    llm = LLM(config)
+    yield llm
+    llm.session.close()
+
+
+def context_for(command: str) -> ContextStore:
+    return ContextStore([{"role": "system", "content": "Fly the drone."}, {"role": "user", "content": command}])
+
+
+def full_response_entries(llm: LLM, command: str) -> List[str]:
+    return extract_terminal_entries(ask_llm(context_for(command), llm.ask_fn))
+
+
+@pytest.mark.parametrize("command", [key for key in RESPONSES if key != "unformatted"])
+def test_token_stream_matches_full_response(command):
+    response = RESPONSES[command]
+    expected = extract_terminal_entries(ensure_terminal_formatting_strict(remove_code_block_formatting(response)))
+
+    entry_stream = TerminalEntryStream()
+    assert feed_tokens(entry_stream, response) == expected
+    assert entry_stream.formatted
+
+
+def test_entry_emitted_once_next_entry_starts():
+    entry_stream = TerminalEntryStream()
+    assert entry_stream.feed(">>> distance = 50\n") == []
+    # Not yet known whether the next line continues the entry
+    assert entry_stream.feed(">>") == []
+    assert entry_stream.feed("> print") == ["distance = 50"]
+
+
+def test_continuation_keeps_entry_open():
+    entry_stream = TerminalEntryStream()
+    assert entry_stream.feed(">>> for i in range(2):\n... ") == []
+    assert entry_stream.feed("    print(i)\n>>> ") == ["for i in range(2):\n    print(i)"]
+
+
+def test_unformatted_response_held_back():
+    entry_stream = TerminalEntryStream()
+    entries = feed_tokens(entry_stream, '>>> a = 1\n>>> b = 2\nprint(a + b)\n')
+
+    assert entries == ["a = 1"]
+    assert not entry_stream.formatted
+    assert entry_stream.unformatted_code == ">>> b = 2\nprint(a + b)"
+
+
+@pytest.mark.parametrize("command", list(RESPONSES))
+def test_streamed_entries_match_full_response(llm, command):
+    streamed = list(stream_llm(context_for(command), llm.ask_fn_stream, no_reformat))
+    assert streamed == full_response_entries(llm, command)
+
+
+def test_streamed_entries_before_end_of_response(llm, server, monkeypatch):
+    monkeypatch.setattr(server, "token_latency", 0.05)
+    entries = stream_llm(context_for("forward"), llm.ask_fn_stream, no_reformat)
+
+    assert next(entries) == "distance = 50"
+    # The rest of the response is still being sent
+    assert server.requests[-1]["stream"]
+    entries.close()
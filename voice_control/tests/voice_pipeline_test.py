@@ -0,0 +1,161 @@
+"""
+Tests for translating voice commands in the background with a warm agent session.
+
+    python -m pytest voice_control/tests/voice_pipeline_test.py
+"""
+
+from typing import List, Dict
+import time
+import queue
+
+import pytest
+from omegaconf import OmegaConf
+
+from common import constants as cc
+from common.SharedRingQueue import SharedRingQueue
+from voice_control.src import file_handler
+from voice_control.src import latency
+from voice_control.src.command_cache import CommandCache
+from voice_control.src import voice_controller as voice_controller_module
+from voice_control.src.voice_controller import VoiceController
+from voice_control.src.LLM.context import ContextStore
+
+SYSTEM = {"role": "system", "content": "Fly the drone."}
+LLM_SECONDS = 0.2
+
+RESPONSES = {
+    "forward 50": '>>> print([("forward", 50)])',
+    "land": '>>> print([("land", 0)])',
+}
+
+
+class SlowLLM:
+    """
+    Answers with scripted completions after a delay.
+    """
+
+    def __init__(self):
+        self.requests: List[str] = []
+
+    def __call__(self, messages: List[Dict[str, str]], *args) -> str:
+        command = messages[-1]["content"].split("User: ")[-1]
+        self.requests.append(command)
+        time.sleep(LLM_SECONDS)
+        return RESPONSES[command]
+
+
+class NoAudio:
+    network_available = True
+    microphone_available = True
+
+
+@pytest.fixture
+def voice_controller(tmp_path):
+    config = OmegaConf.load(file_handler.get_package_folder() / "configs/config.yaml")
+    config = OmegaConf.merge(config, {
+        "voice_control": {"detect_voice": False},
+        "llm": {"stream": False, "pipeline": True},
+        "command_cache": {"enable": False},
+    })
+    command_queue = queue.Queue()
+    voice_controller = VoiceController(config, {cc.VOICE_CONTROL: {cc.COMMAND_QUEUE: command_queue}}, NoAudio())
+
+    prompt_file = tmp_path / "system_prompt.txt"
+    prompt_file.write_text(SYSTEM["content"])
+    voice_controller.command_cache = CommandCache(config.command_cache, tmp_path / "cache.json", [prompt_file])
+
+    voice_controller.llm.session.ask_fn = SlowLLM()
+    voice_controller.llm.session.context = ContextStore([SYSTEM])
+    voice_controller.command_queue = command_queue
+    yield voice_controller
+    voice_controller.close()
+
+
+def queued_commands(voice_controller: VoiceController) -> List:
+    commands = []
+    while not voice_controller.command_queue.empty():
+        commands.append(voice_controller.command_queue.get()[cc.PARSED_COMMAND])
+    return commands
+
+
+def test_cache_hit_waits_for_earlier_command(voice_controller):
+    voice_controller.command_cache.store("land", [("land", 0)])
+
+    voice_controller.submit_voice_command("forward 50", time.perf_counter())
+    voice_controller.submit_voice_command("land", time.perf_counter())
+    voice_controller.submit_voice_command("", time.perf_counter())
+    voice_controller.wait_for_pending_commands()
+
+    assert queued_commands(voice_controller) == [[("forward", 50)], [("land", 0)], None]
+    assert voice_controller.llm.session.ask_fn.requests == ["forward 50"]
+
+
+def test_llm_latency_excludes_queue_wait(voice_controller):
+    voice_controller.submit_voice_command("forward 50", time.perf_counter())
+    voice_controller.submit_voice_command("land", time.perf_counter())
+    voice_controller.wait_for_pending_commands()
+
+    samples = voice_controller.latency.samples[latency.LLM]
+    assert len(samples) == 2
+    # The second command waited for the first, but only its own round trip is counted
+    assert max(samples) < 1.9 * LLM_SECONDS
+
+
+def test_latency_keeps_recent_samples():
+    recorder = latency.LatencyRecorder(max_samples=3)
+    for seconds in range(5):
+        recorder.record(latency.TOTAL, seconds)
+
+    assert list(recorder.samples[latency.TOTAL]) == [2, 3, 4]
+    assert recorder.last(latency.TOTAL) == 4
+    assert recorder.summary()[latency.TOTAL]["count"] == 3
+
+
+def test_cache_hit_extends_context(voice_controller):
+    session = voice_controller.llm.session
+    assert voice_controller.process_voice_command("forward 50") == [("forward", 50)]
+    turns = session.last_turns
+    assert [turn["role"] for turn in turns] == ["assistant", "user"]
+
+    # Answered from the cache, but the context reads as if the LLM had translated it again
+    assert voice_controller.process_voice_command("Forward 50.") == [("forward", 50)]
+    assert session.ask_fn.requests == ["forward 50"]
+    assert session.context.messages[-3:] == [{"role": "user", "content": ">>> # User: Forward 50."}] + turns
+
+
+@pytest.fixture
+def ring_queue(voice_controller, monkeypatch):
+    monkeypatch.setattr(cc, "COMMAND_QUEUE_PUT_TIMEOUT", 0.1)
+    ring_queue = SharedRingQueue(capacity=1, slot_size=256)
+    voice_controller.interprocess_data[cc.VOICE_CONTROL][cc.COMMAND_QUEUE] = ring_queue
+    yield ring_queue
+    ring_queue.unlink()
+
+
+def command_data(text: str) -> Dict:
+    return {cc.COMMAND_TEXT: text, cc.PARSED_COMMAND: [("land", 0)]}
+
+
+def test_full_queue_drops_command(voice_controller, ring_queue):
+    voice_controller.save_command_to_thread_data(command_data("land"))
+
+    start = time.monotonic()
+    voice_controller.save_command_to_thread_data(command_data("take off"))
+    assert time.monotonic() - start < 1
+
+    assert ring_queue.get_nowait()[cc.COMMAND_TEXT] == "land"
+    assert ring_queue.empty()
+
+
+def test_oversize_text_truncated(voice_controller, ring_queue, monkeypatch):
+    monkeypatch.setattr(voice_controller_module.c, "MAX_COMMAND_TEXT_LENGTH", 16)
+    voice_controller.save_command_to_thread_data(command_data("land " * 100))
+
+    received = ring_queue.get_nowait()
+    assert received[cc.COMMAND_TEXT] == ("land " * 100)[:16]
+    assert received[cc.PARSED_COMMAND] == [("land", 0)]
+
+
+def test_oversize_command_dropped(voice_controller, ring_queue):
+    voice_controller.save_command_to_thread_data({cc.COMMAND_TEXT: "land", cc.PARSED_COMMAND: [("up", 1)] * 100})
+    assert ring_queue.empty()